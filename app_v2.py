@@ -8,21 +8,27 @@ import streamlit as st
 import os
 import json
 from datetime import datetime
+from config import TRAINING_CATEGORIES
 
-# Configurar logging (desabilitado por permissões CloudWatch)
-# from utils.logger import setup_logging, log_event
-# logger = setup_logging(__name__)
-import logging
-logger = logging.getLogger(__name__)
+# Configurar logging (envio assíncrono em lotes ao CloudWatch)
+from utils.logger import setup_logging, log_event
+logger = setup_logging(__name__)
 
 # Importar módulos
 from utils.aws_client import get_aws_client
+from utils.metrics import get_metrics
+from utils.capacity import get_accountant, metered_page, set_current_user
+from utils.health import get_health_monitor, sparkline
+from utils.export import IterStream
 from modules.auth import SessionManager, CognitoAuth
 from modules.questions import QuestionManager
 from modules.progress import ProgressManager
 from modules.ai import FeedbackGenerator, AIQuestionGenerator
-from modules.gamification import CertificateManager, GamificationManager
+from modules.gamification import (CertificateManager, GamificationManager, badge_progress,
+                                  certificate_period, certificate_status)
 from modules.reports import ReportGenerator
+from modules.item_analysis import ItemAnalyzer
+from modules.ranking import get_rank_index
 
 # Configuração da página
 st.set_page_config(
@@ -142,6 +148,10 @@ try:
     if not aws_client.is_healthy():
         st.error("❌ Erro ao conectar com serviços AWS")
         st.stop()
+    # Bedrock só é usado ao fim do treinamento: criar o cliente fora do caminho da página
+    aws_client.warm_up(['bedrock'], background=True)
+    # Sondas periódicas de latência/erros (thread única por processo)
+    get_health_monitor()
 except Exception as e:
     st.error(f"❌ Erro ao inicializar: {e}")
     logger.error(f"Erro crítico: {e}")
@@ -149,11 +159,13 @@ except Exception as e:
 
 # Instanciar gerenciadores
 question_manager = QuestionManager()
-progress_manager = ProgressManager()
+rank_index = get_rank_index()  # um por processo: sobrevive aos reruns do Streamlit
+gamification_manager = GamificationManager(rank_index=rank_index)
+progress_manager = ProgressManager(gamification=gamification_manager)
 feedback_generator = FeedbackGenerator()
 certificate_manager = CertificateManager()
-gamification_manager = GamificationManager()
 report_generator = ReportGenerator()
+item_analyzer = ItemAnalyzer()
 
 # Verificar status do Bedrock (cache por sessão)
 @st.cache_data(ttl=300)  # Cache por 5 minutos
@@ -177,6 +189,7 @@ def get_cached_questions(category):
 bedrock_available = check_bedrock_status()
 
 
+@metered_page
 def render_login_page():
     """Página de login/registro"""
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -186,7 +199,7 @@ def render_login_page():
         st.markdown("### Plataforma de Treinamento em Segurança Cibernética v2.0")
         st.markdown("---")
         
-        tab1, tab2 = st.tabs(["🔐 Entrar", "📝 Registrar"])
+        tab1, tab2, tab3 = st.tabs(["🔐 Entrar", "📝 Registrar", "🔎 Verificar Certificado"])
         
         with tab1:
             st.subheader("Acesso de Usuário")
@@ -199,7 +212,7 @@ def render_login_page():
                     if email and password:
                         # Simular autenticação (em produção usar Cognito)
                         SessionManager.set_user(email, "token_" + email, "student")
-                        # log_event(logger, "user_login", email, {"timestamp": datetime.now().isoformat()})
+                        log_event(logger, "user_login", email, {"timestamp": datetime.now().isoformat()})
                         st.success(f"✅ Bem-vindo, {email}!")
                         st.rerun()
                     else:
@@ -220,18 +233,66 @@ def render_login_page():
                 if name and email_reg and password_reg:
                     if password_reg == password_confirm:
                         SessionManager.set_user(email_reg, "token_" + email_reg, "student")
-                        # log_event(logger, "user_signup", email_reg, {"name": name})
+                        log_event(logger, "user_signup", email_reg, {"name": name})
                         st.success(f"✅ Conta criada com sucesso! Bem-vindo, {name}!")
                         st.rerun()
                     else:
                         st.error("❌ As senhas não combinam")
                 else:
                     st.error("⚠️ Preencha todos os campos")
+        
+        with tab3:
+            render_certificate_verification()
+
+
+CERTIFICATE_STATUS = {
+    'valid': '✅ Válido',
+    'expired': '⌛ Expirado',
+    'not_found': '❌ Não encontrado',
+    'error': '⚠️ Erro na verificação'
+}
 
 
+def render_certificate_verification():
+    """Verificação pública de certificados (individual ou em lote, sem login)"""
+    st.subheader("Verificação de Autenticidade")
+    
+    certificate_id = st.text_input("🆔 ID do Certificado", key="verify_id")
+    if st.button("🔎 Verificar", use_container_width=True) and certificate_id.strip():
+        cert = certificate_manager.verify_certificate(certificate_id.strip())
+        status = certificate_status(cert)
+        if status == 'not_found':
+            st.error(CERTIFICATE_STATUS[status])
+        else:
+            st.success(f"{CERTIFICATE_STATUS[status]}: **{cert.get('userName', '')}** - "
+                       f"{cert.get('category', '').upper()} ({cert.get('accuracy', 0)}% de acerto)")
+    
+    st.markdown("---")
+    st.write("**Verificação em lote (RH)**")
+    upload = st.file_uploader("Arquivo com um ID por linha (.txt ou .csv)", type=['txt', 'csv'])
+    if upload is not None and st.button("🔎 Verificar arquivo", use_container_width=True):
+        ids = [line.split(',')[0].strip() for line in upload.getvalue().decode('utf-8').splitlines()]
+        ids = [i for i in ids if i.lower() not in ('id', 'certificateid')]  # cabeçalho
+        try:
+            results = certificate_manager.verify_many(ids)
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+        else:
+            rows = [{
+                'ID': certificate_id,
+                'Situação': CERTIFICATE_STATUS[result['status']],
+                'Nome': (result['certificate'] or {}).get('userName', ''),
+                'Categoria': (result['certificate'] or {}).get('category', '')
+            } for certificate_id, result in results.items()]
+            valid = sum(1 for r in results.values() if r['status'] == 'valid')
+            st.metric("Certificados válidos", f"{valid}/{len(results)}")
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+@metered_page
 def render_student_dashboard():
     """Dashboard do aluno"""
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric("📊 Progresso Geral", f"{st.session_state.get('progress', 0)}%", "0%")
@@ -244,6 +305,15 @@ def render_student_dashboard():
         badges = gamification_manager.get_user_badges(st.session_state.user_id)
         st.metric("🏆 Badges", len(badges), f"+{len(badges)}")
     
+    with col4:
+        rank = rank_index.rank_of(st.session_state.user_id)
+        if not rank_index.loaded:
+            st.metric("🏅 Sua Posição", "—", "carregando ranking", delta_color="off")
+        elif rank is None:
+            st.metric("🏅 Sua Posição", "—", f"mín. {rank_index.min_answers} respostas", delta_color="off")
+        else:
+            st.metric("🏅 Sua Posição", f"#{rank}", f"de {rank_index.size()}", delta_color="off")
+    
     st.markdown("---")
     
     # Tabs principais
@@ -271,6 +341,7 @@ def render_student_dashboard():
         render_data_export_section()
 
 
+@metered_page
 def render_training_section():
     """Seção de treinamento"""
     st.subheader("📚 Treinar em Segurança Cibernética")
@@ -301,18 +372,19 @@ def render_training_section():
         
         with col1:
             if st.button("🚀 Iniciar Treinamento", type="primary", use_container_width=True):
-                st.session_state.questions = question_manager.get_by_category(category)
+                st.session_state.questions = question_manager.sample(category, difficulty)
                 st.session_state.category = category
                 st.session_state.index = 0
                 st.session_state.answered = False
                 st.session_state.answers = {}
+                st.session_state.session_feedback = None
                 st.session_state.start_time = datetime.now()
                 
                 if st.session_state.questions:
-                    # log_event(logger, "training_started", st.session_state.user_id, {
-                    #     'category': category,
-                    #     'question_count': len(st.session_state.questions)
-                    # })
+                    log_event(logger, "training_started", st.session_state.user_id, {
+                        'category': category,
+                        'question_count': len(st.session_state.questions)
+                    })
                     st.rerun()
                 else:
                     st.error("❌ Nenhuma questão disponível nesta categoria")
@@ -326,12 +398,13 @@ def render_training_section():
                     st.json(question)
                 else:
                     st.warning("⚠️ Limite de IA atingido. Tente novamente mais tarde.")
-    
+                    
     else:
         # Renderizar questão atual
         render_question()
 
 
+@metered_page
 def render_question():
     """Renderiza questão atual"""
     questions = st.session_state.questions
@@ -368,15 +441,16 @@ def render_question():
                         q['questionId'],
                         correct,
                         st.session_state.category,
-                        time_spent
+                        time_spent,
+                        q.get('difficulty')
                     )
                     
                     # Log
-                    # log_event(logger, "answer_submitted", st.session_state.user_id, {
-                    #     'question_id': q['questionId'],
-                    #     'correct': correct,
-                    #     'time_spent': time_spent
-                    # })
+                    log_event(logger, "answer_submitted", st.session_state.user_id, {
+                        'question_id': q['questionId'],
+                        'correct': correct,
+                        'time_spent': time_spent
+                    })
                     
                     st.rerun()
             
@@ -385,7 +459,7 @@ def render_question():
                     st.session_state.index += 1
                     st.session_state.answered = False
                     st.rerun()
-        
+                    
         else:
             # Mostrar resultado
             correct = st.session_state.answers.get(idx) == int(q['correctAnswer'])
@@ -408,12 +482,13 @@ def render_question():
                 if st.button("📋 Ver Resumo", use_container_width=True):
                     st.session_state.show_summary = True
                     st.rerun()
-    
+                    
     else:
         # Treino completo
         render_training_summary()
 
 
+@metered_page
 def render_training_summary():
     """Resumo do treinamento - VERSÃO LIMPA SEM FEEDBACK"""
     st.balloons()
@@ -460,34 +535,42 @@ def render_training_summary():
     # TESTE: Reativando feedback com versão robusta
     st.markdown("## 🤖 Feedback das Questões")
     
+    # Feedback de toda a sessão em uma única chamada à IA (calculado uma vez)
+    session_answers = []
     for i, q in enumerate(questions):
         user_ans_idx = st.session_state.answers.get(i, int(q['correctAnswer']))
         correct_ans_idx = int(q['correctAnswer'])
-        is_correct = user_ans_idx == correct_ans_idx
-        
+        session_answers.append({
+            'question': q['question'],
+            'user_answer': q['options'][user_ans_idx],
+            'correct_answer': q['options'][correct_ans_idx],
+            'is_correct': user_ans_idx == correct_ans_idx
+        })
+    
+    if st.session_state.get('session_feedback') is None:
+        try:
+            st.session_state.session_feedback = feedback_generator.generate_session_feedback(
+                session_answers,
+                st.session_state.category
+            )
+        except Exception as e:
+            st.error(f"Erro no feedback: {e}")
+            st.session_state.session_feedback = [
+                "💡 Continue praticando para melhorar seus conhecimentos!"
+            ] * len(session_answers)
+    
+    for i, (q, item) in enumerate(zip(questions, session_answers)):
         with st.expander(f"Questão {i+1}: {q['question'][:50]}...", expanded=False):
             col1, col2 = st.columns(2)
             with col1:
-                if is_correct:
-                    st.success(f"✅ Sua resposta: {q['options'][user_ans_idx]}")
+                if item['is_correct']:
+                    st.success(f"✅ Sua resposta: {item['user_answer']}")
                 else:
-                    st.error(f"❌ Sua resposta: {q['options'][user_ans_idx]}")
+                    st.error(f"❌ Sua resposta: {item['user_answer']}")
             with col2:
-                st.info(f"✅ Resposta correta: {q['options'][correct_ans_idx]}")
+                st.info(f"✅ Resposta correta: {item['correct_answer']}")
             
-            # Feedback com tratamento robusto
-            try:
-                feedback = feedback_generator.generate_feedback(
-                    q['question'],
-                    q['options'][user_ans_idx],
-                    q['options'][correct_ans_idx],
-                    is_correct,
-                    st.session_state.category
-                )
-                st.markdown(feedback)
-            except Exception as e:
-                st.error(f"Erro no feedback: {e}")
-                st.info("💡 Continue praticando para melhorar seus conhecimentos!")
+            st.markdown(st.session_state.session_feedback[i])
     
     st.success("✅ **Treinamento concluído com sucesso!** Use os botões abaixo para continuar.")
     
@@ -497,6 +580,7 @@ def render_training_summary():
         if st.button("🔄 Novo Treinamento", use_container_width=True):
             st.session_state.questions = []
             st.session_state.answers = {}
+            st.session_state.session_feedback = None
             st.session_state.show_summary = False
             st.rerun()
     
@@ -509,9 +593,11 @@ def render_training_summary():
         if st.button("🏠 Ir para Dashboard", use_container_width=True):
             st.session_state.questions = []
             st.session_state.answers = {}
+            st.session_state.session_feedback = None
             st.rerun()
 
 
+@metered_page
 def render_analytics_section():
     """Seção de análise e estatísticas"""
     st.subheader("📊 Sua Análise de Desempenho")
@@ -535,6 +621,8 @@ def render_analytics_section():
         
         st.markdown("---")
         
+        render_position_widget()
+        
         # Gráfico por categoria
         if stats.get('by_category'):
             st.subheader("Desempenho por Categoria")
@@ -557,6 +645,7 @@ def render_analytics_section():
             st.info("Sem atividade nos últimos 7 dias")
 
 
+@metered_page
 def render_certificates_section():
     """Seção de certificados"""
     st.subheader("📜 Meus Certificados")
@@ -580,16 +669,79 @@ def render_certificates_section():
                 """)
             
             with col2:
-                if st.button("📥 Baixar", key=f"cert_{cert.get('certificateId')}", use_container_width=True):
-                    st.info("Em produção, arquivo PDF seria baixado")
+                # Download direto do S3: o servidor da aplicação não trafega o PDF
+                url = certificate_manager.get_download_url(
+                    cert, cache=st.session_state.setdefault('certificate_urls', {})
+                )
+                if url:
+                    st.link_button("📥 Baixar", url, use_container_width=True)
+                else:
+                    st.button("📥 Indisponível", key=f"cert_{cert.get('certificateId')}",
+                              disabled=True, use_container_width=True)
+
+
+def render_position_widget():
+    """Posição do aluno no ranking geral ou de uma categoria, com os vizinhos"""
+    st.subheader("🏅 Sua Posição no Ranking")
+    
+    category = st.selectbox(
+        "Ranking:",
+        [None] + list(TRAINING_CATEGORIES),
+        format_func=lambda c: 'Geral' if c is None else TRAINING_CATEGORIES[c]['name'],
+        key="ranking_scope"
+    )
+    nearby = rank_index.around(st.session_state.user_id, k=2, category=category)
+    
+    if not rank_index.loaded:
+        st.info("O ranking está sendo carregado. Volte em instantes.")
+    elif not nearby:
+        st.info(f"Responda pelo menos {rank_index.min_answers} questões para entrar neste ranking.")
+    else:
+        st.dataframe([{
+            'Posição': f"#{row['rank']}",
+            'Aluno': 'Você' if row['user_id'] == st.session_state.user_id else row['user_id'].split('@')[0],
+            'Taxa de Acerto': f"{row['accuracy']:.1f}%",
+            'Acertos': row['correct']
+        } for row in nearby], use_container_width=True, hide_index=True)
+    
+    st.markdown("---")
+
 
+POINTS_WINDOWS = {'week': 'Semana', 'month': 'Mês', 'all': 'Geral'}
 
+
+def render_points_leaderboard(aggregates: dict):
+    """Pontos do aluno e ranking de pontos da semana, do mês ou geral"""
+    st.markdown("---")
+    st.subheader("⭐ Pontos")
+    
+    points = gamification_manager.get_points(st.session_state.user_id, aggregates)
+    cols = st.columns(len(POINTS_WINDOWS))
+    for col, (window, label) in zip(cols, POINTS_WINDOWS.items()):
+        col.metric(label, points[window])
+    
+    window = st.radio("Ranking de pontos:", list(POINTS_WINDOWS), format_func=POINTS_WINDOWS.get,
+                      horizontal=True, key="points_window")
+    rows = rank_index.top_points(10, window=window)
+    if not any(row['user_id'] == st.session_state.user_id for row in rows):
+        rows += rank_index.around_points(st.session_state.user_id, k=1, window=window)
+    
+    if not rows:
+        st.info("Ninguém pontuou neste período ainda. Acerte questões para pontuar!")
+    else:
+        st.dataframe([{
+            'Posição': f"#{row['rank']}",
+            'Aluno': 'Você' if row['user_id'] == st.session_state.user_id else row['user_id'].split('@')[0],
+            'Pontos': row['points']
+        } for row in rows], use_container_width=True, hide_index=True)
+
+
+@metered_page
 def render_badges_section():
     """Seção de badges e gamificação"""
     st.subheader("🎖️ Meus Badges")
     
     badges = gamification_manager.get_user_badges(st.session_state.user_id)
-    stats = progress_manager.get_user_stats(st.session_state.user_id)
     
     # Mostrar badges desbloqueados
     if badges:
@@ -607,63 +759,60 @@ def render_badges_section():
                     </div>
                     """, unsafe_allow_html=True)
     
-    # Mostrar próximos badges elegíveis
+    aggregates = gamification_manager.get_user_aggregates(st.session_state.user_id)
+    render_points_leaderboard(aggregates)
+    
+    # Badges são desbloqueados automaticamente ao responder; aqui só o progresso
     st.markdown("---")
     st.subheader("Próximos Badges Disponíveis")
     
-    eligible_badges = gamification_manager.check_badge_eligibility(
-        st.session_state.user_id,
-        stats
-    )
+    unlocked = {b.get('badgeId') for b in badges}
+    progress = badge_progress(aggregates)
+    locked = [(badge_id, info) for badge_id, info in gamification_manager.BADGES.items()
+              if badge_id not in unlocked]
     
-    if eligible_badges:
-        st.success(f"🎯 Você qualificou-se para **{len(eligible_badges)}** badge(s)! Parabéns! 🎉")
-        
-        for badge_id in eligible_badges:
-            badge_info = gamification_manager.BADGES.get(badge_id)
-            if badge_info:
-                st.write(f"- {badge_info['icon']} **{badge_info['name']}**: {badge_info['requirement']}")
-                if st.button(f"Desbloquear {badge_info['name']}", key=f"unlock_{badge_id}"):
-                    if gamification_manager.unlock_badge(st.session_state.user_id, badge_id):
-                        st.success(f"✅ Badge '{badge_info['name']}' desbloqueado!")
-                        st.rerun()
-    else:
-        # Mostrar badges disponíveis
-        st.info("Nenhum novo badge desbloqueado ainda. Continue treinando!")
-        
-        st.markdown("**Badges Disponíveis:**")
-        for badge_id, badge_info in gamification_manager.BADGES.items():
+    if locked:
+        st.info("Os badges são desbloqueados automaticamente enquanto você treina!")
+        for badge_id, badge_info in locked:
             st.write(f"- {badge_info['icon']} **{badge_info['name']}**: {badge_info['requirement']}")
+            if badge_id in progress:
+                st.progress(progress[badge_id])
+    else:
+        st.success("🎉 Você desbloqueou todos os badges!")
 
 
+@metered_page
 def render_data_export_section():
     """Seção para exportar dados"""
     st.subheader("📥 Exportar Meus Dados")
     
     col1, col2, col3 = st.columns(3)
     
+    # Os arquivos são gerados sob demanda, no clique, página a página
+    user_id = st.session_state.user_id
+    
     with col1:
         if st.button("📊 Exportar como CSV", use_container_width=True):
-            csv_data = report_generator.generate_user_report_csv(st.session_state.user_id)
-            if csv_data:
+            if report_generator.has_data(user_id):
                 st.download_button(
                     label="Baixar CSV",
-                    data=csv_data,
-                    file_name=f"cyberguard_{st.session_state.user_id}_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv"
+                    data=lambda: IterStream(report_generator.stream_csv([user_id])),
+                    file_name=f"cyberguard_{user_id}_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv",
+                    on_click="ignore"
                 )
             else:
                 st.error("Nenhum dado para exportar")
     
     with col2:
         if st.button("📄 Exportar como JSON", use_container_width=True):
-            json_data = report_generator.export_to_json(st.session_state.user_id)
-            if json_data:
+            if report_generator.has_data(user_id):
                 st.download_button(
-                    label="Baixar JSON",
-                    data=json_data,
-                    file_name=f"cyberguard_{st.session_state.user_id}_{datetime.now().strftime('%Y%m%d')}.json",
-                    mime="application/json"
+                    label="Baixar JSON Lines",
+                    data=lambda: IterStream(report_generator.stream_jsonl([user_id])),
+                    file_name=f"cyberguard_{user_id}_{datetime.now().strftime('%Y%m%d')}.jsonl",
+                    mime="application/x-ndjson",
+                    on_click="ignore"
                 )
             else:
                 st.error("Nenhum dado para exportar")
@@ -677,15 +826,53 @@ def render_data_export_section():
                 st.error("Nenhum dado para gerar relatório")
 
 
+def render_cohort_certificates(cohort_report: dict):
+    """Emissão em lote dos certificados da turma a partir do relatório"""
+    with st.form("cohort_certificates"):
+        st.write(f"**Emitir certificados da turma** (período {certificate_period()})")
+        category = st.selectbox("Categoria", list(TRAINING_CATEGORIES),
+                                format_func=lambda c: TRAINING_CATEGORIES[c]['name'])
+        submitted = st.form_submit_button("🏆 Emitir certificados", use_container_width=True)
+    if not submitted:
+        return
+    
+    candidates = [{
+        'user_id': user_id,
+        'category': category,
+        'accuracy': summary['by_category'].get(category, {}).get('accuracy', 0),
+        'total_questions': summary['by_category'].get(category, {}).get('total', 0)
+    } for user_id, summary in cohort_report['users'].items() if 'error' not in summary]
+    with st.spinner(f"Emitindo certificados para {len(candidates)} alunos..."):
+        batch = certificate_manager.issue_batch(candidates)
+    
+    counts = batch['counts']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Emitidos", counts.get('issued', 0))
+    col2.metric("Já existentes", counts.get('exists', 0))
+    col3.metric("Não elegíveis", counts.get('ineligible', 0))
+    col4.metric("Falhas", counts.get('error', 0))
+    st.dataframe([{
+        'Aluno': r['user_id'], 'Situação': r['status'],
+        'Certificado': r['certificate_id'], 'Erro': r.get('error', '')
+    } for r in batch['results']], use_container_width=True, hide_index=True)
+
+
+@metered_page
 def render_instructor_dashboard():
     """Dashboard do instrutor"""
     st.subheader("👨‍🏫 Dashboard do Instrutor")
     
+    # Um único snapshot (compartilhado entre instrutores) alimenta as duas abas
+    if st.button("🔄 Atualizar dados"):
+        report = report_generator.generate_instructor_report(max_age=0)
+    else:
+        report = report_generator.generate_instructor_report()
+    st.caption(f"Dados de {report.get('snapshot_age_seconds', 0) / 60:.0f} min atrás")
+    
     tab1, tab2, tab3 = st.tabs(["📊 Relatórios", "👥 Alunos", "⚙️ Gerenciar"])
     
     with tab1:
         st.write("**Estatísticas Gerais**")
-        report = report_generator.generate_instructor_report()
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -705,7 +892,6 @@ def render_instructor_dashboard():
     
     with tab2:
         st.write("**Desempenho dos Alunos**")
-        report = report_generator.generate_instructor_report()
         
         if report.get('by_user'):
             # Top 10 alunos
@@ -726,6 +912,32 @@ def render_instructor_dashboard():
                     st.write(f"{accuracy:.1f}%")
                 with col4:
                     st.write(f"{correct}/{total}")
+        
+        st.divider()
+        st.write("**Relatório de Turma**")
+        cohort_text = st.text_area("E-mails dos alunos (um por linha ou separados por vírgula)")
+        if st.button("👥 Gerar relatório da turma") and cohort_text.strip():
+            cohort = [u.strip() for u in cohort_text.replace(',', '\n').splitlines() if u.strip()]
+            with st.spinner(f"Consultando {len(cohort)} alunos..."):
+                st.session_state.cohort_report = report_generator.generate_cohort_report(cohort)
+            if not st.session_state.cohort_report:
+                st.error("Erro ao gerar relatório da turma")
+        
+        cohort_report = st.session_state.get('cohort_report')
+        if cohort_report:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Alunos ativos", f"{cohort_report['active_users']}/{cohort_report['cohort_size']}")
+            col2.metric("Taxa de acerto", f"{cohort_report['overall_accuracy']:.1f}%")
+            col3.metric("Questões respondidas", cohort_report['total_questions'])
+            st.dataframe([
+                {'Aluno': uid, 'Questões': s.get('total_questions', 0),
+                 'Acerto (%)': round(s.get('overall_accuracy', 0), 1),
+                 'Tempo (min)': round(s.get('total_study_time_seconds', 0) / 60, 1)}
+                for uid, s in cohort_report['users'].items()
+            ], use_container_width=True)
+            if cohort_report['without_data']:
+                st.caption(f"Sem dados: {', '.join(cohort_report['without_data'])}")
+            render_cohort_certificates(cohort_report)
     
     with tab3:
         st.write("**Gerenciamento de Questões**")
@@ -744,8 +956,42 @@ def render_instructor_dashboard():
         with col3:
             if st.button("🔄 Limpar Dados de Teste", use_container_width=True):
                 st.warning("Esta ação não pode ser desfeita!")
+        
+        st.divider()
+        st.write("**Análise de Itens**")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🧮 Atualizar estatísticas", use_container_width=True):
+                result = item_analyzer.refresh()
+                if result:
+                    st.success(f"✅ {result['answers']} novas respostas, "
+                               f"{result['questions_updated']} questões atualizadas")
+                else:
+                    st.error("Erro na análise de itens")
+        with col2:
+            if st.button("♻️ Recalcular tudo", use_container_width=True):
+                result = item_analyzer.refresh(full=True)
+                if result:
+                    st.success(f"✅ {result['questions_updated']} questões recalculadas")
+        
+        item_stats = item_analyzer.get_item_stats()
+        flagged = [row for row in item_stats if row['flags']]
+        if flagged:
+            st.warning(f"⚠️ {len(flagged)} questões com problemas")
+        if item_stats:
+            st.dataframe(
+                [{**row, 'flags': ', '.join(row['flags'])} for row in item_stats],
+                use_container_width=True,
+                column_config={
+                    'p_value': st.column_config.NumberColumn('p-value', format='%.2f'),
+                    'point_biserial': st.column_config.NumberColumn('Discriminação', format='%.2f'),
+                    'avg_time': st.column_config.NumberColumn('Tempo médio (s)', format='%.1f')
+                }
+            )
 
 
+@metered_page
 def render_admin_panel():
     """Painel de administrador"""
     st.subheader("⚙️ Painel de Administrador")
@@ -777,20 +1023,103 @@ def render_admin_panel():
     with tab4:
         st.write("**Status do Sistema**")
         
-        col1, col2, col3 = st.columns(3)
+        monitor = get_health_monitor()
+        if st.button("🔄 Sondar agora"):
+            monitor.request_run()
+            st.info("Sondagem solicitada; os resultados aparecem na próxima atualização.")
+        
+        status_labels = {
+            'ok': '✅ Online',
+            'degraded': '⚠️ Degradado',
+            'down': '❌ Fora do ar',
+            'unknown': '⏳ Aguardando'
+        }
+        health = monitor.report()
+        columns = st.columns(3)
+        for i, (name, h) in enumerate(health.items()):
+            with columns[i % 3]:
+                st.metric(
+                    name,
+                    status_labels[h['status']],
+                    delta=f"p95 {h['p95_ms']:.0f} ms · erros {h['error_rate']:.0%}",
+                    delta_color="off",
+                    help=h['last_error']
+                )
+                st.caption(
+                    f"p50 {h['p50_ms']:.0f} · p99 {h['p99_ms']:.0f} ms  "
+                    f"`{sparkline(h['series'][-40:])}`"
+                )
+        
+        st.markdown("---")
+        st.write("**Latência por Operação**")
+        operations = get_metrics().snapshot()
+        if operations:
+            st.dataframe(
+                [
+                    {
+                        'Operação': name,
+                        'Chamadas': m['calls'],
+                        'Erros': m['errors'],
+                        'p50 (ms)': round(m['p50_ms'], 1),
+                        'p95 (ms)': round(m['p95_ms'], 1),
+                        'p99 (ms)': round(m['p99_ms'], 1),
+                        'Itens': m['items'],
+                        'RCU': m['read_units'],
+                        'WCU': m['write_units']
+                    }
+                    for name, m in operations.items()
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            st.download_button(
+                label="📥 Métricas (Prometheus)",
+                data=get_metrics().to_prometheus(),
+                file_name=f"cyberguard_metrics_{datetime.now().strftime('%Y%m%d_%H%M')}.prom",
+                mime="text/plain"
+            )
+        else:
+            st.info("Nenhuma operação registrada ainda")
         
+        st.markdown("---")
+        st.write("**Capacidade DynamoDB Consumida**")
+        accountant = get_accountant()
+        usage = accountant.session_usage(st.session_state.user_id)
+        col1, col2 = st.columns(2)
         with col1:
-            st.metric("AWS DynamoDB", "✅ Online")
+            st.metric("RCU nesta sessão", f"{usage['read_units']:.1f} / {usage['read_budget']:.0f}")
+            st.progress(min(usage['read_ratio'], 1.0))
         with col2:
-            st.metric("AWS Bedrock", "✅ Online")
-        with col3:
-            st.metric("CloudWatch", "✅ Online")
+            st.metric("WCU nesta sessão", f"{usage['write_units']:.1f} / {usage['write_budget']:.0f}")
+            st.progress(min(usage['write_ratio'], 1.0))
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("Por página")
+            st.dataframe(
+                [{'Página': name, 'RCU': round(u['read_units'], 1), 'WCU': round(u['write_units'], 1),
+                  'Chamadas': u['calls']} for name, u in accountant.totals('page').items()],
+                use_container_width=True,
+                hide_index=True
+            )
+        with col2:
+            st.write("Por operação")
+            st.dataframe(
+                [{'Operação': name, 'RCU': round(u['read_units'], 1), 'WCU': round(u['write_units'], 1),
+                  'Chamadas': u['calls']} for name, u in accountant.totals('operation').items()],
+                use_container_width=True,
+                hide_index=True
+            )
 
 
 # MAIN APP LOGIC
+@metered_page(name="main")
 def main():
     """Função principal"""
     
+    # Consumo DynamoDB desta execução é atribuído ao usuário logado
+    set_current_user(st.session_state.get('user_id'))
+    
     # Remover aviso global - tratar erro apenas quando necessário
     
     # Barra lateral
@@ -838,7 +1167,7 @@ def main():
             st.markdown("---")
             
             if st.button("🚪 Sair", use_container_width=True):
-                # log_event(logger, "user_logout", st.session_state.user_id, {})
+                log_event(logger, "user_logout", st.session_state.user_id, {})
                 SessionManager.logout()
                 st.rerun()
     
@@ -867,7 +1196,7 @@ def main():
             st.write("Role:", role)
             st.write("Membro desde:", datetime.now().strftime('%d/%m/%Y'))
         elif page == "Sair":
-            # log_event(logger, "user_logout", st.session_state.user_id, {})
+            log_event(logger, "user_logout", st.session_state.user_id, {})
             SessionManager.logout()
             st.rerun()
 
@@ -0,0 +1,29 @@
+"""
+Carga única da tabela user_stats a partir do histórico de respostas
+
+Usuários que já respondiam antes da user_stats existir não têm agregados, e
+badges, ranking e pontos partem do zero para eles. Este script recalcula os
+agregados de todos a partir das tabelas de progresso e de badges.
+
+Uso (com a aplicação parada, pois os itens são sobrescritos):
+    python backfill_user_stats.py
+"""
+import logging
+import sys
+from modules.gamification import GamificationManager
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    
+    result = GamificationManager().rebuild_user_stats()
+    if not result:
+        print("❌ Falha ao reconstruir a user_stats (ver o log)")
+        return 1
+    
+    print(f"✅ Agregados de {result['users']} usuários a partir de {result['answers']} respostas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
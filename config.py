@@ -1,6 +1,7 @@
 """
 Arquivo de configuração e constantes da aplicação
 """
+import os
 
 # Categorias de Treinamento
 TRAINING_CATEGORIES = {
@@ -40,6 +41,39 @@ CERTIFICATION_REQUIREMENTS = {
     'validity_days': 365   # Válido por 1 ano
 }
 
+# Renderização dos certificados em PDF (modules/certificate_pdf.py)
+CERTIFICATE_PDF = {
+    'workers': int(os.getenv('CERT_PDF_WORKERS', min(4, os.cpu_count() or 1))),  # 0 = sem pool
+    'start_method': 'spawn',        # seguro com as threads do Streamlit
+    'batch_chunksize': 16,          # certificados por tarefa no modo em lote
+    'font_path': os.getenv('CERT_PDF_FONT'),            # TTF opcional (Unicode completo)
+    'bold_font_path': os.getenv('CERT_PDF_FONT_BOLD'),
+    'logo_path': os.getenv('CERT_PDF_LOGO'),
+    'background_path': os.getenv('CERT_PDF_BACKGROUND')
+}
+
+# PDFs dos certificados no S3 (gerados uma vez, baixados por URL pré-assinada)
+CERTIFICATE_STORAGE = {
+    'bucket': os.getenv('CERTIFICATES_BUCKET', 'cyberguard-certificates'),
+    'url_ttl': int(os.getenv('CERT_URL_TTL', 300)),  # segundos
+    'url_refresh_margin': 30                          # renova a URL antes de expirar
+}
+
+# Emissão de certificados em lote (CertificateManager.issue_batch)
+CERTIFICATE_BATCH = {
+    'chunk_size': 200,                                            # renderiza/grava por blocos
+    'upload_workers': int(os.getenv('CERT_BATCH_UPLOAD_WORKERS', 8))
+}
+
+# Verificação pública de certificados (cache em processo)
+CERTIFICATE_VERIFICATION = {
+    'ttl': float(os.getenv('CERT_VERIFY_TTL', 3600)),
+    'negative_ttl': float(os.getenv('CERT_VERIFY_NEGATIVE_TTL', 60)),  # IDs inexistentes
+    'max_entries': 50000,
+    'workers': int(os.getenv('CERT_VERIFY_WORKERS', 8)),               # verificação em lote
+    'max_batch': 5000
+}
+
 # Gamificação
 GAMIFICATION = {
     'accuracy_80': {'points': 100, 'name': 'Especialista'},
@@ -52,27 +86,155 @@ GAMIFICATION = {
     'champion': {'points': 500, 'name': 'Campeão'}
 }
 
+# Regras de badges avaliadas a cada resposta (modules/gamification.py)
+BADGE_RULES = {
+    'accuracy_min_answers': 10,  # acurácia só conta a partir deste volume
+    'persistent_answers': 30,
+    'speedster_seconds': 30,
+    'champion_top': 3
+}
+
+# Ranking em memória (modules/ranking.py)
+RANKING = {
+    'min_answers': int(os.getenv('RANKING_MIN_ANSWERS', 5)),  # abaixo disso não classifica
+    'buckets': 1000,                                           # faixas de taxa de acerto (0,1%)
+    'refresh_seconds': float(os.getenv('RANKING_REFRESH_SECONDS', 300)),
+    'retry_seconds': float(os.getenv('RANKING_RETRY_SECONDS', 5))  # 1ª carga com falha: espera dobra
+}
+
 # AWS Configuration
-AWS_REGION = 'us-east-1'
+AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+
+# Cognito: tokens verificados localmente contra as chaves públicas (JWKS) do pool
+COGNITO = {
+    'user_pool_id': os.getenv('COGNITO_USER_POOL_ID', ''),
+    'client_id': os.getenv('COGNITO_CLIENT_ID', ''),
+    'jwks_refresh_seconds': int(os.getenv('COGNITO_JWKS_REFRESH', 6 * 3600)),
+    'jwks_min_interval': 60,      # intervalo mínimo entre buscas por kid desconhecido
+    'leeway_seconds': 30,         # tolerância de relógio para exp/iat
+    'claims_cache_size': 10000    # tokens já verificados mantidos em memória
+}
+
+# Serviços AWS simulados em memória (utils/fake_aws.py) para testes e benchmarks
+AWS_FAKE = os.getenv('CYBERGUARD_FAKE_AWS', '').lower() in ('1', 'true', 'yes')
+
 DYNAMODB_TABLES = {
     'questions': 'cyberguard-questions',
     'progress': 'cyberguard-progress',
     'certificates': 'cyberguard-certificates',
-    'badges': 'cyberguard-badges'
+    'badges': 'cyberguard-badges',
+    'user_stats': 'cyberguard-user-stats'
+}
+
+# Backend de armazenamento: 'dynamodb' (padrão) ou 'sqlite' (nó único/benchmarks)
+STORAGE = {
+    'backend': os.getenv('CYBERGUARD_STORAGE', 'dynamodb'),
+    'sqlite_path': os.getenv('CYBERGUARD_SQLITE_PATH', 'cyberguard.db'),
+    'sqlite_page_size': 5000  # itens por página em query/scan
 }
 
 BEDROCK_CONFIG = {
     'model_id': 'amazon.nova-micro-v1:0',
     'max_tokens_feedback': 800,
+    # Feedback da sessão: itens por chamada e orçamento por item (até 80 palavras + JSON)
+    'session_feedback_chunk': 8,
+    'max_tokens_feedback_item': 220,
     'max_tokens_question': 500,
     'temperature_feedback': 0.7,
     'temperature_question': 0.9
 }
 
+# Geração de questões com IA em lote
+AI_GENERATION = {
+    'max_workers': 4,        # Chamadas simultâneas ao Bedrock
+    'per_combination': 5,    # Questões por categoria/dificuldade
+    'max_retries': 3,        # Tentativas extras em caso de throttling
+    'backoff_base': 1.0      # Segundos (exponencial)
+}
+
 # Logging
 LOG_LEVEL = 'INFO'
 LOG_GROUP = '/cyberguard/app'
 
+# Instrumentação de latência (utils/metrics.py)
+METRICS = {
+    'namespace': 'CyberGuard',
+    'latency_buckets': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+}
+
+# Relatórios de instrutor (snapshots em memória)
+REPORTS = {
+    'snapshot_ttl': float(os.getenv('REPORT_SNAPSHOT_TTL', 300)),
+    'snapshot_max_stale': float(os.getenv('REPORT_SNAPSHOT_MAX_STALE', 3600)),
+    'scan_segments': int(os.getenv('REPORT_SCAN_SEGMENTS', 4)),
+    # Relatório de turma: consultas simultâneas e limite de RCU/s (0 = sem limite)
+    'cohort_workers': int(os.getenv('REPORT_COHORT_WORKERS', 16)),
+    'cohort_rcu_per_second': float(os.getenv('REPORT_COHORT_RCU', 25))
+}
+
+# Exportações em streaming (utils/export.py)
+EXPORTS = {
+    'bucket': os.getenv('EXPORTS_BUCKET', 'cyberguard-exports'),
+    'chunk_size': 65536,
+    'part_size': int(os.getenv('EXPORTS_PART_SIZE', 8 * 1024 * 1024))
+}
+
+# Cache do catálogo de questões usado para enriquecer relatórios
+QUESTION_CATALOG = {
+    'ttl': float(os.getenv('QUESTION_CATALOG_TTL', 600)),
+    'max_entries': 20000
+}
+
+# Análise de itens (modules/item_analysis.py)
+ITEM_ANALYSIS = {
+    'min_attempts': 20,           # abaixo disso vale a dificuldade declarada
+    'p_value_bounds': (0.10, 0.95),
+    'min_discrimination': 0.15,   # point-biserial
+    'difficulty_bands': {'easy': (0.75, 1.0), 'medium': (0.45, 0.75), 'hard': (0.0, 0.45)},
+    'sampler_weights': {'match': 4.0, 'other': 1.0},
+    # `through` não passa de (início da varredura - margem); ver modules/analytics.py
+    'watermark_margin_seconds': float(os.getenv('ITEM_ANALYSIS_WATERMARK_MARGIN', 300))
+}
+
+# Exportação analítica colunar (modules/analytics.py, export_analytics.py)
+ANALYTICS = {
+    'output_dir': os.getenv('ANALYTICS_OUTPUT_DIR', 'exports/analytics'),
+    'format': 'parquet',  # parquet | arrow
+    'compression': os.getenv('ANALYTICS_COMPRESSION', 'zstd'),
+    'scan_segments': int(os.getenv('ANALYTICS_SCAN_SEGMENTS', 8)),
+    'row_group_size': 100000,
+    # A marca d'água não passa de (início da varredura - margem): respostas gravadas
+    # durante a varredura, ou com relógio atrasado, são relidas na execução seguinte
+    'watermark_margin_seconds': float(os.getenv('ANALYTICS_WATERMARK_MARGIN', 300))
+}
+
+# Orçamento de capacidade DynamoDB por sessão de usuário (tabelas com 5 RCU/WCU)
+CAPACITY = {
+    'session_read_budget': float(os.getenv('CAPACITY_SESSION_RCU', 300)),
+    'session_write_budget': float(os.getenv('CAPACITY_SESSION_WCU', 120))
+}
+
+# Sondas de saúde das dependências (utils/health.py)
+HEALTH = {
+    'interval': float(os.getenv('HEALTH_INTERVAL', 30)),
+    'bedrock_interval': float(os.getenv('HEALTH_BEDROCK_INTERVAL', 300)),
+    'window': 120,
+    'degraded_p95_ms': 1000,
+    'degraded_error_rate': 0.05
+}
+
+# Envio assíncrono de logs ao CloudWatch (limites do PutLogEvents: 10.000 eventos / 1 MB)
+LOGGING = {
+    'batch_max_events': 10000,
+    'batch_max_bytes': 1048576,
+    'flush_interval': float(os.getenv('LOG_FLUSH_INTERVAL', 5)),
+    'queue_size': int(os.getenv('LOG_QUEUE_SIZE', 20000)),
+    'max_retries': 5,
+    'backoff_base': 0.5,
+    'overflow': os.getenv('LOG_OVERFLOW', 'spill'),  # spill | drop
+    'spill_path': os.getenv('LOG_SPILL_PATH', 'logs/cloudwatch-spill.jsonl')
+}
+
 # Streamlit
 STREAMLIT_CONFIG = {
     'page_title': 'CyberGuard Professional v2.0',
@@ -92,5 +254,31 @@ PAGINATION = {
 TIMEOUTS = {
     'bedrock_invoke': 60,
     'dynamodb_query': 5,
+    'aws_connect': 3,
+    'aws_default': 10,
     'session_timeout': 3600  # 1 hora
 }
+
+# Clientes AWS (botocore) - valores padrão sobrescritos por variáveis de ambiente
+AWS_CLIENT_CONFIG = {
+    'connect_timeout': int(os.getenv('AWS_CONNECT_TIMEOUT', TIMEOUTS['aws_connect'])),
+    'read_timeout': int(os.getenv('AWS_READ_TIMEOUT', TIMEOUTS['aws_default'])),  # serviços sem ajuste abaixo
+    'max_pool_connections': int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 50)),
+    'retry_mode': os.getenv('AWS_RETRY_MODE', 'adaptive'),
+    'max_attempts': int(os.getenv('AWS_MAX_ATTEMPTS', 5)),
+    'tcp_keepalive': os.getenv('AWS_TCP_KEEPALIVE', 'true').lower() == 'true',
+    # Ajustes por serviço (read_timeout em segundos)
+    'services': {
+        'dynamodb': {
+            'read_timeout': int(os.getenv('AWS_DYNAMODB_READ_TIMEOUT', TIMEOUTS['dynamodb_query']))
+        },
+        'bedrock-runtime': {
+            'read_timeout': int(os.getenv('AWS_BEDROCK_READ_TIMEOUT', TIMEOUTS['bedrock_invoke'])),
+            'max_attempts': 2  # A aplicação já tem fallback local
+        },
+        'bedrock': {'read_timeout': TIMEOUTS['aws_default']},
+        'cognito-idp': {'read_timeout': TIMEOUTS['aws_default']},
+        'logs': {'read_timeout': TIMEOUTS['aws_default']},
+        's3': {'read_timeout': TIMEOUTS['aws_default'] * 3}
+    }
+}
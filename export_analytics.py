@@ -0,0 +1,50 @@
+"""
+Exportação analítica da tabela de progresso (Parquet / Arrow)
+
+Uso:
+    python export_analytics.py                      # incremental desde a última marca d'água
+    python export_analytics.py --full               # reexporta tudo
+    python export_analytics.py --format arrow --output /dados/cyberguard
+"""
+import argparse
+import logging
+import sys
+from config import ANALYTICS
+from modules.analytics import AnalyticsExporter
+from utils.capacity import get_accountant, page
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Exporta respostas em arquivos colunares particionados')
+    parser.add_argument('--output', default=ANALYTICS['output_dir'], help='diretório de saída')
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default=ANALYTICS['format'])
+    parser.add_argument('--compression', default=ANALYTICS['compression'],
+                        help='zstd, snappy, gzip, lz4...')
+    parser.add_argument('--segments', type=int, default=ANALYTICS['scan_segments'],
+                        help='segmentos da varredura paralela')
+    parser.add_argument('--full', action='store_true', help="ignora a marca d'água")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    exporter = AnalyticsExporter(args.output)
+    try:
+        with page('export_analytics'):
+            result = exporter.export(incremental=not args.full, fmt=args.format,
+                                     compression=args.compression, segments=args.segments)
+    except Exception as e:
+        print(f"❌ Falha na exportação: {e}")
+        return 1
+    
+    usage = get_accountant().totals('page').get('export_analytics', {})
+    print(f"✅ {result['rows']} respostas em {len(result['files'])} arquivos "
+          f"({result['bytes'] / 1024:.1f} KB) em {args.output}")
+    if result['since'] is not None:
+        print(f"   Incremental desde {result['since']}")
+    print(f"   Marca d'água: {result['watermark']}")
+    print(f"   RCUs consumidas: {usage.get('read_units', 0):.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,21 +3,80 @@ Módulo de Feedback e Análise com IA Bedrock
 """
 import json
 import logging
-from typing import Dict
+import random
+from typing import Dict, List, Optional, Tuple
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from config import AI_GENERATION, BEDROCK_CONFIG
+from modules.questions import question_fingerprint
 from utils.aws_client import get_aws_client
+from utils.metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
-class FeedbackGenerator:
-    """Gera feedback inteligente com Amazon Bedrock - VERSÃO ROBUSTA"""
+
+def _extract_json(text: str, opener: str = '{'):
+    """Extrai o primeiro bloco JSON (objeto ou array) de uma resposta da IA
+
+    Tolera cercas de markdown e texto antes/depois do JSON. Retorna None se
+    nenhum bloco válido for encontrado.
+    """
+    closer = '}' if opener == '{' else ']'
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.strip('`')
+        if text.lower().startswith('json'):
+            text = text[4:]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    
+    decoder = json.JSONDecoder()
+    start = text.find(opener)
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text[start:])
+            return value
+        except json.JSONDecodeError:
+            start = text.find(opener, start + 1)
     
-    def __init__(self):
+    # Última tentativa: recortar do primeiro abridor ao último fechador
+    first, last = text.find(opener), text.rfind(closer)
+    if first != -1 and last > first:
         try:
-            self.bedrock = get_aws_client().bedrock
-        except:
-            self.bedrock = None
+            return json.loads(text[first:last + 1])
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+class _LazyBedrockMixin:
+    """Obtém o cliente Bedrock apenas quando é usado pela primeira vez"""
+    
+    _bedrock = None
+    _bedrock_loaded = False
+    
+    @property
+    def bedrock(self):
+        if not self._bedrock_loaded:
+            try:
+                self._bedrock = get_aws_client().bedrock
+            except Exception as e:
+                logger.warning(f"Bedrock indisponível: {e}")
+                self._bedrock = None
+            self._bedrock_loaded = True
+        return self._bedrock
+    
+    @bedrock.setter
+    def bedrock(self, client):
+        self._bedrock = client
+        self._bedrock_loaded = True
+
+
+@instrumented
+class FeedbackGenerator(_LazyBedrockMixin):
+    """Gera feedback inteligente com Amazon Bedrock - VERSÃO ROBUSTA"""
     
     def generate_feedback(self, question: str, user_answer: str,
                          correct_answer: str, is_correct: bool,
@@ -50,6 +109,108 @@ class FeedbackGenerator:
             logger.warning(f"Bedrock falhou, usando local: {e}")
             return self._get_local_feedback(is_correct, user_answer, correct_answer)
     
+    def generate_session_feedback(self, answers: List[Dict], category: str) -> List[str]:
+        """Gera feedback para todas as questões de uma sessão em uma única chamada
+
+        Cada item de `answers` deve conter `question`, `user_answer`,
+        `correct_answer` e `is_correct`. Retorna uma lista de feedbacks na mesma
+        ordem; itens ausentes ou inválidos na resposta da IA recebem feedback local.
+        """
+        if not answers:
+            return []
+        
+        feedbacks: List[Optional[str]] = [None] * len(answers)
+        
+        if self.bedrock:
+            # Sessões longas em várias chamadas, para nenhuma resposta ser cortada
+            chunk_size = BEDROCK_CONFIG['session_feedback_chunk']
+            for start in range(0, len(answers), chunk_size):
+                chunk = answers[start:start + chunk_size]
+                try:
+                    for index, feedback in self._session_feedback_chunk(chunk, category).items():
+                        feedbacks[start + index] = f"🤖 **Feedback da IA:**\n\n{feedback}"
+                except Exception as e:
+                    logger.warning(f"Bedrock falhou no feedback em lote, usando local: {e}")
+        
+        missing = sum(1 for f in feedbacks if f is None)
+        if missing and self.bedrock:
+            logger.info(f"Feedback em lote: {missing}/{len(answers)} itens com fallback local")
+        
+        return [
+            feedback or self._get_local_feedback(
+                a['is_correct'], a['user_answer'], a['correct_answer']
+            )
+            for feedback, a in zip(feedbacks, answers)
+        ]
+    
+    def _session_feedback_chunk(self, answers: List[Dict], category: str) -> Dict[int, str]:
+        """Uma chamada ao Bedrock para um trecho da sessão; retorna {índice: feedback}"""
+        response = self.bedrock.invoke_model(
+            modelId=BEDROCK_CONFIG['model_id'],
+            body=json.dumps({
+                "messages": [{"role": "user", "content": [{"text": self._build_session_prompt(answers, category)}]}],
+                "inferenceConfig": {
+                    "max_new_tokens": BEDROCK_CONFIG['max_tokens_feedback_item'] * len(answers) + 100,
+                    "temperature": BEDROCK_CONFIG['temperature_feedback']
+                }
+            })
+        )
+        result = json.loads(response['body'].read())
+        if result.get('stopReason') == 'max_tokens':
+            logger.warning(f"Feedback em lote truncado (max_tokens) com {len(answers)} itens")
+        text = result['output']['message']['content'][0]['text']
+        return self._parse_session_feedback(text, len(answers))
+    
+    def _build_session_prompt(self, answers: List[Dict], category: str) -> str:
+        """Constrói prompt único com todas as respostas da sessão"""
+        lines = []
+        for i, a in enumerate(answers):
+            status = 'CORRETA' if a['is_correct'] else 'INCORRETA'
+            lines.append(
+                f"{i}. Questão: {a['question']}\n"
+                f"   Resposta do aluno: {a['user_answer']} ({status})\n"
+                f"   Resposta correta: {a['correct_answer']}"
+            )
+        
+        return f"""Você é um mentor em segurança cibernética ({category}).
+
+Para cada resposta abaixo, escreva um feedback educativo em português brasileiro:
+até 50 palavras se a resposta estiver correta (explique por que está certa) e até
+80 palavras se estiver incorreta (explique por que a correta é melhor).
+
+{chr(10).join(lines)}
+
+Retorne APENAS um array JSON, um objeto por questão, neste formato:
+[{{"index": 0, "feedback": "texto"}}]"""
+    
+    def _parse_session_feedback(self, text: str, expected: int) -> Dict[int, str]:
+        """Valida a resposta em lote e retorna {índice: feedback} dos itens válidos"""
+        data = _extract_json(text, '[')
+        if isinstance(data, dict):
+            data = data.get('feedback') or data.get('items')
+        if not isinstance(data, list):
+            logger.warning("Resposta em lote da IA não é um array JSON")
+            return {}
+        
+        parsed = {}
+        for position, entry in enumerate(data):
+            if isinstance(entry, str):
+                index, feedback = position, entry
+            elif isinstance(entry, dict):
+                index, feedback = entry.get('index', position), entry.get('feedback')
+            else:
+                continue
+            
+            try:
+                index = int(index)
+            except (TypeError, ValueError):
+                continue
+            
+            if 0 <= index < expected and isinstance(feedback, str) and feedback.strip():
+                parsed.setdefault(index, feedback.strip())
+        
+        return parsed
+    
     def _build_prompt(self, question: str, user_answer: str, correct_answer: str, is_correct: bool) -> str:
         """Constrói prompt otimizado"""
         if is_correct:
@@ -159,7 +320,7 @@ Revise este conceito e tente novamente. A prática contínua ajuda a solidificar
                 except TimeoutError:
                     logger.warning("Timeout na geração de relatório - usando feedback local")
                     return f"⏱️ Timeout na IA. Sua taxa de acerto foi {accuracy:.1f}% - {'Excelente!' if accuracy >= 80 else 'Continue praticando!'}"
-            
+                    
         except Exception as e:
             error_msg = str(e)
             if "ThrottlingException" in error_msg or "Too many tokens" in error_msg or "ServiceQuotaExceededException" in error_msg:
@@ -202,17 +363,176 @@ Use tom amigável e motivador. Português brasileiro."""
         return result['output']['message']['content'][0]['text']
 
 
-class AIQuestionGenerator:
-    """Gera questões - DESABILITADO TEMPORARIAMENTE"""
+class AIQuestionGenerator(_LazyBedrockMixin):
+    """Gera questões com Amazon Bedrock com validação e geração concorrente"""
     
-    def __init__(self):
-        # DESABILITADO: self.bedrock = get_aws_client().bedrock
-        self.bedrock = None  # Forçar None para evitar chamadas
+    THROTTLE_ERRORS = ('ThrottlingException', 'Too many tokens', 'ServiceQuotaExceededException')
     
     def generate_question(self, category: str, difficulty: str = 'medium',
-                         topic: str = '') -> Dict:
-        """DESABILITADO - Retorna None sempre"""
-        return None  # Sempre retorna None - IA desabilitada
+                         topic: str = '') -> Optional[Dict]:
+        """Gera e valida uma questão; retorna None se a IA falhar ou a questão for inválida"""
+        if not self.bedrock:
+            return None
+        
+        try:
+            question_data = self._call_bedrock_question(category, difficulty, topic)
+        except Exception as e:
+            logger.warning(f"Falha ao gerar questão ({category}/{difficulty}): {e}")
+            return None
+        
+        question = self.validate_question(question_data)
+        if question:
+            self.shuffle_options(question)
+            question['category'] = category
+            question['difficulty'] = difficulty
+        return question
+    
+    @staticmethod
+    def validate_question(data) -> Optional[Dict]:
+        """Valida o esquema da questão gerada e retorna versão normalizada"""
+        if not isinstance(data, dict):
+            return None
+        
+        question = data.get('question')
+        options = data.get('options')
+        explanation = data.get('explanation', '')
+        why_wrong = data.get('why_wrong')
+        
+        if not isinstance(question, str) or not question.strip():
+            return None
+        if not isinstance(options, list) or len(options) != 4:
+            return None
+        if not all(isinstance(o, str) and o.strip() for o in options):
+            return None
+        if len({o.strip().lower() for o in options}) != 4:
+            return None
+        
+        try:
+            correct = int(data.get('correctAnswer'))
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= correct < 4:
+            return None
+        
+        if not isinstance(why_wrong, dict):
+            return None
+        why_wrong = {str(k).strip(): v for k, v in why_wrong.items()}
+        expected_keys = {str(i) for i in range(4) if i != correct}
+        if set(why_wrong) != expected_keys:
+            return None
+        if not all(isinstance(v, str) and v.strip() for v in why_wrong.values()):
+            return None
+        
+        return {
+            'question': question.strip(),
+            'options': [o.strip() for o in options],
+            'correctAnswer': correct,
+            'explanation': explanation.strip() if isinstance(explanation, str) else '',
+            'why_wrong': {k: v.strip() for k, v in why_wrong.items()}
+        }
+    
+    @staticmethod
+    def shuffle_options(question: Dict, rng=random) -> Dict:
+        """Embaralha as alternativas, remapeando `correctAnswer` e as chaves de `why_wrong`
+        
+        O modelo tende a repetir a posição da resposta do exemplo do prompt;
+        embaralhar depois da validação distribui a correta entre A-D.
+        """
+        order = list(range(4))
+        rng.shuffle(order)  # nova posição i recebe a alternativa order[i]
+        new_index = {old: new for new, old in enumerate(order)}
+        question['options'] = [question['options'][old] for old in order]
+        question['correctAnswer'] = new_index[question['correctAnswer']]
+        question['why_wrong'] = {str(new_index[int(k)]): v for k, v in question['why_wrong'].items()}
+        return question
+    
+    def generate_batch(self, categories: List[str], difficulties: List[str],
+                       per_combination: int = AI_GENERATION['per_combination'],
+                       max_workers: int = AI_GENERATION['max_workers'],
+                       existing_questions: Optional[List[str]] = None,
+                       topics: Optional[Dict[str, str]] = None) -> Tuple[List[Dict], Dict]:
+        """Gera questões em paralelo para todas as combinações categoria/dificuldade
+        
+        `topics` mapeia categoria -> tópico usado no prompt. Retorna as questões
+        aceitas (validadas e sem duplicatas, inclusive contra
+        `existing_questions`) e um relatório de throughput/aceitação.
+        """
+        jobs = [
+            (category, difficulty)
+            for category in categories
+            for difficulty in difficulties
+            for _ in range(per_combination)
+        ]
+        report = {
+            'requested': len(jobs),
+            'accepted': 0,
+            'invalid': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'throttled': 0,
+            'by_category': {},
+            'elapsed_seconds': 0.0,
+            'questions_per_second': 0.0,
+            'acceptance_rate': 0.0
+        }
+        if not self.bedrock or not jobs:
+            return [], report
+        
+        seen = {question_fingerprint(q) for q in (existing_questions or [])}
+        accepted = []
+        start = time.monotonic()
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._generate_with_retry, c, d, (topics or {}).get(c, ''))
+                       for c, d in jobs]
+            for future in as_completed(futures):
+                status, question = future.result()
+                if status != 'ok':
+                    report[status] += 1
+                    continue
+                
+                key = question_fingerprint(question['question'])
+                if key in seen:
+                    report['duplicates'] += 1
+                    continue
+                seen.add(key)
+                
+                accepted.append(question)
+                report['by_category'][question['category']] = report['by_category'].get(question['category'], 0) + 1
+        
+        elapsed = time.monotonic() - start
+        report['accepted'] = len(accepted)
+        report['elapsed_seconds'] = round(elapsed, 2)
+        report['questions_per_second'] = round(len(accepted) / elapsed, 2) if elapsed > 0 else 0.0
+        report['acceptance_rate'] = round(len(accepted) / len(jobs) * 100, 1)
+        logger.info(f"Geração em lote: {len(accepted)}/{len(jobs)} questões aceitas em {elapsed:.1f}s")
+        return accepted, report
+    
+    def _generate_with_retry(self, category: str, difficulty: str,
+                             topic: str = '') -> Tuple[str, Optional[Dict]]:
+        """Gera uma questão com backoff exponencial em caso de throttling"""
+        throttled = False
+        for attempt in range(AI_GENERATION['max_retries'] + 1):
+            try:
+                question_data = self._call_bedrock_question(category, difficulty, topic)
+            except Exception as e:
+                if any(err in str(e) for err in self.THROTTLE_ERRORS):
+                    throttled = True
+                    if attempt < AI_GENERATION['max_retries']:
+                        time.sleep(AI_GENERATION['backoff_base'] * (2 ** attempt))
+                    continue
+                logger.warning(f"Falha ao gerar questão ({category}/{difficulty}): {e}")
+                return 'failed', None
+            
+            question = self.validate_question(question_data)
+            if not question:
+                return 'invalid', None
+            self.shuffle_options(question)
+            question['category'] = category
+            question['difficulty'] = difficulty
+            return 'ok', question
+        
+        return ('throttled' if throttled else 'failed'), None
     
     def _call_bedrock_question(self, category: str, difficulty: str, topic: str) -> Dict:
         """Chama o Bedrock para geração de questão de forma isolada"""
@@ -225,6 +545,12 @@ class AIQuestionGenerator:
         
         topic = topic or category_topics.get(category, 'segurança cibernética')
         
+        # Posição da correta no exemplo sorteada a cada chamada (o modelo copia o exemplo)
+        letters = 'ABCD'
+        correct = random.randrange(4)
+        why_wrong = ',\n'.join(f'    "{i}": "Por que opção {letters[i]} está errada (25 palavras)"'
+                                for i in range(4) if i != correct)
+        
         prompt = f"""Crie uma questão de múltipla escolha sobre segurança cibernética.
 
 Tópico: {topic}
@@ -235,33 +561,31 @@ Retorne APENAS um JSON válido neste exato formato:
 {{
   "question": "Pergunta clara em português BR (máx. 100 caracteres)",
   "options": ["Opção A realista", "Opção B realista", "Opção C realista", "Opção D realista"],
-  "correctAnswer": 1,
+  "correctAnswer": {correct},
   "explanation": "Explicação de por que esta resposta está correta (50 palavras máximo)",
   "why_wrong": {{
-    "0": "Por que opção A está errada (25 palavras)",
-    "2": "Por que opção C está errada (25 palavras)",
-    "3": "Por que opção D está errada (25 palavras)"
+{why_wrong}
   }}
 }}
 
 Crie apenas JSON válido, sem explicações adicionais."""
         
         response = self.bedrock.invoke_model(
-            modelId='amazon.nova-micro-v1:0',
+            modelId=BEDROCK_CONFIG['model_id'],
             body=json.dumps({
                 "messages": [{"role": "user", "content": [{"text": prompt}]}],
-                "inferenceConfig": {"max_new_tokens": 500, "temperature": 0.9}
+                "inferenceConfig": {
+                    "max_new_tokens": BEDROCK_CONFIG['max_tokens_question'],
+                    "temperature": BEDROCK_CONFIG['temperature_question']
+                }
             })
         )
         
         result = json.loads(response['body'].read())
         response_text = result['output']['message']['content'][0]['text']
         
-        try:
-            # Parse JSON da resposta
-            question_data = json.loads(response_text)
-            logger.info(f"Questão gerada: {question_data['question'][:50]}...")
-            return question_data
-        except json.JSONDecodeError as e:
-            logger.error(f"Erro ao fazer parse da resposta IA: {e}")
-            raise e
+        # Parse tolerante: aceita cercas de markdown e texto ao redor do JSON
+        question_data = _extract_json(response_text, '{')
+        if question_data is None:
+            logger.error("Erro ao fazer parse da resposta IA: JSON não encontrado")
+        return question_data
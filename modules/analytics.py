@@ -0,0 +1,253 @@
+"""
+Módulo de Exportação Analítica (Parquet / Arrow)
+
+Exporta o log completo de respostas (tabela de progresso) em arquivos
+colunares comprimidos, particionados por data e categoria no layout Hive
+(``date=AAAA-MM-DD/category=.../part-*.parquet``), com colunas tipadas em
+vez de Decimal. Exportações incrementais leem a marca d'água gravada na
+execução anterior e exportam apenas respostas mais recentes.
+
+A varredura é feita com a tabela recebendo escritas: uma resposta gravada
+num segmento já lido pode ter timestamp menor que o maior visto. Por isso a
+marca d'água fica limitada a (início da varredura - margem) e a execução
+seguinte relê essa sobreposição, descartando as respostas já exportadas
+(guardadas por userId+timestamp junto com a marca).
+
+Requer ``pyarrow`` (dependência opcional).
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from config import ANALYTICS
+from utils.storage import get_table, iter_pages
+from utils.metrics import instrumented
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_FILE = '_watermark.json'
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+
+def progress_schema():
+    """Schema Arrow das respostas exportadas"""
+    return pa.schema([
+        ('userId', pa.string()),
+        ('questionId', pa.string()),
+        ('correct', pa.bool_()),
+        ('time_spent', pa.float64()),
+        ('timestamp', pa.timestamp('ms', tz='UTC'))
+    ])
+
+
+class _PartitionWriter:
+    """Acumula linhas por partição e grava um arquivo a cada `row_group_size` linhas
+
+    Cada segmento da varredura tem o seu, então não há escrita concorrente
+    no mesmo arquivo.
+    """
+    
+    def __init__(self, output_dir: str, prefix: str, fmt: str, compression: str,
+                 row_group_size: int, files: List[str],
+                 exported: Set[Tuple[str, str]] = frozenset(),
+                 overlap_from: Optional[Decimal] = None):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.fmt = fmt
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.schema = progress_schema()
+        self._buffers: Dict[Tuple[str, str], Dict[str, List]] = {}
+        self._sequence = 0
+        self.files = files
+        self.rows = 0
+        self.max_timestamp: Optional[Decimal] = None
+        self.exported = exported          # já exportadas na sobreposição anterior
+        self.overlap_from = overlap_from  # acima disto, guarda as chaves exportadas
+        self.recent: List[Tuple[str, str]] = []
+    
+    def add(self, item: Dict) -> None:
+        raw_timestamp = item['timestamp']
+        key = (item.get('userId'), str(raw_timestamp))
+        if key in self.exported:
+            return
+        if self.overlap_from is not None and raw_timestamp > self.overlap_from:
+            self.recent.append(key)
+        timestamp = float(raw_timestamp)
+        day = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d')
+        key = (day, item.get('category', 'unknown'))
+        columns = self._buffers.get(key)
+        if columns is None:
+            columns = self._buffers[key] = {name: [] for name in self.schema.names}
+        columns['userId'].append(item.get('userId'))
+        columns['questionId'].append(item.get('questionId'))
+        columns['correct'].append(bool(item.get('correct', False)))
+        columns['time_spent'].append(float(item.get('time_spent', 0) or 0))
+        columns['timestamp'].append(int(timestamp * 1000))
+        self.rows += 1
+        if self.max_timestamp is None or raw_timestamp > self.max_timestamp:
+            self.max_timestamp = raw_timestamp
+        if len(columns['userId']) >= self.row_group_size:
+            self._flush(key)
+    
+    def _flush(self, key: Tuple[str, str]) -> None:
+        columns = self._buffers.pop(key)
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        day, category = key
+        directory = os.path.join(self.output_dir, f'date={day}', f'category={category}')
+        os.makedirs(directory, exist_ok=True)
+        self._sequence += 1
+        path = os.path.join(directory, f'{self.prefix}-{self._sequence:05d}.{FORMATS[self.fmt]}')
+        if self.fmt == 'parquet':
+            pq.write_table(table, path, compression=self.compression,
+                           row_group_size=self.row_group_size)
+        else:
+            # Arrow IPC (Feather v2) só suporta lz4 e zstd
+            compression = self.compression if self.compression in ('lz4', 'zstd') else 'zstd'
+            feather.write_feather(table, path, compression=compression)
+        self.files.append(path)
+    
+    def close(self) -> None:
+        for key in list(self._buffers):
+            self._flush(key)
+
+
+@instrumented
+class AnalyticsExporter:
+    """Exporta a tabela de progresso para arquivos colunares particionados"""
+    
+    def __init__(self, output_dir: str = ANALYTICS['output_dir'],
+                 clock: Callable[[], float] = time.time):
+        self.output_dir = output_dir
+        self.clock = clock
+    
+    def _read_state(self) -> Dict:
+        try:
+            with open(os.path.join(self.output_dir, WATERMARK_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Erro ao ler marca d'água: {e}")
+            return {}
+    
+    def read_watermark(self) -> Optional[Decimal]:
+        """Timestamp até o qual todas as respostas já foram exportadas (None se nunca exportado)"""
+        state = self._read_state()
+        return Decimal(state['timestamp']) if 'timestamp' in state else None
+    
+    def _write_watermark(self, timestamp: Decimal, rows: int,
+                         exported: List[Tuple[str, str]]) -> None:
+        path = os.path.join(self.output_dir, WATERMARK_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': str(timestamp),  # exato, como o Decimal da chave
+                'rows': rows,
+                'exported_after': sorted(exported),  # acima da marca, já exportadas
+                'exported_at': datetime.now(timezone.utc).isoformat()
+            }, f)
+        os.replace(tmp_path, path)  # atômico: uma exportação interrompida não avança a marca
+    
+    def export(self, incremental: bool = True, fmt: str = ANALYTICS['format'],
+               compression: str = ANALYTICS['compression'],
+               segments: int = ANALYTICS['scan_segments']) -> Dict:
+        """Varre a tabela em segmentos paralelos e grava os arquivos particionados
+
+        Com `incremental`, exporta apenas respostas posteriores à marca
+        d'água que ainda não foram exportadas. A marca só avança depois que
+        todos os segmentos terminam.
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow não instalado: pip install pyarrow")
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato não suportado: {fmt}")
+        
+        state = self._read_state() if incremental else {}
+        since = Decimal(state['timestamp']) if 'timestamp' in state else None
+        exported = {tuple(key) for key in state.get('exported_after', [])}
+        # Antes da varredura: o que for gravado a partir daqui pode não ser visto
+        cutoff = Decimal(str(round(self.clock() - ANALYTICS['watermark_margin_seconds'], 6)))
+        kwargs = {
+            'ProjectionExpression': 'userId, #ts, questionId, category, correct, time_spent',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'}
+        }
+        if since is not None:
+            # A chave da tabela é userId+timestamp: sem GSI por data, o filtro
+            # ainda lê a tabela inteira, mas só transfere e grava o que é novo
+            kwargs['FilterExpression'] = '#ts > :since'
+            kwargs['ExpressionAttributeValues'] = {':since': since}
+        
+        # Único por execução: nunca sobrescreve arquivos de exportações anteriores
+        run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        files: List[str] = []
+        try:
+            if segments <= 1:
+                writers = [self._export_segment(kwargs, run_id, fmt, compression, files,
+                                                exported, cutoff)]
+            else:
+                with ThreadPoolExecutor(max_workers=segments) as executor:
+                    futures = [
+                        executor.submit(contextvars.copy_context().run, self._export_segment,
+                                        kwargs, run_id, fmt, compression, files, exported, cutoff,
+                                        segment, segments)
+                        for segment in range(segments)
+                    ]
+                    writers = [future.result() for future in futures]
+        except Exception:
+            # Sem marca d'água nova, a próxima execução refaz o intervalo: remove arquivos parciais
+            for path in files:
+                os.remove(path)
+            raise
+        
+        rows = sum(w.rows for w in writers)
+        timestamps = [w.max_timestamp for w in writers if w.max_timestamp is not None]
+        watermark = min(max(timestamps), cutoff) if timestamps else since
+        if since is not None and (watermark is None or watermark < since):
+            watermark = since
+        if watermark is not None and (rows or watermark != since):
+            recent = exported.union(*(w.recent for w in writers))
+            self._write_watermark(watermark, rows, [k for k in recent if Decimal(k[1]) > watermark])
+        
+        logger.info(f"Exportação analítica: {rows} respostas em {len(files)} arquivos")
+        return {
+            'rows': rows,
+            'files': files,
+            'bytes': sum(os.path.getsize(path) for path in files),
+            'since': since,
+            'watermark': watermark
+        }
+    
+    def _export_segment(self, kwargs: Dict, run_id: str, fmt: str, compression: str,
+                        files: List[str], exported: Set[Tuple[str, str]], cutoff: Decimal,
+                        segment: Optional[int] = None,
+                        total_segments: Optional[int] = None) -> _PartitionWriter:
+        # Tabela da própria thread (resources boto3 não são thread-safe)
+        table = get_table('progress')
+        kwargs = dict(kwargs)
+        if segment is not None:
+            kwargs.update(Segment=segment, TotalSegments=total_segments)
+        
+        writer = _PartitionWriter(self.output_dir, f'part-{run_id}-{segment or 0:02d}', fmt,
+                                  compression, ANALYTICS['row_group_size'], files,
+                                  exported, cutoff)
+        for page in iter_pages(table.scan, **kwargs):
+            for item in page.get('Items', []):
+                writer.add(item)
+        writer.close()
+        return writer
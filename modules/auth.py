@@ -6,8 +6,10 @@ import hmac
 import hashlib
 import logging
 from datetime import datetime
+from typing import Optional
 from utils.aws_client import get_aws_client
 from utils.logger import log_event
+from utils.tokens import TokenError, get_token_verifier
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,8 @@ class CognitoAuth:
         self.cognito = get_aws_client().cognito
         self.user_pool_id = user_pool_id
         self.client_id = client_id
+        # JWKS e tokens verificados compartilhados entre sessões do processo
+        self.verifier = get_token_verifier(user_pool_id, client_id)
     
     def sign_up(self, email: str, password: str, name: str) -> dict:
         """Registra novo usuário"""
@@ -66,17 +70,50 @@ class CognitoAuth:
             logger.error(f"Erro na autenticação: {e}")
             return {'success': False, 'error': 'Erro ao autenticar'}
     
-    def get_user(self, access_token: str) -> dict:
-        """Obtém informações do usuário autenticado"""
+    def refresh_tokens(self, refresh_token: str) -> dict:
+        """Obtém novos tokens de acesso e identidade a partir do refresh token"""
         try:
-            response = self.cognito.get_user(AccessToken=access_token)
-            
-            user_data = {'username': response['Username']}
-            for attr in response.get('UserAttributes', []):
-                if attr['Name'] in ['email', 'name', 'email_verified']:
-                    user_data[attr['Name']] = attr['Value']
+            response = self.cognito.initiate_auth(
+                ClientId=self.client_id,
+                AuthFlow='REFRESH_TOKEN_AUTH',
+                AuthParameters={'REFRESH_TOKEN': refresh_token}
+            )
+            auth_result = response.get('AuthenticationResult', {})
+            return {
+                'success': True,
+                'access_token': auth_result.get('AccessToken'),
+                'id_token': auth_result.get('IdToken')
+            }
+        except self.cognito.exceptions.NotAuthorizedException:
+            return {'success': False, 'error': 'Sessão expirada'}
+        except Exception as e:
+            logger.error(f"Erro ao renovar tokens: {e}")
+            return {'success': False, 'error': 'Erro ao renovar sessão'}
+    
+    def get_user(self, access_token: str, id_token: Optional[str] = None) -> dict:
+        """Obtém informações do usuário autenticado
+        
+        Os tokens são verificados localmente (assinatura, expiração, emissor
+        e cliente), sem chamada ao Cognito. Email e nome vêm do token de
+        identidade, quando informado.
+        """
+        try:
+            claims = self.verifier.verify(access_token, token_use='access')
+            user_data = {'username': claims['username']}
+            if id_token:
+                identity = self.verifier.verify(id_token, token_use='id')
+                if identity.get('sub') != claims.get('sub'):
+                    raise TokenError('Tokens de usuários diferentes')
+                for name in ('email', 'name'):
+                    if name in identity:
+                        user_data[name] = identity[name]
+                if 'email_verified' in identity:
+                    # Mesmo formato dos atributos do Cognito ('true'/'false')
+                    user_data['email_verified'] = str(identity['email_verified']).lower()
             
             return {'success': True, 'user': user_data}
+        except TokenError as e:
+            return {'success': False, 'error': str(e)}
         except Exception as e:
             logger.error(f"Erro ao obter usuário: {e}")
             return {'success': False, 'error': str(e)}
@@ -0,0 +1,309 @@
+"""
+Módulo de Renderização de Certificados em PDF (reportlab)
+
+A renderização é CPU-bound e roda em um pool de processos, para não
+bloquear a thread do script Streamlit nem disputar o GIL com as demais
+sessões. Cada processo monta o template uma única vez (fontes registradas,
+logo e fundo decodificados, geometria da página) e o reutiliza em todos os
+certificados que renderizar.
+
+Os PDFs são gerados com ``invariant=1``: os mesmos dados produzem sempre os
+mesmos bytes, o que permite comparar versões pelo hash do conteúdo.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from config import CERTIFICATE_PDF, TRAINING_CATEGORIES
+from utils.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Incrementar ao mudar o layout: certificados de versões anteriores são regerados
+TEMPLATE_VERSION = '1'
+
+
+def _plain(text: str) -> str:
+    """Remove caracteres fora do Latin-1 (emojis), que as fontes padrão não têm"""
+    return text.encode('latin-1', 'ignore').decode('latin-1').strip()
+
+
+def _date(timestamp) -> str:
+    return datetime.fromtimestamp(float(timestamp)).strftime('%d/%m/%Y')
+
+
+class _Template:
+    """Recursos e geometria compartilhados por todos os certificados do processo"""
+    
+    def __init__(self):
+        self.width, self.height = landscape(A4)
+        self.regular, self.bold = 'Helvetica', 'Helvetica-Bold'
+        self.unicode = False
+        font_path = CERTIFICATE_PDF.get('font_path')
+        if font_path and os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont('CertificateFont', font_path))
+            bold_path = CERTIFICATE_PDF.get('bold_font_path')
+            if bold_path and os.path.exists(bold_path):
+                pdfmetrics.registerFont(TTFont('CertificateFont-Bold', bold_path))
+                self.bold = 'CertificateFont-Bold'
+            else:
+                self.bold = 'CertificateFont'
+            self.regular = 'CertificateFont'
+            self.unicode = True
+        self.logo = self._image(CERTIFICATE_PDF.get('logo_path'))
+        self.background = self._image(CERTIFICATE_PDF.get('background_path'))
+        self.category_names = {
+            key: self.text(info['name']) for key, info in TRAINING_CATEGORIES.items()
+        }
+        self.category_colors = {
+            key: colors.HexColor(info['color']) for key, info in TRAINING_CATEGORIES.items()
+        }
+    
+    @staticmethod
+    def _image(path: Optional[str]) -> Optional[ImageReader]:
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            reader = ImageReader(path)
+            reader.getSize()  # decodifica agora, não a cada certificado
+            return reader
+        except Exception as e:
+            logger.warning(f"Imagem do certificado ignorada ({path}): {e}")
+            return None
+    
+    def text(self, value) -> str:
+        value = str(value)
+        return value.strip() if self.unicode else _plain(value)
+    
+    def fit(self, text: str, font: str, size: float, max_width: float) -> float:
+        """Maior tamanho de fonte (até `size`) em que o texto cabe na largura"""
+        width = pdfmetrics.stringWidth(text, font, size)
+        return size if width <= max_width else max(size * max_width / width, 10)
+    
+    def draw_static(self, pdf: canvas.Canvas, accent) -> None:
+        width, height = self.width, self.height
+        if self.background is not None:
+            pdf.drawImage(self.background, 0, 0, width, height)
+        else:
+            pdf.setFillColor(colors.HexColor('#FBFBF8'))
+            pdf.rect(0, 0, width, height, stroke=0, fill=1)
+        
+        pdf.setFillColor(accent)
+        pdf.rect(0, height - 18, width, 18, stroke=0, fill=1)
+        pdf.rect(0, 0, width, 18, stroke=0, fill=1)
+        
+        navy = colors.HexColor('#1F2A44')
+        pdf.setStrokeColor(navy)
+        pdf.setLineWidth(3)
+        pdf.rect(30, 36, width - 60, height - 72)
+        pdf.setLineWidth(0.8)
+        pdf.rect(38, 44, width - 76, height - 88)
+        
+        if self.logo is not None:
+            logo_w, logo_h = self.logo.getSize()
+            scale = 60 / logo_h
+            pdf.drawImage(self.logo, (width - logo_w * scale) / 2, height - 130,
+                          logo_w * scale, 60, mask='auto')
+        else:
+            pdf.setFillColor(navy)
+            pdf.setFont(self.bold, 16)
+            pdf.drawCentredString(width / 2, height - 95, 'CYBERGUARD')
+        
+        pdf.setFillColor(navy)
+        pdf.setFont(self.bold, 30)
+        pdf.drawCentredString(width / 2, height - 170, 'CERTIFICADO DE CONCLUSÃO')
+        pdf.setFont(self.regular, 12)
+        pdf.drawCentredString(width / 2, height - 192, 'CYBERGUARD PROFESSIONAL TRAINING')
+
+
+_template_instance: Optional[_Template] = None
+_template_lock = threading.Lock()
+
+
+def _template() -> _Template:
+    """Template do processo atual (montado no primeiro uso)"""
+    global _template_instance
+    if _template_instance is None:
+        with _template_lock:
+            if _template_instance is None:
+                _template_instance = _Template()
+    return _template_instance
+
+
+def _init_worker() -> None:
+    _template()
+
+
+def render_certificate(certificate: Dict) -> bytes:
+    """Renderiza um certificado (dados de ``CertificateManager``) e retorna o PDF"""
+    template = _template()
+    width, height = template.width, template.height
+    category = certificate.get('category', '')
+    accent = template.category_colors.get(category, colors.HexColor('#1F2A44'))
+    name = template.text(certificate.get('userName', ''))
+    certificate_id = template.text(certificate.get('certificateId', ''))
+    
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(width, height), invariant=1, pageCompression=1)
+    pdf.setTitle(f'Certificado CyberGuard - {name}')
+    pdf.setAuthor('CyberGuard Professional')
+    pdf.setSubject(certificate_id)
+    
+    template.draw_static(pdf, accent)
+    
+    text_color = colors.HexColor('#333333')
+    pdf.setFillColor(text_color)
+    pdf.setFont(template.regular, 14)
+    pdf.drawCentredString(width / 2, height - 240, 'Certificamos que')
+    
+    size = template.fit(name, template.bold, 34, width - 160)
+    pdf.setFillColor(colors.HexColor('#1F2A44'))
+    pdf.setFont(template.bold, size)
+    pdf.drawCentredString(width / 2, height - 285, name)
+    pdf.setStrokeColor(accent)
+    pdf.setLineWidth(1.5)
+    pdf.line(width / 2 - 220, height - 297, width / 2 + 220, height - 297)
+    
+    pdf.setFillColor(text_color)
+    pdf.setFont(template.regular, 14)
+    pdf.drawCentredString(width / 2, height - 330,
+                          'concluiu com êxito o treinamento em segurança cibernética na categoria')
+    pdf.setFont(template.bold, 20)
+    pdf.drawCentredString(width / 2, height - 362,
+                          template.category_names.get(category) or template.text(category).upper())
+    pdf.setFont(template.regular, 14)
+    pdf.drawCentredString(width / 2, height - 392,
+                          f"com taxa de acerto de {float(certificate.get('accuracy', 0)):.1f}% "
+                          f"em {int(certificate.get('total_questions', 0))} questões.")
+    
+    pdf.setFont(template.regular, 10)
+    issued_at = certificate.get('issued_at')
+    valid_until = certificate.get('valid_until')
+    if issued_at is not None:
+        pdf.drawString(70, 80, f'Emitido em: {_date(issued_at)}')
+    if valid_until is not None:
+        pdf.drawString(70, 64, f'Válido até: {_date(valid_until)}')
+    pdf.drawRightString(width - 70, 80, f'ID: {certificate_id}')
+    pdf.drawRightString(width - 70, 64, 'Verifique a autenticidade na plataforma CyberGuard')
+    
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _render_or_error(certificate: Dict) -> Union[bytes, Exception]:
+    try:
+        return render_certificate(certificate)
+    except Exception as e:
+        # Exceções do reportlab nem sempre são serializáveis entre processos
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+@instrumented
+class CertificateRenderer:
+    """Renderiza certificados em um pool de processos
+
+    Com ``workers=0`` (ou se o sistema não permitir criar processos) a
+    renderização acontece na própria thread chamadora.
+    """
+    
+    def __init__(self, workers: int = CERTIFICATE_PDF['workers']):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                try:
+                    context = multiprocessing.get_context(CERTIFICATE_PDF['start_method'])
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                         initializer=_init_worker)
+                except (OSError, ValueError, NotImplementedError) as e:
+                    logger.warning(f"Pool de processos indisponível, renderizando na thread atual: {e}")
+                    self.workers = 0
+                    return None
+            return self._executor
+    
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """Descarta um pool quebrado (processo morto); o próximo uso cria outro"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Pool de renderização reiniciado")
+    
+    def submit(self, certificate: Dict) -> Future:
+        """Agenda a renderização; o Future resolve para os bytes do PDF"""
+        pool = self._pool()
+        if pool is not None:
+            try:
+                return pool.submit(render_certificate, certificate)
+            except BrokenProcessPool:
+                self._discard(pool)
+        future = Future()
+        try:
+            future.set_result(render_certificate(certificate))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def render(self, certificate: Dict, timeout: Optional[float] = None) -> bytes:
+        """Renderiza um certificado e aguarda o resultado"""
+        future = self.submit(certificate)
+        try:
+            return future.result(timeout)
+        except BrokenProcessPool:
+            if self._executor is not None:
+                self._discard(self._executor)
+            return render_certificate(certificate)
+    
+    def render_many(self, certificates: List[Dict]) -> List[Union[bytes, Exception]]:
+        """Renderiza um lote em paralelo, na ordem de entrada
+
+        Falhas não interrompem o lote: a posição correspondente recebe a
+        exceção em vez dos bytes.
+        """
+        pool = self._pool()
+        if pool is None or len(certificates) <= 1:
+            return [_render_or_error(c) for c in certificates]
+        chunksize = max(1, min(CERTIFICATE_PDF['batch_chunksize'],
+                               len(certificates) // (self.workers * 4)))
+        try:
+            return list(pool.map(_render_or_error, certificates, chunksize=chunksize))
+        except BrokenProcessPool:
+            self._discard(pool)
+            return [_render_or_error(c) for c in certificates]
+    
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_renderer: Optional[CertificateRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_certificate_renderer() -> CertificateRenderer:
+    """Retorna o renderizador do processo (pool criado no primeiro uso)"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = CertificateRenderer()
+    return _renderer
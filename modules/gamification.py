@@ -1,23 +1,225 @@
 """
 Módulo de Certificados e Gamificação
 """
+import contextvars
+import hashlib
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, List, Optional
+from botocore.exceptions import ClientError
+from config import (BADGE_RULES, CERTIFICATE_BATCH, CERTIFICATE_STORAGE, CERTIFICATE_VERIFICATION,
+                    CERTIFICATION_REQUIREMENTS, DIFFICULTY_LEVELS, GAMIFICATION, TRAINING_CATEGORIES)
+from modules.certificate_pdf import TEMPLATE_VERSION, get_certificate_renderer
+from modules.questions import QuestionManager
+from modules.ranking import points_attributes
 from utils.aws_client import get_aws_client
+from utils.storage import batch_get, conditional_check_failed, get_table, iter_pages
+from utils.metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
+
+# Regras de badges: (agregados do usuário, resposta atual) -> elegível.
+# Os agregados vêm da tabela user_stats, atualizada a cada resposta, então
+# nenhuma regra relê o histórico.
+def _accuracy(stats: Dict) -> float:
+    total = int(stats.get('total_answers', 0))
+    return int(stats.get('correct_answers', 0)) / total * 100 if total else 0.0
+
+
+def _accuracy_rule(threshold: float) -> Callable[[Dict, Dict], bool]:
+    def rule(stats: Dict, event: Dict) -> bool:
+        return (int(stats.get('total_answers', 0)) >= BADGE_RULES['accuracy_min_answers']
+                and _accuracy(stats) >= threshold)
+    return rule
+
+
+RULES: Dict[str, Callable[[Dict, Dict], bool]] = {
+    'first_correct': lambda stats, event: int(stats.get('correct_answers', 0)) >= 1,
+    'streak_5': lambda stats, event: int(stats.get('streak', 0)) >= 5,
+    'streak_10': lambda stats, event: int(stats.get('streak', 0)) >= 10,
+    'accuracy_80': _accuracy_rule(80),
+    'accuracy_100': _accuracy_rule(99),
+    'allrounder': lambda stats, event: set(stats.get('categories', ())) >= set(TRAINING_CATEGORIES),
+    'speedster': lambda stats, event: (event.get('correct', False)
+                                       and 0 < event.get('time_spent', 0) < BADGE_RULES['speedster_seconds']),
+    'persistent': lambda stats, event: int(stats.get('total_answers', 0)) >= BADGE_RULES['persistent_answers'],
+    'champion': lambda stats, event: (event.get('rank') is not None
+                                      and event['rank'] <= BADGE_RULES['champion_top'])
+}
+
+
+def evaluate_rules(stats: Dict, event: Dict) -> List[str]:
+    """Badges elegíveis ainda não registrados em `stats['badges']`"""
+    unlocked = set(stats.get('badges', ()))
+    return [badge_id for badge_id, rule in RULES.items()
+            if badge_id not in unlocked and rule(stats, event)]
+
+
+def badge_progress(stats: Dict) -> Dict[str, float]:
+    """Fração (0-1) cumprida dos badges contáveis, para exibir o progresso"""
+    total = int(stats.get('total_answers', 0))
+    streak = int(stats.get('streak', 0))
+    categories = set(stats.get('categories', ())) & set(TRAINING_CATEGORIES)
+    return {
+        'first_correct': float(min(int(stats.get('correct_answers', 0)), 1)),
+        'streak_5': min(streak / 5, 1.0),
+        'streak_10': min(streak / 10, 1.0),
+        'persistent': min(total / BADGE_RULES['persistent_answers'], 1.0),
+        'allrounder': len(categories) / len(TRAINING_CATEGORIES)
+    }
+
+
+def stats_from_history(user_id: str, answers: Iterable[Dict], badges: Iterable[Dict],
+                       difficulties: Dict[str, str], when: Optional[datetime] = None) -> Dict:
+    """Item da user_stats reconstruído a partir das respostas e badges gravados
+    
+    Produz os mesmos atributos que ``record_answer`` acumula: totais, acertos
+    e contadores por categoria, a sequência atual (acertos desde o último
+    erro) e os pontos das respostas e dos badges, somados também nas janelas
+    da semana e do mês de `when` quando caem nelas.
+    """
+    current = points_attributes(when)
+    item = {'userId': user_id, 'total_answers': 0, 'correct_answers': 0, 'streak': 0}
+    categories, points = set(), {attribute: 0 for attribute in current.values()}
+    
+    def add_points(amount: int, timestamp) -> None:
+        if amount:
+            windows = points_attributes(datetime.fromtimestamp(float(timestamp)))
+            for window, attribute in current.items():
+                if windows[window] == attribute:
+                    points[attribute] += amount
+    
+    for answer in sorted(answers, key=lambda a: a['timestamp']):
+        category, correct = answer['category'], bool(answer.get('correct'))
+        categories.add(category)
+        item['total_answers'] += 1
+        item[f'total_{category}'] = item.get(f'total_{category}', 0) + 1
+        if correct:
+            item['correct_answers'] += 1
+            item[f'correct_{category}'] = item.get(f'correct_{category}', 0) + 1
+            item['streak'] += 1
+        else:
+            item['streak'] = 0
+        add_points(GamificationManager.answer_points(correct, difficulties.get(answer.get('questionId'))),
+                   answer['timestamp'])
+    
+    unlocked = set()
+    for badge in badges:
+        unlocked.add(badge['badgeId'])
+        add_points(GAMIFICATION.get(badge['badgeId'], {}).get('points', 0), badge['unlockedAt'])
+    
+    if categories:
+        item['categories'] = categories
+    if unlocked:
+        item['badges'] = unlocked
+    item.update(points)
+    item['updated_at'] = Decimal(str((when or datetime.now()).timestamp()))
+    return item
+
+class _VerificationCache:
+    """Cache em processo das verificações de certificado (com TTL)
+    
+    IDs inexistentes são guardados como None por um TTL menor, para que
+    IDs inválidos repetidos não cheguem ao DynamoDB e um certificado
+    emitido depois não fique "inexistente" por muito tempo.
+    """
+    
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def lookup(self, certificate_ids) -> tuple:
+        """Retorna (encontrados, faltantes)"""
+        now = time.time()
+        found, missing = {}, []
+        with self._lock:
+            for certificate_id in certificate_ids:
+                entry = self._entries.get(certificate_id)
+                ttl = self.negative_ttl if entry is not None and entry[1] is None else self.ttl
+                if entry is not None and now - entry[0] <= ttl:
+                    found[certificate_id] = entry[1]
+                else:
+                    missing.append(certificate_id)
+        return found, missing
+    
+    def store(self, entries: Dict[str, Optional[Dict]]) -> None:
+        now = time.time()
+        with self._lock:
+            if len(self._entries) + len(entries) > self.max_entries:
+                self._entries = {}
+            for certificate_id, entry in entries.items():
+                self._entries[certificate_id] = (now, entry)
+    
+    def invalidate(self, certificate_id: Optional[str] = None) -> None:
+        with self._lock:
+            if certificate_id is None:
+                self._entries = {}
+            else:
+                self._entries.pop(certificate_id, None)
+
+
+_verified = _VerificationCache(CERTIFICATE_VERIFICATION['ttl'],
+                               CERTIFICATE_VERIFICATION['negative_ttl'],
+                               CERTIFICATE_VERIFICATION['max_entries'])
+
+
+def certificate_status(certificate: Optional[Dict], now: Optional[float] = None) -> str:
+    """'valid', 'expired' ou 'not_found'"""
+    if certificate is None:
+        return 'not_found'
+    now = datetime.now().timestamp() if now is None else now
+    valid_until = certificate.get('valid_until')
+    return 'expired' if valid_until is not None and float(valid_until) < now else 'valid'
+
+
+def certificate_period(when: Optional[datetime] = None) -> str:
+    """Período de emissão em lote (trimestre), ex.: '2025-Q4'"""
+    when = when or datetime.now()
+    return f"{when.year}-Q{(when.month - 1) // 3 + 1}"
+
+
+def batch_certificate_id(user_id: str, category: str, period: str) -> str:
+    """ID determinístico: reemitir o mesmo usuário/categoria/período não duplica"""
+    return f"{user_id}_{category}_{period}"
+
+
+@instrumented
 class CertificateManager:
     """Gerencia geração e armazenamento de certificados"""
     
     def __init__(self):
-        self.dynamodb = get_aws_client().dynamodb
-        self.s3 = get_aws_client().s3
-        self.table = self.dynamodb.Table('cyberguard-certificates')
-        self.bucket = 'cyberguard-certificates'
+        self.table = get_table('certificates')
+        self.bucket = CERTIFICATE_STORAGE['bucket']
+    
+    @property
+    def s3(self):
+        """Cliente S3 criado apenas na primeira emissão de certificado"""
+        return get_aws_client().s3
+    
+    @staticmethod
+    def _pdf_key(user_id: str, certificate_id: str) -> str:
+        return f"certificates/{user_id}/{certificate_id}.pdf"
+    
+    def _store_pdf(self, key: str, pdf_content: bytes) -> Dict:
+        """Grava o PDF no S3 com hash e versão do template; retorna os campos do registro"""
+        sha256 = hashlib.sha256(pdf_content).hexdigest()
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=pdf_content,
+            ContentType='application/pdf',
+            Metadata={'sha256': sha256, 'template-version': TEMPLATE_VERSION}
+        )
+        return {'s3_key': key, 'sha256': sha256, 'template_version': TEMPLATE_VERSION}
     
     def check_eligibility(self, accuracy: float, total_questions: int) -> Dict:
         """Verifica elegibilidade para certificado"""
@@ -52,20 +254,14 @@ class CertificateManager:
                 'valid_until': Decimal(str((datetime.now().timestamp()) + (365 * 24 * 60 * 60)))
             }
             
-            # Salvar no DynamoDB
-            self.table.put_item(Item=certificate_data)
-            
-            # Gerar PDF (simulado - em produção usaria reportlab)
+            # Gerar PDF uma única vez e salvar no S3; o registro guarda chave e hash
+            key = self._pdf_key(user_id, certificate_id)
             pdf_content = self._generate_pdf_content(certificate_data)
+            certificate_data.update(self._store_pdf(key, pdf_content))
             
-            # Salvar no S3
-            key = f"certificates/{user_id}/{certificate_id}.pdf"
-            self.s3.put_object(
-                Bucket=self.bucket,
-                Key=key,
-                Body=pdf_content,
-                ContentType='application/pdf'
-            )
+            # Salvar no DynamoDB
+            self.table.put_item(Item=certificate_data)
+            _verified.invalidate(certificate_id)
             
             logger.info(f"Certificado gerado: {certificate_id}")
             
@@ -81,23 +277,180 @@ class CertificateManager:
             return {'success': False, 'error': str(e)}
     
     def _generate_pdf_content(self, certificate_data: Dict) -> bytes:
-        """Gera conteúdo PDF do certificado (simulado)"""
-        # Em produção, usar reportlab para gerar PDF real
-        content = f"""
-CERTIFICADO DE CONCLUSÃO
-CYBERGUARD PROFESSIONAL TRAINING
-
-Certificado para: {certificate_data['userName']}
-Categoria: {certificate_data['category']}
-Taxa de Acerto: {certificate_data['accuracy']}%
-Data de Emissão: {datetime.now().strftime('%d/%m/%Y')}
-
-ID do Certificado: {certificate_data['certificateId']}
-
-Este certificado atesta a conclusão bem-sucedida do treinamento em
-segurança cibernética na plataforma CyberGuard Professional.
-"""
-        return content.encode('utf-8')
+        """Gera o PDF do certificado (reportlab, fora da thread atual)"""
+        return get_certificate_renderer().render(certificate_data)
+    
+    def issue_batch(self, candidates: Iterable[Dict], period: Optional[str] = None,
+                    max_workers: Optional[int] = None) -> Dict:
+        """Emite certificados para vários usuários (ex.: fechamento do trimestre)
+        
+        `candidates` traz, por usuário, ``user_id``, ``category``, ``accuracy``,
+        ``total_questions`` e opcionalmente ``user_name``. Certificados já
+        emitidos no período são mantidos ('exists'); os novos são
+        renderizados no pool de processos, enviados ao S3 em paralelo e
+        registrados com batch_writer, só depois que o PDF existe.
+        Falhas ficam no resultado de cada candidato e são registradas no log
+        uma única vez, agrupadas por motivo (ex.: AccessDenied em todo o lote).
+        Retorna contagens e o resultado de cada candidato, na ordem de entrada.
+        """
+        period = period or certificate_period()
+        results, pending, seen = [], [], set()
+        for candidate in candidates:
+            user_id, category = candidate['user_id'], candidate['category']
+            certificate_id = batch_certificate_id(user_id, category, period)
+            result = {'user_id': user_id, 'category': category, 'certificate_id': certificate_id}
+            results.append(result)
+            if certificate_id in seen:
+                result['status'] = 'duplicate'
+            elif not self.check_eligibility(float(candidate.get('accuracy', 0)),
+                                            int(candidate.get('total_questions', 0)))['eligible']:
+                result['status'] = 'ineligible'
+            else:
+                pending.append((result, candidate))
+            seen.add(certificate_id)
+        
+        try:
+            existing = {
+                item['certificateId'] for item in batch_get(
+                    self.table,
+                    [{'userId': r['user_id'], 'certificateId': r['certificate_id']} for r, _ in pending],
+                    ProjectionExpression='userId, certificateId'
+                )
+            } if pending else set()
+        except Exception as e:
+            for result, _ in pending:
+                result.update(status='error', error=f"Consulta: {e}")
+            pending = []
+            existing = set()
+        
+        todo = []
+        for result, candidate in pending:
+            if result['certificate_id'] in existing:
+                result['status'] = 'exists'
+            else:
+                todo.append((result, candidate))
+        
+        chunk_size = CERTIFICATE_BATCH['chunk_size']
+        for start in range(0, len(todo), chunk_size):
+            self._issue_chunk(todo[start:start + chunk_size], max_workers)
+        
+        counts: Dict[str, int] = {}
+        reasons: Dict[str, int] = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            if result['status'] == 'error':
+                reasons[result['error']] = reasons.get(result['error'], 0) + 1
+        if reasons:
+            summary = '; '.join(f"{n}x {reason}" for reason, n
+                                in sorted(reasons.items(), key=lambda kv: -kv[1]))
+            logger.error(f"Erro na emissão em lote {period}: {counts['error']} certificados "
+                         f"não emitidos: {summary}")
+        logger.info(f"Emissão em lote {period}: {counts}")
+        return {'period': period, 'counts': counts, 'results': results}
+    
+    def _issue_chunk(self, chunk: List[tuple], max_workers: Optional[int]) -> None:
+        now = datetime.now().timestamp()
+        valid_until = now + CERTIFICATION_REQUIREMENTS['validity_days'] * 24 * 60 * 60
+        records = [{
+            'certificateId': result['certificate_id'],
+            'userId': result['user_id'],
+            'userName': candidate.get('user_name') or result['user_id'],
+            'category': result['category'],
+            'accuracy': Decimal(str(round(float(candidate['accuracy']), 2))),
+            'total_questions': int(candidate['total_questions']),
+            'issued_at': Decimal(str(now)),
+            'valid_until': Decimal(str(valid_until))
+        } for result, candidate in chunk]
+        
+        pdfs = get_certificate_renderer().render_many(records)
+        
+        def upload(record: Dict, pdf: bytes) -> Dict:
+            return self._store_pdf(self._pdf_key(record['userId'], record['certificateId']), pdf)
+        
+        uploads = {}
+        with ThreadPoolExecutor(max_workers=max_workers or CERTIFICATE_BATCH['upload_workers']) as executor:
+            for index, pdf in enumerate(pdfs):
+                if isinstance(pdf, Exception):
+                    chunk[index][0].update(status='error', error=f"Renderização: {pdf}")
+                else:
+                    uploads[index] = executor.submit(contextvars.copy_context().run,
+                                                     upload, records[index], pdf)
+        
+        stored = []
+        for index, future in uploads.items():
+            try:
+                records[index].update(future.result())
+                stored.append(index)
+            except Exception as e:
+                chunk[index][0].update(status='error', error=f"Upload: {e}")
+        
+        try:
+            with self.table.batch_writer() as writer:
+                for index in stored:
+                    writer.put_item(Item=records[index])
+        except Exception as e:
+            for index in stored:
+                chunk[index][0].update(status='error', error=f"Registro: {e}")
+            return
+        
+        for index in stored:
+            chunk[index][0]['status'] = 'issued'
+            _verified.invalidate(records[index]['certificateId'])
+    
+    def _ensure_pdf(self, certificate: Dict) -> str:
+        """Chave do PDF no S3, regerando-o só se o template mudou (ou se nunca foi gerado)"""
+        if certificate.get('template_version') == TEMPLATE_VERSION and certificate.get('s3_key'):
+            return certificate['s3_key']
+        
+        key = certificate.get('s3_key') or self._pdf_key(certificate['userId'], certificate['certificateId'])
+        fields = self._store_pdf(key, self._generate_pdf_content(certificate))
+        self.table.update_item(
+            Key={'userId': certificate['userId'], 'certificateId': certificate['certificateId']},
+            UpdateExpression='SET s3_key = :key, sha256 = :sha256, template_version = :version',
+            ExpressionAttributeValues={
+                ':key': fields['s3_key'],
+                ':sha256': fields['sha256'],
+                ':version': fields['template_version']
+            }
+        )
+        _verified.invalidate(certificate['certificateId'])
+        logger.info(f"Certificado regerado com template {TEMPLATE_VERSION}: {certificate['certificateId']}")
+        return key
+    
+    def get_download_url(self, certificate: Dict, cache: Optional[Dict] = None) -> Optional[str]:
+        """URL pré-assinada de curta duração para baixar o PDF direto do S3
+        
+        `cache` (ex.: um dict em ``st.session_state``) guarda as URLs da
+        sessão até perto de expirarem. Assinar a URL não acessa a rede; o
+        PDF só é renderizado de novo quando o template muda.
+        """
+        try:
+            certificate_id = certificate['certificateId']
+            now = time.time()
+            if cache is not None:
+                cached = cache.get(certificate_id)
+                if cached is not None and cached[1] - CERTIFICATE_STORAGE['url_refresh_margin'] > now:
+                    return cached[0]
+            
+            key = self._ensure_pdf(certificate)
+            expires_in = CERTIFICATE_STORAGE['url_ttl']
+            url = self.s3.generate_presigned_url(
+                'get_object',
+                Params={
+                    'Bucket': self.bucket,
+                    'Key': key,
+                    'ResponseContentType': 'application/pdf',
+                    'ResponseContentDisposition':
+                        f'attachment; filename="certificado-{certificate.get("category", "cyberguard")}.pdf"'
+                },
+                ExpiresIn=expires_in
+            )
+            if cache is not None:
+                cache[certificate_id] = (url, now + expires_in)
+            return url
+        except Exception as e:
+            logger.error(f"Erro ao gerar link do certificado: {e}")
+            return None
     
     def get_user_certificates(self, user_id: str) -> list:
         """Obtém certificados do usuário"""
@@ -111,20 +464,79 @@ segurança cibernética na plataforma CyberGuard Professional.
             logger.error(f"Erro ao obter certificados: {e}")
             return []
     
+    def _lookup(self, certificate_id: str, table=None) -> Optional[Dict]:
+        """Leitura de uma chave no índice CertificateIdIndex"""
+        response = (table or self.table).query(
+            IndexName='CertificateIdIndex',
+            KeyConditionExpression='certificateId = :cid',
+            ExpressionAttributeValues={':cid': certificate_id},
+            Limit=1
+        )
+        items = response.get('Items', [])
+        return items[0] if items else None
+    
     def verify_certificate(self, certificate_id: str) -> Optional[Dict]:
         """Verifica autenticidade de certificado"""
         try:
-            response = self.table.scan(
-                FilterExpression='certificateId = :cid',
-                ExpressionAttributeValues={':cid': certificate_id}
-            )
-            items = response.get('Items', [])
-            return items[0] if items else None
+            found, missing = _verified.lookup([certificate_id])
+            if not missing:
+                return found[certificate_id]
+            certificate = self._lookup(certificate_id)
+            _verified.store({certificate_id: certificate})
+            return certificate
         except Exception as e:
             logger.error(f"Erro ao verificar certificado: {e}")
             return None
+    
+    def _lookup_in_thread(self, certificate_id: str) -> Optional[Dict]:
+        # Tabela da própria thread (resources boto3 não são thread-safe)
+        return self._lookup(certificate_id, get_table('certificates'))
+    
+    def verify_many(self, certificate_ids: Iterable[str],
+                    max_workers: Optional[int] = None) -> Dict[str, Dict]:
+        """Verifica vários IDs de uma vez (ex.: planilha enviada pelo RH)
+        
+        Retorna, na ordem de entrada e sem repetições, ``{id: {'status',
+        'certificate'}}`` com status 'valid', 'expired', 'not_found' ou
+        'error'. IDs em cache não são consultados; os demais são lidos em
+        paralelo, uma chave por leitura.
+        """
+        unique = list(dict.fromkeys(c.strip() for c in certificate_ids if c and c.strip()))
+        if len(unique) > CERTIFICATE_VERIFICATION['max_batch']:
+            raise ValueError(f"Máximo de {CERTIFICATE_VERIFICATION['max_batch']} IDs por verificação")
+        
+        found, missing = _verified.lookup(unique)
+        errors = set()
+        if missing:
+            workers = min(max_workers or CERTIFICATE_VERIFICATION['workers'], len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    certificate_id: executor.submit(contextvars.copy_context().run,
+                                                    self._lookup_in_thread, certificate_id)
+                    for certificate_id in missing
+                }
+            fetched = {}
+            for certificate_id, future in futures.items():
+                try:
+                    fetched[certificate_id] = future.result()
+                except Exception as e:
+                    logger.error(f"Erro ao verificar certificado {certificate_id}: {e}")
+                    errors.add(certificate_id)
+            _verified.store(fetched)
+            found.update(fetched)
+        
+        now = datetime.now().timestamp()
+        return {
+            certificate_id: {
+                'status': 'error' if certificate_id in errors
+                else certificate_status(found.get(certificate_id), now),
+                'certificate': found.get(certificate_id)
+            }
+            for certificate_id in unique
+        }
 
 
+@instrumented
 class GamificationManager:
     """Gerencia sistema de gamificação e badges"""
     
@@ -140,31 +552,152 @@ class GamificationManager:
         'champion': {'name': 'Campeão', 'icon': '🥇', 'requirement': 'Top 3 do ranking'},
     }
     
-    def __init__(self):
-        self.dynamodb = get_aws_client().dynamodb
-        self.badges_table = self.dynamodb.Table('cyberguard-badges')
+    def __init__(self, rank_index=None):
+        self.badges_table = get_table('badges')
+        self.stats_table = get_table('user_stats')
+        # RankIndex mantido a cada resposta (regra 'champion'); None desativa
+        self.rank_index = rank_index
+    
+    def _put_badge(self, user_id: str, badge_id: str) -> bool:
+        """Grava o badge uma única vez; False se já estava desbloqueado"""
+        try:
+            self.badges_table.put_item(
+                Item={
+                    'userId': user_id,
+                    'badgeId': badge_id,
+                    'unlockedAt': Decimal(str(datetime.now().timestamp())),
+                    'badge_info': json.dumps(self.BADGES[badge_id])
+                },
+                ConditionExpression='attribute_not_exists(badgeId)'
+            )
+        except ClientError as e:
+            if conditional_check_failed(e):
+                return False
+            raise
+        logger.info(f"Badge desbloqueado: {badge_id} para {user_id}")
+        return True
     
     def unlock_badge(self, user_id: str, badge_id: str) -> bool:
-        """Desbloqueia badge para usuário"""
+        """Desbloqueia badge para usuário (False se inválido ou já desbloqueado)"""
         try:
             if badge_id not in self.BADGES:
                 return False
-            
-            badge_data = {
-                'userId': user_id,
-                'badgeId': badge_id,
-                'unlockedAt': Decimal(str(datetime.now().timestamp())),
-                'badge_info': json.dumps(self.BADGES[badge_id])
-            }
-            
-            self.badges_table.put_item(Item=badge_data)
-            logger.info(f"Badge desbloqueado: {badge_id} para {user_id}")
-            return True
-            
+            return self._put_badge(user_id, badge_id)
         except Exception as e:
             logger.error(f"Erro ao desbloquear badge: {e}")
             return False
     
+    def _update_stats(self, user_id: str, category: str, correct: bool, points: int = 0) -> Dict:
+        """Atualiza os agregados do usuário atomicamente e retorna o item novo
+        
+        Contadores por categoria são atributos planos (``total_<categoria>``),
+        pois ADD não cria mapas aninhados inexistentes. Os pontos são somados
+        no total e nos atributos da semana e do mês correntes.
+        """
+        names = {'#streak': 'streak', '#cat_total': f'total_{category}'}
+        values = {
+            ':zero': 0,
+            ':one': 1,
+            ':category': {category},
+            ':now': Decimal(str(datetime.now().timestamp()))
+        }
+        if correct:
+            names['#cat_correct'] = f'correct_{category}'
+            expression = ('SET #streak = if_not_exists(#streak, :zero) + :one, updated_at = :now '
+                          'ADD total_answers :one, correct_answers :one, categories :category, '
+                          '#cat_total :one, #cat_correct :one')
+        else:
+            expression = ('SET #streak = :zero, updated_at = :now '
+                          'ADD total_answers :one, categories :category, #cat_total :one')
+        if points:
+            expression += ', ' + self._points_clause(names, values, points)
+        response = self.stats_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+        return response.get('Attributes', {})
+    
+    @staticmethod
+    def _points_clause(names: Dict, values: Dict, points: int) -> str:
+        """Trecho ADD que soma `points` no total e nas janelas correntes"""
+        values[':points'] = points
+        clauses = []
+        for window, attribute in points_attributes().items():
+            names[f'#points_{window}'] = attribute
+            clauses.append(f'#points_{window} :points')
+        return ', '.join(clauses)
+    
+    @staticmethod
+    def answer_points(correct: bool, difficulty: Optional[str] = None) -> int:
+        """Pontos de uma resposta: acertos valem os pontos da dificuldade da questão"""
+        if not correct:
+            return 0
+        level = DIFFICULTY_LEVELS.get(difficulty or 'medium', DIFFICULTY_LEVELS['medium'])
+        return level['points']
+    
+    def record_answer(self, user_id: str, category: str, correct: bool,
+                      time_spent: int = 0, difficulty: Optional[str] = None) -> List[str]:
+        """Contabiliza uma resposta e desbloqueia os badges cujas regras passaram
+        
+        Custa um UpdateItem nos agregados e, só quando alguma regra passa, um
+        PutItem condicional por badge e um UpdateItem com os pontos dos
+        badges. Os agregados novos também atualizam o ranking em memória.
+        Retorna os badges desbloqueados agora.
+        """
+        try:
+            stats = self._update_stats(user_id, category, correct,
+                                       self.answer_points(correct, difficulty))
+            event = {'category': category, 'correct': correct, 'time_spent': time_spent or 0}
+            if self.rank_index is not None:
+                self.rank_index.update(user_id, stats)
+                # Durante a carga o índice só tem quem respondeu desde o início do processo
+                if self.rank_index.loaded and 'champion' not in stats.get('badges', ()):
+                    event['rank'] = self.rank_index.rank_of(user_id)
+            
+            unlocked, settled = [], []
+            for badge_id in evaluate_rules(stats, event):
+                try:
+                    if self._put_badge(user_id, badge_id):
+                        unlocked.append(badge_id)
+                    settled.append(badge_id)
+                except Exception as e:
+                    logger.error(f"Erro ao desbloquear badge {badge_id}: {e}")
+            
+            if settled:
+                # Registrados nos agregados, deixam de ser avaliados; só quem
+                # desbloqueou agora (PutItem condicional) recebe os pontos
+                names, values = {}, {':badges': set(settled)}
+                expression = 'ADD badges :badges'
+                points = sum(GAMIFICATION.get(b, {}).get('points', 0) for b in unlocked)
+                if points:
+                    expression += ', ' + self._points_clause(names, values, points)
+                kwargs = {'ExpressionAttributeNames': names} if names else {}
+                response = self.stats_table.update_item(
+                    Key={'userId': user_id},
+                    UpdateExpression=expression,
+                    ExpressionAttributeValues=values,
+                    ReturnValues='ALL_NEW',
+                    **kwargs
+                )
+                if points and self.rank_index is not None:
+                    self.rank_index.update(user_id, response.get('Attributes', {}))
+            return unlocked
+        except Exception as e:
+            logger.error(f"Erro ao avaliar badges: {e}")
+            return []
+    
+    def get_user_aggregates(self, user_id: str) -> Dict:
+        """Agregados incrementais do usuário (respostas, acertos, sequência, categorias)"""
+        try:
+            response = self.stats_table.get_item(Key={'userId': user_id})
+            return response.get('Item', {})
+        except Exception as e:
+            logger.error(f"Erro ao obter agregados: {e}")
+            return {}
+    
     def get_user_badges(self, user_id: str) -> list:
         """Obtém badges desbloqueados do usuário"""
         try:
@@ -177,40 +710,46 @@ class GamificationManager:
             logger.error(f"Erro ao obter badges: {e}")
             return []
     
-    def get_user_points(self, accuracy: float, streak: int, questions_count: int) -> int:
-        """Calcula pontos do usuário baseado em performance"""
-        points = 0
-        
-        # Pontos por acurácia
-        points += int(accuracy * 10)  # Até 1000 pontos
-        
-        # Bônus por sequência
-        points += min(streak * 50, 500)  # Até 500 pontos
-        
-        # Bônus por volume
-        points += min(questions_count * 10, 300)  # Até 300 pontos
-        
-        return points
+    def get_points(self, user_id: str, aggregates: Optional[Dict] = None) -> Dict[str, int]:
+        """Pontos acumulados do usuário no total, na semana e no mês correntes"""
+        aggregates = self.get_user_aggregates(user_id) if aggregates is None else aggregates
+        return {window: int(aggregates.get(attribute, 0))
+                for window, attribute in points_attributes().items()}
     
-    def check_badge_eligibility(self, user_id: str, stats: Dict) -> list:
-        """Verifica e retorna badges elegíveis para desbloquear"""
-        unlocked = set(b['badgeId'] for b in self.get_user_badges(user_id))
-        eligible = []
-        
-        # Verificar elegibilidade para cada badge
-        if 'accuracy_80' not in unlocked and stats.get('accuracy', 0) >= 80:
-            eligible.append('accuracy_80')
-        
-        if 'accuracy_100' not in unlocked and stats.get('accuracy', 0) >= 99:
-            eligible.append('accuracy_100')
-        
-        if 'streak_5' not in unlocked and stats.get('streak', 0) >= 5:
-            eligible.append('streak_5')
+    def rebuild_user_stats(self, question_manager=None) -> Dict[str, int]:
+        """Recalcula a user_stats de todos os usuários a partir do histórico
         
-        if 'streak_10' not in unlocked and stats.get('streak', 0) >= 10:
-            eligible.append('streak_10')
-        
-        if 'persistent' not in unlocked and stats.get('total_answers', 0) >= 30:
-            eligible.append('persistent')
-        
-        return eligible
+        Carga única para quem já respondia antes da user_stats existir (ou
+        para corrigir agregados): uma varredura da progress e da badges, um
+        BatchGetItem das dificuldades das questões respondidas e a regravação
+        em lote dos itens. Sobrescreve os agregados, então deve rodar sem
+        respostas sendo gravadas ao mesmo tempo. Retorna as contagens.
+        """
+        try:
+            answers: Dict[str, List[Dict]] = {}
+            progress_table = get_table('progress')
+            for page in iter_pages(progress_table.scan):
+                for item in page.get('Items', []):
+                    if 'category' in item:
+                        answers.setdefault(item['userId'], []).append(item)
+            
+            badges: Dict[str, List[Dict]] = {}
+            for page in iter_pages(self.badges_table.scan):
+                for item in page.get('Items', []):
+                    badges.setdefault(item['userId'], []).append(item)
+            
+            catalog = (question_manager or QuestionManager()).get_many(
+                {a.get('questionId') for rows in answers.values() for a in rows})
+            difficulties = {q: entry.get('difficulty') for q, entry in catalog.items()}
+            
+            when = datetime.now()
+            users = sorted(set(answers) | set(badges))
+            with self.stats_table.batch_writer() as batch:
+                for user_id in users:
+                    batch.put_item(Item=stats_from_history(
+                        user_id, answers.get(user_id, []), badges.get(user_id, []), difficulties, when))
+            logger.info(f"user_stats reconstruída: {len(users)} usuários")
+            return {'users': len(users), 'answers': sum(len(rows) for rows in answers.values())}
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir agregados: {e}")
+            return {}
@@ -0,0 +1,314 @@
+"""
+Módulo de Análise de Itens (dificuldade e discriminação por questão)
+
+Calcula, a partir do log de respostas, as estatísticas clássicas de cada
+questão e as grava no próprio item da questão (atributo ``stats``):
+
+- p-value: proporção de acertos (dificuldade empírica)
+- point-biserial: correlação entre acertar a questão e o desempenho do
+  aluno nas demais questões (discriminação; negativa = item suspeito)
+- tempo médio e número de tentativas
+
+O ``stats`` guarda também as somas suficientes, o que permite atualizar
+incrementalmente apenas com as respostas posteriores à última execução.
+No modo incremental o desempenho de cada aluno é o de agora (suas respostas
+antigas não são reprocessadas); uma atualização completa recalcula tudo.
+
+A varredura concorre com novas respostas, então a marca ``through`` fica
+limitada a (início da varredura - margem) e a execução seguinte relê esse
+intervalo. As respostas já somadas acima da marca ficam em ``counted_after``
+(``"<timestamp> <userId>"``) e não são somadas de novo.
+"""
+import logging
+import math
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import numpy as np
+from botocore.exceptions import ClientError
+from config import ITEM_ANALYSIS
+from utils.storage import conditional_check_failed, get_table, iter_pages
+from utils.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Somas suficientes mantidas por questão
+SUMS = ('attempts', 'correct', 'time_spent', 'scored', 'scored_correct',
+        'score_sum', 'score_sq_sum', 'score_correct_sum')
+
+
+def _to_decimal(value: float) -> Decimal:
+    return Decimal(str(round(float(value), 6)))
+
+
+def derive_stats(sums: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """p-value, point-biserial e tempo médio a partir das somas suficientes"""
+    attempts = float(sums.get('attempts', 0))
+    scored = float(sums.get('scored', 0))
+    scored_correct = float(sums.get('scored_correct', 0))
+    p_value = float(sums.get('correct', 0)) / attempts if attempts else None
+    avg_time = float(sums.get('time_spent', 0)) / attempts if attempts else None
+    
+    point_biserial = None
+    if scored and 0 < scored_correct < scored:
+        mean = float(sums['score_sum']) / scored
+        variance = float(sums['score_sq_sum']) / scored - mean * mean
+        if variance > 1e-12:
+            p = scored_correct / scored
+            mean_correct = float(sums['score_correct_sum']) / scored_correct
+            point_biserial = (mean_correct - mean) / math.sqrt(variance) * math.sqrt(p / (1 - p))
+            point_biserial = max(-1.0, min(1.0, point_biserial))
+    
+    return {'p_value': p_value, 'point_biserial': point_biserial, 'avg_time': avg_time}
+
+
+def item_flags(stats: Optional[Dict]) -> List[str]:
+    """Problemas detectados em uma questão (vazio se ok ou com poucas tentativas)"""
+    if not stats or float(stats.get('attempts', 0)) < ITEM_ANALYSIS['min_attempts']:
+        return []
+    flags = []
+    p_value = stats.get('p_value')
+    point_biserial = stats.get('point_biserial')
+    low, high = ITEM_ANALYSIS['p_value_bounds']
+    if p_value is not None and float(p_value) < low:
+        flags.append('muito_dificil')
+    if p_value is not None and float(p_value) > high:
+        flags.append('muito_facil')
+    if point_biserial is not None and float(point_biserial) < 0:
+        flags.append('discriminacao_negativa')
+    elif point_biserial is not None and float(point_biserial) < ITEM_ANALYSIS['min_discrimination']:
+        flags.append('discriminacao_baixa')
+    return flags
+
+
+def empirical_difficulty(question: Dict) -> str:
+    """Dificuldade pela proporção de acertos; a declarada enquanto houver poucas tentativas"""
+    stats = question.get('stats') or {}
+    if float(stats.get('attempts', 0)) < ITEM_ANALYSIS['min_attempts'] or stats.get('p_value') is None:
+        return question.get('difficulty', 'medium')
+    p_value = float(stats['p_value'])
+    for difficulty, (low, high) in ITEM_ANALYSIS['difficulty_bands'].items():
+        if low <= p_value <= high:
+            return difficulty
+    return question.get('difficulty', 'medium')
+
+
+def compute_sums(question_ids: np.ndarray, user_ids: np.ndarray, correct: np.ndarray,
+                 time_spent: np.ndarray, user_totals: Optional[Dict[str, tuple]] = None
+                 ) -> Dict[str, Dict[str, float]]:
+    """Somas suficientes por questão, vetorizadas com numpy
+
+    O escore de cada resposta é a taxa de acerto do aluno nas *demais*
+    respostas (rest score), o que evita inflar a correlação com o próprio
+    item. `user_totals` (aluno -> (respostas, acertos)) substitui os totais
+    calculados a partir das próprias respostas (modo incremental).
+    """
+    if len(question_ids) == 0:
+        return {}
+    correct = correct.astype(np.float64)
+    time_spent = time_spent.astype(np.float64)
+    q_keys, q_idx = np.unique(question_ids, return_inverse=True)
+    u_keys, u_idx = np.unique(user_ids, return_inverse=True)
+    
+    if user_totals is None:
+        totals = np.bincount(u_idx, minlength=len(u_keys)).astype(np.float64)
+        hits = np.bincount(u_idx, weights=correct, minlength=len(u_keys))
+    else:
+        totals = np.array([user_totals.get(u, (0, 0))[0] for u in u_keys], dtype=np.float64)
+        hits = np.array([user_totals.get(u, (0, 0))[1] for u in u_keys], dtype=np.float64)
+    
+    rest_total = totals[u_idx] - 1
+    has_score = rest_total > 0
+    score = np.where(has_score, (hits[u_idx] - correct) / np.where(has_score, rest_total, 1), 0.0)
+    scored = has_score.astype(np.float64)
+    
+    n = len(q_keys)
+    columns = {
+        'attempts': np.bincount(q_idx, minlength=n).astype(np.float64),
+        'correct': np.bincount(q_idx, weights=correct, minlength=n),
+        'time_spent': np.bincount(q_idx, weights=time_spent, minlength=n),
+        'scored': np.bincount(q_idx, weights=scored, minlength=n),
+        'scored_correct': np.bincount(q_idx, weights=scored * correct, minlength=n),
+        'score_sum': np.bincount(q_idx, weights=score * scored, minlength=n),
+        'score_sq_sum': np.bincount(q_idx, weights=score * score * scored, minlength=n),
+        'score_correct_sum': np.bincount(q_idx, weights=score * scored * correct, minlength=n)
+    }
+    return {
+        str(question_id): {name: float(values[i]) for name, values in columns.items()}
+        for i, question_id in enumerate(q_keys)
+    }
+
+
+@instrumented
+class ItemAnalyzer:
+    """Calcula e armazena estatísticas por questão a partir do log de respostas"""
+    
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.progress_table = get_table('progress')
+        self.questions_table = get_table('questions')
+        self.clock = clock
+    
+    def _scan_answers(self, since: Optional[Decimal], counted: Dict[str, Set[str]],
+                      cutoff: Decimal) -> Dict[str, np.ndarray]:
+        kwargs = {
+            'ProjectionExpression': 'userId, questionId, correct, time_spent, #ts',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'}
+        }
+        if since is not None:
+            kwargs['FilterExpression'] = '#ts > :since'
+            kwargs['ExpressionAttributeValues'] = {':since': since}
+        
+        users, questions, correct, time_spent = [], [], [], []
+        recent: Dict[str, Set[str]] = {}
+        watermark = since
+        for page in iter_pages(self.progress_table.scan, **kwargs):
+            for item in page.get('Items', []):
+                if 'questionId' not in item:
+                    continue
+                key = f"{item['timestamp']} {item['userId']}"
+                if key in counted.get(item['questionId'], ()):
+                    continue  # já somada na sobreposição da execução anterior
+                if item['timestamp'] > cutoff:
+                    recent.setdefault(item['questionId'], set()).add(key)
+                users.append(item['userId'])
+                questions.append(item['questionId'])
+                correct.append(bool(item.get('correct', False)))
+                time_spent.append(float(item.get('time_spent', 0) or 0))
+                if watermark is None or item['timestamp'] > watermark:
+                    watermark = item['timestamp']
+        return {
+            'users': np.array(users, dtype=object),
+            'questions': np.array(questions, dtype=object),
+            'correct': np.array(correct, dtype=bool),
+            'time_spent': np.array(time_spent, dtype=np.float64),
+            'watermark': watermark,
+            'recent': recent
+        }
+    
+    def _user_totals(self, user_ids: Iterable[str]) -> Dict[str, tuple]:
+        """(respostas, acertos) atuais de cada aluno, lendo só o atributo `correct`"""
+        totals = {}
+        for user_id in user_ids:
+            total = hits = 0
+            for page in iter_pages(self.progress_table.query,
+                                   KeyConditionExpression='userId = :uid',
+                                   ExpressionAttributeValues={':uid': user_id},
+                                   ProjectionExpression='correct'):
+                for item in page.get('Items', []):
+                    total += 1
+                    hits += 1 if item.get('correct', False) else 0
+            totals[user_id] = (total, hits)
+        return totals
+    
+    @staticmethod
+    def _counted(stats: Dict) -> Set[str]:
+        return set(stats.get('counted_after') or [])
+    
+    def _current_stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for page in iter_pages(self.questions_table.scan,
+                               ProjectionExpression='questionId, stats'):
+            for item in page.get('Items', []):
+                stats[item['questionId']] = item.get('stats') or {}
+        return stats
+    
+    def refresh(self, full: bool = False) -> Dict:
+        """Atualiza as estatísticas (incremental desde a última execução, ou completa)"""
+        try:
+            current = self._current_stats()
+            watermarks = [s['through'] for s in current.values() if s.get('through') is not None]
+            since = None if full or not watermarks else max(watermarks)
+            
+            counted = {} if since is None else {q: self._counted(s) for q, s in current.items()}
+            # Antes da varredura: respostas gravadas a partir daqui podem não ser vistas
+            cutoff = _to_decimal(self.clock() - ITEM_ANALYSIS['watermark_margin_seconds'])
+            answers = self._scan_answers(since, counted, cutoff)
+            through = answers['watermark']
+            if through is not None and through != since:
+                through = min(through, cutoff)
+                if since is not None:
+                    through = max(through, since)
+            user_totals = None
+            if since is not None and len(answers['users']):
+                user_totals = self._user_totals(set(answers['users']))
+            new_sums = compute_sums(answers['questions'], answers['users'], answers['correct'],
+                                    answers['time_spent'], user_totals)
+            
+            updated = 0
+            now = _to_decimal(datetime.now().timestamp())
+            for question_id, sums in new_sums.items():
+                if question_id not in current:
+                    continue  # questão removida
+                if since is not None:
+                    previous = current[question_id]
+                    sums = {k: sums[k] + float(previous.get(k, 0)) for k in SUMS}
+                keys = counted.get(question_id, set()) | answers['recent'].get(question_id, set())
+                counted_after = sorted(k for k in keys if Decimal(k.split(' ', 1)[0]) > through)
+                if self._store(question_id, sums, through, counted_after, now):
+                    updated += 1
+            
+            logger.info(f"Análise de itens: {len(answers['users'])} respostas, {updated} questões atualizadas")
+            return {
+                'answers': len(answers['users']),
+                'questions_updated': updated,
+                'since': since,
+                'watermark': through
+            }
+        except Exception as e:
+            logger.error(f"Erro na análise de itens: {e}")
+            return {}
+    
+    def _store(self, question_id: str, sums: Dict[str, float], through,
+               counted_after: List[str], now: Decimal) -> bool:
+        stats = {k: _to_decimal(sums[k]) for k in SUMS}
+        for name, value in derive_stats(sums).items():
+            stats[name] = None if value is None else _to_decimal(value)
+        stats['through'] = through
+        stats['counted_after'] = counted_after
+        stats['updated_at'] = now
+        try:
+            self.questions_table.update_item(
+                Key={'questionId': question_id},
+                UpdateExpression='SET #stats = :stats',
+                ConditionExpression='attribute_exists(questionId)',
+                ExpressionAttributeNames={'#stats': 'stats'},
+                ExpressionAttributeValues={':stats': stats}
+            )
+            return True
+        except ClientError as e:
+            if conditional_check_failed(e):
+                return False
+            raise
+    
+    def get_item_stats(self, category: Optional[str] = None) -> List[Dict]:
+        """Estatísticas armazenadas por questão, com os problemas detectados"""
+        try:
+            kwargs = {'ProjectionExpression': 'questionId, question, category, difficulty, stats'}
+            if category:
+                kwargs['FilterExpression'] = 'category = :cat'
+                kwargs['ExpressionAttributeValues'] = {':cat': category}
+            rows = []
+            for page in iter_pages(self.questions_table.scan, **kwargs):
+                for question in page.get('Items', []):
+                    stats = question.get('stats') or {}
+                    rows.append({
+                        'questionId': question['questionId'],
+                        'question': question.get('question', ''),
+                        'category': question.get('category', ''),
+                        'difficulty': question.get('difficulty', ''),
+                        'empirical_difficulty': empirical_difficulty(question),
+                        'attempts': int(stats.get('attempts', 0)),
+                        'p_value': _float(stats.get('p_value')),
+                        'point_biserial': _float(stats.get('point_biserial')),
+                        'avg_time': _float(stats.get('avg_time')),
+                        'flags': item_flags(stats)
+                    })
+            return sorted(rows, key=lambda r: (not r['flags'], -r['attempts']))
+        except Exception as e:
+            logger.error(f"Erro ao obter estatísticas de itens: {e}")
+            return []
+
+
+def _float(value) -> Optional[float]:
+    return None if value is None else float(value)
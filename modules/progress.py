@@ -6,21 +6,24 @@ import logging
 from decimal import Decimal
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from utils.aws_client import get_aws_client
+from utils.storage import get_table
 from utils.logger import log_event
+from utils.metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
+@instrumented
 class ProgressManager:
     """Gerencia progresso e resultados dos usuários"""
     
-    def __init__(self):
-        self.dynamodb = get_aws_client().dynamodb
-        self.table = self.dynamodb.Table('cyberguard-progress')
+    def __init__(self, gamification=None):
+        self.table = get_table('progress')
+        # GamificationManager: avalia badges a cada resposta (None desativa)
+        self.gamification = gamification
     
     def save_answer(self, user_id: str, question_id: str, correct: bool,
-                    category: str, time_spent: int = 0) -> bool:
-        """Salva resposta do usuário"""
+                    category: str, time_spent: int = 0, difficulty: Optional[str] = None) -> bool:
+        """Salva resposta do usuário (a dificuldade define os pontos do acerto)"""
         try:
             self.table.put_item(Item={
                 'userId': user_id,
@@ -37,6 +40,9 @@ class ProgressManager:
                 'category': category
             })
             
+            if self.gamification is not None:
+                self.gamification.record_answer(user_id, category, correct, time_spent, difficulty)
+            
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar resposta: {e}")
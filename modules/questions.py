@@ -1,22 +1,83 @@
 """
 Módulo de Gerenciamento de Questões
 """
+import hashlib
 import json
+import re
+import threading
+import time
 import uuid
 import logging
 from decimal import Decimal
 from datetime import datetime
 from typing import List, Dict, Optional
-from utils.aws_client import get_aws_client
+from config import ITEM_ANALYSIS, QUESTION_CATALOG
+from modules.item_analysis import empirical_difficulty
+from utils.storage import batch_get, get_table, iter_pages
+from utils.metrics import instrumented
 
 logger = logging.getLogger(__name__)
 
+CATALOG_FIELDS = 'questionId, question, category, difficulty'
+
+
+def question_fingerprint(question: str) -> str:
+    """Hash do texto normalizado (caixa, pontuação e espaços) para deduplicação"""
+    normalized = re.sub(r'[\W_]+', ' ', question.lower()).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class _QuestionCatalog:
+    """Cache em processo de texto/categoria/dificuldade por questionId (com TTL)
+    
+    IDs inexistentes também são guardados (como None) para não serem
+    consultados de novo a cada relatório.
+    """
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def lookup(self, question_ids) -> tuple:
+        """Retorna (encontrados, faltantes)"""
+        now = time.time()
+        found, missing = {}, []
+        with self._lock:
+            for question_id in question_ids:
+                entry = self._entries.get(question_id)
+                if entry is not None and now - entry[0] <= self.ttl:
+                    found[question_id] = entry[1]
+                else:
+                    missing.append(question_id)
+        return found, missing
+    
+    def store(self, entries: Dict[str, Optional[Dict]]) -> None:
+        now = time.time()
+        with self._lock:
+            if len(self._entries) + len(entries) > self.max_entries:
+                self._entries = {}
+            for question_id, entry in entries.items():
+                self._entries[question_id] = (now, entry)
+    
+    def invalidate(self, question_id: Optional[str] = None) -> None:
+        with self._lock:
+            if question_id is None:
+                self._entries = {}
+            else:
+                self._entries.pop(question_id, None)
+
+
+_catalog = _QuestionCatalog(QUESTION_CATALOG['ttl'], QUESTION_CATALOG['max_entries'])
+
+
+@instrumented
 class QuestionManager:
     """Gerencia questões no DynamoDB"""
     
     def __init__(self):
-        self.dynamodb = get_aws_client().dynamodb
-        self.table = self.dynamodb.Table('cyberguard-questions')
+        self.table = get_table('questions')
     
     def get_by_category(self, category: str, shuffle_options: bool = True) -> List[Dict]:
         """Obtém questões por categoria"""
@@ -67,6 +128,29 @@ class QuestionManager:
             logger.error(f"Erro ao obter questões: {e}")
             return []
     
+    def sample(self, category: str, difficulty: Optional[str] = None,
+               count: Optional[int] = None) -> List[Dict]:
+        """Sorteia questões da categoria priorizando a dificuldade empírica pedida
+        
+        Usa as estatísticas gravadas pela análise de itens (sem ler respostas):
+        questões cuja dificuldade empírica coincide com `difficulty` têm peso
+        maior. Sem `count`, retorna todas as questões nessa ordem ponderada.
+        """
+        questions = self.get_by_category(category)
+        if not difficulty:
+            return questions[:count] if count else questions
+        
+        import random
+        weights = ITEM_ANALYSIS['sampler_weights']
+        
+        def key(q):
+            # Amostragem ponderada sem reposição (Efraimidis-Spirakis)
+            weight = weights['match'] if empirical_difficulty(q) == difficulty else weights['other']
+            return random.random() ** (1.0 / weight)
+        
+        questions.sort(key=key, reverse=True)
+        return questions[:count] if count else questions
+    
     def get_all(self) -> List[Dict]:
         """Obtém todas as questões"""
         try:
@@ -85,6 +169,29 @@ class QuestionManager:
             logger.error(f"Erro ao obter questão: {e}")
             return None
     
+    def get_many(self, question_ids) -> Dict[str, Dict]:
+        """Texto, categoria e dificuldade de várias questões (questionId -> dados)
+        
+        IDs repetidos são lidos uma vez; os ausentes do catálogo em cache são
+        buscados com BatchGetItem (100 chaves por chamada). IDs inexistentes
+        ficam fora do resultado.
+        """
+        try:
+            unique = list(dict.fromkeys(q for q in question_ids if q))
+            found, missing = _catalog.lookup(unique)
+            if missing:
+                items = batch_get(self.table, [{'questionId': q} for q in missing],
+                                  ProjectionExpression=CATALOG_FIELDS)
+                fetched: Dict[str, Optional[Dict]] = {q: None for q in missing}
+                for item in items:
+                    fetched[item['questionId']] = item
+                _catalog.store(fetched)
+                found.update(fetched)
+            return {q: entry for q, entry in found.items() if entry is not None}
+        except Exception as e:
+            logger.error(f"Erro ao obter questões em lote: {e}")
+            return {}
+    
     def create(self, question: str, options: List[str], correct_answer: int,
                explanation: str, category: str, difficulty: str = 'medium',
                why_wrong: Optional[Dict] = None) -> bool:
@@ -107,6 +214,49 @@ class QuestionManager:
             logger.error(f"Erro ao criar questão: {e}")
             return False
     
+    def stored_fingerprints(self) -> set:
+        """Fingerprints das questões já gravadas (varredura só do texto)"""
+        fingerprints = set()
+        for page in iter_pages(self.table.scan, ProjectionExpression='#q',
+                               ExpressionAttributeNames={'#q': 'question'}):
+            for item in page.get('Items', []):
+                fingerprints.add(question_fingerprint(item.get('question', '')))
+        return fingerprints
+    
+    def bulk_create(self, questions: List[Dict], skip_existing: bool = True) -> int:
+        """Cria várias questões em lote (batch_writer agrupa 25 itens por chamada)
+        
+        Com `skip_existing`, questões cujo texto normalizado já existe na
+        tabela (ou repete outra do lote) são ignoradas.
+        """
+        count = 0
+        try:
+            seen = self.stored_fingerprints() if skip_existing else set()
+            with self.table.batch_writer() as batch:
+                for q in questions:
+                    fingerprint = question_fingerprint(q['question'])
+                    if fingerprint in seen:
+                        continue
+                    seen.add(fingerprint)
+                    batch.put_item(Item={
+                        'questionId': str(uuid.uuid4()),
+                        'question': q['question'],
+                        'options': q['options'],
+                        'correctAnswer': str(q['correctAnswer']),
+                        'explanation': q.get('explanation', ''),
+                        'category': q['category'],
+                        'difficulty': q.get('difficulty', 'medium'),
+                        'why_wrong': q.get('why_wrong') or {},
+                        'created_at': Decimal(str(datetime.now().timestamp()))
+                    })
+                    count += 1
+            skipped = len(questions) - count
+            logger.info(f"{count} questões criadas em lote" + (f" ({skipped} já existentes)" if skipped else ''))
+            return count
+        except Exception as e:
+            logger.error(f"Erro ao criar questões em lote: {e}")
+            return 0
+    
     def update(self, question_id: str, **kwargs) -> bool:
         """Atualiza questão"""
         try:
@@ -118,6 +268,7 @@ class QuestionManager:
                 UpdateExpression=update_expression,
                 ExpressionAttributeValues=expression_values
             )
+            _catalog.invalidate(question_id)
             logger.info(f"Questão atualizada: {question_id}")
             return True
         except Exception as e:
@@ -128,6 +279,7 @@ class QuestionManager:
         """Deleta questão"""
         try:
             self.table.delete_item(Key={'questionId': question_id})
+            _catalog.invalidate(question_id)
             logger.info(f"Questão deletada: {question_id}")
             return True
         except Exception as e:
@@ -0,0 +1,427 @@
+"""
+Módulo de Ranking (posição do usuário em O(log n))
+
+Mantém em memória, por processo, o ranking geral e o de cada categoria a
+partir dos agregados da tabela user_stats (ver ``GamificationManager``).
+O critério é o mesmo de ``ProgressManager.get_leaderboard``: taxa de acerto,
+com desempate pelo número de acertos. A taxa é discretizada em faixas
+(``RANKING['buckets']``) contadas por uma árvore de Fenwick, e dentro de
+cada faixa os usuários ficam em ordem, então ``rank_of`` custa O(log n) e
+``top``/``around`` só visitam as faixas necessárias.
+
+O índice é carregado com uma varredura da user_stats (nunca do histórico
+de respostas), atualizado a cada resposta deste processo e recarregado
+periodicamente para incorporar respostas de outros processos. A varredura
+roda em segundo plano (``warm_up``): nenhuma consulta espera por ela, e até
+a primeira carga terminar o ranking fica vazio.
+
+O mesmo índice mantém o ranking de pontos (total, semana e mês), a partir
+dos atributos de pontos acumulados na user_stats (ver ``points_attributes``).
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from config import RANKING, TRAINING_CATEGORIES
+from utils.storage import get_table, iter_pages
+from utils.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+
+class _Fenwick:
+    """Contagens por posição com soma de prefixo e busca do k-ésimo em O(log n)"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self._step = 1 << size.bit_length()
+    
+    def add(self, index: int, delta: int) -> None:
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+    
+    def prefix(self, index: int) -> int:
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+    
+    def find(self, k: int) -> int:
+        """Menor posição cuja soma de prefixo é >= k (k >= 1)"""
+        position, step = 0, self._step
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] < k:
+                position = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return position + 1
+
+
+class _Board:
+    """Ranking de um escopo (geral ou categoria)
+    
+    A árvore de Fenwick conta os usuários por faixa de taxa; dentro da faixa
+    eles ficam numa lista ordenada pela chave completa (taxa exata, acertos,
+    id), então a posição dentro da faixa sai de uma busca binária.
+    """
+    
+    def __init__(self, buckets: int):
+        self.buckets = buckets
+        self.tree = _Fenwick(buckets + 1)
+        self.members: Dict[int, List[Tuple[float, int, str]]] = {}  # posição -> chaves ordenadas
+        self.position_of: Dict[str, int] = {}
+        self.key_of: Dict[str, Tuple[float, int, str]] = {}
+        self.counts: Dict[str, Tuple[int, int]] = {}  # user -> (acertos, total)
+    
+    def _position(self, correct: int, total: int) -> int:
+        # Posição 1 = maior taxa de acerto, para que o prefixo conte quem está à frente
+        return self.buckets - (correct * self.buckets) // total + 1
+    
+    def remove(self, user_id: str) -> None:
+        position = self.position_of.pop(user_id, None)
+        if position is not None:
+            bucket = self.members[position]
+            del bucket[bisect.bisect_left(bucket, self.key_of.pop(user_id))]
+            del self.counts[user_id]
+            if not bucket:
+                del self.members[position]
+            self.tree.add(position, -1)
+    
+    def set(self, user_id: str, correct: int, total: int) -> None:
+        self.remove(user_id)
+        position = self._position(correct, total)
+        # Dentro da faixa: taxa exata, depois acertos, depois id (ordem estável)
+        key = (-correct / total, -correct, user_id)
+        bisect.insort(self.members.setdefault(position, []), key)
+        self.position_of[user_id] = position
+        self.key_of[user_id] = key
+        self.counts[user_id] = (correct, total)
+        self.tree.add(position, 1)
+    
+    def __len__(self) -> int:
+        return len(self.position_of)
+    
+    def rank_of(self, user_id: str) -> Optional[int]:
+        position = self.position_of.get(user_id)
+        if position is None:
+            return None
+        ahead = bisect.bisect_left(self.members[position], self.key_of[user_id])
+        return self.tree.prefix(position - 1) + ahead + 1
+    
+    def entries(self, start: int, count: int) -> List[Dict]:
+        """`count` entradas a partir da posição `start` (1 = primeiro)"""
+        rows = []
+        rank = max(start, 1)
+        while len(rows) < count and rank <= len(self):
+            position = self.tree.find(rank)
+            offset = rank - self.tree.prefix(position - 1) - 1
+            for _, _, user_id in self.members[position][offset:offset + count - len(rows)]:
+                correct, total = self.counts[user_id]
+                rows.append({
+                    'rank': rank,
+                    'user_id': user_id,
+                    'accuracy': correct / total * 100,
+                    'correct': correct,
+                    'total': total
+                })
+                rank += 1
+        return rows
+
+
+def points_attributes(when: Optional[datetime] = None) -> Dict[str, str]:
+    """Atributos da user_stats com os pontos de cada janela no instante `when`
+    
+    A janela semanal/mensal é parte do nome do atributo: ao virar a semana,
+    os pontos passam a ser somados em um atributo novo, que começa do zero.
+    """
+    when = when or datetime.now()
+    year, week, _ = when.isocalendar()
+    return {
+        'all': 'points',
+        'week': f'points_{year}-W{week:02d}',
+        'month': f'points_{when.year}-{when.month:02d}'
+    }
+
+
+class _PointsBoard:
+    """Ranking de pontos de uma janela
+    
+    Mesma estrutura do ``_Board``: a árvore de Fenwick conta os usuários por
+    total de pontos (posição = pontos) e, entre empatados, eles ficam numa
+    lista ordenada por id. A árvore cresce dobrando quando alguém passa do
+    maior total que ela comporta.
+    """
+    
+    INITIAL_SIZE = 1024
+    
+    def __init__(self, attribute: str):
+        self.attribute = attribute
+        self.tree = _Fenwick(self.INITIAL_SIZE)
+        self.members: Dict[int, List[str]] = {}  # pontos -> ids ordenados
+        self.points_of: Dict[str, int] = {}
+    
+    def _grow(self, points: int) -> None:
+        size = self.tree.size
+        while size < points:
+            size *= 2
+        self.tree = _Fenwick(size)
+        for value, users in self.members.items():
+            self.tree.add(value, len(users))
+    
+    def remove(self, user_id: str) -> None:
+        points = self.points_of.pop(user_id, None)
+        if points is not None:
+            users = self.members[points]
+            del users[bisect.bisect_left(users, user_id)]
+            if not users:
+                del self.members[points]
+            self.tree.add(points, -1)
+    
+    def set(self, user_id: str, points: int) -> None:
+        """Posiciona o usuário com `points` (> 0) pontos"""
+        self.remove(user_id)
+        if points > self.tree.size:
+            self._grow(points)
+        bisect.insort(self.members.setdefault(points, []), user_id)
+        self.points_of[user_id] = points
+        self.tree.add(points, 1)
+    
+    def __len__(self) -> int:
+        return len(self.points_of)
+    
+    def rank_of(self, user_id: str) -> Optional[int]:
+        points = self.points_of.get(user_id)
+        if points is None:
+            return None
+        # À frente: quem tem mais pontos, depois os empatados com id menor
+        ahead = len(self) - self.tree.prefix(points)
+        return ahead + bisect.bisect_left(self.members[points], user_id) + 1
+    
+    def entries(self, start: int, count: int) -> List[Dict]:
+        """`count` entradas a partir da posição `start` (1 = primeiro)"""
+        rows = []
+        rank = max(start, 1)
+        total = len(self)
+        while len(rows) < count and rank <= total:
+            # Posição `rank` de cima = posição total - rank + 1 na ordem crescente de pontos
+            points = self.tree.find(total - rank + 1)
+            offset = rank - (total - self.tree.prefix(points)) - 1
+            for user_id in self.members[points][offset:offset + count - len(rows)]:
+                rows.append({'rank': rank, 'user_id': user_id, 'points': points})
+                rank += 1
+        return rows
+
+
+@instrumented
+class RankIndex:
+    """Ranking geral e por categoria com consultas em tempo logarítmico"""
+    
+    def __init__(self, min_answers: int = RANKING['min_answers'],
+                 buckets: int = RANKING['buckets'],
+                 refresh_seconds: float = RANKING['refresh_seconds']):
+        self.min_answers = min_answers
+        self.buckets = buckets
+        self.refresh_seconds = refresh_seconds
+        self._boards: Dict[Optional[str], _Board] = self._empty()
+        self._points: Dict[str, _PointsBoard] = self._empty_points()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        # Agregados aplicados durante uma recarga, reaplicados sobre o resultado dela
+        self._pending: Optional[Dict[str, Dict]] = None
+    
+    @property
+    def loaded(self) -> bool:
+        """Se a primeira carga já terminou"""
+        return self._loaded_at is not None
+    
+    def _empty(self) -> Dict[Optional[str], _Board]:
+        boards = {None: _Board(self.buckets)}
+        for category in TRAINING_CATEGORIES:
+            boards[category] = _Board(self.buckets)
+        return boards
+    
+    @staticmethod
+    def _empty_points() -> Dict[str, _PointsBoard]:
+        return {window: _PointsBoard(attribute) for window, attribute in points_attributes().items()}
+    
+    def _roll_points(self) -> None:
+        """Inicia vazia a janela que virou (semana ou mês novos); chamar com o lock"""
+        for window, attribute in points_attributes().items():
+            if self._points[window].attribute != attribute:
+                self._points[window] = _PointsBoard(attribute)
+    
+    @staticmethod
+    def _apply_points(points: Dict[str, _PointsBoard], user_id: str, stats: Dict) -> None:
+        for board in points.values():
+            value = int(stats.get(board.attribute, 0))
+            if value > 0:
+                board.set(user_id, value)
+            else:
+                board.remove(user_id)
+    
+    def _apply(self, boards: Dict[Optional[str], _Board], user_id: str, stats: Dict) -> None:
+        counts = {None: (stats.get('correct_answers', 0), stats.get('total_answers', 0))}
+        for category in TRAINING_CATEGORIES:
+            counts[category] = (stats.get(f'correct_{category}', 0), stats.get(f'total_{category}', 0))
+        for scope, (correct, total) in counts.items():
+            correct, total = int(correct), int(total)
+            if total >= self.min_answers:
+                boards[scope].set(user_id, correct, total)
+            else:
+                boards[scope].remove(user_id)
+    
+    def refresh(self) -> int:
+        """Recarrega o índice a partir da tabela user_stats; retorna o número de usuários"""
+        started = time.monotonic()
+        with self._lock:
+            self._pending = {}
+        try:
+            boards, points = self._empty(), self._empty_points()
+            table = get_table('user_stats')
+            for page in iter_pages(table.scan):
+                for item in page.get('Items', []):
+                    self._apply(boards, item['userId'], item)
+                    self._apply_points(points, item['userId'], item)
+            with self._lock:
+                for user_id, item in self._pending.items():
+                    self._apply(boards, user_id, item)
+                    self._apply_points(points, user_id, item)
+                self._boards = boards
+                self._points = points
+                self._pending = None
+                self._loaded_at = started
+                self._failures = 0
+            logger.info(f"Ranking carregado: {len(boards[None])} usuários")
+            return len(boards[None])
+        except Exception as e:
+            logger.error(f"Erro ao carregar ranking: {e}")
+            with self._lock:
+                self._pending = None
+            if self._loaded_at is not None:
+                self._loaded_at = started  # mantém o índice atual até a próxima recarga
+            else:
+                # Sem carga anterior o índice continua não carregado; nova tentativa com espera crescente
+                self._retry_at = time.monotonic() + min(
+                    RANKING['retry_seconds'] * 2 ** self._failures, self.refresh_seconds)
+                self._failures += 1
+            return 0
+    
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self._refresh_lock.release()
+    
+    def warm_up(self, wait: bool = False) -> None:
+        """Inicia a recarga em segundo plano (se nenhuma estiver em curso)
+        
+        Com `wait`, espera a recarga em curso terminar; usado por scripts e
+        testes que precisam do índice completo.
+        """
+        if self._refresh_lock.acquire(blocking=False):
+            thread = threading.Thread(target=self._background_refresh, name='rank-index-refresh',
+                                      daemon=True)
+            thread.start()
+        if wait:
+            with self._refresh_lock:
+                pass
+    
+    def _ensure_loaded(self) -> None:
+        loaded_at, now = self._loaded_at, time.monotonic()
+        if loaded_at is None:
+            if now >= self._retry_at:
+                self.warm_up()
+        elif now - loaded_at > self.refresh_seconds:
+            self.warm_up()
+    
+    def update(self, user_id: str, stats: Dict) -> None:
+        """Aplica os agregados novos de um usuário (retorno ALL_NEW da user_stats)"""
+        self._ensure_loaded()
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = stats
+            self._apply(self._boards, user_id, stats)
+            self._roll_points()
+            self._apply_points(self._points, user_id, stats)
+    
+    def rank_of(self, user_id: str, category: Optional[str] = None) -> Optional[int]:
+        """Posição do usuário (1 = primeiro); None se ainda não classificado"""
+        self._ensure_loaded()
+        with self._lock:
+            board = self._boards.get(category)
+            return board.rank_of(user_id) if board is not None else None
+    
+    def size(self, category: Optional[str] = None) -> int:
+        """Número de usuários classificados"""
+        self._ensure_loaded()
+        with self._lock:
+            board = self._boards.get(category)
+            return len(board) if board is not None else 0
+    
+    def top(self, n: int = 10, category: Optional[str] = None) -> List[Dict]:
+        """Primeiros `n` colocados"""
+        self._ensure_loaded()
+        with self._lock:
+            board = self._boards.get(category)
+            return board.entries(1, n) if board is not None else []
+    
+    def around(self, user_id: str, k: int = 2, category: Optional[str] = None) -> List[Dict]:
+        """Até `k` colocados acima e abaixo do usuário, incluindo ele"""
+        self._ensure_loaded()
+        with self._lock:
+            board = self._boards.get(category)
+            rank = board.rank_of(user_id) if board is not None else None
+            if rank is None:
+                return []
+            start = max(rank - k, 1)
+            return board.entries(start, rank + k - start + 1)
+    
+    def points_rank_of(self, user_id: str, window: str = 'all') -> Optional[int]:
+        """Posição do usuário no ranking de pontos ('all', 'week' ou 'month')"""
+        self._ensure_loaded()
+        with self._lock:
+            self._roll_points()
+            return self._points[window].rank_of(user_id)
+    
+    def top_points(self, n: int = 10, window: str = 'all') -> List[Dict]:
+        """Primeiros `n` colocados em pontos na janela"""
+        self._ensure_loaded()
+        with self._lock:
+            self._roll_points()
+            return self._points[window].entries(1, n)
+    
+    def around_points(self, user_id: str, k: int = 2, window: str = 'all') -> List[Dict]:
+        """Até `k` colocados acima e abaixo do usuário no ranking de pontos"""
+        self._ensure_loaded()
+        with self._lock:
+            self._roll_points()
+            board = self._points[window]
+            rank = board.rank_of(user_id)
+            if rank is None:
+                return []
+            start = max(rank - k, 1)
+            return board.entries(start, rank + k - start + 1)
+
+
+_index: Optional[RankIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_rank_index() -> RankIndex:
+    """Retorna o índice de ranking do processo (a primeira carga começa aqui)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RankIndex()
+                _index.warm_up()
+    return _index
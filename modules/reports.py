@@ -1,144 +1,237 @@
 """
 Módulo de Relatórios e Exportação
 """
-import csv
+import contextvars
 import json
 import logging
-from io import StringIO, BytesIO
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from config import EXPORTS, REPORTS
 from utils.aws_client import get_aws_client
+from utils.export import json_default, iter_csv, iter_jsonl, upload_multipart
+from utils.storage import get_table, iter_pages
+from utils.metrics import instrumented
+from utils.capacity import CapacityThrottle
+from modules.questions import QuestionManager
 
 logger = logging.getLogger(__name__)
 
+@instrumented
 class ReportGenerator:
     """Gera relatórios de desempenho e dados"""
     
     def __init__(self):
-        self.dynamodb = get_aws_client().dynamodb
-        self.progress_table = self.dynamodb.Table('cyberguard-progress')
+        self.progress_table = get_table('progress')
+        self._question_manager: Optional[QuestionManager] = None
     
-    def generate_user_report_csv(self, user_id: str) -> Optional[str]:
-        """Gera relatório do usuário em CSV"""
+    CSV_FIELDS = ['timestamp', 'questionId', 'question', 'category', 'difficulty', 'correct', 'time_spent']
+    ENRICH_BATCH = 1000  # linhas por consulta ao catálogo de questões
+    
+    def _iter_user_items(self, user_id: str) -> Iterator[Dict]:
+        """Itens de progresso do usuário, página a página (sem limite de 1 MB)"""
+        for page in iter_pages(self.progress_table.query,
+                               KeyConditionExpression='userId = :uid',
+                               ExpressionAttributeValues={':uid': user_id}):
+            yield from page.get('Items', [])
+    
+    def _iter_items(self, user_ids: List[str]) -> Iterator[Dict]:
+        for user_id in user_ids:
+            yield from self._iter_user_items(user_id)
+    
+    @property
+    def question_manager(self) -> QuestionManager:
+        if self._question_manager is None:
+            self._question_manager = QuestionManager()
+        return self._question_manager
+    
+    def _enrich(self, items: Iterator[Dict]) -> Iterator[Dict]:
+        """Acrescenta texto, categoria e dificuldade da questão a cada resposta
+        
+        Lê em blocos de ENRICH_BATCH linhas e busca no catálogo apenas as
+        questões distintas de cada bloco (cache + BatchGetItem).
+        """
+        batch: List[Dict] = []
+        
+        def flush():
+            catalog = self.question_manager.get_many(item.get('questionId') for item in batch)
+            for item in batch:
+                question = catalog.get(item.get('questionId'), {})
+                item['question'] = question.get('question', '')
+                item['difficulty'] = question.get('difficulty', '')
+                if not item.get('category'):
+                    item['category'] = question.get('category', '')
+            return batch
+        
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.ENRICH_BATCH:
+                yield from flush()
+                batch = []
+        if batch:
+            yield from flush()
+    
+    @staticmethod
+    def _csv_row(item: Dict) -> Dict:
+        return {
+            'userId': item.get('userId', ''),
+            'timestamp': datetime.fromtimestamp(float(item['timestamp'])).isoformat(),
+            'questionId': item.get('questionId', ''),
+            'question': item.get('question', ''),
+            'category': item.get('category', ''),
+            'difficulty': item.get('difficulty', ''),
+            'correct': item.get('correct', False),
+            'time_spent': item.get('time_spent', 0)
+        }
+    
+    def stream_csv(self, user_ids: List[str], include_user: Optional[bool] = None,
+                   enrich: bool = True) -> Iterator[bytes]:
+        """CSV de um ou mais usuários em blocos de bytes (memória constante)
+        
+        A coluna userId é incluída por padrão quando há mais de um usuário;
+        com `enrich`, as colunas da questão vêm do catálogo de questões.
+        """
+        if include_user is None:
+            include_user = len(user_ids) > 1
+        fieldnames = (['userId'] if include_user else []) + self.CSV_FIELDS
+        items = self._iter_items(user_ids)
+        if enrich:
+            items = self._enrich(items)
+        rows = (self._csv_row(item) for item in items)
+        return iter_csv(rows, fieldnames, EXPORTS['chunk_size'])
+    
+    def stream_jsonl(self, user_ids: List[str], enrich: bool = True) -> Iterator[bytes]:
+        """JSON Lines (um item por linha) de um ou mais usuários em blocos de bytes"""
+        items = self._iter_items(user_ids)
+        if enrich:
+            items = self._enrich(items)
+        return iter_jsonl(items, EXPORTS['chunk_size'])
+    
+    def has_data(self, user_id: str) -> bool:
+        """Verifica se o usuário tem ao menos um registro de progresso"""
         try:
             response = self.progress_table.query(
                 KeyConditionExpression='userId = :uid',
-                ExpressionAttributeValues={':uid': user_id}
+                ExpressionAttributeValues={':uid': user_id},
+                ProjectionExpression='userId',
+                Limit=1
             )
+            return bool(response.get('Items'))
+        except Exception as e:
+            logger.error(f"Erro ao verificar dados do usuário: {e}")
+            return False
+    
+    def export_to_s3(self, user_ids: List[str], fmt: str = 'jsonl',
+                     key: Optional[str] = None) -> Optional[Dict]:
+        """Exporta usuários para o S3 via upload multipart, sem materializar o arquivo"""
+        try:
+            if fmt == 'csv':
+                chunks, content_type = self.stream_csv(user_ids), 'text/csv'
+            elif fmt == 'jsonl':
+                chunks, content_type = self.stream_jsonl(user_ids), 'application/x-ndjson'
+            else:
+                raise ValueError(f"Formato não suportado: {fmt}")
             
-            items = response.get('Items', [])
-            if not items:
-                return None
-            
-            # Criar CSV
-            output = StringIO()
-            writer = csv.DictWriter(
-                output,
-                fieldnames=['timestamp', 'questionId', 'category', 'correct', 'time_spent']
-            )
+            key = key or f"exports/{datetime.now().strftime('%Y%m%d-%H%M%S')}-{len(user_ids)}users.{fmt}"
+            result = upload_multipart(get_aws_client().s3, EXPORTS['bucket'], key, chunks,
+                                      EXPORTS['part_size'], content_type=content_type)
+            logger.info(f"Exportação de {len(user_ids)} usuários enviada para {key}")
+            return result
             
-            writer.writeheader()
-            for item in items:
-                writer.writerow({
-                    'timestamp': datetime.fromtimestamp(float(item['timestamp'])).isoformat(),
-                    'questionId': item.get('questionId', ''),
-                    'category': item.get('category', ''),
-                    'correct': item.get('correct', False),
-                    'time_spent': item.get('time_spent', 0)
-                })
+        except Exception as e:
+            logger.error(f"Erro ao exportar para o S3: {e}")
+            return None
+    
+    def generate_user_report_csv(self, user_id: str) -> Optional[str]:
+        """Gera relatório do usuário em CSV
+        
+        Para históricos grandes prefira `stream_csv`, que não monta o
+        documento em memória.
+        """
+        try:
+            csv_data = b''.join(self.stream_csv([user_id])).decode('utf-8')
+            if csv_data.count('\n') <= 1:  # apenas o cabeçalho
+                return None
             
             logger.info(f"Relatório CSV gerado para usuário {user_id}")
-            return output.getvalue()
+            return csv_data
             
         except Exception as e:
             logger.error(f"Erro ao gerar relatório CSV: {e}")
             return None
     
-    def generate_instructor_report(self, category: Optional[str] = None) -> Dict:
-        """Gera relatório agregado para instrutores"""
+    def generate_instructor_report(self, category: Optional[str] = None,
+                                   max_age: Optional[float] = None) -> Dict:
+        """Gera relatório agregado para instrutores
+        
+        Servido a partir de um snapshot por filtro (categoria) com TTL; um
+        snapshot vencido continua sendo servido enquanto é recalculado em
+        segundo plano. `max_age=0` força o recálculo imediato.
+        """
         try:
-            response = self.progress_table.scan()
-            all_items = response.get('Items', [])
-            
-            # Filtrar por categoria se especificado
-            if category:
-                all_items = [item for item in all_items if item.get('category') == category]
-            
-            # Agregação de dados
-            stats = {
-                'total_responses': len(all_items),
-                'total_users': len(set(item.get('userId') for item in all_items)),
-                'overall_accuracy': 0.0,
-                'by_category': {},
-                'by_user': {},
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            correct_count = sum(1 for item in all_items if item.get('correct', False))
-            stats['overall_accuracy'] = (correct_count / len(all_items) * 100) if all_items else 0
-            
-            # Estatísticas por categoria
-            for item in all_items:
-                cat = item.get('category', 'unknown')
-                if cat not in stats['by_category']:
-                    stats['by_category'][cat] = {'total': 0, 'correct': 0}
-                
-                stats['by_category'][cat]['total'] += 1
-                if item.get('correct', False):
-                    stats['by_category'][cat]['correct'] += 1
-            
-            # Calcular taxa por categoria
-            for cat in stats['by_category']:
-                total = stats['by_category'][cat]['total']
-                correct = stats['by_category'][cat]['correct']
-                stats['by_category'][cat]['accuracy'] = (correct / total * 100) if total > 0 else 0
-            
-            # Estatísticas por usuário
-            for item in all_items:
-                user = item.get('userId', 'unknown')
-                if user not in stats['by_user']:
-                    stats['by_user'][user] = {'total': 0, 'correct': 0}
-                
-                stats['by_user'][user]['total'] += 1
-                if item.get('correct', False):
-                    stats['by_user'][user]['correct'] += 1
-            
-            # Calcular taxa por usuário
-            for user in stats['by_user']:
-                total = stats['by_user'][user]['total']
-                correct = stats['by_user'][user]['correct']
-                stats['by_user'][user]['accuracy'] = (correct / total * 100) if total > 0 else 0
-            
-            logger.info(f"Relatório de instrutor gerado")
-            return stats
+            snapshot = _snapshots.get(
+                category or '*', lambda: self._build_instructor_report(category), max_age
+            )
+            return dict(snapshot['data'], snapshot_age_seconds=time.time() - snapshot['created_at'])
             
         except Exception as e:
             logger.error(f"Erro ao gerar relatório de instrutor: {e}")
             return {}
     
+    def _build_instructor_report(self, category: Optional[str] = None) -> Dict:
+        """Varre a tabela de progresso uma vez (em segmentos paralelos) e agrega"""
+        kwargs = {
+            'ProjectionExpression': 'userId, #ts, category, correct, time_spent',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'}
+        }
+        if category:
+            kwargs['FilterExpression'] = 'category = :cat'
+            kwargs['ExpressionAttributeValues'] = {':cat': category}
+        
+        segments = REPORTS['scan_segments']
+        if segments <= 1:
+            accumulator = self._scan_segment(kwargs)
+        else:
+            accumulator = _ReportAccumulator()
+            with ThreadPoolExecutor(max_workers=segments) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._scan_segment,
+                                    kwargs, segment, segments)
+                    for segment in range(segments)
+                ]
+                for future in futures:
+                    accumulator.merge(future.result())
+        
+        logger.info(f"Relatório de instrutor gerado")
+        return accumulator.result()
+    
+    def _scan_segment(self, kwargs: Dict, segment: Optional[int] = None,
+                      total_segments: Optional[int] = None) -> '_ReportAccumulator':
+        # Sempre a tabela da thread atual: a varredura também roda na atualização
+        # do snapshot em segundo plano (resources boto3 não são thread-safe)
+        table = get_table('progress')
+        kwargs = dict(kwargs)
+        if segment is not None:
+            kwargs.update(Segment=segment, TotalSegments=total_segments)
+        
+        accumulator = _ReportAccumulator()
+        for page in iter_pages(table.scan, **kwargs):
+            for item in page.get('Items', []):
+                accumulator.add(item)
+        return accumulator
+    
     def export_to_json(self, user_id: str) -> Optional[str]:
-        """Exporta dados do usuário em JSON"""
+        """Exporta dados do usuário em JSON
+        
+        Para históricos grandes prefira `stream_jsonl`.
+        """
         try:
-            response = self.progress_table.query(
-                KeyConditionExpression='userId = :uid',
-                ExpressionAttributeValues={':uid': user_id}
-            )
-            
-            items = response.get('Items', [])
-            
-            # Converter Decimal para tipos padrão JSON
-            items_json = []
-            for item in items:
-                item_dict = {}
-                for key, value in item.items():
-                    if isinstance(value, type(item['timestamp'])):  # Decimal
-                        item_dict[key] = float(value)
-                    else:
-                        item_dict[key] = value
-                items_json.append(item_dict)
+            items = list(self._enrich(self._iter_user_items(user_id)))
             
             logger.info(f"Dados exportados em JSON para usuário {user_id}")
-            return json.dumps(items_json, ensure_ascii=False, indent=2)
+            return json.dumps(items, ensure_ascii=False, indent=2, default=json_default)
             
         except Exception as e:
             logger.error(f"Erro ao exportar JSON: {e}")
@@ -147,55 +240,296 @@ class ReportGenerator:
     def generate_summary_report(self, user_id: str) -> Dict:
         """Gera relatório resumido do usuário"""
         try:
-            response = self.progress_table.query(
-                KeyConditionExpression='userId = :uid',
-                ExpressionAttributeValues={':uid': user_id}
-            )
-            
-            items = response.get('Items', [])
-            
-            if not items:
+            aggregate = self._user_aggregate(user_id)
+            if aggregate is None:
                 return {'error': 'Nenhum dado disponível'}
+            return _summary_from_aggregate(user_id, aggregate)
             
-            total = len(items)
-            correct = sum(1 for item in items if item.get('correct', False))
-            
-            # Por categoria
-            by_category = {}
-            for item in items:
-                cat = item.get('category', 'unknown')
-                if cat not in by_category:
-                    by_category[cat] = {'total': 0, 'correct': 0}
-                by_category[cat]['total'] += 1
-                if item.get('correct', False):
-                    by_category[cat]['correct'] += 1
-            
-            # Calcular taxas
-            category_stats = {}
-            for cat, stats in by_category.items():
-                accuracy = (stats['correct'] / stats['total'] * 100) if stats['total'] > 0 else 0
-                category_stats[cat] = {
-                    'total': stats['total'],
-                    'correct': stats['correct'],
-                    'accuracy': accuracy
-                }
+        except Exception as e:
+            logger.error(f"Erro ao gerar relatório resumido: {e}")
+            return {}
+    
+    def _user_aggregate(self, user_id: str, table=None,
+                        throttle: Optional[CapacityThrottle] = None) -> Optional[Dict]:
+        """Agregados de um usuário (mesmo formato de `by_user` do relatório de instrutor)"""
+        table = table or self.progress_table
+        query = throttle.wrap(table.query) if throttle else table.query
+        accumulator = _ReportAccumulator()
+        for page in iter_pages(query,
+                               KeyConditionExpression='userId = :uid',
+                               ExpressionAttributeValues={':uid': user_id},
+                               ProjectionExpression='userId, #ts, category, correct, time_spent',
+                               ExpressionAttributeNames={'#ts': 'timestamp'}):
+            for item in page.get('Items', []):
+                accumulator.add(item)
+        return accumulator.result()['by_user'].get(user_id)
+    
+    def _cohort_member(self, user_id: str, throttle: Optional[CapacityThrottle]) -> Dict:
+        try:
+            # Tabela da própria thread (resources boto3 não são thread-safe)
+            aggregate = self._user_aggregate(user_id, get_table('progress'), throttle)
+            if aggregate is None:
+                return {'user_id': user_id, 'error': 'Nenhum dado disponível'}
+            return dict(_summary_from_aggregate(user_id, aggregate), source='query')
+        except Exception as e:
+            logger.error(f"Erro ao gerar resumo de {user_id}: {e}")
+            return {'user_id': user_id, 'error': str(e)}
+    
+    def iter_cohort_report(self, user_ids: List[str], max_workers: Optional[int] = None,
+                           rcu_per_second: Optional[float] = None,
+                           reuse_snapshot: bool = True) -> Iterator[Tuple[str, Dict]]:
+        """Resumos (user_id, resumo) de uma turma, na ordem em que ficam prontos
+        
+        Alunos presentes no snapshot vigente do relatório de instrutor são
+        atendidos sem consulta; os demais são consultados em paralelo (no
+        máximo `max_workers` de cada vez), limitados a `rcu_per_second`.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        pending = user_ids
+        if reuse_snapshot:
+            snapshot = _snapshots.peek('*')
+            if snapshot is not None:
+                by_user = snapshot['data'].get('by_user', {})
+                pending = []
+                for user_id in user_ids:
+                    aggregate = by_user.get(user_id)
+                    if aggregate is None:
+                        pending.append(user_id)
+                    else:
+                        yield user_id, dict(_summary_from_aggregate(user_id, aggregate), source='snapshot')
+        if not pending:
+            return
+        
+        rate = REPORTS['cohort_rcu_per_second'] if rcu_per_second is None else rcu_per_second
+        throttle = CapacityThrottle(rate) if rate else None
+        executor = ThreadPoolExecutor(max_workers=max_workers or REPORTS['cohort_workers'])
+        try:
+            futures = {
+                executor.submit(contextvars.copy_context().run, self._cohort_member, user_id, throttle): user_id
+                for user_id in pending
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # Consumidor interrompido: descarta o que ainda não começou
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def generate_cohort_report(self, user_ids: List[str], max_workers: Optional[int] = None,
+                               rcu_per_second: Optional[float] = None,
+                               reuse_snapshot: bool = True) -> Dict:
+        """Relatório combinado de uma turma (resumo por aluno e totais)"""
+        try:
+            summaries = dict(self.iter_cohort_report(user_ids, max_workers, rcu_per_second,
+                                                     reuse_snapshot))
+            users = {user_id: summaries[user_id] for user_id in dict.fromkeys(user_ids)}
+            active = [s for s in users.values() if 'error' not in s]
             
-            # Tempo de estudo (se disponível)
-            total_time = sum(item.get('time_spent', 0) for item in items)
+            total = sum(s['total_questions'] for s in active)
+            correct = sum(s['correct_answers'] for s in active)
+            by_category: Dict[str, Dict] = {}
+            for summary in active:
+                for cat, stats in summary['by_category'].items():
+                    combined = by_category.setdefault(cat, {'total': 0, 'correct': 0, 'users': 0})
+                    combined['total'] += stats['total']
+                    combined['correct'] += stats['correct']
+                    combined['users'] += 1
+            for stats in by_category.values():
+                stats['accuracy'] = _accuracy(stats['correct'], stats['total'])
             
-            summary = {
-                'user_id': user_id,
+            logger.info(f"Relatório de turma gerado ({len(users)} alunos)")
+            return {
+                'cohort_size': len(users),
+                'active_users': len(active),
+                'without_data': [uid for uid, s in users.items() if 'error' in s],
+                'from_snapshot': sum(1 for s in active if s.get('source') == 'snapshot'),
                 'total_questions': total,
                 'correct_answers': correct,
-                'overall_accuracy': (correct / total * 100) if total > 0 else 0,
-                'by_category': category_stats,
-                'total_study_time_seconds': total_time,
-                'average_time_per_question': (total_time / total) if total > 0 else 0,
+                'overall_accuracy': _accuracy(correct, total),
+                'average_user_accuracy': (sum(s['overall_accuracy'] for s in active) / len(active)
+                                          if active else 0),
+                'by_category': by_category,
+                'users': users,
                 'generated_at': datetime.now().isoformat()
             }
             
-            return summary
-            
         except Exception as e:
-            logger.error(f"Erro ao gerar relatório resumido: {e}")
+            logger.error(f"Erro ao gerar relatório de turma: {e}")
             return {}
+
+
+def _summary_from_aggregate(user_id: str, aggregate: Dict) -> Dict:
+    """Converte os agregados de um usuário no formato de `generate_summary_report`"""
+    total = aggregate['total']
+    return {
+        'user_id': user_id,
+        'total_questions': total,
+        'correct_answers': aggregate['correct'],
+        'overall_accuracy': _accuracy(aggregate['correct'], total),
+        'by_category': {
+            cat: {'total': stats['total'], 'correct': stats['correct'],
+                  'accuracy': _accuracy(stats['correct'], stats['total'])}
+            for cat, stats in aggregate['by_category'].items()
+        },
+        'total_study_time_seconds': aggregate['time_spent'],
+        'average_time_per_question': (aggregate['time_spent'] / total) if total > 0 else 0,
+        'generated_at': datetime.now().isoformat()
+    }
+
+def _accuracy(correct: int, total: int) -> float:
+    return (correct / total * 100) if total > 0 else 0
+
+
+class _ReportAccumulator:
+    """Agregados do relatório de instrutor calculados em uma única passada"""
+    
+    def __init__(self):
+        self.total = 0
+        self.correct = 0
+        self.by_category: Dict[str, Dict] = {}
+        self.by_user: Dict[str, Dict] = {}
+    
+    def add(self, item: Dict) -> None:
+        correct = 1 if item.get('correct', False) else 0
+        time_spent = float(item.get('time_spent', 0) or 0)
+        timestamp = float(item.get('timestamp', 0) or 0)
+        cat = item.get('category', 'unknown')
+        
+        self.total += 1
+        self.correct += correct
+        
+        cat_stats = self.by_category.get(cat)
+        if cat_stats is None:
+            cat_stats = self.by_category[cat] = {'total': 0, 'correct': 0, 'time_spent': 0.0}
+        cat_stats['total'] += 1
+        cat_stats['correct'] += correct
+        cat_stats['time_spent'] += time_spent
+        
+        user = self.by_user.get(item.get('userId', 'unknown'))
+        if user is None:
+            user = self.by_user[item.get('userId', 'unknown')] = {
+                'total': 0, 'correct': 0, 'time_spent': 0.0,
+                'first_activity': timestamp, 'last_activity': timestamp, 'by_category': {}
+            }
+        user['total'] += 1
+        user['correct'] += correct
+        user['time_spent'] += time_spent
+        if timestamp < user['first_activity']:
+            user['first_activity'] = timestamp
+        if timestamp > user['last_activity']:
+            user['last_activity'] = timestamp
+        user_cat = user['by_category'].get(cat)
+        if user_cat is None:
+            user_cat = user['by_category'][cat] = {'total': 0, 'correct': 0}
+        user_cat['total'] += 1
+        user_cat['correct'] += correct
+    
+    def merge(self, other: '_ReportAccumulator') -> None:
+        """Combina o resultado de outro segmento da varredura"""
+        self.total += other.total
+        self.correct += other.correct
+        for cat, stats in other.by_category.items():
+            mine = self.by_category.setdefault(cat, {'total': 0, 'correct': 0, 'time_spent': 0.0})
+            for key in mine:
+                mine[key] += stats[key]
+        for user_id, stats in other.by_user.items():
+            mine = self.by_user.get(user_id)
+            if mine is None:
+                self.by_user[user_id] = stats
+                continue
+            for key in ('total', 'correct', 'time_spent'):
+                mine[key] += stats[key]
+            mine['first_activity'] = min(mine['first_activity'], stats['first_activity'])
+            mine['last_activity'] = max(mine['last_activity'], stats['last_activity'])
+            for cat, cat_stats in stats['by_category'].items():
+                mine_cat = mine['by_category'].setdefault(cat, {'total': 0, 'correct': 0})
+                mine_cat['total'] += cat_stats['total']
+                mine_cat['correct'] += cat_stats['correct']
+    
+    def result(self) -> Dict:
+        for stats in self.by_category.values():
+            stats['accuracy'] = _accuracy(stats['correct'], stats['total'])
+        for stats in self.by_user.values():
+            stats['accuracy'] = _accuracy(stats['correct'], stats['total'])
+            for cat_stats in stats['by_category'].values():
+                cat_stats['accuracy'] = _accuracy(cat_stats['correct'], cat_stats['total'])
+        return {
+            'total_responses': self.total,
+            'total_users': len(self.by_user),
+            'overall_accuracy': _accuracy(self.correct, self.total),
+            'by_category': self.by_category,
+            'by_user': self.by_user,
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+class _SnapshotStore:
+    """Snapshots de relatórios por chave, com TTL e atualização em segundo plano"""
+    
+    def __init__(self, ttl: float, max_stale: float):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._snapshots: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._refreshing = set()
+    
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+    
+    def _compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        snapshot = {'data': compute(), 'created_at': time.time()}
+        self._snapshots[key] = snapshot
+        return snapshot
+    
+    def _refresh_async(self, key: str, compute: Callable[[], Dict]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._compute(key, compute)
+            except Exception as e:
+                logger.error(f"Erro ao atualizar snapshot {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(refresh,), name=f'report-refresh-{key}',
+                         daemon=True).start()
+    
+    def get(self, key: str, compute: Callable[[], Dict], max_age: Optional[float] = None) -> Dict:
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            age = time.time() - snapshot['created_at']
+            if age <= max_age:
+                return snapshot
+            if max_age > 0 and age <= self.max_stale:
+                self._refresh_async(key, compute)
+                return snapshot
+        
+        # Sem snapshot utilizável: apenas uma thread recalcula, as demais aguardam
+        with self._key_lock(key):
+            snapshot = self._snapshots.get(key)
+            if snapshot is None or time.time() - snapshot['created_at'] > max_age:
+                snapshot = self._compute(key, compute)
+        return snapshot
+    
+    def peek(self, key: str) -> Optional[Dict]:
+        """Snapshot dentro do TTL, sem recalcular (None se ausente ou vencido)"""
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and time.time() - snapshot['created_at'] <= self.ttl:
+            return snapshot
+        return None
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots = {}
+
+
+_snapshots = _SnapshotStore(REPORTS['snapshot_ttl'], REPORTS['snapshot_max_stale'])
@@ -4,7 +4,6 @@ Inclui fallback para questões pré-geradas quando Bedrock não está disponíve
 """
 
 import boto3
-import json
 import uuid
 import time
 import logging
@@ -12,6 +11,9 @@ import sys
 from decimal import Decimal
 from datetime import datetime
 from pregenerated_questions import PREGERATED_QUESTIONS
+from config import AI_GENERATION
+from modules.ai import AIQuestionGenerator
+from modules.questions import QuestionManager
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +24,6 @@ print("🚀 CyberGuard v2.0 - Setup Completo com IA e Analytics")
 print("=" * 70)
 
 dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
 client = boto3.client('dynamodb', region_name='us-east-1')
 
 # 1. DELETAR TABELAS ANTIGAS
@@ -31,7 +32,8 @@ for table_name in [
     'cyberguard-questions',
     'cyberguard-progress',
     'cyberguard-certificates',
-    'cyberguard-badges'
+    'cyberguard-badges',
+    'cyberguard-user-stats'
 ]:
     try:
         table = dynamodb.Table(table_name)
@@ -93,6 +95,13 @@ table = dynamodb.create_table(
         {'AttributeName': 'userId', 'AttributeType': 'S'},
         {'AttributeName': 'certificateId', 'AttributeType': 'S'}
     ],
+    # Verificação pública por ID (leitura de uma chave, sem scan)
+    GlobalSecondaryIndexes=[{
+        'IndexName': 'CertificateIdIndex',
+        'KeySchema': [{'AttributeName': 'certificateId', 'KeyType': 'HASH'}],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 2}
+    }],
     ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 2}
 )
 
@@ -111,6 +120,15 @@ table = dynamodb.create_table(
     ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 2}
 )
 
+# Tabela de agregados por usuário (atualizada a cada resposta)
+print("   Criando: cyberguard-user-stats")
+table = dynamodb.create_table(
+    TableName='cyberguard-user-stats',
+    KeySchema=[{'AttributeName': 'userId', 'KeyType': 'HASH'}],
+    AttributeDefinitions=[{'AttributeName': 'userId', 'AttributeType': 'S'}],
+    ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+)
+
 print("\n⏳ Aguardando tabelas ficarem ativas (30 segundos)...")
 time.sleep(30)
 
@@ -124,58 +142,7 @@ CATEGORIES = {
     'malware': 'prevenção e detecção de malware'
 }
 
-DIFFICULTIES = ['easy', 'medium']
-
-def generate_question_with_ai(category, difficulty, topic):
-    """Gera questão com Bedrock"""
-    prompt = f"""Crie uma questão de múltipla escolha sobre segurança cibernética.
-
-Tópico: {topic}
-Categoria: {category}
-Dificuldade: {difficulty}
-
-Retorne APENAS um JSON válido neste formato:
-{{
-  "question": "Pergunta clara em português (máximo 100 caracteres)",
-  "options": ["Opção A", "Opção B", "Opção C", "Opção D"],
-  "correctAnswer": 1,
-  "explanation": "Explicação de por que a resposta correta está certa (50 palavras máximo)",
-  "why_wrong": {{
-    "0": "Por que opção A está errada (25 palavras)",
-    "2": "Por que opção C está errada (25 palavras)",
-    "3": "Por que opção D está errada (25 palavras)"
-  }}
-}}
-
-Crie apenas JSON válido, sem explicações adicionais."""
-    
-    try:
-        response = bedrock.invoke_model(
-            modelId='amazon.nova-micro-v1:0',
-            body=json.dumps({
-                "messages": [{"role": "user", "content": [{"text": prompt}]}],
-                "inferenceConfig": {"max_new_tokens": 500, "temperature": 0.9}
-            })
-        )
-        
-        result = json.loads(response['body'].read())
-        response_text = result['output']['message']['content'][0]['text']
-        
-        # Tentar fazer parse do JSON
-        try:
-            question_data = json.loads(response_text)
-            return question_data
-        except json.JSONDecodeError:
-            # Tentar extrair JSON da resposta
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                question_data = json.loads(json_match.group())
-                return question_data
-            return None
-    except Exception as e:
-        logger.error(f"Erro ao gerar questão: {e}")
-        return None
+DIFFICULTIES = ['easy', 'medium', 'hard']
 
 # Gerar ou carregar questões
 questions_table = dynamodb.Table('cyberguard-questions')
@@ -206,65 +173,38 @@ for question_data in PREGERATED_QUESTIONS:
         print(f"   ✅ {question_data.get('category')} ({question_data.get('difficulty')}): {question_data.get('question')[:50]}...")
     except Exception as e:
         print(f"   ❌ Erro ao inserir questão: {e}")
-        
+    
     time.sleep(0.1)  # Pequeno delay
 
 print(f"\n✅ Total de questões carregadas: {total_generated}")
 
-# Tentar gerar mais questões com IA se disponível
-print("\n🤖 Tentando gerar questões adicionais com Amazon Bedrock...\n")
-bedrock_generated = 0
-bedrock_failed = 0
+# Gerar questões adicionais com IA em paralelo (validadas e sem duplicatas)
+print("\n🤖 Gerando questões adicionais com Amazon Bedrock...\n")
+generator = AIQuestionGenerator()
+generated, report = generator.generate_batch(
+    list(CATEGORIES.keys()),
+    DIFFICULTIES,
+    per_combination=AI_GENERATION['per_combination'],
+    max_workers=AI_GENERATION['max_workers'],
+    existing_questions=[q.get('question', '') for q in PREGERATED_QUESTIONS],
+    topics=CATEGORIES
+)
+# bulk_create ignora questões já gravadas na tabela (reexecuções do setup)
+bedrock_generated = QuestionManager().bulk_create(generated) if generated else 0
 
-for category, topic in CATEGORIES.items():
-    print(f"📝 Gerando questões extras para: {category.upper()}")
-    
-    for difficulty in DIFFICULTIES:
-        for i in range(1):  # Apenas 1 questão extra por dificuldade
-            print(f"   Gerando {difficulty} #{i+1}...", end=" ", flush=True)
-            
-            try:
-                question_data = generate_question_with_ai(category, difficulty, topic)
-                
-                if question_data:
-                    question_id = str(uuid.uuid4())
-                    item = {
-                        'questionId': question_id,
-                        'question': question_data.get('question', ''),
-                        'options': question_data.get('options', []),
-                        'correctAnswer': str(question_data.get('correctAnswer', 0)),
-                        'explanation': question_data.get('explanation', ''),
-                        'category': category,
-                        'difficulty': difficulty,
-                        'why_wrong': question_data.get('why_wrong', {}),
-                        'created_at': Decimal(str(datetime.now().timestamp()))
-                    }
-                    
-                    questions_table.put_item(Item=item)
-                    print("✅")
-                    bedrock_generated += 1
-                else:
-                    print("⏭️  (Skipped)")
-                    bedrock_failed += 1
-            except Exception as e:
-                if "ThrottlingException" in str(e) or "Too many tokens" in str(e):
-                    print("⚠️  (Bedrock limit reached)")
-                else:
-                    print(f"❌ ({str(e)[:30]}...)")
-                bedrock_failed += 1
-            
-            if bedrock_failed >= 2:
-                print("\n⚠️  Bedrock limit reached. Usando apenas questões pré-geradas.")
-                break
-    
-    if bedrock_failed >= 2:
-        break
+print(f"   📊 Solicitadas: {report['requested']} | Aceitas: {report['accepted']} "
+      f"({report['acceptance_rate']}%)")
+print(f"   ⏭️  Inválidas: {report['invalid']} | Duplicadas: {report['duplicates']} | "
+      f"Falhas: {report['failed']} | Throttling: {report['throttled']}")
+print(f"   ⏱️  {report['elapsed_seconds']}s ({report['questions_per_second']} questões/s)")
+for category, count in report['by_category'].items():
+    print(f"   ✅ {category}: {count}")
 
 print(f"\n✅ Total de questões carregadas: {total_generated}")
 if bedrock_generated > 0:
     print(f"✅ Questões extras geradas com IA: {bedrock_generated}")
-if bedrock_failed > 0:
-    print(f"⚠️  Falhas na geração com IA: {bedrock_failed} (limite de Bedrock)")
+if report['throttled'] > 0:
+    print(f"⚠️  Limite do Bedrock atingido em {report['throttled']} solicitações")
 
 print("\n" + "=" * 70)
 print("🎉 Setup concluído com sucesso!")
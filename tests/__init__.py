@@ -1 +1,20 @@
 # Testes da aplicação
+import unittest
+from utils.aws_client import AWSClient
+from utils.fake_aws import FakeAWS, fake_aws_env
+
+
+class FakeAWSTestCase(unittest.TestCase):
+    """Base dos testes que usam a AWS falsa (ver ``utils.fake_aws.fake_aws_env``)"""
+    
+    def use_fake_aws(self, *modules: str, fake: FakeAWS = None) -> FakeAWS:
+        """Instala a AWS falsa até o fim do teste, com `get_table` dos `modules` apontando para ela"""
+        env = fake_aws_env(*modules, fake=fake)
+        fake = env.__enter__()
+        self.addCleanup(env.__exit__, None, None, None)
+        return fake
+    
+    def reset_aws_client(self) -> None:
+        """Descarta o singleton do AWSClient agora e no fim do teste"""
+        AWSClient._instance = None
+        self.addCleanup(setattr, AWSClient, '_instance', None)
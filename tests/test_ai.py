@@ -0,0 +1,188 @@
+"""
+Testes para módulo de IA
+"""
+import io
+import json
+import random
+import unittest
+from unittest.mock import MagicMock, patch
+from modules.ai import FeedbackGenerator, AIQuestionGenerator, _extract_json
+
+
+def bedrock_response(text, stop_reason='end_turn'):
+    """Monta resposta no formato do Bedrock (Nova)"""
+    body = {'output': {'message': {'content': [{'text': text}]}}, 'stopReason': stop_reason}
+    return {'body': io.BytesIO(json.dumps(body).encode('utf-8'))}
+
+
+class TestExtractJson(unittest.TestCase):
+    """Testes para o extrator tolerante de JSON"""
+    
+    def test_extract_with_surrounding_text(self):
+        """Testa extração de array cercado por texto"""
+        text = 'Aqui está:\n```json\n[{"index": 0, "feedback": "ok"}]\n```\nFim.'
+        self.assertEqual(_extract_json(text, '['), [{'index': 0, 'feedback': 'ok'}])
+    
+    def test_extract_invalid(self):
+        """Testa resposta sem JSON"""
+        self.assertIsNone(_extract_json('sem json aqui', '{'))
+
+
+class TestSessionFeedback(unittest.TestCase):
+    """Testes para feedback em lote da sessão"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.answers = [
+            {'question': 'Q1', 'user_answer': 'A', 'correct_answer': 'A', 'is_correct': True},
+            {'question': 'Q2', 'user_answer': 'B', 'correct_answer': 'C', 'is_correct': False},
+            {'question': 'Q3', 'user_answer': 'D', 'correct_answer': 'D', 'is_correct': True}
+        ]
+    
+    @patch('modules.ai.get_aws_client')
+    def test_single_invocation(self, mock_aws):
+        """Testa que uma sessão curta usa uma única chamada"""
+        mock_bedrock = MagicMock()
+        mock_bedrock.invoke_model.return_value = bedrock_response(json.dumps([
+            {'index': 0, 'feedback': 'F0'},
+            {'index': 1, 'feedback': 'F1'},
+            {'index': 2, 'feedback': 'F2'}
+        ]))
+        mock_aws.return_value.bedrock = mock_bedrock
+        
+        result = FeedbackGenerator().generate_session_feedback(self.answers, 'phishing')
+        
+        self.assertEqual(len(result), 3)
+        self.assertIn('F1', result[1])
+        mock_bedrock.invoke_model.assert_called_once()
+    
+    @patch('modules.ai.get_aws_client')
+    def test_partial_fallback(self, mock_aws):
+        """Testa fallback local para itens ausentes ou inválidos"""
+        mock_bedrock = MagicMock()
+        mock_bedrock.invoke_model.return_value = bedrock_response(json.dumps([
+            {'index': 0, 'feedback': 'F0'},
+            {'index': 7, 'feedback': 'fora do intervalo'},
+            {'index': 2, 'feedback': ''}
+        ]))
+        mock_aws.return_value.bedrock = mock_bedrock
+        
+        result = FeedbackGenerator().generate_session_feedback(self.answers, 'phishing')
+        
+        self.assertIn('F0', result[0])
+        self.assertIn('Resposta incorreta', result[1])
+        self.assertIn('Excelente', result[2])
+    
+    @patch('modules.ai.get_aws_client')
+    def test_long_session_is_split(self, mock_aws):
+        """Testa chamadas por trecho, orçamento por item e aviso de resposta truncada"""
+        answers = [dict(self.answers[1], question=f'Q{i}') for i in range(20)]
+        
+        def invoke(modelId, body):
+            prompt = json.loads(body)['messages'][0]['content'][0]['text']
+            count = prompt.count('Questão:')
+            first = int(prompt.split('. Questão: Q')[1].split('\n')[0])
+            items = [{'index': i, 'feedback': f'F{first + i}'} for i in range(count)]
+            return bedrock_response(json.dumps(items), 'max_tokens' if count < 8 else 'end_turn')
+        
+        mock_bedrock = MagicMock()
+        mock_bedrock.invoke_model.side_effect = invoke
+        mock_aws.return_value.bedrock = mock_bedrock
+        
+        with self.assertLogs('modules.ai', 'WARNING') as logs:
+            result = FeedbackGenerator().generate_session_feedback(answers, 'phishing')
+        
+        self.assertEqual(mock_bedrock.invoke_model.call_count, 3)
+        budgets = [json.loads(c.kwargs['body'])['inferenceConfig']['max_new_tokens']
+                   for c in mock_bedrock.invoke_model.call_args_list]
+        self.assertEqual(budgets, [8 * 220 + 100, 8 * 220 + 100, 4 * 220 + 100])
+        self.assertTrue(all(feedback.endswith(f'\n\nF{i}') for i, feedback in enumerate(result)))
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('max_tokens', logs.output[0])
+    
+    @patch('modules.ai.get_aws_client')
+    def test_bedrock_error(self, mock_aws):
+        """Testa fallback completo quando Bedrock falha"""
+        mock_bedrock = MagicMock()
+        mock_bedrock.invoke_model.side_effect = Exception('ThrottlingException')
+        mock_aws.return_value.bedrock = mock_bedrock
+        
+        result = FeedbackGenerator().generate_session_feedback(self.answers, 'phishing')
+        
+        self.assertEqual(len(result), 3)
+        self.assertTrue(all(result))
+
+
+class TestAIQuestionGenerator(unittest.TestCase):
+    """Testes para o pipeline de geração de questões"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.valid = {
+            'question': 'Qual é um sinal de phishing?',
+            'options': ['Remetente conhecido', 'Urgência excessiva', 'Assinatura', 'Logo oficial'],
+            'correctAnswer': 1,
+            'explanation': 'Urgência é tática comum.',
+            'why_wrong': {'0': 'a', '2': 'b', '3': 'c'}
+        }
+    
+    def test_validate_question(self):
+        """Testa validação de esquema"""
+        self.assertIsNotNone(AIQuestionGenerator.validate_question(self.valid))
+        
+        wrong_keys = dict(self.valid, why_wrong={'0': 'a', '1': 'b', '3': 'c'})
+        self.assertIsNone(AIQuestionGenerator.validate_question(wrong_keys))
+        
+        three_options = dict(self.valid, options=['a', 'b', 'c'])
+        self.assertIsNone(AIQuestionGenerator.validate_question(three_options))
+        
+        bad_answer = dict(self.valid, correctAnswer=4)
+        self.assertIsNone(AIQuestionGenerator.validate_question(bad_answer))
+    
+    def test_shuffle_options_remaps_answer(self):
+        """Testa que o embaralhamento mantém a correta e as justificativas de cada alternativa"""
+        wrong_text = {self.valid['options'][int(k)]: v for k, v in self.valid['why_wrong'].items()}
+        positions = set()
+        for seed in range(20):
+            question = AIQuestionGenerator.validate_question(self.valid)
+            AIQuestionGenerator.shuffle_options(question, random.Random(seed))
+            
+            self.assertEqual(question['options'][question['correctAnswer']], 'Urgência excessiva')
+            self.assertEqual({question['options'][int(k)]: v for k, v in question['why_wrong'].items()},
+                             wrong_text)
+            self.assertIsNotNone(AIQuestionGenerator.validate_question(question))
+            positions.add(question['correctAnswer'])
+        self.assertEqual(positions, {0, 1, 2, 3})
+    
+    @patch('modules.ai.get_aws_client')
+    def test_generate_batch_dedupes(self, mock_aws):
+        """Testa geração concorrente com deduplicação e relatório"""
+        mock_bedrock = MagicMock()
+        mock_bedrock.invoke_model.side_effect = lambda **kwargs: bedrock_response(
+            'Resposta:\n' + json.dumps(self.valid)
+        )
+        mock_aws.return_value.bedrock = mock_bedrock
+        
+        accepted, report = AIQuestionGenerator().generate_batch(
+            ['phishing'], ['easy', 'medium'], per_combination=2, max_workers=2,
+            topics={'phishing': 'golpes por SMS'}
+        )
+        
+        self.assertEqual(report['requested'], 4)
+        self.assertEqual(len(accepted), 1)
+        self.assertEqual(report['duplicates'], 3)
+        self.assertEqual(accepted[0]['category'], 'phishing')
+        prompt = json.loads(mock_bedrock.invoke_model.call_args.kwargs['body'])
+        self.assertIn('Tópico: golpes por SMS',
+                      prompt['messages'][0]['content'][0]['text'])
+        
+        with patch('modules.ai.random.randrange', return_value=3):
+            AIQuestionGenerator().generate_question('phishing')
+        text = json.loads(mock_bedrock.invoke_model.call_args.kwargs['body'])['messages'][0]['content'][0]['text']
+        self.assertIn('"correctAnswer": 3', text)
+        self.assertIn('"2": "Por que opção C', text)
+        self.assertNotIn('"3": "Por que', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Testes para exportação analítica colunar
+"""
+import os
+import tempfile
+import time
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from config import DYNAMODB_TABLES
+from modules import analytics
+from modules.analytics import AnalyticsExporter
+from utils.fake_aws import seed_synthetic
+from tests import FakeAWSTestCase
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+
+@unittest.skipIf(pa is None, "pyarrow não instalado")
+class TestAnalyticsExporter(FakeAWSTestCase):
+    """Testes para a exportação particionada e incremental"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com dados sintéticos e diretório temporário"""
+        self.fake = self.use_fake_aws('modules.analytics')
+        seed_synthetic(self.fake, users=10, answers_per_user=20, questions_per_category=5, days=10)
+        
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output = tmp.name
+        self.exporter = AnalyticsExporter(self.output)
+        self.table = self.fake.dynamodb.Table(DYNAMODB_TABLES['progress'])
+    
+    def dataset(self, fmt='parquet'):
+        return ds.dataset(self.output, format='ipc' if fmt == 'arrow' else fmt,
+                          partitioning='hive', exclude_invalid_files=True).to_table()
+    
+    def test_partitioned_typed_export(self):
+        """Testa partições por data/categoria e colunas tipadas"""
+        result = self.exporter.export(segments=4)
+        table = self.dataset()
+        
+        self.assertEqual(result['rows'], 200)
+        self.assertEqual(table.num_rows, 200)
+        self.assertEqual(table.schema.field('correct').type, pa.bool_())
+        self.assertEqual(table.schema.field('time_spent').type, pa.float64())
+        self.assertTrue(pa.types.is_timestamp(table.schema.field('timestamp').type))
+        
+        partitions = {os.path.relpath(os.path.dirname(p), self.output) for p in result['files']}
+        self.assertTrue(all(p.startswith('date=') and '/category=' in p for p in partitions))
+        
+        items = self.table.scan()['Items']
+        self.assertEqual(result['watermark'], max(i['timestamp'] for i in items))
+        self.assertEqual(sum(table.column('correct').to_pylist()), sum(1 for i in items if i['correct']))
+    
+    def test_incremental_exports_only_new_answers(self):
+        """Testa que a segunda execução exporta apenas respostas após a marca d'água"""
+        first = self.exporter.export()
+        self.assertIsNone(first['since'])
+        
+        nothing = self.exporter.export()
+        self.assertEqual(nothing['rows'], 0)
+        self.assertEqual(nothing['watermark'], first['watermark'])
+        
+        newer = first['watermark'] + 60
+        self.table.put_item(Item={'userId': 'novo@example.com', 'timestamp': newer,
+                                  'questionId': 'q1', 'correct': True, 'category': 'phishing',
+                                  'time_spent': 12})
+        second = AnalyticsExporter(self.output).export(segments=2)
+        
+        self.assertEqual(second['since'], first['watermark'])
+        self.assertEqual(second['rows'], 1)
+        self.assertEqual(second['watermark'], newer)
+        self.assertEqual(self.dataset().num_rows, 201)
+    
+    def test_late_write_during_scan_is_exported_once(self):
+        """Testa resposta gravada com timestamp menor, num trecho já varrido"""
+        now = time.time()
+        answer = {'questionId': 'q1', 'correct': True, 'category': 'phishing', 'time_spent': 12}
+        self.table.put_item(Item=dict(answer, userId='ana@example.com',
+                                      timestamp=Decimal(str(round(now - 10, 6)))))
+        late = dict(answer, userId='bia@example.com', timestamp=Decimal(str(round(now - 20, 6))))
+        scan_pages = analytics.iter_pages
+        
+        def pages_then_late_write(operation, **kwargs):
+            yield from scan_pages(operation, **kwargs)
+            self.table.put_item(Item=late)  # depois que o segmento já foi lido
+        
+        exporter = AnalyticsExporter(self.output, clock=lambda: now)
+        with patch('modules.analytics.iter_pages', pages_then_late_write):
+            first = exporter.export(segments=1)
+        self.assertEqual(first['rows'], 201)
+        self.assertEqual(first['watermark'], Decimal(str(round(now - 300, 6))))
+        
+        second = exporter.export(segments=2)
+        self.assertEqual(second['rows'], 1)
+        self.assertEqual(exporter.export()['rows'], 0)
+        
+        table = self.dataset()
+        keys = set(zip(table.column('userId').to_pylist(), table.column('timestamp').to_pylist()))
+        self.assertEqual(table.num_rows, 202)
+        self.assertEqual(len(keys), 202)
+    
+    def test_arrow_format_and_failed_run_cleanup(self):
+        """Testa formato Arrow IPC e remoção de arquivos de uma execução com falha"""
+        result = self.exporter.export(fmt='arrow', segments=1)
+        self.assertEqual(self.dataset('arrow').num_rows, 200)
+        self.assertTrue(all(p.endswith('.arrow') for p in result['files']))
+        
+        close = analytics._PartitionWriter.close
+        
+        def close_then_fail(writer):
+            close(writer)  # arquivos já gravados precisam ser removidos
+            raise OSError('disco cheio')
+        
+        with patch.object(analytics._PartitionWriter, 'close', close_then_fail):
+            with self.assertRaises(OSError):
+                self.exporter.export(fmt='arrow', incremental=False, segments=2)
+        self.assertEqual(self.dataset('arrow').num_rows, 200)
+        self.assertEqual(self.exporter.read_watermark(), result['watermark'])
+        self.assertIsInstance(self.exporter.read_watermark(), Decimal)
+
+
+if __name__ == '__main__':
+    unittest.main()
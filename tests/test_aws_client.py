@@ -0,0 +1,92 @@
+"""
+Testes para o cliente AWS centralizado
+"""
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from config import TIMEOUTS
+from utils.aws_client import AWSClient
+from tests import FakeAWSTestCase
+
+class TestAWSClient(FakeAWSTestCase):
+    """Testes para criação sob demanda dos clientes"""
+    
+    def setUp(self):
+        """Reinicia o singleton para cada teste"""
+        self.reset_aws_client()
+        self.session = MagicMock()
+        patcher = patch('utils.aws_client.boto3.session.Session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_lazy_creation(self):
+        """Testa que nenhum cliente é criado antes do primeiro acesso"""
+        client = AWSClient()
+        self.session.client.assert_not_called()
+        self.session.resource.assert_not_called()
+        
+        client.s3
+        self.session.client.assert_called_once()
+        self.assertEqual(self.session.client.call_args[0][0], 's3')
+    
+    def test_concurrent_access_creates_once(self):
+        """Testa double-checked locking com várias threads"""
+        client = AWSClient()
+        threads = [threading.Thread(target=lambda: client.bedrock) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        self.assertEqual(self.session.client.call_count, 1)
+    
+    def test_resource_per_thread_with_pool(self):
+        """Testa que cada thread recebe seu resource e que ele é reaproveitado"""
+        self.session.resource.side_effect = lambda *args, **kwargs: MagicMock()
+        client = AWSClient()
+        main_resource = client.dynamodb
+        self.assertIs(client.dynamodb, main_resource)
+        
+        seen = []
+        worker = threading.Thread(target=lambda: seen.append(client.dynamodb))
+        worker.start()
+        worker.join()
+        self.assertIsNot(seen[0], main_resource)
+        
+        # A próxima thread reaproveita o resource devolvido ao pool
+        worker = threading.Thread(target=lambda: seen.append(client.dynamodb))
+        worker.start()
+        worker.join()
+        self.assertIs(seen[1], seen[0])
+        self.assertEqual(client.pool_stats()['resources_created'], 2)
+    
+    def test_client_timeouts_come_from_config(self):
+        """Testa timeouts por serviço e o padrão de config.py para serviços sem ajuste"""
+        self.assertEqual(AWSClient._client_config('bedrock-runtime').read_timeout,
+                         TIMEOUTS['bedrock_invoke'])
+        sts = AWSClient._client_config('sts')
+        self.assertEqual(sts.read_timeout, TIMEOUTS['aws_default'])
+        self.assertEqual(sts.connect_timeout, TIMEOUTS['aws_connect'])
+    
+    def test_is_healthy_does_not_create_clients(self):
+        """Testa que o health check não força a criação de clientes"""
+        client = AWSClient()
+        self.assertTrue(client.is_healthy())
+        self.session.client.assert_not_called()
+        self.session.resource.assert_not_called()
+        
+        self.session.get_credentials.return_value = None
+        self.assertFalse(client.is_healthy())
+    
+    def test_warm_up(self):
+        """Testa pré-aquecimento de clientes"""
+        client = AWSClient()
+        client.warm_up(['bedrock', 'cognito'])
+        self.assertEqual(self.session.client.call_count, 2)
+        
+        # Clientes já criados não disparam nova thread
+        self.assertIsNone(client.warm_up(['bedrock'], background=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Testes para contabilidade de capacidade DynamoDB
+"""
+import unittest
+from modules.progress import ProgressManager
+from utils.capacity import (CapacityThrottle, MeteredTable, get_accountant, metered_page,
+                            set_current_user)
+from utils.metrics import get_metrics
+from utils.storage import DynamoDBBackend
+from tests import FakeAWSTestCase
+
+
+class TestCapacityAccounting(FakeAWSTestCase):
+    """Testes para atribuição de RCU/WCU por página, usuário e operação"""
+    
+    def setUp(self):
+        """Usa a AWS falsa e zera os contadores"""
+        self.use_fake_aws('modules.progress')
+        
+        self.accountant = get_accountant()
+        self.accountant.reset()
+        self.addCleanup(self.accountant.reset)
+        get_metrics().reset()
+        set_current_user('aluno@test.com')
+        self.addCleanup(set_current_user, None)
+    
+    def test_attributes_to_page_user_and_operation(self):
+        """Testa atribuição às páginas render_* e às operações dos gerenciadores"""
+        manager = ProgressManager()
+        
+        @metered_page
+        def render_question():
+            manager.save_answer('aluno@test.com', 'q1', True, 'phishing', 10)
+        
+        @metered_page
+        def render_student_dashboard():
+            return manager.get_user_stats('aluno@test.com')
+        
+        render_question()
+        render_student_dashboard()
+        
+        by_page = self.accountant.totals('page')
+        self.assertEqual(by_page['render_question']['write_units'], 1.0)
+        self.assertEqual(by_page['render_student_dashboard']['read_units'], 0.5)
+        
+        by_operation = self.accountant.totals('operation')
+        self.assertIn('ProgressManager.save_answer', by_operation)
+        self.assertIn('ProgressManager.get_user_progress', by_operation)
+        
+        usage = self.accountant.session_usage('aluno@test.com')
+        self.assertEqual(usage['read_units'], 0.5)
+        self.assertEqual(usage['write_units'], 1.0)
+        self.assertEqual(get_metrics().snapshot()['ProgressManager.save_answer']['write_units'], 1.0)
+    
+    def test_batch_writer_estimates_units(self):
+        """Testa estimativa de WCU no batch_writer"""
+        table = DynamoDBBackend().table('badges')
+        self.assertIsInstance(table, MeteredTable)
+        
+        with table.batch_writer() as batch:
+            for i in range(3):
+                batch.put_item(Item={'userId': 'u1', 'badgeId': str(i)})
+        
+        self.assertEqual(self.accountant.totals('table')['badges']['write_units'], 3)
+
+
+
+class TestCapacityThrottle(unittest.TestCase):
+    """Testes para o limitador de RCU/s"""
+    
+    def setUp(self):
+        """Relógio simulado: dormir avança o tempo"""
+        self.now = 0.0
+        self.throttle = CapacityThrottle(rate=10, clock=lambda: self.now, sleep=self.advance)
+    
+    def advance(self, seconds):
+        self.now += seconds
+    
+    def test_rate_limit_and_settlement(self):
+        """Testa espera pelo saldo e acerto pelo consumo real"""
+        for _ in range(10):
+            self.throttle.acquire(1)
+        self.assertEqual(self.now, 0.0)
+        
+        self.throttle.acquire(1)
+        self.assertAlmostEqual(self.now, 0.1)
+        
+        # Consumo real acima do reservado deixa o saldo negativo
+        self.throttle.settle(reserved=1, consumed=21)
+        self.throttle.acquire(1)
+        self.assertAlmostEqual(self.now, 2.2)
+    
+    def test_wrap_uses_consumed_capacity(self):
+        """Testa que a operação embrulhada acerta pelo ConsumedCapacity"""
+        query = self.throttle.wrap(lambda **kwargs: {
+            'Items': [], 'ConsumedCapacity': {'CapacityUnits': 4.0}, 'kwargs': kwargs
+        })
+        response = query(KeyConditionExpression='x')
+        
+        self.assertEqual(response['kwargs']['ReturnConsumedCapacity'], 'TOTAL')
+        self.assertAlmostEqual(self.throttle.tokens, 6.0)
+        self.assertEqual(self.throttle._estimate, 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Testes para a renderização de certificados em PDF
+"""
+import base64
+import re
+import unittest
+import zlib
+from decimal import Decimal
+from unittest.mock import patch
+from modules import certificate_pdf
+from modules.certificate_pdf import CertificateRenderer, render_certificate
+
+
+def certificate(i=0, **overrides):
+    data = {
+        'certificateId': f'aluno{i}@example.com_phishing_1700000000',
+        'userId': f'aluno{i}@example.com',
+        'userName': f'Aluno Número {i}',
+        'category': 'phishing',
+        'accuracy': Decimal('87.5'),
+        'total_questions': 16,
+        'issued_at': Decimal('1699963200'),  # 14/11/2023 12:00 UTC
+        'valid_until': Decimal('1731536000')
+    }
+    data.update(overrides)
+    return data
+
+
+def page_text(pdf: bytes) -> str:
+    """Conteúdo dos streams do PDF (ASCII85 + Flate, como o reportlab grava)"""
+    streams = re.findall(rb'stream\r?\n(.*?)endstream', pdf, re.S)
+    return b''.join(zlib.decompress(base64.a85decode(s.strip()[:-2])) for s in streams).decode('latin-1')
+
+
+class TestRenderCertificate(unittest.TestCase):
+    """Testes para o PDF gerado"""
+    
+    def test_real_deterministic_pdf(self):
+        """Testa PDF válido, com os dados do certificado e bytes estáveis"""
+        pdf = render_certificate(certificate())
+        
+        self.assertTrue(pdf.startswith(b'%PDF-'))
+        self.assertIn(b'%%EOF', pdf[-32:])
+        self.assertEqual(pdf, render_certificate(certificate()))
+        self.assertNotEqual(pdf, render_certificate(certificate(accuracy=Decimal('90'))))
+        
+        text = page_text(pdf)
+        self.assertIn('Aluno N', text)
+        self.assertIn('87.5%', text)
+        self.assertIn('14/11/2023', text)
+    
+    def test_template_built_once_per_process(self):
+        """Testa que fontes/imagens/geometria são montadas uma única vez"""
+        with patch.object(certificate_pdf, '_template_instance', None), \
+                patch.object(certificate_pdf, '_Template', wraps=certificate_pdf._Template) as template:
+            for i in range(5):
+                render_certificate(certificate(i, userName='Emoji 🎓 ignorado'))
+        self.assertEqual(template.call_count, 1)
+
+
+class TestCertificateRenderer(unittest.TestCase):
+    """Testes para o pool de processos"""
+    
+    def test_process_pool_batch_matches_inline(self):
+        """Testa lote em processos separados, na ordem de entrada e com falhas isoladas"""
+        renderer = CertificateRenderer(workers=2)
+        self.addCleanup(renderer.shutdown)
+        batch = [certificate(i) for i in range(12)]
+        batch[5] = certificate(5, accuracy='não numérico')
+        
+        results = renderer.render_many(batch)
+        
+        self.assertEqual(len(results), 12)
+        self.assertIsInstance(results[5], Exception)
+        for i in (0, 7, 11):
+            self.assertEqual(results[i], render_certificate(batch[i]))
+        self.assertEqual(renderer.render(batch[3]), results[3])
+    
+    def test_inline_without_workers(self):
+        """Testa renderização na thread atual com workers=0"""
+        renderer = CertificateRenderer(workers=0)
+        self.assertEqual(renderer.render(certificate()), render_certificate(certificate()))
+        self.assertIsNone(renderer._executor)
+        with self.assertRaises(ValueError):
+            renderer.submit(certificate(accuracy='x')).result()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Testes para exportação em streaming
+"""
+import csv
+import io
+import json
+import unittest
+from decimal import Decimal
+from utils.export import IterStream, dumps, iter_csv, iter_jsonl, upload_multipart
+from utils.fake_aws import FakeS3
+
+MB = 1024 * 1024
+
+
+class TestEncoders(unittest.TestCase):
+    """Testes para os geradores CSV/JSONL"""
+    
+    def test_jsonl_decimal_and_chunks(self):
+        """Testa serialização de Decimal e blocos limitados"""
+        rows = [{'n': Decimal('3'), 'x': Decimal('1.5'), 'tags': {'b', 'a'}} for _ in range(100)]
+        chunks = list(iter_jsonl(rows, chunk_size=256))
+        
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(c) < 256 + 64 for c in chunks))
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(json.loads(lines[0]), {'n': 3, 'x': 1.5, 'tags': ['a', 'b']})
+        self.assertEqual(dumps({'v': Decimal('2')}), '{"v":2}')
+    
+    def test_csv_header_once(self):
+        """Testa CSV com cabeçalho único mesmo com vários blocos"""
+        rows = ({'a': i, 'b': 'ç' * 10, 'extra': 1} for i in range(500))
+        chunks = list(iter_csv(rows, ['a', 'b'], chunk_size=1024))
+        
+        self.assertGreater(len(chunks), 1)
+        parsed = list(csv.DictReader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual(len(parsed), 500)
+        self.assertEqual(parsed[499], {'a': '499', 'b': 'ç' * 10})
+    
+    def test_iter_stream(self):
+        """Testa leitura de arquivo sobre o iterador de blocos"""
+        stream = io.BufferedReader(IterStream([b'abc', b'', b'defgh']))
+        self.assertEqual(stream.read(4), b'abcd')
+        self.assertEqual(stream.read(), b'efgh')
+
+
+class TestUploadMultipart(unittest.TestCase):
+    """Testes para o upload multipart"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.s3 = FakeS3()
+    
+    def chunks(self, total, size=MB // 4):
+        for i in range(total // size):
+            yield bytes([i % 256]) * size
+    
+    def test_small_export_single_put(self):
+        """Testa que exportações pequenas usam put_object"""
+        result = upload_multipart(self.s3, 'bucket', 'small.csv', [b'a,b\n', b'1,2\n'],
+                                  content_type='text/csv')
+        
+        self.assertEqual(result['parts'], 1)
+        obj = self.s3.get_object(Bucket='bucket', Key='small.csv')
+        self.assertEqual(obj['Body'].read(), b'a,b\n1,2\n')
+        self.assertEqual(obj['ContentType'], 'text/csv')
+    
+    def test_parts_respect_minimum(self):
+        """Testa divisão em partes de tamanho fixo e montagem do objeto"""
+        expected = b''.join(self.chunks(12 * MB))
+        result = upload_multipart(self.s3, 'bucket', 'big.jsonl', self.chunks(12 * MB),
+                                  part_size=MB)
+        
+        self.assertEqual(result['parts'], 3)  # mínimo de 5 MB por parte
+        self.assertEqual(result['size'], 12 * MB)
+        self.assertEqual(self.s3.get_object(Bucket='bucket', Key='big.jsonl')['Body'].read(), expected)
+    
+    def test_abort_on_error(self):
+        """Testa que o upload é abortado quando a origem falha"""
+        def failing():
+            yield from self.chunks(6 * MB)
+            raise RuntimeError('origem falhou')
+        
+        with self.assertRaises(RuntimeError):
+            upload_multipart(self.s3, 'bucket', 'broken', failing(), part_size=5 * MB)
+        
+        self.assertEqual(self.s3._uploads, {})
+        self.assertNotIn(('bucket', 'broken'), self.s3.objects)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Testes para a camada AWS falsa em memória
+"""
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from config import DYNAMODB_TABLES
+from utils.aws_client import AWSClient
+from utils.fake_aws import FakeAWS, seed_synthetic, item_size
+from utils.storage import DynamoDBBackend, iter_pages
+from tests import FakeAWSTestCase
+
+
+class TestFakeDynamoDB(unittest.TestCase):
+    """Testes para tabelas DynamoDB falsas"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.fake = FakeAWS()
+        self.table = self.fake.dynamodb.Table(DYNAMODB_TABLES['progress'])
+    
+    def test_query_pages_at_one_megabyte(self):
+        """Testa paginação por tamanho e capacidade consumida"""
+        padding = 'x' * 10000
+        for i in range(250):
+            self.table.put_item(Item={'userId': 'u1', 'timestamp': i, 'padding': padding})
+        
+        pages = list(iter_pages(self.table.query, KeyConditionExpression=Key('userId').eq('u1'),
+                                ReturnConsumedCapacity='TOTAL'))
+        
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(p['Count'] for p in pages), 250)
+        self.assertLessEqual(sum(item_size(i) for i in pages[0]['Items']), 1024 * 1024 + 10100)
+        self.assertGreater(pages[0]['ConsumedCapacity']['CapacityUnits'], 100)
+    
+    def test_limit_counts_before_filter(self):
+        """Testa que Limit limita itens lidos, não itens retornados"""
+        for i in range(10):
+            self.table.put_item(Item={'userId': 'u1', 'timestamp': i, 'correct': i % 2 == 0})
+        
+        response = self.table.query(
+            KeyConditionExpression=Key('userId').eq('u1') & Key('timestamp').gte(2),
+            FilterExpression='correct = :c',
+            ExpressionAttributeValues={':c': True},
+            Limit=4
+        )
+        
+        self.assertEqual(response['ScannedCount'], 4)
+        self.assertEqual([i['timestamp'] for i in response['Items']], [2, 4])
+        self.assertEqual(response['LastEvaluatedKey'], {'userId': 'u1', 'timestamp': Decimal(5)})
+    
+    def test_conditional_put_and_write_units(self):
+        """Testa escrita condicional e WCU por 1 KB"""
+        item = {'userId': 'u1', 'timestamp': 1, 'blob': 'y' * 3000}
+        response = self.table.put_item(Item=item, ConditionExpression='attribute_not_exists(userId)',
+                                       ReturnConsumedCapacity='TOTAL')
+        self.assertEqual(response['ConsumedCapacity']['CapacityUnits'], 3.0)
+        
+        with self.assertRaises(ClientError) as ctx:
+            self.table.put_item(Item=item, ConditionExpression='attribute_not_exists(userId)')
+        self.assertEqual(ctx.exception.response['Error']['Code'], 'ConditionalCheckFailedException')
+    
+    def test_provisioned_throttling(self):
+        """Testa throttling quando a capacidade provisionada se esgota"""
+        fake = FakeAWS(write_capacity=1, clock=lambda: 0.0)
+        table = fake.dynamodb.Table(DYNAMODB_TABLES['badges'])
+        for i in range(300):
+            table.put_item(Item={'userId': 'u1', 'badgeId': str(i)})
+        
+        with self.assertRaises(ClientError) as ctx:
+            table.put_item(Item={'userId': 'u1', 'badgeId': 'extra'})
+        self.assertEqual(ctx.exception.response['Error']['Code'],
+                         'ProvisionedThroughputExceededException')
+    
+    def test_seed_synthetic(self):
+        """Testa carga sintética determinística"""
+        summary = seed_synthetic(self.fake, users=5, answers_per_user=10, questions_per_category=3)
+        report = self.fake.capacity_report()
+        
+        self.assertEqual(summary['answers'], 50)
+        self.assertEqual(report[DYNAMODB_TABLES['progress']]['items'], 50)
+        self.assertEqual(report[DYNAMODB_TABLES['questions']]['items'], summary['questions'])
+
+
+class TestFakeServices(unittest.TestCase):
+    """Testes para Bedrock, S3 e CloudWatch Logs falsos"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.fake = FakeAWS(bedrock_responses=['resposta'])
+    
+    def _invoke(self):
+        body = {'messages': [{'role': 'user', 'content': [{'text': 'prompt'}]}]}
+        return self.fake.bedrock.invoke_model(modelId='m', body=json.dumps(body))
+    
+    def test_bedrock_canned_and_throttled(self):
+        """Testa resposta configurada e throttling"""
+        result = json.loads(self._invoke()['body'].read())
+        self.assertEqual(result['output']['message']['content'][0]['text'], 'resposta')
+        
+        self.fake.bedrock.throttle_rate = 1.0
+        with self.assertRaises(self.fake.bedrock.exceptions.ThrottlingException):
+            self._invoke()
+        self.assertEqual(self.fake.bedrock.throttled, 1)
+    
+    def test_s3_multipart(self):
+        """Testa upload multipart e head_object"""
+        s3 = self.fake.s3
+        upload = s3.create_multipart_upload(Bucket='b', Key='k', Metadata={'sha256': 'abc'})
+        parts = [
+            {'PartNumber': n, 'ETag': s3.upload_part(Bucket='b', Key='k', UploadId=upload['UploadId'],
+                                                     PartNumber=n, Body=data)['ETag']}
+            for n, data in ((1, b'o' * s3.MIN_PART_SIZE), (2, b'la mundo'))
+        ]
+        s3.complete_multipart_upload(Bucket='b', Key='k', UploadId=upload['UploadId'],
+                                     MultipartUpload={'Parts': parts})
+        
+        self.assertEqual(s3.get_object(Bucket='b', Key='k')['Body'].read()[-9:], b'ola mundo')
+        
+        small = s3.create_multipart_upload(Bucket='b', Key='p')
+        parts = [
+            {'PartNumber': n, 'ETag': s3.upload_part(Bucket='b', Key='p', UploadId=small['UploadId'],
+                                                     PartNumber=n, Body=b'x')['ETag']}
+            for n in (1, 2)
+        ]
+        with self.assertRaises(s3.exceptions.EntityTooSmall):
+            s3.complete_multipart_upload(Bucket='b', Key='p', UploadId=small['UploadId'],
+                                         MultipartUpload={'Parts': parts})
+        self.assertEqual(s3.head_object(Bucket='b', Key='k')['Metadata'], {'sha256': 'abc'})
+        with self.assertRaises(s3.exceptions.NoSuchKey):
+            s3.head_object(Bucket='b', Key='outro')
+    
+    def test_logs_require_chronological_order(self):
+        """Testa validação de ordem dos eventos"""
+        logs = self.fake.cloudwatch
+        logs.create_log_group(logGroupName='/g')
+        logs.create_log_stream(logGroupName='/g', logStreamName='s')
+        with self.assertRaises(logs.exceptions.ResourceAlreadyExistsException):
+            logs.create_log_group(logGroupName='/g')
+        
+        with self.assertRaises(logs.exceptions.InvalidParameterException):
+            logs.put_log_events(logGroupName='/g', logStreamName='s', logEvents=[
+                {'timestamp': 2, 'message': 'b'}, {'timestamp': 1, 'message': 'a'}
+            ])
+
+
+class TestAWSClientWithFake(FakeAWSTestCase):
+    """Testes para a injeção da camada falsa no AWSClient"""
+    
+    def setUp(self):
+        """Reinicia o singleton para cada teste"""
+        self.reset_aws_client()
+    
+    @patch('utils.aws_client.boto3.session.Session')
+    def test_use_fake_routes_services(self, mock_session):
+        """Testa que clientes e tabelas vêm da camada falsa"""
+        fake = FakeAWS()
+        client = AWSClient()
+        client.use_fake(fake)
+        
+        table = DynamoDBBackend().table('badges')
+        table.put_item(Item={'userId': 'u1', 'badgeId': 'first_steps'})
+        
+        self.assertIs(client.s3, fake.s3)
+        self.assertTrue(client.is_healthy())
+        self.assertEqual(fake.capacity_report()[DYNAMODB_TABLES['badges']]['items'], 1)
+        mock_session.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,329 @@
+"""
+Testes para o motor de regras de badges
+"""
+import hashlib
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from config import DYNAMODB_TABLES
+from decimal import Decimal
+from modules import gamification as gamification_module
+from modules.certificate_pdf import CertificateRenderer
+from modules.gamification import (CertificateManager, GamificationManager, badge_progress,
+                                  batch_certificate_id, evaluate_rules)
+from modules.progress import ProgressManager
+from tests import FakeAWSTestCase
+
+
+class TestBadgeRules(unittest.TestCase):
+    """Testes para as regras puras"""
+    
+    def test_rules_against_aggregates(self):
+        """Testa regras de acurácia, categorias, tempo e ranking"""
+        stats = {'total_answers': 12, 'correct_answers': 12, 'streak': 6,
+                 'categories': {'phishing', 'passwords', 'social_engineering', 'malware'}}
+        eligible = evaluate_rules(stats, {'correct': True, 'time_spent': 12, 'rank': 2})
+        self.assertEqual(set(eligible), {'first_correct', 'streak_5', 'accuracy_80', 'accuracy_100',
+                                         'allrounder', 'speedster', 'champion'})
+        
+        stats['badges'] = set(eligible)
+        self.assertEqual(evaluate_rules(stats, {'correct': False, 'time_spent': 5}), [])
+        
+        few = {'total_answers': 3, 'correct_answers': 3}
+        self.assertEqual(evaluate_rules(few, {'correct': True, 'time_spent': 0}), ['first_correct'])
+        self.assertEqual(badge_progress(few)['persistent'], 0.1)
+
+
+class TestBadgeEngine(FakeAWSTestCase):
+    """Testes para a avaliação a cada resposta"""
+    
+    def setUp(self):
+        """Usa a AWS falsa"""
+        self.fake = self.use_fake_aws('modules.gamification', 'modules.progress', 'modules.questions')
+        
+        self.gamification = GamificationManager()
+        self.progress = ProgressManager(gamification=self.gamification)
+        self.user = 'aluno@example.com'
+    
+    def answer(self, correct=True, category='phishing', time_spent=45):
+        self.assertTrue(self.progress.save_answer(self.user, 'q1', correct, category, time_spent))
+    
+    def badges(self):
+        return sorted(b['badgeId'] for b in self.gamification.get_user_badges(self.user))
+    
+    def test_answers_unlock_badges_without_reading_history(self):
+        """Testa desbloqueio automático, reset da sequência e ausência de consultas ao histórico"""
+        self.answer(correct=False)
+        self.assertEqual(self.badges(), [])
+        
+        for _ in range(5):
+            self.answer()
+        self.assertEqual(self.badges(), ['first_correct', 'streak_5'])
+        
+        self.answer(correct=False)
+        for _ in range(4):
+            self.answer()
+        aggregates = self.gamification.get_user_aggregates(self.user)
+        self.assertEqual(aggregates['streak'], 4)
+        self.assertEqual(aggregates['total_answers'], 11)
+        self.assertEqual(aggregates['correct_answers'], 9)
+        self.assertEqual(aggregates['badges'], {'first_correct', 'streak_5', 'accuracy_80'})
+        
+        calls = self.fake.capacity_report()[DYNAMODB_TABLES['progress']]['calls']
+        self.assertEqual(calls, {'PutItem': 11})
+    
+    def test_allrounder_speedster_and_champion(self):
+        """Testa regras de categorias, tempo e o gancho de ranking"""
+        rank_index = MagicMock()
+        rank_index.rank_of.return_value = 3
+        self.gamification.rank_index = rank_index
+        
+        for category in ('phishing', 'passwords', 'social_engineering'):
+            self.answer(correct=False, category=category)
+        self.assertEqual(self.badges(), ['champion'])
+        
+        self.answer(category='malware', time_spent=12)
+        self.assertEqual(self.badges(), ['allrounder', 'champion', 'first_correct', 'speedster'])
+        self.assertEqual(rank_index.update.call_count, 6)  # 4 respostas + 2 com pontos de badges
+        self.assertEqual(rank_index.rank_of.call_count, 1)  # champion já registrado
+    
+    def test_concurrent_answers_unlock_once(self):
+        """Testa que respostas simultâneas desbloqueiam cada badge uma única vez"""
+        unlocked = []
+        lock = threading.Lock()
+        
+        def worker():
+            new = self.gamification.record_answer(self.user, 'phishing', True, 40)
+            with lock:
+                unlocked.extend(new)
+        
+        threads = [threading.Thread(target=worker) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(sorted(unlocked), sorted(set(unlocked)))
+        self.assertEqual(sorted(unlocked), self.badges())
+        self.assertIn('streak_10', unlocked)
+        self.assertFalse(self.gamification.unlock_badge(self.user, 'streak_10'))
+    
+    def test_rebuild_user_stats_from_history(self):
+        """Testa que a carga a partir da progress e da badges reproduz os agregados"""
+        for correct, category in [(False, 'phishing'), (True, 'phishing'), (True, 'malware'),
+                                  (True, 'malware'), (False, 'passwords'), (True, 'passwords')]:
+            self.answer(correct=correct, category=category, time_spent=12)
+        self.progress.save_answer('outro@example.com', 'q2', True, 'malware', 60)
+        stats_table = self.fake.dynamodb.Table(DYNAMODB_TABLES['user_stats'])
+        expected = {i['userId']: i for i in stats_table.scan()['Items']}
+        for user_id in expected:
+            stats_table.delete_item(Key={'userId': user_id})
+        
+        result = self.gamification.rebuild_user_stats()
+        
+        self.assertEqual(result, {'users': 2, 'answers': 7})
+        for user_id, before in expected.items():
+            after = self.gamification.get_user_aggregates(user_id)
+            before.pop('updated_at'), after.pop('updated_at')
+            self.assertEqual(after, before)
+        self.assertEqual(expected[self.user]['streak'], 1)
+
+
+
+class TestCertificateVerification(FakeAWSTestCase):
+    """Testes para a verificação por índice com cache"""
+    
+    def setUp(self):
+        """Usa a AWS falsa e um cache de verificação vazio"""
+        self.fake = self.use_fake_aws('modules.gamification')
+        
+        patcher = patch('modules.gamification.get_certificate_renderer',
+                        lambda: CertificateRenderer(workers=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        gamification_module._verified.invalidate()
+        self.addCleanup(gamification_module._verified.invalidate)
+        
+        self.manager = CertificateManager()
+        self.table = self.fake.dynamodb.Table(DYNAMODB_TABLES['certificates'])
+    
+    def calls(self):
+        return self.fake.capacity_report()[DYNAMODB_TABLES['certificates']]['calls']
+    
+    def test_single_verification_is_cached(self):
+        """Testa leitura pelo índice, cache positivo e negativo"""
+        issued = self.manager.generate_certificate('ana@example.com', 'Ana', 'phishing', 90.0, 10)
+        certificate_id = issued['certificate_id']
+        pdf = self.fake.s3.get_object(Bucket='cyberguard-certificates',
+                                      Key=f'certificates/ana@example.com/{certificate_id}.pdf')
+        self.assertTrue(pdf['Body'].read().startswith(b'%PDF-'))
+        
+        for _ in range(3):
+            self.assertEqual(self.manager.verify_certificate(certificate_id)['userName'], 'Ana')
+            self.assertIsNone(self.manager.verify_certificate('inexistente'))
+        self.assertEqual(self.calls().get('Query'), 2)
+        self.assertNotIn('Scan', self.calls())
+        
+        with patch.object(gamification_module._verified, 'negative_ttl', -1):
+            self.assertIsNone(self.manager.verify_certificate('inexistente'))
+        self.assertEqual(self.calls().get('Query'), 3)
+    
+    def test_bulk_verification(self):
+        """Testa status por ID, ordem de entrada e consultas apenas dos IDs fora do cache"""
+        self.table.put_item(Item={'userId': 'ana', 'certificateId': 'c-valid', 'userName': 'Ana',
+                                  'valid_until': Decimal('9999999999')})
+        self.table.put_item(Item={'userId': 'bia', 'certificateId': 'c-old', 'userName': 'Bia',
+                                  'valid_until': Decimal('1000')})
+        self.manager.verify_certificate('c-valid')
+        
+        results = self.manager.verify_many(['c-old', ' c-valid', 'nope', 'c-old', ''], max_workers=3)
+        
+        self.assertEqual(list(results), ['c-old', 'c-valid', 'nope'])
+        self.assertEqual([r['status'] for r in results.values()], ['expired', 'valid', 'not_found'])
+        self.assertEqual(results['c-old']['certificate']['userName'], 'Bia')
+        self.assertEqual(self.calls().get('Query'), 3)
+        
+        with patch.dict(gamification_module.CERTIFICATE_VERIFICATION, {'max_batch': 2}):
+            with self.assertRaises(ValueError):
+                self.manager.verify_many(['a', 'b', 'c'])
+
+
+
+class TestCertificateDownloads(FakeAWSTestCase):
+    """Testes para PDFs gerados uma vez e baixados por URL pré-assinada"""
+    
+    def setUp(self):
+        """Usa a AWS falsa e renderização na thread atual"""
+        self.fake = self.use_fake_aws('modules.gamification')
+        
+        self.renderer = CertificateRenderer(workers=0)
+        patcher = patch('modules.gamification.get_certificate_renderer', lambda: self.renderer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.manager = CertificateManager()
+        self.table = self.fake.dynamodb.Table(DYNAMODB_TABLES['certificates'])
+    
+    def test_issued_once_with_hash_metadata(self):
+        """Testa PDF no S3 com sha256 e URLs reaproveitadas na sessão"""
+        issued = self.manager.generate_certificate('ana@example.com', 'Ana', 'malware', 95.0, 12)
+        record = self.manager.get_user_certificates('ana@example.com')[0]
+        
+        stored = self.fake.s3.get_object(Bucket='cyberguard-certificates', Key=record['s3_key'])
+        body = stored['Body'].read()
+        self.assertEqual(record['certificateId'], issued['certificate_id'])
+        self.assertEqual(stored['Metadata']['sha256'], hashlib.sha256(body).hexdigest())
+        self.assertEqual(record['sha256'], stored['Metadata']['sha256'])
+        self.assertEqual(record['template_version'], stored['Metadata']['template-version'])
+        
+        session = {}
+        with patch.object(self.renderer, 'render', wraps=self.renderer.render) as render, \
+                patch.object(self.fake.s3, 'generate_presigned_url',
+                             wraps=self.fake.s3.generate_presigned_url) as presign:
+            first = self.manager.get_download_url(record, cache=session)
+            self.assertEqual(self.manager.get_download_url(record, cache=session), first)
+            
+            session[record['certificateId']] = (first, time.time() + 10)  # perto de expirar
+            self.manager.get_download_url(record, cache=session)
+        
+        self.assertIn(record['s3_key'], first)
+        self.assertEqual(presign.call_count, 2)
+        render.assert_not_called()
+    
+    def test_regenerated_only_when_template_changes(self):
+        """Testa regeneração de certificados antigos e de versões anteriores do template"""
+        self.table.put_item(Item={'userId': 'bia', 'certificateId': 'legado', 'userName': 'Bia',
+                                  'category': 'phishing', 'accuracy': Decimal('81'),
+                                  'total_questions': 8, 'issued_at': Decimal('1700000000'),
+                                  'valid_until': Decimal('1731536000')})
+        
+        with patch.object(self.renderer, 'render', wraps=self.renderer.render) as render:
+            legacy = self.manager.get_user_certificates('bia')[0]
+            self.assertIsNotNone(self.manager.get_download_url(legacy))
+            updated = self.manager.get_user_certificates('bia')[0]
+            self.manager.get_download_url(updated)
+            self.assertEqual(render.call_count, 1)
+            
+            with patch('modules.gamification.TEMPLATE_VERSION', 'novo'):
+                self.manager.get_download_url(updated)
+            self.assertEqual(render.call_count, 2)
+        
+        self.assertEqual(self.manager.get_user_certificates('bia')[0]['template_version'], 'novo')
+        self.assertEqual(self.fake.s3.head_object(Bucket='cyberguard-certificates',
+                                                  Key=updated['s3_key'])['Metadata']['template-version'], 'novo')
+
+
+class TestCertificateBatch(FakeAWSTestCase):
+    """Testes para a emissão de certificados de uma turma"""
+    
+    def setUp(self):
+        """Usa a AWS falsa e renderização na thread atual"""
+        self.fake = self.use_fake_aws('modules.gamification')
+        
+        self.renderer = CertificateRenderer(workers=0)
+        patcher = patch('modules.gamification.get_certificate_renderer', lambda: self.renderer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.manager = CertificateManager()
+        self.candidates = [
+            {'user_id': f'aluno{i}@example.com', 'category': 'phishing',
+             'accuracy': 85.0 + i, 'total_questions': 10}
+            for i in range(5)
+        ] + [{'user_id': 'fraco@example.com', 'category': 'phishing', 'accuracy': 50.0,
+              'total_questions': 10}]
+    
+    def test_issue_is_idempotent(self):
+        """Testa registros, PDFs no S3, inelegíveis e reexecução sem duplicar"""
+        with patch.dict(gamification_module.CERTIFICATE_BATCH, {'chunk_size': 2}):
+            batch = self.manager.issue_batch(self.candidates + self.candidates[:1],
+                                             period='2025-Q4', max_workers=3)
+        
+        self.assertEqual(batch['counts'], {'issued': 5, 'ineligible': 1, 'duplicate': 1})
+        self.assertEqual([r['user_id'] for r in batch['results'][:6]],
+                         [c['user_id'] for c in self.candidates])
+        certificate_id = batch_certificate_id('aluno3@example.com', 'phishing', '2025-Q4')
+        record = self.manager.verify_certificate(certificate_id)
+        self.assertEqual(record['userName'], 'aluno3@example.com')
+        body = self.fake.s3.get_object(Bucket='cyberguard-certificates',
+                                       Key=record['s3_key'])['Body'].read()
+        self.assertEqual(hashlib.sha256(body).hexdigest(), record['sha256'])
+        
+        with patch.object(self.renderer, 'render_many', wraps=self.renderer.render_many) as render:
+            again = self.manager.issue_batch(self.candidates, period='2025-Q4')
+        self.assertEqual(again['counts'], {'exists': 5, 'ineligible': 1})
+        render.assert_not_called()
+        self.assertEqual(len(self.manager.get_user_certificates('aluno0@example.com')), 1)
+    
+    def test_failures_are_reported_per_user(self):
+        """Testa que falhas de renderização ficam no resultado do usuário e não geram registro"""
+        failed = RuntimeError('fonte ausente')
+        with patch.object(self.renderer, 'render_many',
+                          side_effect=lambda records: [failed] + [b'%PDF-ok'] * (len(records) - 1)):
+            batch = self.manager.issue_batch(self.candidates, period='2025-Q4')
+        
+        self.assertEqual(batch['counts'], {'error': 1, 'issued': 4, 'ineligible': 1})
+        self.assertIn('fonte ausente', batch['results'][0]['error'])
+        self.assertEqual(self.manager.get_user_certificates('aluno0@example.com'), [])
+        
+        retry = self.manager.issue_batch(self.candidates, period='2025-Q4')
+        self.assertEqual(retry['counts'], {'issued': 1, 'exists': 4, 'ineligible': 1})
+    
+    def test_access_denied_is_logged_once(self):
+        """Testa que o mesmo erro em todo o lote gera uma única linha de log com o motivo"""
+        denied = ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}}, 'PutObject')
+        with patch.dict(gamification_module.CERTIFICATE_BATCH, {'chunk_size': 2}), \
+                patch.object(self.manager, '_store_pdf', side_effect=denied), \
+                self.assertLogs('modules.gamification', 'ERROR') as logs:
+            batch = self.manager.issue_batch(self.candidates, period='2025-Q4')
+        
+        self.assertEqual(batch['counts'], {'error': 5, 'ineligible': 1})
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('5x Upload', logs.output[0])
+        self.assertIn('AccessDenied', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
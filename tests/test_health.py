@@ -0,0 +1,108 @@
+"""
+Testes para sondas de saúde
+"""
+import threading
+import unittest
+from utils.health import HealthMonitor, default_probes, sparkline
+from tests import FakeAWSTestCase
+
+
+class TestHealthMonitor(unittest.TestCase):
+    """Testes para o monitor de saúde"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.now = [1000.0]
+        self.calls = {'ok': 0, 'flaky': 0}
+        
+        def ok():
+            self.calls['ok'] += 1
+        
+        def flaky():
+            self.calls['flaky'] += 1
+            if self.calls['flaky'] % 2 == 0:
+                raise RuntimeError('timeout')
+        
+        self.monitor = HealthMonitor(
+            probes={'ok': (ok, 30), 'flaky': (flaky, 10)},
+            window=4,
+            clock=lambda: self.now[0]
+        )
+    
+    def test_runs_only_due_probes(self):
+        """Testa respeito aos intervalos de cada sonda"""
+        self.monitor.run_once()
+        self.now[0] += 10
+        self.monitor.run_once()
+        
+        self.assertEqual(self.calls, {'ok': 1, 'flaky': 2})
+    
+    def test_stats_and_status(self):
+        """Testa taxa de erro, status e janela circular"""
+        for _ in range(6):
+            self.monitor.run_once(force=True)
+        
+        ok = self.monitor.stats('ok')
+        flaky = self.monitor.stats('flaky')
+        
+        self.assertEqual(ok['status'], 'ok')
+        self.assertEqual(ok['samples'], 4)
+        self.assertEqual(flaky['status'], 'down')
+        self.assertEqual(flaky['error_rate'], 0.5)
+        self.assertEqual(flaky['last_error'], 'timeout')
+        self.assertEqual(flaky['series'][1::2], [None, None])
+    
+    def test_request_run_wakes_background_thread(self):
+        """Testa que o pedido de sondagem é atendido pela thread, não por quem pede"""
+        ran = threading.Event()
+        callers = []
+        
+        def probe():
+            callers.append(threading.current_thread().name)
+            if len(callers) > 1:
+                ran.set()
+        
+        monitor = HealthMonitor(probes={'p': (probe, 3600)}, clock=lambda: self.now[0])
+        monitor.start()
+        try:
+            monitor.request_run()
+            self.assertTrue(ran.wait(5))
+        finally:
+            monitor.stop()
+        
+        self.assertEqual(set(callers), {'health-probes'})
+    
+    def test_sparkline(self):
+        """Testa sparkline com falhas"""
+        self.assertEqual(sparkline([1.0, None, 8.0]), '▁×█')
+        self.assertEqual(sparkline([]), '')
+
+
+class TestDefaultProbes(FakeAWSTestCase):
+    """Testes para as sondas padrão contra a AWS falsa"""
+    
+    def setUp(self):
+        """Usa a AWS falsa"""
+        self.fake = self.use_fake_aws('utils.health')
+        self.fake.cloudwatch.create_log_group(logGroupName='/cyberguard/app')
+    
+    def test_all_probes_pass(self):
+        """Testa que todas as sondas padrão passam"""
+        results = HealthMonitor(probes=default_probes()).run_once()
+        
+        self.assertTrue(all(results.values()))
+        self.assertIn('dynamodb:progress', results)
+        self.assertEqual(self.fake.bedrock.calls, 0)
+        self.assertEqual(self.fake.bedrock_control.calls, 1)
+    
+    def test_bedrock_probe_fails_without_model(self):
+        """Testa falha da sonda quando o modelo configurado não está no catálogo"""
+        self.fake.bedrock_control.models = ['amazon.titan-text-lite-v1']
+        
+        results = HealthMonitor(probes=default_probes()).run_once()
+        
+        self.assertFalse(results['bedrock'])
+
+
+if __name__ == '__main__':
+    unittest.main()
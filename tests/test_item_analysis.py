@@ -0,0 +1,139 @@
+"""
+Testes para análise de itens
+"""
+import time
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+import numpy as np
+from config import DYNAMODB_TABLES
+from modules import item_analysis
+from modules.item_analysis import (ItemAnalyzer, compute_sums, derive_stats,
+                                   empirical_difficulty, item_flags)
+from modules.questions import QuestionManager
+from utils.fake_aws import seed_synthetic
+from tests import FakeAWSTestCase
+
+
+class TestItemStatistics(unittest.TestCase):
+    """Testes para o cálculo vetorizado"""
+    
+    def test_point_biserial_matches_pearson(self):
+        """Testa que a discriminação é a correlação com o rest score"""
+        rng = np.random.default_rng(7)
+        users = np.array([f'u{i}' for i in rng.integers(0, 30, 600)], dtype=object)
+        questions = np.array([f'q{i}' for i in rng.integers(0, 8, 600)], dtype=object)
+        correct = rng.random(600) < 0.6
+        time_spent = rng.integers(5, 90, 600).astype(float)
+        
+        sums = compute_sums(questions, users, correct, time_spent)
+        stats = derive_stats(sums['q3'])
+        
+        totals = {u: (np.sum(users == u), np.sum(correct[users == u])) for u in set(users)}
+        mask = questions == 'q3'
+        rest = np.array([(totals[u][1] - c) / (totals[u][0] - 1)
+                         for u, c in zip(users[mask], correct[mask])])
+        expected = np.corrcoef(correct[mask].astype(float), rest)[0, 1]
+        
+        self.assertAlmostEqual(stats['point_biserial'], expected, places=9)
+        self.assertAlmostEqual(stats['p_value'], correct[mask].mean())
+        self.assertAlmostEqual(stats['avg_time'], time_spent[mask].mean())
+        self.assertEqual(sums['q3']['attempts'], mask.sum())
+    
+    def test_flags_and_empirical_difficulty(self):
+        """Testa detecção de itens problemáticos e dificuldade empírica"""
+        broken = {'attempts': 50, 'p_value': Decimal('0.98'), 'point_biserial': Decimal('-0.2')}
+        self.assertEqual(item_flags(broken), ['muito_facil', 'discriminacao_negativa'])
+        self.assertEqual(item_flags({'attempts': 3, 'p_value': Decimal('0')}), [])
+        
+        self.assertEqual(empirical_difficulty({'difficulty': 'hard', 'stats': broken}), 'easy')
+        self.assertEqual(empirical_difficulty({'difficulty': 'hard', 'stats': {'attempts': 3}}), 'hard')
+
+
+class TestItemAnalyzer(FakeAWSTestCase):
+    """Testes para a atualização completa e incremental"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com dados sintéticos"""
+        self.fake = self.use_fake_aws('modules.item_analysis', 'modules.questions')
+        seed_synthetic(self.fake, users=40, answers_per_user=25, questions_per_category=5)
+        
+        self.progress = self.fake.dynamodb.Table(DYNAMODB_TABLES['progress'])
+        self.questions = self.fake.dynamodb.Table(DYNAMODB_TABLES['questions'])
+        self.analyzer = ItemAnalyzer()
+    
+    def stats(self, question_id):
+        return self.questions.get_item(Key={'questionId': question_id})['Item']['stats']
+    
+    def test_full_then_incremental(self):
+        """Testa que a atualização incremental soma apenas respostas novas"""
+        first = self.analyzer.refresh()
+        self.assertEqual(first['answers'], 1000)
+        self.assertIsNone(first['since'])
+        
+        answers = [i for i in self.progress.scan()['Items'] if i['questionId'] == 'phishing-0001']
+        stats = self.stats('phishing-0001')
+        self.assertEqual(stats['attempts'], len(answers))
+        self.assertAlmostEqual(float(stats['p_value']),
+                               sum(1 for a in answers if a['correct']) / len(answers), places=5)
+        
+        self.assertEqual(self.analyzer.refresh()['answers'], 0)
+        
+        newer = first['watermark'] + 10
+        for i in range(3):
+            self.progress.put_item(Item={'userId': 'user00001@example.com', 'timestamp': newer + i,
+                                         'questionId': 'phishing-0001', 'correct': True,
+                                         'category': 'phishing', 'time_spent': 10})
+        second = self.analyzer.refresh()
+        
+        self.assertEqual(second['since'], first['watermark'])
+        self.assertEqual(second['answers'], 3)
+        self.assertEqual(second['questions_updated'], 1)
+        self.assertEqual(self.stats('phishing-0001')['attempts'], len(answers) + 3)
+    
+    def test_late_write_during_scan_is_counted_once(self):
+        """Testa resposta gravada com timestamp menor, num trecho já varrido"""
+        now = time.time()
+        answer = {'questionId': 'phishing-0001', 'correct': True, 'category': 'phishing', 'time_spent': 10}
+        self.progress.put_item(Item=dict(answer, userId='ana@example.com',
+                                         timestamp=Decimal(str(round(now - 10, 6)))))
+        late = dict(answer, userId='bia@example.com', timestamp=Decimal(str(round(now - 20, 6))))
+        scan_pages = item_analysis.iter_pages
+        
+        def pages_then_late_write(operation, **kwargs):
+            yield from scan_pages(operation, **kwargs)
+            if operation == analyzer.progress_table.scan:
+                self.progress.put_item(Item=late)  # depois que a tabela já foi lida
+        
+        analyzer = ItemAnalyzer(clock=lambda: now)
+        with patch('modules.item_analysis.iter_pages', pages_then_late_write):
+            first = analyzer.refresh()
+        self.assertEqual(first['answers'], 1001)
+        self.assertEqual(first['watermark'], Decimal(str(round(now - 300, 6))))
+        attempts = self.stats('phishing-0001')['attempts']
+        
+        second = analyzer.refresh()
+        self.assertEqual(second['answers'], 1)
+        self.assertEqual(self.stats('phishing-0001')['attempts'], attempts + 1)
+        self.assertEqual(analyzer.refresh()['answers'], 0)
+        self.assertEqual(self.stats('phishing-0001')['attempts'], attempts + 1)
+    
+    def test_get_item_stats_and_sampler(self):
+        """Testa a listagem para instrutores e o sorteio por dificuldade empírica"""
+        self.analyzer.refresh()
+        rows = self.analyzer.get_item_stats('malware')
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(r['attempts'] > 0 and r['p_value'] is not None for r in rows))
+        
+        with patch.dict(item_analysis.ITEM_ANALYSIS, {'min_attempts': 1}):
+            target = empirical_difficulty(self.questions.get_item(Key={'questionId': 'malware-0000'})['Item'])
+            matching = {r['questionId'] for r in self.analyzer.get_item_stats('malware')
+                        if r['empirical_difficulty'] == target}
+            with patch.dict('config.ITEM_ANALYSIS', {'sampler_weights': {'match': 1e9, 'other': 1.0}}):
+                sampled = QuestionManager().sample('malware', target, count=len(matching))
+        
+        self.assertEqual({q['questionId'] for q in sampled}, matching)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Testes para o envio assíncrono de logs ao CloudWatch
+"""
+import logging
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError, EndpointConnectionError
+from utils.fake_aws import FakeAWS
+from utils import logger as logger_module
+from utils.logger import CloudWatchHandler, setup_logging
+
+
+def make_record(message, created=None):
+    """Cria LogRecord de teste"""
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, message, None, None)
+    if created is not None:
+        record.created = created
+    return record
+
+
+class TestCloudWatchHandler(unittest.TestCase):
+    """Testes para o handler em lotes"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.fake = FakeAWS()
+        patcher = patch('utils.logger.get_aws_client')
+        mock_aws = patcher.start()
+        mock_aws.return_value.cloudwatch = self.fake.cloudwatch
+        self.addCleanup(patcher.stop)
+        self.spill_path = os.path.join(tempfile.mkdtemp(), 'spill.jsonl')
+    
+    def make_handler(self, **kwargs):
+        """Cria handler com envio rápido e spill em diretório temporário"""
+        options = {'flush_interval': 60, 'spill_path': self.spill_path, 'backoff_base': 0}
+        options.update(kwargs)
+        handler = CloudWatchHandler(**options)
+        self.addCleanup(handler.close)
+        return handler
+    
+    def stored_events(self):
+        """Eventos gravados no CloudWatch falso"""
+        return [e for stream in self.fake.cloudwatch.groups.get('/cyberguard/app', {}).values()
+                for e in stream]
+    
+    def test_emit_is_batched_and_sorted(self):
+        """Testa que emit não envia na hora e que o lote sai ordenado"""
+        handler = self.make_handler()
+        for created in (1700000003.0, 1700000001.0, 1700000002.0):
+            handler.emit(make_record('evento', created))
+        self.assertEqual(self.fake.cloudwatch.put_calls, 0)
+        
+        handler.flush()
+        
+        timestamps = [e['timestamp'] for e in self.stored_events()]
+        self.assertEqual(self.fake.cloudwatch.put_calls, 1)
+        self.assertEqual(timestamps, sorted(timestamps))
+    
+    def test_batches_respect_event_limit(self):
+        """Testa divisão em lotes pelo número de eventos"""
+        handler = self.make_handler(max_events=10)
+        for i in range(25):
+            handler.emit(make_record(f'evento {i}'))
+        handler.flush()
+        
+        self.assertEqual(self.fake.cloudwatch.put_calls, 3)
+        self.assertEqual(handler.stats['sent'], 25)
+    
+    def test_failure_spills_and_replays(self):
+        """Testa spill em disco após falhas e reenvio na próxima inicialização"""
+        failing = MagicMock()
+        failing.put_log_events.side_effect = EndpointConnectionError(endpoint_url='https://logs')
+        with patch.object(CloudWatchHandler, 'cloudwatch', failing):
+            handler = self.make_handler(max_retries=1)
+            handler.emit(make_record('perdido?'))
+            handler.flush()
+        self.assertEqual(handler.stats['spilled'], 1)
+        self.assertEqual(failing.put_log_events.call_count, 2)
+        
+        replay = self.make_handler()
+        replay.flush()
+        
+        self.assertEqual(len(self.stored_events()), 1)
+        self.assertFalse(os.path.exists(self.spill_path))
+    
+    def test_permanent_rejection_is_dropped(self):
+        """Testa que rejeições permanentes não têm backoff nem vão para o disco"""
+        failing = MagicMock()
+        failing.put_log_events.side_effect = ClientError(
+            {'Error': {'Code': 'InvalidParameterException', 'Message': 'too old'},
+             'ResponseMetadata': {'HTTPStatusCode': 400}}, 'PutLogEvents')
+        with patch.object(CloudWatchHandler, 'cloudwatch', failing):
+            handler = self.make_handler(max_retries=3)
+            handler.emit(make_record('antigo'))
+            handler.flush()
+        
+        self.assertEqual(failing.put_log_events.call_count, 1)
+        self.assertEqual(handler.stats['dropped'], 1)
+        self.assertEqual(handler.stats['retries'], 0)
+        self.assertFalse(os.path.exists(self.spill_path))
+    
+    def test_replay_skips_bad_lines_and_keeps_leftovers(self):
+        """Testa que linha corrompida não interrompe o reenvio nem perde a sobra anterior"""
+        with open(self.spill_path + '.replay', 'w', encoding='utf-8') as f:
+            f.write('{"timestamp": 1700000000000, "message": "sobra"}\n')
+        with open(self.spill_path, 'w', encoding='utf-8') as f:
+            f.write('{"timestamp": 1700000001000, "message": "a"}\n{corrompida\n'
+                    '{"timestamp": 1700000002000, "message": "b"}\n')
+        
+        handler = self.make_handler()
+        handler.flush()
+        
+        self.assertEqual(sorted(e['message'] for e in self.stored_events()), ['a', 'b', 'sobra'])
+        self.assertEqual(handler.stats['dropped'], 1)
+        self.assertFalse(os.path.exists(self.spill_path + '.replay'))
+    
+    def test_queue_full_drops(self):
+        """Testa descarte sob contrapressão com overflow='drop'"""
+        handler = self.make_handler(queue_size=1, overflow='drop')
+        with patch.object(handler._queue, 'put_nowait', side_effect=logger_module.queue.Full):
+            handler.emit(make_record('sem espaço'))
+        self.assertEqual(handler.stats['dropped'], 1)
+
+
+class TestSetupLogging(unittest.TestCase):
+    """Testes para setup_logging"""
+    
+    @patch('utils.logger._get_cloudwatch_handler')
+    def test_idempotent(self, mock_handler):
+        """Testa que chamadas repetidas não duplicam handlers"""
+        mock_handler.return_value = logging.NullHandler()
+        logger = setup_logging('cyberguard.test.idempotent')
+        count = len(logger.handlers)
+        
+        setup_logging('cyberguard.test.idempotent')
+        
+        self.assertEqual(len(logger.handlers), count)
+        mock_handler.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
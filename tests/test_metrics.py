@@ -0,0 +1,84 @@
+"""
+Testes para instrumentação de latência
+"""
+import json
+import logging
+import unittest
+from utils.metrics import MetricsRegistry, _Measurement, add_consumed_capacity
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Testes para o registro de métricas"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.registry = MetricsRegistry(buckets=(0.01, 0.1, 1.0))
+        
+        @self.registry.instrument_class
+        class Manager:
+            def get_items(self, n):
+                add_consumed_capacity(read_units=0.5)
+                return list(range(n))
+            
+            def fail(self):
+                logging.getLogger('modules.fake').error("Erro simulado")
+                return []
+            
+            def explode(self):
+                raise ValueError('falhou')
+            
+            def _private(self):
+                return 'não instrumentado'
+        
+        self.manager = Manager()
+    
+    def test_counts_items_and_capacity(self):
+        """Testa contagem de chamadas, itens e capacidade"""
+        self.manager.get_items(3)
+        self.manager.get_items(2)
+        
+        stats = self.registry.snapshot()['Manager.get_items']
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['items'], 5)
+        self.assertEqual(stats['read_units'], 1.0)
+        self.assertEqual(stats['errors'], 0)
+    
+    def test_errors_from_logger_and_exceptions(self):
+        """Testa erros tratados (logger.error) e exceções propagadas"""
+        self.manager.fail()
+        with self.assertRaises(ValueError):
+            self.manager.explode()
+        self.manager._private()
+        
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['Manager.fail']['errors'], 1)
+        self.assertEqual(snapshot['Manager.explode']['errors'], 1)
+        self.assertNotIn('Manager._private', snapshot)
+    
+    def test_quantiles_from_histogram(self):
+        """Testa estimativa de quantis"""
+        for seconds in (0.005, 0.005, 0.05, 0.5):
+            self.registry._record(_Measurement('op'), seconds)
+        
+        snapshot = self.registry.snapshot()['op']
+        self.assertLessEqual(snapshot['p50_ms'], 10)
+        self.assertGreater(snapshot['p99_ms'], 100)
+        self.assertLessEqual(snapshot['p99_ms'], 500)
+        self.assertEqual(snapshot['max_ms'], 500)
+    
+    def test_exports(self):
+        """Testa exportação Prometheus e EMF"""
+        self.manager.get_items(1)
+        
+        text = self.registry.to_prometheus()
+        self.assertIn('cyberguard_operation_duration_seconds_bucket{operation="Manager.get_items",le="+Inf"} 1', text)
+        self.assertIn('cyberguard_dynamodb_consumed_read_units_total{operation="Manager.get_items"} 0.5', text)
+        
+        document = json.loads(self.registry.to_emf(timestamp_ms=1)[0])
+        self.assertEqual(document['_aws']['CloudWatchMetrics'][0]['Dimensions'], [['Operation']])
+        self.assertEqual(document['Operation'], 'Manager.get_items')
+        self.assertEqual(document['Calls'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,10 +14,10 @@ class TestProgressManager(unittest.TestCase):
         self.mock_table = MagicMock()
         self.mock_dynamodb.Table.return_value = self.mock_table
     
-    @patch('modules.progress.get_aws_client')
-    def test_save_answer(self, mock_aws):
+    @patch('modules.progress.get_table')
+    def test_save_answer(self, mock_get_table):
         """Testa salvamento de resposta"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = ProgressManager()
         manager.table = self.mock_table
@@ -32,10 +32,10 @@ class TestProgressManager(unittest.TestCase):
         self.assertTrue(result)
         self.mock_table.put_item.assert_called_once()
     
-    @patch('modules.progress.get_aws_client')
-    def test_get_user_progress(self, mock_aws):
+    @patch('modules.progress.get_table')
+    def test_get_user_progress(self, mock_get_table):
         """Testa obtenção de progresso do usuário"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = ProgressManager()
         manager.table = self.mock_table
@@ -50,10 +50,10 @@ class TestProgressManager(unittest.TestCase):
         
         self.assertEqual(len(result), 2)
     
-    @patch('modules.progress.get_aws_client')
-    def test_get_user_stats(self, mock_aws):
+    @patch('modules.progress.get_table')
+    def test_get_user_stats(self, mock_get_table):
         """Testa cálculo de estatísticas"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = ProgressManager()
         manager.table = self.mock_table
@@ -72,10 +72,10 @@ class TestProgressManager(unittest.TestCase):
         self.assertEqual(result['correct_answers'], 2)
         self.assertEqual(result['accuracy'], 50.0)
     
-    @patch('modules.progress.get_aws_client')
-    def test_get_leaderboard(self, mock_aws):
+    @patch('modules.progress.get_table')
+    def test_get_leaderboard(self, mock_get_table):
         """Testa geração de leaderboard"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = ProgressManager()
         manager.table = self.mock_table
@@ -3,7 +3,11 @@ Testes para módulo de questões
 """
 import unittest
 from unittest.mock import MagicMock, patch
+from config import DYNAMODB_TABLES
+from modules import questions
 from modules.questions import QuestionManager
+from utils.fake_aws import seed_synthetic
+from tests import FakeAWSTestCase
 
 class TestQuestionManager(unittest.TestCase):
     """Testes para gerenciamento de questões"""
@@ -14,10 +18,10 @@ class TestQuestionManager(unittest.TestCase):
         self.mock_table = MagicMock()
         self.mock_dynamodb.Table.return_value = self.mock_table
     
-    @patch('modules.questions.get_aws_client')
-    def test_create_question(self, mock_aws):
+    @patch('modules.questions.get_table')
+    def test_create_question(self, mock_get_table):
         """Testa criação de questão"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = QuestionManager()
         manager.table = self.mock_table
@@ -33,10 +37,10 @@ class TestQuestionManager(unittest.TestCase):
         self.assertTrue(result)
         self.mock_table.put_item.assert_called_once()
     
-    @patch('modules.questions.get_aws_client')
-    def test_get_by_category(self, mock_aws):
+    @patch('modules.questions.get_table')
+    def test_get_by_category(self, mock_get_table):
         """Testa busca de questões por categoria"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = QuestionManager()
         manager.table = self.mock_table
@@ -53,10 +57,10 @@ class TestQuestionManager(unittest.TestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0]['category'], 'phishing')
     
-    @patch('modules.questions.get_aws_client')
-    def test_delete_question(self, mock_aws):
+    @patch('modules.questions.get_table')
+    def test_delete_question(self, mock_get_table):
         """Testa deleção de questão"""
-        mock_aws.return_value.dynamodb = self.mock_dynamodb
+        mock_get_table.return_value = self.mock_table
         
         manager = QuestionManager()
         manager.table = self.mock_table
@@ -67,6 +71,54 @@ class TestQuestionManager(unittest.TestCase):
         self.mock_table.delete_item.assert_called_once()
 
 
+class TestQuestionCatalog(FakeAWSTestCase):
+    """Testes para get_many com cache do catálogo"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com questões sintéticas"""
+        self.fake = self.use_fake_aws('modules.questions')
+        seed_synthetic(self.fake, users=1, answers_per_user=1, questions_per_category=30)
+        questions._catalog.invalidate()
+        self.addCleanup(questions._catalog.invalidate)
+        
+        self.manager = QuestionManager()
+    
+    def calls(self, operation):
+        return self.fake.capacity_report()[DYNAMODB_TABLES['questions']]['calls'].get(operation, 0)
+    
+    def test_get_many_batches_and_caches(self):
+        """Testa BatchGetItem só para questões fora do cache"""
+        ids = [f'phishing-{i:04d}' for i in range(30)] * 3 + ['malware-0001', 'apagada']
+        result = self.manager.get_many(ids)
+        
+        self.assertEqual(len(result), 31)
+        self.assertEqual(result['malware-0001']['category'], 'malware')
+        self.assertNotIn('options', result['malware-0001'])
+        self.assertEqual(self.calls('BatchGetItem'), 1)
+        
+        self.manager.get_many(ids + ['malware-0002'])
+        self.assertEqual(self.calls('BatchGetItem'), 2)
+        self.assertGreater(self.fake.dynamodb.Table(DYNAMODB_TABLES['questions']).consumed['read'], 0)
+    
+    def test_update_invalidates(self):
+        """Testa que a atualização descarta a entrada em cache"""
+        self.manager.get_many(['phishing-0001'])
+        self.manager.update('phishing-0001', difficulty='hard')
+        
+        self.assertEqual(self.manager.get_many(['phishing-0001'])['phishing-0001']['difficulty'], 'hard')
+    
+    def test_bulk_create_skips_stored_questions(self):
+        """Testa que reexecutar a carga não duplica questões já gravadas"""
+        stored = self.fake.dynamodb.Table(DYNAMODB_TABLES['questions']).get_item(
+            Key={'questionId': 'phishing-0001'})['Item']['question']
+        new = {'options': ['a', 'b', 'c', 'd'], 'correctAnswer': 1, 'category': 'phishing'}
+        batch = [dict(new, question=f'  {stored.upper()}!! '), dict(new, question='Questão inédita?'),
+                 dict(new, question='questão   inédita')]
+        
+        self.assertEqual(self.manager.bulk_create(batch), 1)
+        self.assertEqual(self.manager.bulk_create(batch), 0)
+
+
 class TestQuestionManagerIntegration(unittest.TestCase):
     """Testes de integração (requer AWS configurado)"""
     
@@ -0,0 +1,243 @@
+"""
+Testes para o índice de ranking
+"""
+import random
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from config import DYNAMODB_TABLES
+from modules.gamification import GamificationManager
+from modules import ranking
+from modules.ranking import RankIndex, _Fenwick, _PointsBoard, points_attributes
+from tests import FakeAWSTestCase
+
+
+def stats(correct, total, category='phishing'):
+    return {'correct_answers': correct, 'total_answers': total,
+            f'correct_{category}': correct, f'total_{category}': total}
+
+
+class TestRankIndex(unittest.TestCase):
+    """Testes para as consultas de posição"""
+    
+    def setUp(self):
+        """Índice já carregado (sem varredura)"""
+        self.index = RankIndex(min_answers=5, buckets=100, refresh_seconds=3600)
+        patcher = patch.object(RankIndex, 'refresh', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_fenwick_prefix_and_find(self):
+        """Testa soma de prefixo e busca do k-ésimo"""
+        tree = _Fenwick(10)
+        for index in (2, 2, 5, 9):
+            tree.add(index, 1)
+        self.assertEqual(tree.prefix(4), 2)
+        self.assertEqual([tree.find(k) for k in (1, 2, 3, 4)], [2, 2, 5, 9])
+    
+    def test_matches_sorted_leaderboard(self):
+        """Testa rank_of/top/around contra a ordenação completa"""
+        rng = random.Random(3)
+        users = {}
+        for i in range(300):
+            total = rng.randint(1, 60)
+            users[f'u{i:03d}'] = (rng.randint(0, total), total)
+        for _ in range(2):  # reaplicar atualiza em vez de duplicar
+            for user_id, (correct, total) in users.items():
+                self.index.update(user_id, stats(correct, total))
+        
+        ranked = sorted(((u, c, t) for u, (c, t) in users.items() if t >= 5),
+                        key=lambda r: (-r[1] / r[2], -r[1], r[0]))
+        expected = [u for u, _, _ in ranked]
+        
+        self.assertEqual(self.index.size(), len(expected))
+        self.assertEqual([r['user_id'] for r in self.index.top(len(expected) + 10)], expected)
+        for position in (0, 1, 57, len(expected) - 1):
+            self.assertEqual(self.index.rank_of(expected[position]), position + 1)
+        
+        around = self.index.around(expected[40], k=3)
+        self.assertEqual([r['user_id'] for r in around], expected[37:44])
+        self.assertEqual([r['rank'] for r in around], list(range(38, 45)))
+        self.assertEqual([r['user_id'] for r in self.index.around(expected[0], k=2)], expected[:3])
+        
+        beginner = next(u for u, (_, t) in users.items() if t < 5)
+        self.assertIsNone(self.index.rank_of(beginner))
+        self.assertEqual(self.index.around(beginner), [])
+    
+    def test_points_board_matches_sorted_order(self):
+        """Testa o ranking de pontos contra a ordenação completa, inclusive acima do tamanho inicial"""
+        rng = random.Random(5)
+        board = _PointsBoard('points')
+        points = {}
+        for _ in range(3):  # reaplicar atualiza em vez de duplicar
+            for i in range(400):
+                points[f'u{i:03d}'] = rng.choice([rng.randint(1, 40), rng.randint(1, 5000)])
+                board.set(f'u{i:03d}', points[f'u{i:03d}'])
+        for user_id in ('u000', 'u001'):
+            board.remove(user_id)
+            del points[user_id]
+        
+        expected = sorted(points, key=lambda u: (-points[u], u))
+        
+        self.assertEqual(len(board), len(expected))
+        self.assertEqual([r['user_id'] for r in board.entries(1, len(expected) + 5)], expected)
+        self.assertEqual([r['user_id'] for r in board.entries(100, 7)], expected[99:106])
+        self.assertEqual(board.entries(3, 1)[0]['points'], points[expected[2]])
+        for position in (0, 1, 123, len(expected) - 1):
+            self.assertEqual(board.rank_of(expected[position]), position + 1)
+        self.assertIsNone(board.rank_of('u000'))
+    
+    def test_incremental_update_and_categories(self):
+        """Testa atualização a cada resposta e rankings por categoria"""
+        self.index.update('ana', stats(5, 10))
+        self.index.update('bia', stats(8, 10, 'malware'))
+        self.assertEqual(self.index.rank_of('ana'), 2)
+        self.assertEqual(self.index.rank_of('ana', 'phishing'), 1)
+        self.assertIsNone(self.index.rank_of('bia', 'phishing'))
+        
+        self.index.update('ana', stats(10, 11))
+        self.assertEqual([r['user_id'] for r in self.index.top(2)], ['ana', 'bia'])
+        self.assertEqual(self.index.top(1, 'malware')[0]['accuracy'], 80.0)
+    
+    def test_points_windows(self):
+        """Testa ranking de pontos por janela e a virada da semana"""
+        week = {'all': 'points', 'week': 'points_2025-W46', 'month': 'points_2025-11'}
+        with patch('modules.ranking.points_attributes', side_effect=lambda: dict(week)):
+            self.index.update('ana', {'points': 300, 'points_2025-W46': 50, 'points_2025-11': 300})
+            self.index.update('bia', {'points': 200, 'points_2025-W46': 200, 'points_2025-11': 200})
+            self.index.update('caio', {'points': 200, 'points_2025-W45': 90})
+            self.assertEqual([r['user_id'] for r in self.index.top_points(3)], ['ana', 'bia', 'caio'])
+            self.assertEqual([r['user_id'] for r in self.index.top_points(3, 'week')], ['bia', 'ana'])
+            self.assertIsNone(self.index.points_rank_of('caio', 'month'))
+            self.assertEqual(self.index.around_points('caio', k=1),
+                             [{'rank': 2, 'user_id': 'bia', 'points': 200},
+                              {'rank': 3, 'user_id': 'caio', 'points': 200}])
+            
+            week['week'] = 'points_2025-W47'
+            self.assertEqual(self.index.top_points(3, 'week'), [])
+            self.index.update('caio', {'points': 260, 'points_2025-W47': 60, 'points_2025-11': 60})
+            self.assertEqual(self.index.points_rank_of('caio', 'week'), 1)
+            self.assertEqual(self.index.points_rank_of('caio'), 2)
+        
+        attributes = points_attributes(datetime(2025, 12, 29))
+        self.assertEqual(attributes, {'all': 'points', 'week': 'points_2026-W01',
+                                      'month': 'points_2025-12'})
+
+
+class TestRankIndexStorage(FakeAWSTestCase):
+    """Testes para a carga a partir da user_stats e o badge champion"""
+    
+    def setUp(self):
+        """Usa a AWS falsa"""
+        self.fake = self.use_fake_aws('modules.gamification', 'modules.ranking')
+    
+    def test_champion_and_reload(self):
+        """Testa o badge champion via ranking e a recarga de outro processo"""
+        index = RankIndex(min_answers=5)
+        index.warm_up(wait=True)
+        gamification = GamificationManager(rank_index=index)
+        for user_id, hits in (('ana', 5), ('bia', 4), ('caio', 3), ('duda', 2)):
+            for i in range(5):
+                gamification.record_answer(user_id, 'phishing', i < hits, 60)
+        
+        champions = [u for u in ('ana', 'bia', 'caio', 'duda')
+                     if any(b['badgeId'] == 'champion' for b in gamification.get_user_badges(u))]
+        self.assertEqual(champions, ['ana', 'bia', 'caio'])
+        
+        other = RankIndex(min_answers=5)
+        other.warm_up(wait=True)
+        self.assertEqual([r['user_id'] for r in other.top(4, 'phishing')], ['ana', 'bia', 'caio', 'duda'])
+        self.assertEqual(other.rank_of('duda'), 4)
+        
+        calls = self.fake.capacity_report()[DYNAMODB_TABLES['user_stats']]['calls']
+        self.assertEqual(calls['Scan'], 2)  # uma carga por índice
+    
+    def test_points_accrual(self):
+        """Testa pontos por acerto (dificuldade) e por badge, nos agregados e no ranking"""
+        index = RankIndex(min_answers=5)
+        index.warm_up(wait=True)
+        gamification = GamificationManager(rank_index=index)
+        for i in range(5):
+            gamification.record_answer('ana', 'phishing', True, 60, 'hard')
+            gamification.record_answer('bia', 'phishing', i > 0, 60, 'easy')
+        
+        # ana: 5 acertos difíceis + streak_5 + champion; bia: 4 acertos fáceis + champion
+        ana = 5 * 50 + 50 + 500
+        bia = 4 * 10 + 500
+        self.assertEqual(gamification.get_points('ana'), {'all': ana, 'week': ana, 'month': ana})
+        self.assertEqual([(r['user_id'], r['points']) for r in index.top_points(window='week')],
+                         [('ana', ana), ('bia', bia)])
+        
+        other = RankIndex(min_answers=5)
+        other.warm_up(wait=True)
+        self.assertEqual(other.points_rank_of('bia', 'month'), 2)
+    
+    def test_load_runs_in_background(self):
+        """Testa que consultas não esperam a carga e que respostas durante ela são mantidas"""
+        gamification = GamificationManager()
+        for user_id, hits in (('ana', 5), ('bia', 4)):
+            for i in range(5):
+                gamification.record_answer(user_id, 'phishing', i < hits, 60)
+        
+        release = threading.Event()
+        scan_pages = ranking.iter_pages
+        
+        def slow_pages(operation, **kwargs):
+            release.wait(5)
+            yield from scan_pages(operation, **kwargs)
+        
+        index = RankIndex(min_answers=5)
+        with patch('modules.ranking.iter_pages', slow_pages):
+            self.assertIsNone(index.rank_of('ana'))  # carga em curso: não bloqueia
+            self.assertFalse(index.loaded)
+            index.update('caio', stats(5, 5))
+            release.set()
+            index.warm_up(wait=True)
+        
+        self.assertTrue(index.loaded)
+        self.assertEqual([r['user_id'] for r in index.top(3)], ['ana', 'caio', 'bia'])
+    
+    def test_no_champion_while_loading(self):
+        """Testa que o badge champion não é avaliado contra um índice ainda em carga"""
+        seed = GamificationManager()
+        for user_id, hits in (('ana', 5), ('bia', 5), ('caio', 5), ('duda', 5), ('edu', 3)):
+            for i in range(5):
+                seed.record_answer(user_id, 'phishing', i < hits, 60)
+        
+        release = threading.Event()
+        scan_pages = ranking.iter_pages
+        
+        def slow_pages(operation, **kwargs):
+            release.wait(5)
+            yield from scan_pages(operation, **kwargs)
+        
+        index = RankIndex(min_answers=5)
+        gamification = GamificationManager(rank_index=index)
+        with patch('modules.ranking.iter_pages', slow_pages):
+            gamification.record_answer('edu', 'phishing', True, 60)  # 5º de fato
+            release.set()
+            index.warm_up(wait=True)
+        
+        self.assertNotIn('champion', [b['badgeId'] for b in gamification.get_user_badges('edu')])
+        self.assertEqual(index.rank_of('edu'), 5)
+    
+    def test_failed_first_load_is_retried(self):
+        """Testa que uma primeira carga com falha mantém o índice não carregado e é repetida"""
+        index = RankIndex(min_answers=5)
+        with patch('modules.ranking.get_table', side_effect=RuntimeError('AccessDenied')):
+            index.warm_up(wait=True)
+            self.assertFalse(index.loaded)
+            self.assertEqual(index.top(), [])  # dentro da espera: sem nova tentativa
+            index.warm_up(wait=True)
+        self.assertFalse(index.loaded)
+        
+        with patch('modules.ranking.time.monotonic', return_value=time.monotonic() + 60):
+            index.top()
+            index.warm_up(wait=True)
+        self.assertTrue(index.loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+"""
+Testes para módulo de relatórios
+"""
+import csv
+import io
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from config import DYNAMODB_TABLES
+from modules import questions, reports
+from modules.reports import ReportGenerator
+from utils.fake_aws import seed_synthetic
+from utils.storage import DynamoDBBackend
+from tests import FakeAWSTestCase
+
+
+class TestInstructorReport(FakeAWSTestCase):
+    """Testes para o relatório de instrutor em passada única"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com dados sintéticos"""
+        self.fake = self.use_fake_aws('modules.reports')
+        seed_synthetic(self.fake, users=20, answers_per_user=15, questions_per_category=5)
+        reports._snapshots.clear()
+        self.addCleanup(reports._snapshots.clear)
+        
+        self.items = list(self.fake.dynamodb.Table(DYNAMODB_TABLES['progress']).scan()['Items'])
+        self.generator = ReportGenerator()
+    
+    def scan_calls(self):
+        """Chamadas de scan na tabela de progresso"""
+        return self.fake.capacity_report()[DYNAMODB_TABLES['progress']]['calls'].get('Scan', 0)
+    
+    def test_aggregates_match_items(self):
+        """Testa agregados contra cálculo direto sobre os itens"""
+        report = self.generator.generate_instructor_report()
+        
+        correct = sum(1 for i in self.items if i['correct'])
+        self.assertEqual(report['total_responses'], 300)
+        self.assertEqual(report['total_users'], 20)
+        self.assertAlmostEqual(report['overall_accuracy'], correct / 300 * 100)
+        
+        user_items = [i for i in self.items if i['userId'] == 'user00003@example.com']
+        user = report['by_user']['user00003@example.com']
+        self.assertEqual(user['total'], len(user_items))
+        self.assertEqual(user['time_spent'], sum(float(i['time_spent']) for i in user_items))
+        self.assertEqual(user['last_activity'], max(float(i['timestamp']) for i in user_items))
+        self.assertEqual(sum(c['total'] for c in user['by_category'].values()), len(user_items))
+    
+    def test_parallel_scan_matches_serial(self):
+        """Testa que a varredura segmentada produz o mesmo resultado"""
+        with patch.dict(reports.REPORTS, {'scan_segments': 1}):
+            serial = self.generator._build_instructor_report('phishing')
+        with patch.dict(reports.REPORTS, {'scan_segments': 4}):
+            parallel = self.generator._build_instructor_report('phishing')
+        
+        self.assertEqual(serial['by_user'], parallel['by_user'])
+        self.assertEqual(list(serial['by_category']), ['phishing'])
+    
+    def test_snapshot_reused_and_refreshed(self):
+        """Testa reuso do snapshot e recálculo em segundo plano quando vencido"""
+        self.generator.generate_instructor_report()
+        calls = self.scan_calls()
+        
+        self.generator.generate_instructor_report()
+        ReportGenerator().generate_instructor_report()
+        self.assertEqual(self.scan_calls(), calls)
+        
+        snapshot = reports._snapshots._snapshots['*']
+        snapshot['created_at'] -= reports.REPORTS['snapshot_ttl'] + 1
+        stale = self.generator.generate_instructor_report()
+        self.assertGreater(stale['snapshot_age_seconds'], reports.REPORTS['snapshot_ttl'])
+        
+        for _ in range(100):
+            if reports._snapshots._snapshots['*'] is not snapshot:
+                break
+            time.sleep(0.01)
+        self.assertGreater(self.scan_calls(), calls)
+        self.assertLess(self.generator.generate_instructor_report()['snapshot_age_seconds'], 60)
+    
+    def test_serial_scan_uses_worker_table(self):
+        """Testa que a varredura sem segmentos obtém a tabela na thread que a executa"""
+        threads = []
+        backend = DynamoDBBackend()
+        
+        def table(key):
+            threads.append(threading.get_ident())
+            return backend.table(key)
+        
+        with patch.dict(reports.REPORTS, {'scan_segments': 1}), \
+                patch('modules.reports.get_table', side_effect=table):
+            worker = threading.Thread(target=self.generator._build_instructor_report)
+            worker.start()
+            worker.join()
+        
+        self.assertEqual(set(threads), {worker.ident})
+
+
+
+class TestCohortReport(FakeAWSTestCase):
+    """Testes para o relatório de turma concorrente"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com dados sintéticos"""
+        self.fake = self.use_fake_aws('modules.reports')
+        seed_synthetic(self.fake, users=30, answers_per_user=12, questions_per_category=5)
+        reports._snapshots.clear()
+        self.addCleanup(reports._snapshots.clear)
+        
+        self.generator = ReportGenerator()
+        self.cohort = [f'user{u:05d}@example.com' for u in range(0, 30, 2)] + ['sumido@example.com']
+    
+    def query_calls(self):
+        return self.fake.capacity_report()[DYNAMODB_TABLES['progress']]['calls'].get('Query', 0)
+    
+    def test_concurrent_queries_match_summary(self):
+        """Testa resumos concorrentes iguais ao relatório individual"""
+        report = self.generator.generate_cohort_report(self.cohort, max_workers=4, rcu_per_second=0)
+        
+        self.assertEqual(report['cohort_size'], 16)
+        self.assertEqual(report['active_users'], 15)
+        self.assertEqual(report['without_data'], ['sumido@example.com'])
+        self.assertEqual(report['total_questions'], 15 * 12)
+        self.assertEqual(list(report['users']), self.cohort)
+        
+        single = self.generator.generate_summary_report('user00004@example.com')
+        member = report['users']['user00004@example.com']
+        for key in ('total_questions', 'correct_answers', 'by_category', 'total_study_time_seconds'):
+            self.assertEqual(member[key], single[key])
+        self.assertEqual(member['source'], 'query')
+    
+    def test_reuses_snapshot_aggregates(self):
+        """Testa que alunos do snapshot vigente não geram consultas"""
+        self.generator.generate_instructor_report()
+        calls = self.query_calls()
+        
+        report = self.generator.generate_cohort_report(self.cohort)
+        
+        self.assertEqual(report['from_snapshot'], 15)
+        self.assertEqual(self.query_calls(), calls + 1)  # apenas o aluno sem dados
+        self.assertEqual(report['users']['user00002@example.com']['source'], 'snapshot')
+    
+    def test_stream_stops_early(self):
+        """Testa consumo parcial do gerador sem executar o restante"""
+        with patch.dict(reports.REPORTS, {'cohort_rcu_per_second': 0}):
+            stream = self.generator.iter_cohort_report(self.cohort, max_workers=1)
+            user_id, summary = next(stream)
+            stream.close()
+        
+        self.assertIn(user_id, self.cohort)
+        self.assertLess(self.query_calls(), len(self.cohort))
+
+
+class TestStreamingExport(FakeAWSTestCase):
+    """Testes para as exportações paginadas em streaming"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com páginas pequenas para forçar paginação"""
+        self.fake = self.use_fake_aws('modules.reports')
+        seed_synthetic(self.fake, users=3, answers_per_user=40, questions_per_category=5)
+        
+        patcher = patch('utils.fake_aws.PAGE_BYTES', 1024)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generator = ReportGenerator()
+        self.user = 'user00001@example.com'
+    
+    def query_calls(self):
+        return self.fake.capacity_report()[DYNAMODB_TABLES['progress']]['calls'].get('Query', 0)
+    
+    def test_csv_follows_pagination(self):
+        """Testa que o CSV inclui todas as páginas da consulta"""
+        csv_data = self.generator.generate_user_report_csv(self.user)
+        rows = list(csv.DictReader(io.StringIO(csv_data)))
+        
+        self.assertEqual(len(rows), 40)
+        self.assertGreater(self.query_calls(), 1)
+        self.assertNotIn('userId', rows[0])
+        self.assertIsNone(self.generator.generate_user_report_csv('ninguem@example.com'))
+    
+    def test_enriched_with_question_catalog(self):
+        """Testa colunas da questão com uma leitura por questão distinta"""
+        questions._catalog.invalidate()
+        self.addCleanup(questions._catalog.invalidate)
+        users = [f'user{u:05d}@example.com' for u in range(3)]
+        rows = list(csv.DictReader(io.StringIO(b''.join(self.generator.stream_csv(users)).decode('utf-8'))))
+        
+        self.assertEqual(len(rows), 120)
+        self.assertTrue(all(r['question'].startswith('Questão sintética') for r in rows))
+        self.assertTrue(all(r['difficulty'] in ('easy', 'medium', 'hard') for r in rows))
+        calls = self.fake.capacity_report()[DYNAMODB_TABLES['questions']]['calls']
+        self.assertEqual(calls.get('BatchGetItem'), 1)
+        self.assertNotIn('GetItem', calls)
+    
+    def test_cohort_jsonl_and_json(self):
+        """Testa JSONL de vários usuários e JSON com Decimal convertido"""
+        users = ['user00000@example.com', 'user00002@example.com']
+        lines = b''.join(self.generator.stream_jsonl(users)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 80)
+        self.assertEqual({json.loads(line)['userId'] for line in lines}, set(users))
+        
+        header = next(self.generator.stream_csv(users)).split(b'\r\n')[0]
+        self.assertTrue(header.startswith(b'userId,'))
+        
+        items = json.loads(self.generator.export_to_json(self.user))
+        self.assertEqual(len(items), 40)
+        self.assertIsInstance(items[0]['timestamp'], (int, float))
+    
+    def test_export_to_s3(self):
+        """Testa envio da exportação ao S3"""
+        result = self.generator.export_to_s3([self.user], fmt='csv', key='exports/u1.csv')
+        
+        body = self.fake.s3.get_object(Bucket=result['bucket'], Key='exports/u1.csv')['Body'].read()
+        self.assertEqual(len(body.decode('utf-8').strip().splitlines()), 41)
+        self.assertIsNone(self.generator.export_to_s3([self.user], fmt='xml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
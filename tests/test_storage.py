@@ -0,0 +1,193 @@
+"""
+Testes para a camada de armazenamento (backend SQLite)
+"""
+import threading
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from config import DYNAMODB_TABLES
+from utils.storage import (DynamoDBBackend, SQLiteBackend, batch_get, conditional_check_failed,
+                           iter_pages)
+from modules.progress import ProgressManager
+from tests import FakeAWSTestCase
+
+class TestSQLiteTable(unittest.TestCase):
+    """Testes para a tabela SQLite compatível com a API do boto3"""
+    
+    def setUp(self):
+        """Configuração para cada teste"""
+        self.backend = SQLiteBackend(':memory:', page_size=4)
+        self.progress = self.backend.table('progress')
+        for i in range(10):
+            self.progress.put_item(Item={
+                'userId': 'user1' if i < 7 else 'user2',
+                'timestamp': Decimal(str(1700000000 + i + 0.25)),
+                'questionId': f'q{i}',
+                'correct': i % 2 == 0,
+                'category': 'phishing'
+            })
+    
+    def test_query_pagination(self):
+        """Testa paginação por LastEvaluatedKey"""
+        pages = list(iter_pages(
+            self.progress.query,
+            KeyConditionExpression='userId = :uid',
+            ExpressionAttributeValues={':uid': 'user1'}
+        ))
+        
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(sum(p['Count'] for p in pages), 7)
+    
+    def test_query_range_and_order(self):
+        """Testa condição no sort key e ordem decrescente"""
+        response = self.progress.query(
+            KeyConditionExpression='userId = :uid AND #ts >= :since',
+            ExpressionAttributeNames={'#ts': 'timestamp'},
+            ExpressionAttributeValues={':uid': 'user1', ':since': Decimal('1700000004')},
+            ScanIndexForward=False
+        )
+        
+        self.assertEqual([i['questionId'] for i in response['Items']], ['q6', 'q5', 'q4'])
+    
+    def test_scan_filter_and_segments(self):
+        """Testa scan com filtro e segmentos paralelos"""
+        correct = sum(p['Count'] for p in iter_pages(
+            self.progress.scan,
+            FilterExpression='correct = :c',
+            ExpressionAttributeValues={':c': True}
+        ))
+        self.assertEqual(correct, 5)
+        
+        total = sum(
+            p['Count']
+            for segment in range(3)
+            for p in iter_pages(self.progress.scan, Segment=segment, TotalSegments=3)
+        )
+        self.assertEqual(total, 10)
+    
+    def test_conditional_put(self):
+        """Testa escrita condicional"""
+        badges = self.backend.table('badges')
+        item = {'userId': 'user1', 'badgeId': 'streak_5'}
+        badges.put_item(Item=item, ConditionExpression='attribute_not_exists(badgeId)')
+        
+        with self.assertRaises(ClientError) as ctx:
+            badges.put_item(Item=item, ConditionExpression='attribute_not_exists(badgeId)')
+        self.assertTrue(conditional_check_failed(ctx.exception))
+    
+    def test_update_item(self):
+        """Testa SET/ADD com if_not_exists"""
+        questions = self.backend.table('questions')
+        for _ in range(2):
+            response = questions.update_item(
+                Key={'questionId': 'q1'},
+                UpdateExpression='SET attempts = if_not_exists(attempts, :zero) + :one ADD tags :tag',
+                ExpressionAttributeValues={':zero': 0, ':one': 1, ':tag': {'phishing'}},
+                ReturnValues='ALL_NEW'
+            )
+        
+        self.assertEqual(response['Attributes']['attempts'], Decimal('2'))
+        self.assertEqual(response['Attributes']['tags'], {'phishing'})
+    
+    def test_category_index(self):
+        """Testa consulta pelo índice CategoryIndex"""
+        questions = self.backend.table('questions')
+        with questions.batch_writer() as batch:
+            for i in range(5):
+                batch.put_item(Item={'questionId': f'q{i}', 'category': 'malware' if i % 2 else 'phishing'})
+        
+        response = questions.query(
+            IndexName='CategoryIndex',
+            KeyConditionExpression='category = :cat',
+            ExpressionAttributeValues={':cat': 'malware'}
+        )
+        self.assertEqual(response['Count'], 2)
+    
+    def test_batch_get(self):
+        """Testa leitura em lote com projeção e chaves inexistentes"""
+        keys = [{'userId': 'user1', 'timestamp': Decimal('1700000002.25')},
+                {'userId': 'user2', 'timestamp': Decimal('1700000008.25')},
+                {'userId': 'user3', 'timestamp': Decimal('1')}]
+        items = batch_get(self.progress, keys, ProjectionExpression='questionId')
+        
+        self.assertEqual(sorted(items, key=lambda i: i['questionId']),
+                         [{'questionId': 'q2'}, {'questionId': 'q8'}])
+    
+    def test_threads_share_database(self):
+        """Testa que conexões de outras threads enxergam os mesmos dados"""
+        counts = []
+        thread = threading.Thread(target=lambda: counts.append(
+            self.progress.scan(Limit=100)['Count']
+        ))
+        thread.start()
+        thread.join()
+        self.assertEqual(counts, [10])
+
+
+class TestBatchGetDynamoDB(FakeAWSTestCase):
+    """Testes para batch_get sobre o DynamoDB (AWS falsa)"""
+    
+    def setUp(self):
+        """Usa a AWS falsa com 250 questões"""
+        self.fake = self.use_fake_aws()
+        self.table = DynamoDBBackend().table('questions')
+        for i in range(250):
+            self.table.put_item(Item={'questionId': f'q{i}', 'question': f'Questão {i}',
+                                      'category': 'phishing'})
+    
+    def batch_calls(self):
+        return self.fake.capacity_report()[DYNAMODB_TABLES['questions']]['calls'].get('BatchGetItem', 0)
+    
+    def test_chunks_and_deduplicates(self):
+        """Testa lotes de 100 chaves e chaves repetidas lidas uma vez"""
+        keys = [{'questionId': f'q{i % 210}'} for i in range(420)] + [{'questionId': 'nao-existe'}]
+        items = batch_get(self.table, keys, ProjectionExpression='questionId, question')
+        
+        self.assertEqual(len(items), 210)
+        self.assertEqual(self.batch_calls(), 3)
+        self.assertEqual(set(items[0]), {'questionId', 'question'})
+    
+    def test_retries_unprocessed_keys(self):
+        """Testa reenvio de UnprocessedKeys"""
+        resource = self.fake.dynamodb
+        original = resource.batch_get_item
+        name = DYNAMODB_TABLES['questions']
+        
+        def partial(RequestItems, **kwargs):
+            # Processa só metade das chaves de cada chamada
+            keys = RequestItems[name]['Keys']
+            half = max(1, len(keys) // 2)
+            response = original(RequestItems={name: dict(RequestItems[name], Keys=keys[:half])}, **kwargs)
+            if keys[half:]:
+                response['UnprocessedKeys'] = {name: dict(RequestItems[name], Keys=keys[half:])}
+            return response
+        
+        with patch.object(resource, 'batch_get_item', side_effect=partial), \
+                patch('utils.storage.time.sleep') as sleep:
+            items = batch_get(self.table, [{'questionId': f'q{i}'} for i in range(8)])
+        
+        self.assertEqual(sorted(i['questionId'] for i in items), [f'q{i}' for i in range(8)])
+        self.assertEqual(sleep.call_count, 3)
+
+
+class TestManagersOnSQLite(unittest.TestCase):
+    """Gerenciadores rodando sobre o backend SQLite"""
+    
+    def test_progress_manager(self):
+        """Testa fluxo de progresso completo sem AWS"""
+        backend = SQLiteBackend(':memory:')
+        with patch('modules.progress.get_table', backend.table):
+            manager = ProgressManager()
+        
+        manager.save_answer('user1', 'q1', True, 'phishing', 10)
+        manager.save_answer('user1', 'q2', False, 'malware', 20)
+        stats = manager.get_user_stats('user1')
+        
+        self.assertEqual(stats['total_answers'], 2)
+        self.assertEqual(stats['accuracy'], 50.0)
+        self.assertEqual(manager.delete_user_progress('user1'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
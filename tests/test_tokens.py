@@ -0,0 +1,144 @@
+"""
+Testes para a verificação local de tokens do Cognito
+"""
+import base64
+import hashlib
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from modules.auth import CognitoAuth
+from utils import tokens
+from utils.tokens import TokenError, TokenVerifier
+from tests import FakeAWSTestCase
+
+POOL = 'us-east-1_TESTPOOL'
+CLIENT = 'cliente-teste'
+ISSUER = f'https://cognito-idp.us-east-1.amazonaws.com/{POOL}'
+
+# Par RSA de 1024 bits usado só nos testes
+N = int('c2a83385078197998897312b6e957cc1547e01891212f2b15fea589ef0be07b8a32aeb0e10a7aa8f576009f2'
+        'bc92949fdeee41624e705679d2409d67b2f259ce0c759e4335cff4450fa670dc9b81fe1bf06d9749057f04'
+        'd9cd5cbad3f13ceaf46fe5a7b6ece9b4e065afa782ee309f3512564fc5a7aed7ed0ab90ca61f6c63e5', 16)
+D = int('bc432150cfe9ae4d77a5829096eb4d354e1a7031b9a149c7f3141b91dd146d334ddbfc6a2601831c0f4d7b51'
+        'a0bfc3aebb55833728d5cd4d14e4195869e1aaa7c40494122978dadaeccbaaf81d2bf98471159d4f39e809'
+        '6fcf60a8ec7bee7f692cd67081ee948ad1b33f25e46ea3f5fa89a1e20686765535500d659d13d5eb21', 16)
+E = 65537
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def jwk(kid: str) -> dict:
+    return {'kty': 'RSA', 'kid': kid, 'alg': 'RS256', 'use': 'sig',
+            'n': b64(N.to_bytes(128, 'big')), 'e': b64(E.to_bytes(3, 'big'))}
+
+
+def sign(claims: dict, kid: str = 'k1', alg: str = 'RS256') -> str:
+    signing_input = (b64(json.dumps({'kid': kid, 'alg': alg}).encode()) + '.'
+                     + b64(json.dumps(claims).encode()))
+    digest = tokens._SHA256_DIGEST_INFO + hashlib.sha256(signing_input.encode()).digest()
+    encoded = b'\x00\x01' + b'\xff' * (128 - len(digest) - 3) + b'\x00' + digest
+    signature = pow(int.from_bytes(encoded, 'big'), D, N).to_bytes(128, 'big')
+    return f'{signing_input}.{b64(signature)}'
+
+
+def access_claims(**overrides) -> dict:
+    claims = {'sub': 'sub-ana', 'username': 'ana@example.com', 'token_use': 'access',
+              'client_id': CLIENT, 'iss': ISSUER, 'iat': int(time.time()) - 10,
+              'exp': int(time.time()) + 3600}
+    claims.update(overrides)
+    return claims
+
+
+class TestTokenVerifier(unittest.TestCase):
+    """Testes para assinatura, claims e caches"""
+    
+    def setUp(self):
+        """Verificador com JWKS servido em memória"""
+        self.jwks = {'keys': [jwk('k1')]}
+        self.fetch = MagicMock(side_effect=lambda url: self.jwks)
+        self.verifier = TokenVerifier(POOL, CLIENT, fetch=self.fetch)
+    
+    def test_valid_token_is_verified_once(self):
+        """Testa claims, JWKS buscado uma vez e cache de tokens verificados"""
+        token = sign(access_claims())
+        with patch('utils.tokens.rsa_sha256_verify', wraps=tokens.rsa_sha256_verify) as rsa:
+            for _ in range(3):
+                self.assertEqual(self.verifier.verify(token, 'access')['username'], 'ana@example.com')
+        self.assertEqual(rsa.call_count, 1)
+        self.fetch.assert_called_once_with(f'{ISSUER}/.well-known/jwks.json')
+        
+        with self.assertRaises(TokenError):
+            self.verifier.verify(token, 'id')
+    
+    def test_rejections(self):
+        """Testa assinatura adulterada, expiração, emissor, cliente e algoritmo"""
+        valid = sign(access_claims())
+        header, payload, signature = valid.split('.')
+        forged = b64(json.dumps(access_claims(username='admin@example.com')).encode())
+        invalid = {
+            'assinatura': f'{header}.{forged}.{signature}',
+            'expirado': sign(access_claims(exp=int(time.time()) - 120)),
+            'emissor': sign(access_claims(iss='https://cognito-idp.us-east-1.amazonaws.com/outro')),
+            'cliente': sign(access_claims(client_id='outro-cliente')),
+            'token_use': sign(access_claims(token_use='refresh')),
+            'algoritmo': sign(access_claims(), alg='none'),
+            'malformado': 'abc.def'
+        }
+        for reason, token in invalid.items():
+            with self.subTest(reason=reason), self.assertRaises(TokenError):
+                self.verifier.verify(token)
+        
+        identity = sign(access_claims(token_use='id', aud=CLIENT, client_id=None))
+        self.assertEqual(self.verifier.verify(identity, 'id')['aud'], CLIENT)
+    
+    def test_key_rotation(self):
+        """Testa recarga do JWKS para kid novo, limitada pelo intervalo mínimo"""
+        self.verifier.verify(sign(access_claims()))
+        
+        self.jwks = {'keys': [jwk('k2')]}
+        with patch.dict(tokens.COGNITO, {'jwks_min_interval': 0}):
+            self.assertEqual(self.verifier.verify(sign(access_claims(), kid='k2'))['sub'], 'sub-ana')
+        self.assertEqual(self.fetch.call_count, 2)
+        
+        for _ in range(3):
+            with self.assertRaises(TokenError):
+                self.verifier.verify(sign(access_claims(), kid='desconhecida'))
+        self.assertEqual(self.fetch.call_count, 2)  # dentro do intervalo mínimo
+
+
+class TestCognitoAuthGetUser(FakeAWSTestCase):
+    """Testes para get_user sem chamadas ao Cognito"""
+    
+    def setUp(self):
+        """Usa a AWS falsa e um verificador com JWKS em memória"""
+        self.use_fake_aws()
+        
+        verifier = TokenVerifier(POOL, CLIENT, fetch=lambda url: {'keys': [jwk('k1')]})
+        patcher = patch('modules.auth.get_token_verifier', return_value=verifier)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.auth = CognitoAuth(POOL, CLIENT)
+        self.auth.cognito = MagicMock(exceptions=self.auth.cognito.exceptions)
+    
+    def test_get_user_from_tokens(self):
+        """Testa dados do usuário a partir dos tokens de acesso e identidade"""
+        access = sign(access_claims())
+        identity = sign(access_claims(token_use='id', aud=CLIENT, email='ana@example.com',
+                                      name='Ana', email_verified=True))
+        
+        result = self.auth.get_user(access, identity)
+        
+        self.assertEqual(result, {'success': True, 'user': {
+            'username': 'ana@example.com', 'email': 'ana@example.com', 'name': 'Ana',
+            'email_verified': 'true'}})
+        self.assertFalse(self.auth.get_user(sign(access_claims(exp=1)))['success'])
+        self.assertFalse(self.auth.get_user(access, sign(access_claims(token_use='id', aud=CLIENT,
+                                                                       sub='outro')))['success'])
+        self.auth.cognito.get_user.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
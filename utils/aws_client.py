@@ -2,67 +2,262 @@
 Módulo para inicialização e gerenciamento de clientes AWS
 """
 import boto3
+import botocore.session
 import logging
-from typing import Tuple, Optional
+import queue
+import threading
+from botocore.config import Config
+from typing import Iterable, Optional
+from config import AWS_REGION, AWS_CLIENT_CONFIG, AWS_FAKE
 
 logger = logging.getLogger(__name__)
 
+class _ResourceLease:
+    """Mantém um resource emprestado para a thread e o devolve ao pool quando ela termina"""
+    
+    def __init__(self, resource, pool: queue.Queue):
+        self.resource = resource
+        self._pool = pool
+    
+    def __del__(self):
+        try:
+            self._pool.put_nowait(self.resource)
+        except Exception:
+            pass
+
+
 class AWSClient:
-    """Cliente centralizado para serviços AWS"""
+    """Cliente centralizado para serviços AWS
+
+    Os clientes são criados sob demanda no primeiro acesso à propriedade
+    correspondente (inicialização com double-checked locking), de modo que uma
+    sessão que nunca usa Cognito ou S3 não paga o custo de criá-los.
+    
+    Clientes de baixo nível são thread-safe e compartilhados. Já os resources
+    boto3 (``dynamodb``) não são: cada thread recebe o seu, criado a partir de
+    uma sessão própria, e ao fim da thread ele volta a um pool para ser
+    reaproveitado pela próxima (workers de ThreadPoolExecutor, threads de
+    script do Streamlit).
+    """
+    
+    # nome da propriedade -> (tipo, serviço botocore)
+    SERVICES = {
+        'dynamodb': ('resource', 'dynamodb'),
+        'dynamodb_client': ('client', 'dynamodb'),
+        'bedrock': ('client', 'bedrock-runtime'),
+        'bedrock_control': ('client', 'bedrock'),
+        'cognito': ('client', 'cognito-idp'),
+        'cloudwatch': ('client', 'logs'),
+        's3': ('client', 's3')
+    }
     
     _instance = None
-    _dynamodb = None
-    _bedrock = None
-    _cognito = None
-    _cloudwatch = None
-    _s3 = None
+    _instance_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(AWSClient, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super(AWSClient, cls).__new__(cls)
+                    instance._clients = {}
+                    instance._lock = threading.RLock()
+                    instance._session = None
+                    instance._local = threading.local()
+                    instance._resource_pools = {}
+                    instance._resources_created = 0
+                    instance._fake = None
+                    cls._instance = instance
+                    if AWS_FAKE:
+                        from utils.fake_aws import FakeAWS
+                        instance.use_fake(FakeAWS())
         return cls._instance
     
-    def __init__(self):
-        """Inicializa clientes AWS com cache"""
-        if self._dynamodb is None:
-            self._init_clients()
+    @staticmethod
+    def _client_config(service: str) -> Config:
+        """Monta configuração botocore (timeouts, retries, pool) para o serviço"""
+        overrides = AWS_CLIENT_CONFIG['services'].get(service, {})
+        return Config(
+            region_name=AWS_REGION,
+            connect_timeout=overrides.get('connect_timeout', AWS_CLIENT_CONFIG['connect_timeout']),
+            read_timeout=overrides.get('read_timeout', AWS_CLIENT_CONFIG['read_timeout']),
+            retries={
+                'mode': AWS_CLIENT_CONFIG['retry_mode'],
+                'max_attempts': overrides.get('max_attempts', AWS_CLIENT_CONFIG['max_attempts'])
+            },
+            max_pool_connections=AWS_CLIENT_CONFIG['max_pool_connections'],
+            tcp_keepalive=AWS_CLIENT_CONFIG['tcp_keepalive']
+        )
+    
+    def _get_session(self) -> boto3.session.Session:
+        """Sessão boto3 própria (a sessão padrão do boto3 não é thread-safe)"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = boto3.session.Session(region_name=AWS_REGION)
+        return self._session
+    
+    def _new_session(self) -> boto3.session.Session:
+        """Nova sessão boto3 que compartilha o loader de modelos da sessão principal
+        
+        Assim os JSONs de serviço do botocore são carregados uma única vez por
+        processo, mesmo com uma sessão por thread.
+        """
+        loader = self._get_session()._session.get_component('data_loader')
+        core = botocore.session.get_session()
+        core.register_component('data_loader', loader)
+        return boto3.session.Session(botocore_session=core, region_name=AWS_REGION)
     
-    def _init_clients(self):
-        """Inicializa todos os clientes AWS"""
+    def _get_thread_resource(self, name: str):
+        """Retorna o resource `name` da thread atual (do pool ou recém-criado)"""
+        lease = getattr(self._local, name, None)
+        if lease is not None:
+            return lease.resource
+        
+        pool = self._resource_pools.setdefault(
+            name, queue.Queue(maxsize=AWS_CLIENT_CONFIG['max_pool_connections'])
+        )
         try:
-            self._dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-            self._bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-            self._cognito = boto3.client('cognito-idp', region_name='us-east-1')
-            self._cloudwatch = boto3.client('logs', region_name='us-east-1')
-            self._s3 = boto3.client('s3', region_name='us-east-1')
-            logger.info("✅ Clientes AWS inicializados com sucesso")
-        except Exception as e:
-            logger.error(f"❌ Erro ao inicializar clientes AWS: {e}")
-            raise
+            resource = pool.get_nowait()
+        except queue.Empty:
+            _, service = self.SERVICES[name]
+            try:
+                resource = self._new_session().resource(service, config=self._client_config(service))
+            except Exception as e:
+                logger.error(f"❌ Erro ao inicializar resource AWS {service}: {e}")
+                raise
+            with self._lock:
+                self._resources_created += 1
+                self._clients.setdefault(name, resource)
+            logger.debug(f"Resource {service} criado para thread {threading.current_thread().name}")
+        
+        setattr(self._local, name, _ResourceLease(resource, pool))
+        return resource
+    
+    def use_fake(self, fake) -> None:
+        """Passa a servir os serviços a partir de um `utils.fake_aws.FakeAWS`
+
+        Com `fake=None` volta aos clientes reais. Caches por thread de tabelas
+        são descartados para que nenhum objeto antigo continue em uso.
+        """
+        with self._lock:
+            self._fake = fake
+            self._clients = {}
+            self._resource_pools = {}
+            self._local = threading.local()
+        logger.info("Usando AWS falsa em memória" if fake else "Usando AWS real")
+    
+    def _get(self, name: str):
+        """Retorna o cliente `name`, criando-o no primeiro acesso"""
+        if self._fake is not None:
+            return self._fake.service(name)
+        if self.SERVICES[name][0] == 'resource':
+            return self._get_thread_resource(name)
+        
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    _, service = self.SERVICES[name]
+                    try:
+                        client = self._get_session().client(service, config=self._client_config(service))
+                    except Exception as e:
+                        logger.error(f"❌ Erro ao inicializar cliente AWS {service}: {e}")
+                        raise
+                    self._clients[name] = client
+                    logger.info(f"✅ Cliente AWS inicializado: {service}")
+        return client
+    
+    def warm_up(self, services: Optional[Iterable[str]] = None,
+                background: bool = False) -> Optional[threading.Thread]:
+        """Cria antecipadamente os clientes indicados (todos por padrão)
+
+        Com `background=True` a criação roda em uma thread daemon, tirando o
+        custo de carregamento dos modelos botocore do caminho da requisição.
+        Para resources por thread, o aquecimento carrega o modelo no loader
+        compartilhado e deixa um resource pronto no pool.
+        """
+        names = [n for n in (services or self.SERVICES) if n not in self._clients]
+        if not names:
+            return None
+        
+        def _warm():
+            for name in names:
+                try:
+                    self._get(name)
+                except Exception as e:
+                    logger.warning(f"Warm-up de {name} falhou: {e}")
+        
+        if not background:
+            _warm()
+            return None
+        
+        thread = threading.Thread(target=_warm, name='aws-warm-up', daemon=True)
+        thread.start()
+        return thread
     
     @property
     def dynamodb(self):
-        return self._dynamodb
+        """Resource DynamoDB da thread atual"""
+        return self._get('dynamodb')
+    
+    @property
+    def dynamodb_client(self):
+        """Cliente DynamoDB de baixo nível (thread-safe, compartilhado)"""
+        return self._get('dynamodb_client')
+    
+    def table(self, table_name: str):
+        """Retorna objeto Table ligado ao resource da thread atual (com cache por thread)"""
+        tables = getattr(self._local, 'tables', None)
+        if tables is None:
+            tables = self._local.tables = {}
+        table = tables.get(table_name)
+        if table is None:
+            table = tables[table_name] = self.dynamodb.Table(table_name)
+        return table
+    
+    def pool_stats(self) -> dict:
+        """Estatísticas de resources criados e disponíveis nos pools"""
+        return {
+            'resources_created': self._resources_created,
+            'idle': {name: pool.qsize() for name, pool in self._resource_pools.items()}
+        }
     
     @property
     def bedrock(self):
-        return self._bedrock
+        return self._get('bedrock')
+    
+    @property
+    def bedrock_control(self):
+        """Plano de controle do Bedrock (catálogo de modelos, sem custo por chamada)"""
+        return self._get('bedrock_control')
     
     @property
     def cognito(self):
-        return self._cognito
+        return self._get('cognito')
     
     @property
     def cloudwatch(self):
-        return self._cloudwatch
+        return self._get('cloudwatch')
     
     @property
     def s3(self):
-        return self._s3
+        return self._get('s3')
     
     def is_healthy(self) -> bool:
-        """Verifica se todos os clientes estão disponíveis"""
-        return all([self._dynamodb, self._bedrock, self._cognito, self._cloudwatch, self._s3])
+        """Verifica se a sessão resolve credenciais e os clientes já criados estão disponíveis
+
+        Não força a criação de clientes que ainda não foram usados.
+        """
+        if self._fake is not None:
+            return True
+        try:
+            if self._get_session().get_credentials() is None:
+                return False
+        except Exception as e:
+            logger.error(f"Erro ao resolver credenciais AWS: {e}")
+            return False
+        return all(client is not None for client in self._clients.values())
 
 
 def get_aws_client() -> AWSClient:
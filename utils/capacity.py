@@ -0,0 +1,286 @@
+"""
+Contabilidade de capacidade DynamoDB consumida por página, usuário e operação
+
+As tabelas rodam com 5 RCU/WCU provisionadas (setup_v2.py). Toda chamada feita
+pelas tabelas do backend DynamoDB passa por ``MeteredTable``, que pede
+``ReturnConsumedCapacity`` e atribui as unidades à página atual (função
+``render_*`` decorada com ``metered_page``), ao usuário e à operação
+instrumentada em andamento (utils/metrics).
+"""
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+from config import CAPACITY
+from utils import metrics
+
+_page: contextvars.ContextVar[str] = contextvars.ContextVar('cyberguard_page', default='-')
+_user: contextvars.ContextVar[str] = contextvars.ContextVar('cyberguard_user', default='-')
+
+READ_OPERATIONS = ('get_item', 'query', 'scan', 'batch_get_item')
+
+
+def item_size(value, name: str = '') -> int:
+    """Tamanho aproximado de um item/atributo segundo as regras do DynamoDB"""
+    size = len(name.encode('utf-8'))
+    if isinstance(value, dict):
+        return size + 3 + sum(item_size(v, k) + 1 for k, v in value.items())
+    if isinstance(value, list):
+        return size + 3 + sum(item_size(v) + 1 for v in value)
+    if isinstance(value, (set, frozenset)):
+        return size + sum(item_size(v) for v in value)
+    if isinstance(value, str):
+        return size + len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return size + len(value)
+    if isinstance(value, bool) or value is None:
+        return size + 1
+    if isinstance(value, (int, float, Decimal)):
+        digits = len(str(value).lstrip('-').replace('.', '').lstrip('0')) or 1
+        return size + 1 + (digits + 1) // 2
+    return size + len(str(value))
+
+
+class CapacityAccountant:
+    """Acumula RCU/WCU por (página, usuário, operação, tabela)"""
+    
+    def __init__(self):
+        self._usage: Dict[tuple, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, table: str, method: str, read_units: float = 0.0,
+               write_units: float = 0.0) -> None:
+        operation = metrics.current_operation() or f'{table}.{method}'
+        key = (_page.get(), _user.get(), operation, table)
+        with self._lock:
+            usage = self._usage.get(key)
+            if usage is None:
+                usage = self._usage[key] = {'read_units': 0.0, 'write_units': 0.0, 'calls': 0}
+            usage['read_units'] += read_units
+            usage['write_units'] += write_units
+            usage['calls'] += 1
+        metrics.add_consumed_capacity(read_units, write_units)
+    
+    def rows(self) -> List[Dict]:
+        """Linhas detalhadas (uma por página/usuário/operação/tabela)"""
+        with self._lock:
+            return [
+                {'page': page, 'user': user, 'operation': op, 'table': table, **usage}
+                for (page, user, op, table), usage in sorted(self._usage.items())
+            ]
+    
+    def totals(self, by: str, user: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Soma por 'page', 'user', 'operation' ou 'table' (opcionalmente de um usuário)"""
+        result: Dict[str, Dict[str, float]] = {}
+        for row in self.rows():
+            if user is not None and row['user'] != user:
+                continue
+            bucket = result.setdefault(row[by], {'read_units': 0.0, 'write_units': 0.0, 'calls': 0})
+            bucket['read_units'] += row['read_units']
+            bucket['write_units'] += row['write_units']
+            bucket['calls'] += row['calls']
+        return dict(sorted(result.items(), key=lambda kv: -(kv[1]['read_units'] + kv[1]['write_units'])))
+    
+    def session_usage(self, user: str) -> Dict[str, float]:
+        """Consumo do usuário comparado ao orçamento por sessão"""
+        totals = self.totals('user').get(user, {'read_units': 0.0, 'write_units': 0.0, 'calls': 0})
+        return {
+            **totals,
+            'read_budget': CAPACITY['session_read_budget'],
+            'write_budget': CAPACITY['session_write_budget'],
+            'read_ratio': totals['read_units'] / CAPACITY['session_read_budget'],
+            'write_ratio': totals['write_units'] / CAPACITY['session_write_budget']
+        }
+    
+    def reset(self, user: Optional[str] = None) -> None:
+        with self._lock:
+            if user is None:
+                self._usage = {}
+            else:
+                self._usage = {k: v for k, v in self._usage.items() if k[1] != user}
+
+
+def _consumed_units(response: Dict) -> float:
+    consumed = response.get('ConsumedCapacity') if isinstance(response, dict) else None
+    if not consumed:
+        return 0.0
+    if isinstance(consumed, list):
+        return float(sum(c.get('CapacityUnits', 0) for c in consumed))
+    return float(consumed.get('CapacityUnits', 0))
+
+
+class CapacityThrottle:
+    """Token bucket de capacidade (RCU/s) para chamadas em paralelo
+    
+    Cada chamada reserva a média de unidades observada até agora e, com a
+    resposta em mãos, acerta a diferença pelo ConsumedCapacity real (o saldo
+    pode ficar negativo, atrasando as próximas chamadas).
+    """
+    
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.waited = 0.0
+        self._estimate = 1.0
+        self._calls = 0
+        self._units = 0.0
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def acquire(self, units: float) -> None:
+        """Bloqueia até haver `units` disponíveis"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= min(units, self.capacity):
+                    self.tokens -= units
+                    return
+                wait = (min(units, self.capacity) - self.tokens) / self.rate
+                self.waited += wait
+            self.sleep(wait)
+    
+    def settle(self, reserved: float, consumed: float) -> None:
+        """Acerta a reserva pelo consumo real"""
+        with self._lock:
+            self.tokens -= consumed - reserved
+            self._calls += 1
+            self._units += consumed
+            self._estimate = max(0.5, self._units / self._calls)
+    
+    def wrap(self, operation: Callable) -> Callable:
+        """Versão limitada de `table.query`/`table.scan` (compatível com iter_pages)"""
+        def call(**kwargs):
+            reserved = self._estimate
+            self.acquire(reserved)
+            kwargs.setdefault('ReturnConsumedCapacity', 'TOTAL')
+            response = operation(**kwargs)
+            self.settle(reserved, _consumed_units(response))
+            return response
+        return call
+
+
+class _MeteredBatchWriter:
+    """batch_writer medido: o boto3 não devolve ConsumedCapacity, então estima 1 WCU/KB"""
+    
+    def __init__(self, writer, table: 'MeteredTable'):
+        self._writer = writer
+        self._table = table
+        self._units = 0.0
+    
+    def put_item(self, Item: Dict, **kwargs) -> None:
+        self._units += max(1, math.ceil(item_size(Item) / 1024))
+        self._writer.put_item(Item=Item, **kwargs)
+    
+    def delete_item(self, Key: Dict, **kwargs) -> None:
+        self._units += 1
+        self._writer.delete_item(Key=Key, **kwargs)
+    
+    def __enter__(self):
+        self._writer.__enter__()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return self._writer.__exit__(exc_type, exc, tb)
+        finally:
+            if self._units:
+                self._table._accountant.record(self._table.name, 'batch_write', write_units=self._units)
+    
+    def __getattr__(self, attr):
+        return getattr(self._writer, attr)
+
+
+class MeteredTable:
+    """Proxy de Table que pede ReturnConsumedCapacity e registra o consumo"""
+    
+    def __init__(self, table, name: str, accountant: Optional[CapacityAccountant] = None):
+        self._table = table
+        self.name = name
+        self._accountant = accountant or get_accountant()
+    
+    def _call(self, method: str, kwargs: Dict):
+        kwargs.setdefault('ReturnConsumedCapacity', 'TOTAL')
+        response = getattr(self._table, method)(**kwargs)
+        self.meter(method, response)
+        return response
+    
+    def meter(self, method: str, response: Dict) -> None:
+        """Registra o consumo de uma resposta (também de chamadas feitas pelo resource)"""
+        units = _consumed_units(response)
+        if method in READ_OPERATIONS:
+            self._accountant.record(self.name, method, read_units=units)
+        else:
+            self._accountant.record(self.name, method, write_units=units)
+    
+    def get_item(self, **kwargs):
+        return self._call('get_item', kwargs)
+    
+    def query(self, **kwargs):
+        return self._call('query', kwargs)
+    
+    def scan(self, **kwargs):
+        return self._call('scan', kwargs)
+    
+    def put_item(self, **kwargs):
+        return self._call('put_item', kwargs)
+    
+    def update_item(self, **kwargs):
+        return self._call('update_item', kwargs)
+    
+    def delete_item(self, **kwargs):
+        return self._call('delete_item', kwargs)
+    
+    def batch_writer(self, *args, **kwargs):
+        return _MeteredBatchWriter(self._table.batch_writer(*args, **kwargs), self)
+    
+    def __getattr__(self, attr):
+        return getattr(self._table, attr)
+
+
+@contextmanager
+def page(name: str):
+    """Atribui o consumo do bloco à página `name`"""
+    token = _page.set(name)
+    try:
+        yield
+    finally:
+        _page.reset(token)
+
+
+def metered_page(func: Optional[Callable] = None, name: Optional[str] = None):
+    """Decorator para funções render_*: o consumo dentro delas vai para a página"""
+    def decorator(f):
+        page_name = name or f.__name__
+        
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with page(page_name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator(func) if func is not None else decorator
+
+
+def set_current_user(user_id: Optional[str]) -> None:
+    """Define o usuário ao qual o consumo da execução atual é atribuído"""
+    _user.set(user_id or '-')
+
+
+_accountant = CapacityAccountant()
+
+
+def get_accountant() -> CapacityAccountant:
+    """Retorna o contador de capacidade do processo"""
+    return _accountant
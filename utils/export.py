@@ -0,0 +1,156 @@
+"""
+Exportação em streaming (CSV/JSONL) com memória constante
+
+Os geradores deste módulo consomem linhas de um iterador (tipicamente
+páginas de uma consulta DynamoDB) e produzem blocos de bytes de tamanho
+limitado. Os blocos podem ser entregues ao ``st.download_button`` via
+``IterStream`` ou enviados ao S3 por upload multipart.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import EXPORTS
+
+logger = logging.getLogger(__name__)
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # limite do S3 para partes (exceto a última)
+
+
+def json_default(value):
+    """Tipos que o json padrão não serializa (Decimal do boto3, sets, datas)"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+# Encoder único e compacto: evita recriar o encoder a cada json.dumps(..., default=...)
+_encoder = json.JSONEncoder(default=json_default, separators=(',', ':'), ensure_ascii=False)
+
+
+def dumps(value) -> str:
+    """json.dumps compacto que aceita Decimal"""
+    return _encoder.encode(value)
+
+
+def iter_jsonl(rows: Iterable[Dict], chunk_size: int = EXPORTS['chunk_size']) -> Iterator[bytes]:
+    """Uma linha JSON por item, em blocos de ~chunk_size bytes"""
+    buffer: List[str] = []
+    size = 0
+    for row in rows:
+        line = _encoder.encode(row) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def iter_csv(rows: Iterable[Dict], fieldnames: List[str],
+             chunk_size: int = EXPORTS['chunk_size']) -> Iterator[bytes]:
+    """CSV com cabeçalho, em blocos de ~chunk_size bytes"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if output.tell() >= chunk_size:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue().encode('utf-8')
+
+
+class IterStream(io.RawIOBase):
+    """Arquivo somente leitura sobre um iterador de blocos de bytes"""
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b''
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def upload_multipart(s3, bucket: str, key: str, chunks: Iterable[bytes],
+                     part_size: int = EXPORTS['part_size'],
+                     content_type: str = 'binary/octet-stream',
+                     metadata: Optional[Dict[str, str]] = None) -> Dict:
+    """Envia os blocos ao S3 em partes de `part_size` bytes, sem materializar o arquivo
+
+    Exportações menores que uma parte viram um único put_object. Em caso de
+    erro o upload multipart é abortado (partes órfãs são cobradas).
+    """
+    part_size = max(part_size, MIN_PART_SIZE)
+    extra = {'ContentType': content_type}
+    if metadata:
+        extra['Metadata'] = metadata
+    
+    buffer = bytearray()
+    chunks = iter(chunks)
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= part_size:
+            break
+    else:
+        response = s3.put_object(Bucket=bucket, Key=key, Body=bytes(buffer), **extra)
+        return {'bucket': bucket, 'key': key, 'size': len(buffer), 'parts': 1,
+                'etag': response.get('ETag')}
+    
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, **extra)['UploadId']
+    parts = []
+    total = 0
+    
+    def send(data: bytes):
+        number = len(parts) + 1
+        response = s3.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                  PartNumber=number, Body=data)
+        parts.append({'PartNumber': number, 'ETag': response['ETag']})
+    
+    try:
+        while True:
+            while len(buffer) >= part_size:
+                send(bytes(buffer[:part_size]))
+                total += part_size
+                del buffer[:part_size]
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            buffer += chunk
+        # Só a última parte pode ser menor que o mínimo
+        if buffer:
+            send(bytes(buffer))
+            total += len(buffer)
+        response = s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                MultipartUpload={'Parts': parts})
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    
+    logger.info(f"Exportação enviada para s3://{bucket}/{key} ({total} bytes, {len(parts)} partes)")
+    return {'bucket': bucket, 'key': key, 'size': total, 'parts': len(parts),
+            'etag': response.get('ETag')}
@@ -0,0 +1,449 @@
+"""
+Avaliador de expressões DynamoDB para backends locais (SQLite, memória)
+
+Suporta o subconjunto usado pela aplicação: KeyConditionExpression,
+FilterExpression e ConditionExpression (comparações, BETWEEN, IN, AND/OR/NOT,
+attribute_exists, attribute_not_exists, begins_with, contains, size) e
+UpdateExpression (SET com `+`/`-`, if_not_exists e list_append; ADD; REMOVE;
+DELETE). Aceita tanto strings quanto objetos de ``boto3.dynamodb.conditions``.
+"""
+import re
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+
+
+class ExpressionError(ValueError):
+    """Expressão inválida ou não suportada"""
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<op><>|<=|>=|=|<|>)
+      | (?P<punct>[(),+\-.\[\]])
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<name>\#[A-Za-z0-9_]+|[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<number>\d+)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'ADD', 'REMOVE', 'DELETE'}
+_FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'begins_with', 'contains',
+              'size', 'if_not_exists', 'list_append', 'attribute_type'}
+_MISSING = object()
+
+
+def normalize(expression, names: Optional[Dict] = None, values: Optional[Dict] = None,
+              is_key_condition: bool = False,
+              builder: Optional[ConditionExpressionBuilder] = None) -> Tuple[Optional[str], Dict, Dict]:
+    """Converte condições boto3 em string e mescla nomes/valores
+
+    Para converter a chave e o filtro de uma mesma query, passe o mesmo
+    `builder` nas duas chamadas (evita colisão de placeholders).
+    """
+    names = dict(names or {})
+    values = dict(values or {})
+    if isinstance(expression, ConditionBase):
+        built = (builder or ConditionExpressionBuilder()).build_expression(expression, is_key_condition)
+        names.update(built.attribute_name_placeholders)
+        values.update(built.attribute_value_placeholders)
+        expression = built.condition_expression
+    return expression, names, values
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise ExpressionError(f"Token inválido em: {expression[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'name' and text.upper() in _KEYWORDS:
+            kind, text = 'kw', text.upper()
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Parser descendente recursivo que gera uma AST de tuplas"""
+    
+    def __init__(self, expression: str, names: Dict[str, str]):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.names = names
+    
+    def peek(self, offset: int = 0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+    
+    def take(self, kind=None, text=None):
+        tok = self.peek()
+        if tok[0] is None or (kind and tok[0] != kind) or (text and tok[1] != text):
+            raise ExpressionError(f"Esperado {text or kind}, encontrado {tok[1]!r}")
+        self.pos += 1
+        return tok
+    
+    def accept(self, kind, text=None) -> bool:
+        tok = self.peek()
+        if tok[0] == kind and (text is None or tok[1] == text):
+            self.pos += 1
+            return True
+        return False
+    
+    def done(self) -> bool:
+        return self.pos >= len(self.tokens)
+    
+    # Caminhos e operandos
+    def path(self) -> Tuple:
+        parts = [self._name(self.take('name')[1])]
+        while True:
+            if self.accept('punct', '.'):
+                parts.append(self._name(self.take('name')[1]))
+            elif self.accept('punct', '['):
+                parts.append(int(self.take('number')[1]))
+                self.take('punct', ']')
+            else:
+                return ('path', tuple(parts))
+    
+    def _name(self, token: str) -> str:
+        if token.startswith('#'):
+            if token not in self.names:
+                raise ExpressionError(f"ExpressionAttributeName ausente: {token}")
+            return self.names[token]
+        return token
+    
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.pos += 1
+            return ('value', text)
+        if kind == 'name' and text in _FUNCTIONS and self.peek(1) == ('punct', '('):
+            return self.function()
+        if kind == 'name':
+            return self.path()
+        raise ExpressionError(f"Operando inesperado: {text!r}")
+    
+    def function(self):
+        name = self.take('name')[1]
+        self.take('punct', '(')
+        args = [self.operand()]
+        while self.accept('punct', ','):
+            args.append(self.operand())
+        self.take('punct', ')')
+        return ('func', name, args)
+    
+    # Condições
+    def condition(self):
+        node = self.and_condition()
+        while self.accept('kw', 'OR'):
+            node = ('or', node, self.and_condition())
+        return node
+    
+    def and_condition(self):
+        node = self.not_condition()
+        while self.accept('kw', 'AND'):
+            node = ('and', node, self.not_condition())
+        return node
+    
+    def not_condition(self):
+        if self.accept('kw', 'NOT'):
+            return ('not', self.not_condition())
+        if self.accept('punct', '('):
+            node = self.condition()
+            self.take('punct', ')')
+            return node
+        return self.comparison()
+    
+    def comparison(self):
+        left = self.operand()
+        kind, text = self.peek()
+        if kind == 'op':
+            self.pos += 1
+            return ('cmp', text, left, self.operand())
+        if self.accept('kw', 'BETWEEN'):
+            low = self.operand()
+            self.take('kw', 'AND')
+            return ('between', left, low, self.operand())
+        if self.accept('kw', 'IN'):
+            self.take('punct', '(')
+            options = [self.operand()]
+            while self.accept('punct', ','):
+                options.append(self.operand())
+            self.take('punct', ')')
+            return ('in', left, options)
+        if left[0] == 'func':
+            return ('test', left)
+        raise ExpressionError(f"Comparação incompleta perto de {text!r}")
+    
+    # Atualizações
+    def update(self) -> List[Tuple]:
+        actions = []
+        while not self.done():
+            clause = self.take('kw')[1]
+            while True:
+                if clause == 'SET':
+                    target = self.path()
+                    self.take('op', '=')
+                    actions.append(('SET', target, self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', self.path(), None))
+                elif clause in ('ADD', 'DELETE'):
+                    actions.append((clause, self.path(), self.operand()))
+                else:
+                    raise ExpressionError(f"Cláusula de update inválida: {clause}")
+                if not self.accept('punct', ','):
+                    break
+        return actions
+    
+    def set_value(self):
+        node = self.operand()
+        while self.peek() in (('punct', '+'), ('punct', '-')):
+            op = self.take('punct')[1]
+            node = ('arith', op, node, self.operand())
+        return node
+
+
+_CACHE: Dict[Tuple, Any] = {}
+
+
+def _parse(kind: str, expression: str, names: Dict[str, str]):
+    key = (kind, expression, tuple(sorted(names.items())))
+    ast = _CACHE.get(key)
+    if ast is None:
+        parser = _Parser(expression, names)
+        ast = parser.update() if kind == 'update' else parser.condition()
+        if not parser.done():
+            raise ExpressionError(f"Sobrou texto na expressão: {expression!r}")
+        if len(_CACHE) > 512:
+            _CACHE.clear()
+        _CACHE[key] = ast
+    return ast
+
+
+def parse_condition(expression: str, names: Optional[Dict] = None):
+    """Retorna a AST de uma condição"""
+    return _parse('cond', expression, names or {})
+
+
+# Avaliação
+def _get_path(item: Dict, path: Tuple):
+    current = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(current, list) or part >= len(current):
+                return _MISSING
+            current = current[part]
+        else:
+            if not isinstance(current, dict) or part not in current:
+                return _MISSING
+            current = current[part]
+    return current
+
+
+def _resolve(node, item: Dict, values: Dict):
+    kind = node[0]
+    if kind == 'value':
+        if node[1] not in values:
+            raise ExpressionError(f"ExpressionAttributeValue ausente: {node[1]}")
+        return values[node[1]]
+    if kind == 'path':
+        return _get_path(item, node[1])
+    if kind == 'func':
+        name, args = node[1], node[2]
+        if name == 'size':
+            value = _resolve(args[0], item, values)
+            return _MISSING if value is _MISSING else Decimal(len(value))
+        if name == 'if_not_exists':
+            value = _resolve(args[0], item, values)
+            return _resolve(args[1], item, values) if value is _MISSING else value
+        if name == 'list_append':
+            left, right = (_resolve(a, item, values) for a in args)
+            return list(left if left is not _MISSING else []) + list(right if right is not _MISSING else [])
+        return _test_function(name, args, item, values)
+    if kind == 'arith':
+        left = _resolve(node[2], item, values)
+        right = _resolve(node[3], item, values)
+        if left is _MISSING or right is _MISSING:
+            raise ExpressionError("Operando inexistente em expressão aritmética")
+        return left + right if node[1] == '+' else left - right
+    raise ExpressionError(f"Nó inesperado: {kind}")
+
+
+def _test_function(name: str, args: List, item: Dict, values: Dict) -> bool:
+    if name == 'attribute_exists':
+        return _resolve(args[0], item, values) is not _MISSING
+    if name == 'attribute_not_exists':
+        return _resolve(args[0], item, values) is _MISSING
+    value = _resolve(args[0], item, values)
+    operand = _resolve(args[1], item, values)
+    if value is _MISSING:
+        return False
+    if name == 'begins_with':
+        return isinstance(value, (str, bytes)) and value.startswith(operand)
+    if name == 'contains':
+        try:
+            return operand in value
+        except TypeError:
+            return False
+    raise ExpressionError(f"Função não suportada: {name}")
+
+
+def _compare(op: str, left, right) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return op == '<>'
+    if op == '=':
+        return left == right
+    if op == '<>':
+        return left != right
+    try:
+        if op == '<':
+            return left < right
+        if op == '<=':
+            return left <= right
+        if op == '>':
+            return left > right
+        return left >= right
+    except TypeError:
+        return False
+
+
+def _evaluate(node, item: Dict, values: Dict) -> bool:
+    kind = node[0]
+    if kind == 'and':
+        return _evaluate(node[1], item, values) and _evaluate(node[2], item, values)
+    if kind == 'or':
+        return _evaluate(node[1], item, values) or _evaluate(node[2], item, values)
+    if kind == 'not':
+        return not _evaluate(node[1], item, values)
+    if kind == 'cmp':
+        return _compare(node[1], _resolve(node[2], item, values), _resolve(node[3], item, values))
+    if kind == 'between':
+        value = _resolve(node[1], item, values)
+        return (_compare('>=', value, _resolve(node[2], item, values))
+                and _compare('<=', value, _resolve(node[3], item, values)))
+    if kind == 'in':
+        value = _resolve(node[1], item, values)
+        return any(_compare('=', value, _resolve(o, item, values)) for o in node[2])
+    if kind == 'test':
+        return bool(_resolve(node[1], item, values))
+    raise ExpressionError(f"Nó de condição inesperado: {kind}")
+
+
+def evaluate(expression, item: Optional[Dict], names: Optional[Dict] = None,
+             values: Optional[Dict] = None) -> bool:
+    """Avalia uma condição contra um item (None = item inexistente)"""
+    if expression is None:
+        return True
+    expression, names, values = normalize(expression, names, values)
+    return _evaluate(parse_condition(expression, names), item or {}, values)
+
+
+def matches(ast, item: Dict, values: Dict) -> bool:
+    """Avalia uma AST já compilada com parse_condition (laços de query/scan)"""
+    return _evaluate(ast, item, values)
+
+
+def key_conditions(expression, names: Optional[Dict] = None,
+                   values: Optional[Dict] = None) -> Dict[str, Tuple]:
+    """Extrai as condições de chave como {atributo: (operador, valor[, valor2])}
+
+    Usado pelos backends para transformar a KeyConditionExpression em consulta
+    indexada; a condição completa continua sendo reavaliada sobre os itens.
+    """
+    expression, names, values = normalize(expression, names, values, is_key_condition=True)
+    result = {}
+    
+    def visit(node):
+        if node[0] == 'and':
+            visit(node[1])
+            visit(node[2])
+        elif node[0] == 'cmp' and node[2][0] == 'path' and node[3][0] == 'value':
+            result[node[2][1][0]] = (node[1], values[node[3][1]])
+        elif node[0] == 'between' and node[1][0] == 'path':
+            result[node[1][1][0]] = ('BETWEEN', values[node[2][1]], values[node[3][1]])
+        elif node[0] == 'test' and node[1][1] == 'begins_with':
+            result[node[1][2][0][1][0]] = ('begins_with', values[node[1][2][1][1]])
+        else:
+            raise ExpressionError("KeyConditionExpression não suportada")
+    
+    visit(parse_condition(expression, names))
+    return result
+
+
+def _set_path(item: Dict, path: Tuple, value) -> None:
+    current = item
+    for part in path[:-1]:
+        current = current.setdefault(part, {}) if isinstance(part, str) else current[part]
+    if isinstance(path[-1], int):
+        lst = current
+        if path[-1] < len(lst):
+            lst[path[-1]] = value
+        else:
+            lst.append(value)
+    else:
+        current[path[-1]] = value
+
+
+def _remove_path(item: Dict, path: Tuple) -> None:
+    parent = _get_path(item, path[:-1]) if len(path) > 1 else item
+    if parent is _MISSING:
+        return
+    if isinstance(path[-1], int):
+        if isinstance(parent, list) and path[-1] < len(parent):
+            parent.pop(path[-1])
+    elif isinstance(parent, dict):
+        parent.pop(path[-1], None)
+
+
+def apply_update(expression: str, item: Dict, names: Optional[Dict] = None,
+                 values: Optional[Dict] = None) -> Dict:
+    """Aplica uma UpdateExpression sobre uma cópia do item e a retorna"""
+    names, values = names or {}, values or {}
+    actions = _parse('update', expression, names)
+    original = item
+    item = _deep_copy(item)
+    for action, (_, path), operand in actions:
+        if action == 'SET':
+            # Valores do lado direito referem-se ao item antes da atualização
+            _set_path(item, path, _deep_copy(_resolve(operand, original, values)))
+        elif action == 'REMOVE':
+            _remove_path(item, path)
+        elif action == 'ADD':
+            delta = _resolve(operand, original, values)
+            current = _get_path(item, path)
+            if isinstance(delta, set):
+                _set_path(item, path, (set() if current is _MISSING else set(current)) | delta)
+            else:
+                _set_path(item, path, (Decimal(0) if current is _MISSING else current) + delta)
+        elif action == 'DELETE':
+            current = _get_path(item, path)
+            if current is not _MISSING:
+                remaining = set(current) - _resolve(operand, original, values)
+                if remaining:
+                    _set_path(item, path, remaining)
+                else:
+                    _remove_path(item, path)
+    return item
+
+
+def _deep_copy(value):
+    if isinstance(value, dict):
+        return {k: _deep_copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_deep_copy(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def project(item: Dict, projection: Optional[str], names: Optional[Dict] = None) -> Dict:
+    """Aplica ProjectionExpression (apenas atributos de primeiro nível)"""
+    if not projection:
+        return item
+    names = names or {}
+    wanted = [names.get(p.strip(), p.strip()) for p in projection.split(',')]
+    return {k: item[k] for k in wanted if k in item}
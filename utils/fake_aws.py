@@ -0,0 +1,828 @@
+"""
+Camada AWS falsa em memória para benchmarks e testes determinísticos
+
+Substitui DynamoDB (resource), Bedrock (runtime e catálogo de modelos), S3 e CloudWatch Logs dentro do
+``AWSClient`` sem rede. O DynamoDB falso modela o comportamento que importa
+para desempenho: páginas de 1 MB, ``Limit`` aplicado antes do filtro,
+``ConsumedCapacity`` (RCU/WCU pelas regras de 4 KB/1 KB) e, opcionalmente,
+throttling pela capacidade provisionada.
+
+Uso típico::
+
+    fake = FakeAWS(bedrock_latency=0.2)
+    get_aws_client().use_fake(fake)
+    seed_synthetic(fake, users=2000, answers_per_user=40)
+"""
+import bisect
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import hashlib
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from unittest.mock import patch
+
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from botocore.exceptions import ClientError
+
+from config import DYNAMODB_TABLES, TRAINING_CATEGORIES, DIFFICULTY_LEVELS
+from utils import expressions
+from utils.aws_client import AWSClient
+from utils.capacity import item_size
+from utils.storage import TABLE_SCHEMAS, DynamoDBBackend, _normalize_numbers
+
+PAGE_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _exceptions(*codes: str) -> SimpleNamespace:
+    """Namespace `client.exceptions` com subclasses de ClientError por código"""
+    namespace = {}
+    for code in codes:
+        namespace[code] = type(code, (ClientError,), {})
+    namespace['ClientError'] = ClientError
+    return SimpleNamespace(**namespace)
+
+
+def _raise(exceptions: SimpleNamespace, code: str, message: str, operation: str):
+    raise getattr(exceptions, code)({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _copy(value):
+    """Cópia profunda barata (o boto3 sempre devolve objetos novos)"""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+class _TokenBucket:
+    """Capacidade provisionada por segundo (com burst de 300 s, como no DynamoDB)"""
+    
+    def __init__(self, rate: float, clock: Callable[[], float]):
+        self.rate = rate
+        self.capacity = rate * 300
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+    
+    def consume(self, amount: float) -> bool:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+
+class FakeTable:
+    """Tabela DynamoDB em memória com a API do boto3 Table"""
+    
+    def __init__(self, fake: 'FakeAWS', name: str, schema: Dict,
+                 read_capacity: Optional[float] = None, write_capacity: Optional[float] = None):
+        self.fake = fake
+        self.name = self.table_name = name
+        self.schema = schema
+        self._partitions: Dict = {}   # pk -> {'keys': [sk ordenados], 'items': {sk: item}}
+        self._hash_keys: List = []    # pks ordenados (scan estável)
+        self._lock = threading.RLock()
+        self._read_bucket = _TokenBucket(read_capacity, fake.clock) if read_capacity else None
+        self._write_bucket = _TokenBucket(write_capacity, fake.clock) if write_capacity else None
+        self.consumed = {'read': 0.0, 'write': 0.0}
+        self.calls: Dict[str, int] = {}
+    
+    # Infraestrutura
+    def _key(self, item: Dict):
+        range_attr = self.schema['range']
+        try:
+            return item[self.schema['hash']], (item[range_attr] if range_attr else '')
+        except KeyError:
+            raise _error('ValidationException', 'Chave incompleta', 'Item')
+    
+    def _count(self, operation: str) -> None:
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.fake.dynamodb_latency:
+            time.sleep(self.fake.dynamodb_latency)
+    
+    def _charge(self, kind: str, units: float, operation: str, request: Dict) -> Dict:
+        bucket = self._read_bucket if kind == 'read' else self._write_bucket
+        if bucket and not bucket.consume(units):
+            raise _error('ProvisionedThroughputExceededException',
+                         'The level of configured provisioned throughput for the table was exceeded',
+                         operation)
+        self.consumed[kind] += units
+        if request.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            key = 'ReadCapacityUnits' if kind == 'read' else 'WriteCapacityUnits'
+            return {'ConsumedCapacity': {'TableName': self.name, 'CapacityUnits': units, key: units}}
+        return {}
+    
+    @staticmethod
+    def _read_units(size: int, consistent: bool) -> float:
+        units = max(1, math.ceil(size / READ_UNIT_BYTES))
+        return float(units) if consistent else units / 2
+    
+    @staticmethod
+    def _write_units(size: int) -> float:
+        return float(max(1, math.ceil(size / WRITE_UNIT_BYTES)))
+    
+    def _get(self, pk, sk) -> Optional[Dict]:
+        partition = self._partitions.get(pk)
+        return partition['items'].get(sk) if partition else None
+    
+    def _store(self, item: Dict) -> None:
+        pk, sk = self._key(item)
+        partition = self._partitions.get(pk)
+        if partition is None:
+            partition = self._partitions[pk] = {'keys': [], 'items': {}}
+            bisect.insort(self._hash_keys, pk)
+        if sk not in partition['items']:
+            bisect.insort(partition['keys'], sk)
+        partition['items'][sk] = item
+    
+    def _remove(self, pk, sk) -> Optional[Dict]:
+        partition = self._partitions.get(pk)
+        if not partition or sk not in partition['items']:
+            return None
+        partition['keys'].remove(sk)
+        old = partition['items'].pop(sk)
+        if not partition['items']:
+            del self._partitions[pk]
+            self._hash_keys.remove(pk)
+        return old
+    
+    def _check(self, request: Dict, current: Optional[Dict], operation: str) -> None:
+        condition = request.get('ConditionExpression')
+        if condition is not None and not expressions.evaluate(
+                condition, current, request.get('ExpressionAttributeNames'),
+                request.get('ExpressionAttributeValues')):
+            raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+    
+    # Escrita
+    def put_item(self, **request) -> Dict:
+        self._count('PutItem')
+        item = _normalize_numbers(_copy(request['Item']))
+        with self._lock:
+            current = self._get(*self._key(item))
+            self._check(request, current, 'PutItem')
+            size = max(item_size(item), item_size(current) if current else 0)
+            response = self._charge('write', self._write_units(size), 'PutItem', request)
+            self._store(item)
+        if request.get('ReturnValues') == 'ALL_OLD' and current:
+            response['Attributes'] = _copy(current)
+        return response
+    
+    def delete_item(self, **request) -> Dict:
+        self._count('DeleteItem')
+        with self._lock:
+            pk, sk = self._key(request['Key'])
+            current = self._get(pk, sk)
+            self._check(request, current, 'DeleteItem')
+            response = self._charge('write', self._write_units(item_size(current or {})),
+                                    'DeleteItem', request)
+            self._remove(pk, sk)
+        if request.get('ReturnValues') == 'ALL_OLD' and current:
+            response['Attributes'] = _copy(current)
+        return response
+    
+    def update_item(self, **request) -> Dict:
+        self._count('UpdateItem')
+        with self._lock:
+            key = request['Key']
+            current = self._get(*self._key(key))
+            self._check(request, current, 'UpdateItem')
+            updated = expressions.apply_update(
+                request['UpdateExpression'], current if current is not None else dict(key),
+                request.get('ExpressionAttributeNames'),
+                _normalize_numbers(request.get('ExpressionAttributeValues') or {})
+            )
+            size = max(item_size(updated), item_size(current) if current else 0)
+            response = self._charge('write', self._write_units(size), 'UpdateItem', request)
+            self._store(updated)
+        
+        mode = request.get('ReturnValues', 'NONE')
+        if mode == 'ALL_NEW':
+            response['Attributes'] = _copy(updated)
+        elif mode == 'ALL_OLD' and current:
+            response['Attributes'] = _copy(current)
+        elif mode in ('UPDATED_NEW', 'UPDATED_OLD'):
+            source = updated if mode == 'UPDATED_NEW' else (current or {})
+            response['Attributes'] = {
+                k: source[k] for k in set(updated) | set(current or {})
+                if (current or {}).get(k) != updated.get(k) and k in source
+            }
+        return response
+    
+    def batch_writer(self, overwrite_by_pkeys=None) -> '_FakeBatchWriter':
+        return _FakeBatchWriter(self)
+    
+    # Leitura
+    def get_item(self, **request) -> Dict:
+        self._count('GetItem')
+        with self._lock:
+            item = self._get(*self._key(request['Key']))
+            response = self._charge('read', self._read_units(item_size(item or {}),
+                                                             request.get('ConsistentRead', False)),
+                                    'GetItem', request)
+        if item is not None:
+            response['Item'] = _copy(expressions.project(
+                item, request.get('ProjectionExpression'), request.get('ExpressionAttributeNames')
+            ))
+        return response
+    
+    def query(self, **request) -> Dict:
+        self._count('Query')
+        builder = ConditionExpressionBuilder()
+        key_expr, names, values = expressions.normalize(
+            request['KeyConditionExpression'], request.get('ExpressionAttributeNames'),
+            request.get('ExpressionAttributeValues'), True, builder
+        )
+        filter_expr, names, values = expressions.normalize(
+            request.get('FilterExpression'), names, values, builder=builder
+        )
+        request = dict(request, FilterExpression=filter_expr)
+        conditions = expressions.key_conditions(key_expr, names, values)
+        index = request.get('IndexName')
+        
+        # A condição de chave seleciona os itens antes do Limit (como no DynamoDB);
+        # só o filtro é aplicado depois da leitura.
+        key_ast = expressions.parse_condition(key_expr, names)
+        with self._lock:
+            if index:
+                hash_attr = self.schema['indexes'][index][0]
+                wanted = conditions[hash_attr][1]
+                candidates = [
+                    item
+                    for pk in self._hash_keys
+                    for sk in self._partitions[pk]['keys']
+                    for item in (self._partitions[pk]['items'][sk],)
+                    if item.get(hash_attr) == wanted and expressions.matches(key_ast, item, values)
+                ]
+            else:
+                partition = self._partitions.get(conditions[self.schema['hash']][1])
+                candidates = [
+                    partition['items'][sk] for sk in partition['keys']
+                    if expressions.matches(key_ast, partition['items'][sk], values)
+                ] if partition else []
+            if not request.get('ScanIndexForward', True):
+                candidates.reverse()
+            return self._paginate('Query', candidates, request, names, values, index)
+    
+    def scan(self, **request) -> Dict:
+        self._count('Scan')
+        filter_expr, names, values = expressions.normalize(
+            request.get('FilterExpression'), request.get('ExpressionAttributeNames'),
+            request.get('ExpressionAttributeValues')
+        )
+        total = request.get('TotalSegments')
+        segment = request.get('Segment', 0)
+        with self._lock:
+            candidates = [
+                self._partitions[pk]['items'][sk]
+                for pk in self._hash_keys
+                if not total or _segment_of(pk, total) == segment
+                for sk in self._partitions[pk]['keys']
+            ]
+            request = dict(request, FilterExpression=filter_expr)
+            return self._paginate('Scan', candidates, request, names, values, None)
+    
+    def _paginate(self, operation, candidates, request, names, values, index) -> Dict:
+        start_key = request.get('ExclusiveStartKey')
+        if start_key:
+            start = self._key(start_key)
+            positions = [i for i, item in enumerate(candidates) if self._key(item) == start]
+            candidates = candidates[positions[0] + 1:] if positions else []
+        
+        limit = request.get('Limit')
+        filter_expr = request.get('FilterExpression')
+        filter_ast = expressions.parse_condition(filter_expr, names) if filter_expr else None
+        
+        items, scanned, size = [], 0, 0
+        for item in candidates:
+            if (limit and scanned >= limit) or size >= PAGE_BYTES:
+                break
+            scanned += 1
+            size += item_size(item)
+            if filter_ast and not expressions.matches(filter_ast, item, values):
+                continue
+            items.append(item)
+        
+        response = self._charge(
+            'read', self._read_units(size, request.get('ConsistentRead', False)), operation, request
+        )
+        response['Count'] = len(items)
+        response['ScannedCount'] = scanned
+        if request.get('Select') != 'COUNT':
+            response['Items'] = [
+                _copy(expressions.project(i, request.get('ProjectionExpression'), names)) for i in items
+            ]
+        if scanned < len(candidates) and scanned:
+            last = candidates[scanned - 1]
+            key_names = [self.schema['hash']] + ([self.schema['range']] if self.schema['range'] else [])
+            if index:
+                key_names += [n for n in self.schema['indexes'][index] if n]
+            response['LastEvaluatedKey'] = {n: last[n] for n in key_names if n in last}
+        return response
+    
+    def item_count(self) -> int:
+        return sum(len(p['items']) for p in self._partitions.values())
+
+
+def _segment_of(pk, total: int) -> int:
+    digest = hashlib.md5(str(pk).encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % total
+
+
+class _FakeBatchWriter:
+    """batch_writer falso: agrupa em lotes de 25 como o BatchWriteItem"""
+    
+    def __init__(self, table: FakeTable):
+        self.table = table
+        self._pending: List = []
+    
+    def put_item(self, Item: Dict) -> None:
+        self._pending.append(('put', Item))
+        if len(self._pending) >= 25:
+            self._flush()
+    
+    def delete_item(self, Key: Dict) -> None:
+        self._pending.append(('delete', Key))
+        if len(self._pending) >= 25:
+            self._flush()
+    
+    def _flush(self) -> None:
+        self.table._count('BatchWriteItem')
+        for action, payload in self._pending:
+            if action == 'put':
+                self.table.put_item(Item=payload)
+            else:
+                self.table.delete_item(Key=payload)
+        self._pending = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self._pending:
+            self._flush()
+        return False
+
+
+class FakeDynamoDBClient:
+    """Parte de baixo nível usada pela aplicação (describe_table, exceções)"""
+    
+    def __init__(self, resource: 'FakeDynamoDBResource'):
+        self.resource = resource
+        self.exceptions = _exceptions(
+            'ConditionalCheckFailedException', 'ResourceNotFoundException',
+            'ProvisionedThroughputExceededException'
+        )
+    
+    def describe_table(self, TableName: str) -> Dict:
+        table = self.resource._tables.get(TableName)
+        if table is None:
+            _raise(self.exceptions, 'ResourceNotFoundException', f'Tabela {TableName} inexistente',
+                   'DescribeTable')
+        return {'Table': {'TableName': TableName, 'TableStatus': 'ACTIVE',
+                          'ItemCount': table.item_count()}}
+
+
+class FakeDynamoDBResource:
+    """Resource DynamoDB falso"""
+    
+    def __init__(self, fake: 'FakeAWS'):
+        self.fake = fake
+        self._tables: Dict[str, FakeTable] = {}
+        self._lock = threading.Lock()
+        self.meta = SimpleNamespace(client=FakeDynamoDBClient(self))
+    
+    def create_table(self, name: str, schema: Dict, read_capacity: Optional[float] = None,
+                     write_capacity: Optional[float] = None) -> FakeTable:
+        with self._lock:
+            table = self._tables[name] = FakeTable(self.fake, name, schema, read_capacity, write_capacity)
+        return table
+    
+    def Table(self, name: str) -> FakeTable:
+        table = self._tables.get(name)
+        if table is None:
+            logical = {v: k for k, v in DYNAMODB_TABLES.items()}.get(name)
+            if logical is None:
+                raise _error('ResourceNotFoundException', f'Tabela {name} inexistente', 'DescribeTable')
+            table = self.create_table(name, TABLE_SCHEMAS[logical],
+                                      self.fake.read_capacity, self.fake.write_capacity)
+        return table
+    
+    def batch_get_item(self, RequestItems: Dict, ReturnConsumedCapacity: str = 'NONE') -> Dict:
+        responses, consumed = {}, []
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            keys = request['Keys']
+            if len(keys) > 100:
+                raise _error('ValidationException', 'Too many items requested for the BatchGetItem call',
+                             'BatchGetItem')
+            table._count('BatchGetItem')
+            units = 0.0
+            found = []
+            with table._lock:
+                for key in keys:
+                    item = table._get(*table._key(key))
+                    units += table._read_units(item_size(item or {}), request.get('ConsistentRead', False))
+                    if item is not None:
+                        found.append(_copy(expressions.project(
+                            item, request.get('ProjectionExpression'),
+                            request.get('ExpressionAttributeNames')
+                        )))
+            table._charge('read', units, 'BatchGetItem', {})
+            responses[name] = found
+            consumed.append({'TableName': name, 'CapacityUnits': units, 'ReadCapacityUnits': units})
+        response = {'Responses': responses, 'UnprocessedKeys': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            response['ConsumedCapacity'] = consumed
+        return response
+    
+    def batch_write_item(self, RequestItems: Dict, ReturnConsumedCapacity: str = 'NONE') -> Dict:
+        for name, requests in RequestItems.items():
+            with self.Table(name).batch_writer() as batch:
+                for request in requests:
+                    if 'PutRequest' in request:
+                        batch.put_item(Item=request['PutRequest']['Item'])
+                    else:
+                        batch.delete_item(Key=request['DeleteRequest']['Key'])
+        return {'UnprocessedItems': {}}
+
+
+class _StreamingBody(io.BytesIO):
+    """Imita botocore StreamingBody (read/iter_chunks/close)"""
+    
+    def iter_chunks(self, chunk_size: int = 1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class FakeBedrockRuntime:
+    """Bedrock Runtime falso com latência, throttling e respostas configuráveis
+
+    `responses` pode ser uma string fixa, uma lista (consumida em ciclo) ou uma
+    função ``f(prompt) -> str``. Sem `responses`, gera um texto curto em
+    português (ou um array JSON quando o prompt pedir um).
+    """
+    
+    def __init__(self, latency: Union[float, Callable[[], float]] = 0.0, throttle_rate: float = 0.0,
+                 responses=None, seed: int = 0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.responses = responses
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.exceptions = _exceptions('ThrottlingException', 'ValidationException',
+                                      'ServiceQuotaExceededException', 'ModelTimeoutException')
+    
+    def _text_for(self, prompt: str, index: int) -> str:
+        if callable(self.responses):
+            return self.responses(prompt)
+        if isinstance(self.responses, (list, tuple)):
+            return self.responses[index % len(self.responses)]
+        if isinstance(self.responses, str):
+            return self.responses
+        if 'array JSON' in prompt:
+            count = prompt.count('Resposta do aluno:')
+            return json.dumps([
+                {'index': i, 'feedback': f'Feedback simulado para a questão {i + 1}.'}
+                for i in range(count)
+            ], ensure_ascii=False)
+        return 'Feedback simulado: revise o conceito e continue praticando.'
+    
+    def invoke_model(self, modelId: str, body, **kwargs) -> Dict:
+        with self._lock:
+            self.calls += 1
+            index = self.calls - 1
+            throttled = self._random.random() < self.throttle_rate
+            if throttled:
+                self.throttled += 1
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            _raise(self.exceptions, 'ThrottlingException', 'Too many requests, please wait', 'InvokeModel')
+        
+        payload = json.loads(body) if isinstance(body, (str, bytes)) else body
+        prompt = payload['messages'][0]['content'][0]['text']
+        text = self._text_for(prompt, index)
+        result = {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+            'stopReason': 'end_turn',
+            'usage': {'inputTokens': len(prompt) // 4, 'outputTokens': len(text) // 4}
+        }
+        return {
+            'body': _StreamingBody(json.dumps(result, ensure_ascii=False).encode('utf-8')),
+            'contentType': 'application/json'
+        }
+
+
+class FakeBedrockControl:
+    """Plano de controle do Bedrock falso: apenas o catálogo de modelos"""
+    
+    def __init__(self, models: Optional[List[str]] = None):
+        self.models = models if models is not None else [
+            'amazon.nova-micro-v1:0', 'amazon.nova-lite-v1:0', 'amazon.nova-pro-v1:0'
+        ]
+        self.calls = 0
+    
+    def list_foundation_models(self, byProvider: Optional[str] = None, **kwargs) -> Dict:
+        self.calls += 1
+        return {'modelSummaries': [
+            {'modelId': model_id, 'providerName': model_id.split('.')[0].capitalize()}
+            for model_id in self.models
+            if byProvider is None or model_id.split('.')[0] == byProvider.lower()
+        ]}
+
+
+class FakeS3:
+    """S3 falso (objetos, metadados, multipart e URLs pré-assinadas)"""
+    
+    MIN_PART_SIZE = 5 * 1024 * 1024
+    
+    def __init__(self):
+        self.objects: Dict = {}
+        self._uploads: Dict = {}
+        self._lock = threading.Lock()
+        self.exceptions = _exceptions('NoSuchKey', 'NoSuchBucket', 'NoSuchUpload', 'EntityTooSmall')
+    
+    def put_object(self, Bucket: str, Key: str, Body=b'', ContentType: str = 'binary/octet-stream',
+                   Metadata: Optional[Dict] = None, **kwargs) -> Dict:
+        data = Body.read() if hasattr(Body, 'read') else Body
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        with self._lock:
+            self.objects[(Bucket, Key)] = {
+                'Body': bytes(data), 'ContentType': ContentType,
+                'Metadata': dict(Metadata or {}), 'ETag': etag,
+                'LastModified': datetime.now()
+            }
+        return {'ETag': etag}
+    
+    def _object(self, Bucket: str, Key: str, operation: str) -> Dict:
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            _raise(self.exceptions, 'NoSuchKey', 'The specified key does not exist.', operation)
+        return obj
+    
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        obj = self._object(Bucket, Key, 'HeadObject')
+        return {'ContentLength': len(obj['Body']), 'ContentType': obj['ContentType'],
+                'Metadata': dict(obj['Metadata']), 'ETag': obj['ETag'],
+                'LastModified': obj['LastModified']}
+    
+    def get_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        response = self.head_object(Bucket, Key)
+        response['Body'] = _StreamingBody(self._object(Bucket, Key, 'GetObject')['Body'])
+        return response
+    
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+    
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict, ExpiresIn: int = 3600) -> str:
+        expires = int(time.time()) + ExpiresIn
+        return (f"https://{Params['Bucket']}.s3.fake.local/{Params['Key']}"
+                f"?X-Amz-Expires={ExpiresIn}&Expires={expires}")
+    
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'parts': {}, 'kwargs': kwargs}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+    
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body, **kwargs) -> Dict:
+        upload = self._uploads.get(UploadId)
+        if upload is None:
+            _raise(self.exceptions, 'NoSuchUpload', 'Upload inexistente', 'UploadPart')
+        data = Body.read() if hasattr(Body, 'read') else Body
+        upload['parts'][PartNumber] = bytes(data)
+        return {'ETag': '"%s"' % hashlib.md5(data).hexdigest()}
+    
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str,
+                                  MultipartUpload: Dict, **kwargs) -> Dict:
+        upload = self._uploads.pop(UploadId, None)
+        if upload is None:
+            _raise(self.exceptions, 'NoSuchUpload', 'Upload inexistente', 'CompleteMultipartUpload')
+        numbers = [p['PartNumber'] for p in MultipartUpload['Parts']]
+        if any(len(upload['parts'][n]) < self.MIN_PART_SIZE for n in numbers[:-1]):
+            _raise(self.exceptions, 'EntityTooSmall', 'Parte menor que 5 MB', 'CompleteMultipartUpload')
+        body = b''.join(upload['parts'][n] for n in numbers)
+        extra = upload['kwargs']
+        return self.put_object(Bucket=Bucket, Key=Key, Body=body,
+                               ContentType=extra.get('ContentType', 'binary/octet-stream'),
+                               Metadata=extra.get('Metadata'))
+    
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs) -> Dict:
+        self._uploads.pop(UploadId, None)
+        return {}
+
+
+class FakeCloudWatchLogs:
+    """CloudWatch Logs falso que valida os limites de PutLogEvents"""
+    
+    MAX_EVENTS = 10000
+    MAX_BYTES = 1048576
+    EVENT_OVERHEAD = 26
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.groups: Dict[str, Dict[str, List]] = {}
+        self._lock = threading.Lock()
+        self.put_calls = 0
+        self.exceptions = _exceptions('ResourceAlreadyExistsException', 'ResourceNotFoundException',
+                                      'InvalidParameterException', 'ThrottlingException')
+    
+    def create_log_group(self, logGroupName: str, **kwargs) -> Dict:
+        with self._lock:
+            if logGroupName in self.groups:
+                _raise(self.exceptions, 'ResourceAlreadyExistsException', 'Log group já existe',
+                       'CreateLogGroup')
+            self.groups[logGroupName] = {}
+        return {}
+    
+    def create_log_stream(self, logGroupName: str, logStreamName: str) -> Dict:
+        with self._lock:
+            group = self.groups.get(logGroupName)
+            if group is None:
+                _raise(self.exceptions, 'ResourceNotFoundException', 'Log group inexistente',
+                       'CreateLogStream')
+            if logStreamName in group:
+                _raise(self.exceptions, 'ResourceAlreadyExistsException', 'Log stream já existe',
+                       'CreateLogStream')
+            group[logStreamName] = []
+        return {}
+    
+    def put_log_events(self, logGroupName: str, logStreamName: str, logEvents: List[Dict],
+                       **kwargs) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        size = sum(len(e['message'].encode('utf-8')) + self.EVENT_OVERHEAD for e in logEvents)
+        if not logEvents or len(logEvents) > self.MAX_EVENTS or size > self.MAX_BYTES:
+            _raise(self.exceptions, 'InvalidParameterException', 'Lote fora dos limites', 'PutLogEvents')
+        timestamps = [e['timestamp'] for e in logEvents]
+        if timestamps != sorted(timestamps):
+            _raise(self.exceptions, 'InvalidParameterException',
+                   'Log events in a single PutLogEvents request must be in chronological order',
+                   'PutLogEvents')
+        with self._lock:
+            stream = self.groups.get(logGroupName, {}).get(logStreamName)
+            if stream is None:
+                _raise(self.exceptions, 'ResourceNotFoundException', 'Log stream inexistente',
+                       'PutLogEvents')
+            stream.extend(logEvents)
+            self.put_calls += 1
+        return {'nextSequenceToken': str(self.put_calls)}
+    
+    def describe_log_groups(self, logGroupNamePrefix: str = '', **kwargs) -> Dict:
+        return {'logGroups': [{'logGroupName': name} for name in self.groups
+                              if name.startswith(logGroupNamePrefix)]}
+    
+    def describe_log_streams(self, logGroupName: str, logStreamNamePrefix: str = '', **kwargs) -> Dict:
+        group = self.groups.get(logGroupName)
+        if group is None:
+            _raise(self.exceptions, 'ResourceNotFoundException', 'Log group inexistente',
+                   'DescribeLogStreams')
+        return {'logStreams': [{'logStreamName': name, 'storedBytes': 0} for name in group
+                               if name.startswith(logStreamNamePrefix)]}
+
+
+class FakeCognito:
+    """Cognito mínimo: apenas as exceções usadas por CognitoAuth"""
+    
+    def __init__(self):
+        self.exceptions = _exceptions('UsernameExistsException', 'NotAuthorizedException')
+
+
+class FakeAWS:
+    """Conjunto de serviços falsos conectável ao AWSClient (``use_fake``)"""
+    
+    def __init__(self, bedrock_latency: Union[float, Callable[[], float]] = 0.0,
+                 bedrock_throttle_rate: float = 0.0, bedrock_responses=None,
+                 dynamodb_latency: float = 0.0, read_capacity: Optional[float] = None,
+                 write_capacity: Optional[float] = None, logs_latency: float = 0.0,
+                 seed: int = 0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.dynamodb_latency = dynamodb_latency
+        self.read_capacity = read_capacity
+        self.write_capacity = write_capacity
+        self.dynamodb = FakeDynamoDBResource(self)
+        self.bedrock = FakeBedrockRuntime(bedrock_latency, bedrock_throttle_rate, bedrock_responses, seed)
+        self.bedrock_control = FakeBedrockControl()
+        self.s3 = FakeS3()
+        self.cloudwatch = FakeCloudWatchLogs(logs_latency)
+        self.cognito = FakeCognito()
+    
+    def service(self, name: str):
+        """Serviço pelo nome de propriedade do AWSClient"""
+        if name == 'dynamodb_client':
+            return self.dynamodb.meta.client
+        return getattr(self, name)
+    
+    def capacity_report(self) -> Dict[str, Dict]:
+        """RCU/WCU consumidos e chamadas por tabela desde a criação"""
+        return {
+            name: {'read_units': t.consumed['read'], 'write_units': t.consumed['write'],
+                   'items': t.item_count(), 'calls': dict(t.calls)}
+            for name, t in self.dynamodb._tables.items()
+        }
+    
+    def reset_counters(self) -> None:
+        for table in self.dynamodb._tables.values():
+            table.consumed = {'read': 0.0, 'write': 0.0}
+            table.calls = {}
+        self.bedrock.calls = self.bedrock.throttled = 0
+
+
+def seed_synthetic(fake: FakeAWS, users: int = 100, answers_per_user: int = 30,
+                   questions_per_category: int = 20, days: int = 90,
+                   accuracy_range=(0.4, 0.95), seed: int = 42) -> Dict[str, int]:
+    """Popula questões e respostas sintéticas em escala (determinístico por `seed`)"""
+    rng = random.Random(seed)
+    questions_table = fake.dynamodb.Table(DYNAMODB_TABLES['questions'])
+    progress_table = fake.dynamodb.Table(DYNAMODB_TABLES['progress'])
+    difficulties = list(DIFFICULTY_LEVELS)
+    
+    questions = []
+    for category in TRAINING_CATEGORIES:
+        for i in range(questions_per_category):
+            correct = rng.randrange(4)
+            question = {
+                'questionId': f'{category}-{i:04d}',
+                'question': f'Questão sintética {i + 1} sobre {category}?',
+                'options': [f'Opção {chr(65 + j)}' for j in range(4)],
+                'correctAnswer': str(correct),
+                'explanation': 'Explicação sintética.',
+                'category': category,
+                'difficulty': difficulties[i % len(difficulties)],
+                'why_wrong': {str(j): 'Motivo sintético.' for j in range(4) if j != correct},
+                'created_at': Decimal('1700000000')
+            }
+            questions.append(question)
+            questions_table._store(question)
+    
+    start = datetime.now() - timedelta(days=days)
+    answers = 0
+    for u in range(users):
+        user_id = f'user{u:05d}@example.com'
+        skill = rng.uniform(*accuracy_range)
+        timestamp = start.timestamp() + rng.uniform(0, 86400)
+        for _ in range(answers_per_user):
+            question = rng.choice(questions)
+            timestamp += rng.uniform(5, days * 86400 / answers_per_user)
+            progress_table._store({
+                'userId': user_id,
+                'timestamp': Decimal(str(round(timestamp, 6))),
+                'questionId': question['questionId'],
+                'correct': rng.random() < skill,
+                'category': question['category'],
+                'time_spent': rng.randint(5, 120)
+            })
+            answers += 1
+    
+    return {'questions': len(questions), 'users': users, 'answers': answers}
+
+
+@contextmanager
+def fake_aws_env(*modules: str, fake: Optional[FakeAWS] = None) -> Iterator[FakeAWS]:
+    """AWSClient do processo servindo `fake` (ou uma FakeAWS nova)
+    
+    O ``get_table`` de cada módulo em `modules` (ex.: ``'modules.ranking'``)
+    passa a devolver as tabelas falsas. Na saída os patches são desfeitos e o
+    singleton do AWSClient é descartado.
+    """
+    fake = fake or FakeAWS()
+    AWSClient._instance = None
+    try:
+        AWSClient().use_fake(fake)
+        with ExitStack() as stack:
+            table = DynamoDBBackend().table
+            for module in modules:
+                stack.enter_context(patch(f'{module}.get_table', table))
+            yield fake
+    finally:
+        AWSClient._instance = None
@@ -0,0 +1,208 @@
+"""
+Sondas periódicas de saúde e latência das dependências AWS
+
+Cada sonda é uma chamada barata (get_item de uma chave sentinela em cada
+tabela, listagem do catálogo de modelos do Bedrock, describe do log stream). Os resultados
+ficam em um buffer circular por dependência, do qual saem p50/p95/p99, taxa
+de erro e a série usada nos sparklines do painel de administração.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+from config import BEDROCK_CONFIG, HEALTH, LOG_GROUP
+from utils.aws_client import get_aws_client
+from utils.capacity import page
+from utils.storage import TABLE_SCHEMAS, get_table
+
+logger = logging.getLogger(__name__)
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def _table_probe(key: str) -> Callable[[], None]:
+    """get_item de uma chave inexistente: mede o caminho de leitura (0,5 RCU)"""
+    schema = TABLE_SCHEMAS[key]
+    sentinel = {schema['hash']: '__healthcheck__'}
+    if schema['range']:
+        sentinel[schema['range']] = Decimal(0) if schema['range_type'] == 'N' else '__healthcheck__'
+    
+    def probe():
+        get_table(key).get_item(Key=sentinel)
+    return probe
+
+
+def _bedrock_probe():
+    """Lista os modelos do provedor e confere o modelo configurado
+
+    Usa o plano de controle, que não é cobrado por chamada, em vez de uma
+    invocação do modelo a cada intervalo em cada processo.
+    """
+    model_id = BEDROCK_CONFIG['model_id']
+    response = get_aws_client().bedrock_control.list_foundation_models(byProvider=model_id.split('.')[0])
+    if not any(m['modelId'] == model_id for m in response.get('modelSummaries', [])):
+        raise RuntimeError(f"Modelo {model_id} indisponível na região")
+
+
+def _cloudwatch_probe():
+    get_aws_client().cloudwatch.describe_log_streams(logGroupName=LOG_GROUP, limit=1)
+
+
+def default_probes() -> Dict[str, Tuple[Callable[[], None], float]]:
+    """Sondas padrão: nome -> (função, intervalo em segundos)"""
+    probes = {
+        f'dynamodb:{key}': (_table_probe(key), HEALTH['interval'])
+        for key in TABLE_SCHEMAS
+    }
+    probes['bedrock'] = (_bedrock_probe, HEALTH['bedrock_interval'])
+    probes['cloudwatch'] = (_cloudwatch_probe, HEALTH['interval'])
+    return probes
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil por posto mais próximo"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def sparkline(values: List[Optional[float]]) -> str:
+    """Sparkline em texto; falhas (None) aparecem como '×'"""
+    present = [v for v in values if v is not None]
+    if not present:
+        return ''
+    low, high = min(present), max(present)
+    span = (high - low) or 1.0
+    return ''.join(
+        '×' if v is None else SPARK_CHARS[int((v - low) / span * (len(SPARK_CHARS) - 1))]
+        for v in values
+    )
+
+
+class HealthMonitor:
+    """Executa as sondas periodicamente e mantém janelas de amostras"""
+    
+    def __init__(self, probes: Optional[Dict[str, Tuple[Callable[[], None], float]]] = None,
+                 window: int = HEALTH['window'], clock: Callable[[], float] = time.time):
+        self.probes = probes if probes is not None else default_probes()
+        self.clock = clock
+        self._samples = {name: deque(maxlen=window) for name in self.probes}
+        self._next_run = {name: 0.0 for name in self.probes}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _probe(self, name: str, probe: Callable[[], None]) -> bool:
+        start = time.perf_counter()
+        error = None
+        try:
+            probe()
+        except Exception as e:
+            error = str(e)
+        latency_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._samples[name].append((self.clock(), latency_ms, error))
+        if error:
+            logger.warning(f"Sonda {name} falhou: {error}")
+        return error is None
+    
+    def run_once(self, force: bool = False) -> Dict[str, bool]:
+        """Executa as sondas vencidas (ou todas, com `force`)
+
+        A agenda é lida e reprogramada sob o lock; as sondas rodam fora dele.
+        """
+        now = self.clock()
+        with self._lock:
+            due = [name for name in self.probes if force or now >= self._next_run[name]]
+            for name in due:
+                self._next_run[name] = now + self.probes[name][1]
+        
+        results = {}
+        with page('health'):
+            for name in due:
+                results[name] = self._probe(name, self.probes[name][0])
+        return results
+    
+    def request_run(self) -> None:
+        """Antecipa todas as sondas para a próxima volta da thread de sondagem
+
+        Não executa nada na thread de quem chama (p.ex. o botão do painel):
+        apenas zera a agenda e acorda a thread.
+        """
+        with self._lock:
+            for name in self._next_run:
+                self._next_run[name] = 0.0
+        self._wake.set()
+    
+    def start(self) -> None:
+        """Inicia a thread de sondagem (idempotente)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        tick = min(interval for _, interval in self.probes.values()) if self.probes else 1.0
+        self._stop.clear()
+        
+        def loop():
+            while not self._stop.is_set():
+                self.run_once()
+                self._wake.wait(tick)
+                self._wake.clear()
+        
+        self._thread = threading.Thread(target=loop, name='health-probes', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+    
+    def stats(self, name: str) -> Dict:
+        """Latências (ms), taxa de erro e status de uma dependência"""
+        with self._lock:
+            samples = list(self._samples[name])
+        latencies = sorted(s[1] for s in samples if s[2] is None)
+        errors = [s for s in samples if s[2] is not None]
+        error_rate = len(errors) / len(samples) if samples else 0.0
+        p95 = _percentile(latencies, 0.95)
+        
+        if not samples:
+            status = 'unknown'
+        elif samples[-1][2] is not None:
+            status = 'down'
+        elif error_rate > HEALTH['degraded_error_rate'] or p95 > HEALTH['degraded_p95_ms']:
+            status = 'degraded'
+        else:
+            status = 'ok'
+        
+        return {
+            'status': status,
+            'samples': len(samples),
+            'p50_ms': _percentile(latencies, 0.50),
+            'p95_ms': p95,
+            'p99_ms': _percentile(latencies, 0.99),
+            'error_rate': error_rate,
+            'last_error': errors[-1][2] if errors else None,
+            'last_checked': samples[-1][0] if samples else None,
+            'series': [None if s[2] is not None else s[1] for s in samples]
+        }
+    
+    def report(self) -> Dict[str, Dict]:
+        return {name: self.stats(name) for name in self.probes}
+
+
+_monitor: Optional[HealthMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Retorna o monitor do processo, iniciando a sondagem no primeiro uso"""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = HealthMonitor()
+                _monitor.start()
+    return _monitor
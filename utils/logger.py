@@ -1,85 +1,337 @@
 """
 Módulo de logging centralizado com CloudWatch
 """
+import atexit
 import logging
 import json
+import os
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Any, Optional
+from typing import Dict, Iterator, List, Optional
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+from config import LOG_GROUP, LOGGING
 from utils.aws_client import get_aws_client
 
+class _Flush:
+    """Marcador na fila: envia o lote pendente e sinaliza `done`"""
+    
+    def __init__(self, stop: bool = False):
+        self.stop = stop
+        self.done = threading.Event()
+
+
 class CloudWatchHandler(logging.Handler):
-    """Handler customizado para enviar logs ao CloudWatch"""
+    """Handler que envia logs ao CloudWatch de forma assíncrona e em lotes
+
+    `emit` apenas enfileira o evento; uma thread de envio agrupa os eventos por
+    quantidade, bytes e tempo (respeitando os limites do PutLogEvents), ordena
+    os timestamps e reenvia com backoff exponencial. Com a fila cheia ou após
+    esgotar as tentativas, os eventos são gravados em disco (`spill_path`) e
+    reenviados na próxima inicialização, ou descartados com `overflow='drop'`.
+    Só falhas transitórias (throttling, 5xx, conexão) são repetidas; rejeições
+    permanentes (ex.: evento com mais de 14 dias, AccessDenied) são descartadas
+    e contadas em ``stats['dropped']``, sem backoff nem spill.
+    """
+    
+    RETRYABLE_CODES = {'ThrottlingException', 'ServiceUnavailableException', 'InternalFailure',
+                       'ServiceUnavailable', 'RequestLimitExceeded', 'ResourceNotFoundException'}
+    EVENT_OVERHEAD = 26
+    MAX_EVENT_BYTES = 256 * 1024 - EVENT_OVERHEAD
+    MAX_BATCH_SPAN_MS = 24 * 3600 * 1000
     
-    def __init__(self):
+    def __init__(self, log_group: str = LOG_GROUP,
+                 flush_interval: float = LOGGING['flush_interval'],
+                 max_events: int = LOGGING['batch_max_events'],
+                 max_bytes: int = LOGGING['batch_max_bytes'],
+                 queue_size: int = LOGGING['queue_size'],
+                 overflow: str = LOGGING['overflow'],
+                 spill_path: Optional[str] = LOGGING['spill_path'],
+                 max_retries: int = LOGGING['max_retries'],
+                 backoff_base: float = LOGGING['backoff_base']):
         super().__init__()
-        self.cloudwatch = get_aws_client().cloudwatch
-        self.log_group = '/cyberguard/app'
-        self.log_stream = f'app-{datetime.now().strftime("%Y-%m-%d")}'
-        self._ensure_log_group()
+        self.log_group = log_group
+        self.flush_interval = flush_interval
+        self.max_events = min(max_events, LOGGING['batch_max_events'])
+        self.max_bytes = min(max_bytes, LOGGING['batch_max_bytes'])
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.stats = {'sent': 0, 'batches': 0, 'retries': 0, 'spilled': 0, 'dropped': 0}
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spill_lock = threading.Lock()
+        self._group_ready = False
+        self._streams = set()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='cloudwatch-shipper', daemon=True)
+        self._thread.start()
+    
+    @property
+    def cloudwatch(self):
+        return get_aws_client().cloudwatch
+    
+    # Lado do chamador
+    def emit(self, record: logging.LogRecord):
+        """Enfileira o registro (sem chamadas de rede na thread do chamador)"""
+        if record.thread == self._thread.ident:
+            return  # Logs do próprio envio (botocore etc.) gerariam um laço
+        try:
+            event = {'timestamp': int(record.created * 1000), 'message': self._serialize(record)}
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._overflow([event])
+    
+    def _serialize(self, record: logging.LogRecord) -> str:
+        log_entry = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': self.format(record),
+            'extra': getattr(record, 'extra', {})
+        }
+        message = json.dumps(log_entry, ensure_ascii=False, default=str)
+        encoded = message.encode('utf-8')
+        if len(encoded) > self.MAX_EVENT_BYTES:
+            message = encoded[:self.MAX_EVENT_BYTES].decode('utf-8', 'ignore')
+        return message
+    
+    def flush(self, timeout: float = 10.0):
+        """Envia o que estiver pendente e aguarda (até `timeout` segundos)"""
+        self._signal(_Flush(), timeout)
+    
+    def close(self, timeout: float = 10.0):
+        """Esvazia a fila e encerra a thread de envio"""
+        if not self._closing:
+            self._closing = True
+            self._signal(_Flush(stop=True), timeout)
+        super().close()
+    
+    def _signal(self, marker: _Flush, timeout: float) -> None:
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return
+        marker.done.wait(timeout)
+    
+    # Thread de envio
+    def _run(self):
+        self._replay_spill()
+        batch: List[Dict] = []
+        size = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            if isinstance(item, _Flush) or item is None:
+                if batch:
+                    self._ship(batch)
+                batch, size, deadline = [], 0, None
+                if item is not None:
+                    item.done.set()
+                    if item.stop:
+                        return
+                continue
+            
+            event_size = len(item['message'].encode('utf-8')) + self.EVENT_OVERHEAD
+            if batch and size + event_size > self.max_bytes:
+                self._ship(batch)
+                batch, size, deadline = [], 0, None
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(item)
+            size += event_size
+            if len(batch) >= self.max_events:
+                self._ship(batch)
+                batch, size, deadline = [], 0, None
+    
+    def _ship(self, events: List[Dict]) -> None:
+        """Ordena e envia, separando lotes que cobririam mais de 24 horas"""
+        events = sorted(events, key=lambda e: e['timestamp'])
+        start = 0
+        for i in range(1, len(events) + 1):
+            span = events[i]['timestamp'] - events[start]['timestamp'] if i < len(events) else 0
+            if i == len(events) or span > self.MAX_BATCH_SPAN_MS:
+                self._put_with_retry(events[start:i])
+                start = i
+    
+    def _stream_name(self, timestamp_ms: int) -> str:
+        return f'app-{datetime.fromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%d")}'
     
-    def _ensure_log_group(self):
+    def _ensure_stream(self, stream: str) -> None:
         """Garante que o log group e stream existem"""
+        if stream in self._streams:
+            return
+        client = self.cloudwatch
+        if not self._group_ready:
+            try:
+                client.create_log_group(logGroupName=self.log_group)
+            except client.exceptions.ResourceAlreadyExistsException:
+                pass
+            self._group_ready = True
         try:
-            self.cloudwatch.create_log_group(logGroupName=self.log_group)
-        except self.cloudwatch.exceptions.ResourceAlreadyExistsException:
+            client.create_log_stream(logGroupName=self.log_group, logStreamName=stream)
+        except client.exceptions.ResourceAlreadyExistsException:
             pass
-        except Exception as e:
-            logging.error(f"Erro ao criar log group: {e}")
+        self._streams.add(stream)
+    
+    @classmethod
+    def _retryable(cls, error: Exception) -> bool:
+        """Se vale repetir o envio (erro transitório) ou descartar o lote"""
+        if isinstance(error, ClientError):
+            code = error.response.get('Error', {}).get('Code', '')
+            status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+            return code in cls.RETRYABLE_CODES or 'Throttl' in code or status >= 500
+        return isinstance(error, (BotoConnectionError, HTTPClientError))
+    
+    def _put_with_retry(self, events: List[Dict]) -> bool:
+        stream = self._stream_name(events[0]['timestamp'])
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._ensure_stream(stream)
+                self.cloudwatch.put_log_events(
+                    logGroupName=self.log_group,
+                    logStreamName=stream,
+                    logEvents=events
+                )
+                self.stats['sent'] += len(events)
+                self.stats['batches'] += 1
+                return True
+            except Exception as e:
+                if not self._retryable(e):
+                    self.stats['dropped'] += len(events)
+                    return False
+                if isinstance(e, ClientError) and e.response['Error'].get('Code') == 'ResourceNotFoundException':
+                    self._group_ready = False
+                    self._streams.discard(stream)
+            # No encerramento não há tempo para backoff: grava em disco
+            if attempt == self.max_retries or self._closing:
+                break
+            self.stats['retries'] += 1
+            time.sleep(self.backoff_base * 2 ** attempt)
         
+        self._overflow(events)
+        return False
+    
+    # Contrapressão
+    def _overflow(self, events: List[Dict]) -> None:
+        if self.overflow != 'spill' or not self.spill_path:
+            self.stats['dropped'] += len(events)
+            return
         try:
-            self.cloudwatch.create_log_stream(
-                logGroupName=self.log_group,
-                logStreamName=self.log_stream
-            )
-        except self.cloudwatch.exceptions.ResourceAlreadyExistsException:
-            pass
-        except Exception as e:
-            logging.error(f"Erro ao criar log stream: {e}")
+            with self._spill_lock:
+                directory = os.path.dirname(self.spill_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for event in events:
+                        f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self.stats['spilled'] += len(events)
+        except OSError:
+            self.stats['dropped'] += len(events)
     
-    def emit(self, record: logging.LogRecord):
-        """Envia registro de log ao CloudWatch"""
+    def _replay_spill(self) -> None:
+        """Reenvia eventos gravados em disco por execuções anteriores"""
+        if not self.spill_path:
+            return
+        replay_path = self.spill_path + '.replay'
+        if not os.path.exists(self.spill_path) and not os.path.exists(replay_path):
+            return
         try:
-            log_entry = {
-                'timestamp': datetime.now().isoformat(),
-                'level': record.levelname,
-                'logger': record.name,
-                'message': self.format(record),
-                'extra': getattr(record, 'extra', {})
-            }
-            
-            self.cloudwatch.put_log_events(
-                logGroupName=self.log_group,
-                logStreamName=self.log_stream,
-                logEvents=[{
-                    'timestamp': int(datetime.now().timestamp() * 1000),
-                    'message': json.dumps(log_entry, ensure_ascii=False)
-                }]
-            )
-        except Exception as e:
-            logging.error(f"Erro ao enviar log ao CloudWatch: {e}")
+            with self._spill_lock:
+                if os.path.exists(self.spill_path) and os.path.exists(replay_path):
+                    # Sobra de uma reexecução interrompida: junta em vez de sobrescrever
+                    with open(self.spill_path, encoding='utf-8') as src, \
+                            open(replay_path, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                    os.remove(self.spill_path)
+                elif os.path.exists(self.spill_path):
+                    os.replace(self.spill_path, replay_path)
+            events = []
+            with open(replay_path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        event = json.loads(line)
+                        events.append({'timestamp': int(event['timestamp']), 'message': str(event['message'])})
+                    except (ValueError, KeyError, TypeError):
+                        self.stats['dropped'] += 1  # linha corrompida não impede as demais
+            os.remove(replay_path)
+        except OSError:
+            return
+        for batch in self._batches(sorted(events, key=lambda e: e['timestamp'])):
+            self._ship(batch)
+    
+    def _batches(self, events: List[Dict]) -> Iterator[List[Dict]]:
+        batch, size = [], 0
+        for event in events:
+            event_size = len(event['message'].encode('utf-8')) + self.EVENT_OVERHEAD
+            if batch and (len(batch) >= self.max_events or size + event_size > self.max_bytes):
+                yield batch
+                batch, size = [], 0
+            batch.append(event)
+            size += event_size
+        if batch:
+            yield batch
+
+
+_cloudwatch_handler: Optional[CloudWatchHandler] = None
+_setup_lock = threading.Lock()
+
+
+def _get_cloudwatch_handler(formatter: logging.Formatter) -> CloudWatchHandler:
+    """Handler CloudWatch único do processo (uma fila e uma thread de envio)"""
+    global _cloudwatch_handler
+    if _cloudwatch_handler is None:
+        handler = CloudWatchHandler()
+        handler.setFormatter(formatter)
+        atexit.register(handler.close)
+        _cloudwatch_handler = handler
+    return _cloudwatch_handler
 
 
 def setup_logging(name: str, level: int = logging.INFO) -> logging.Logger:
-    """Configura logger com suporte a CloudWatch"""
+    """Configura logger com suporte a CloudWatch
+
+    Idempotente: chamadas repetidas (ex.: a cada rerun do Streamlit) não
+    duplicam handlers.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(level)
     
-    # Handler para console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Handler para CloudWatch
-    try:
-        cloudwatch_handler = CloudWatchHandler()
-        cloudwatch_handler.setFormatter(formatter)
-        logger.addHandler(cloudwatch_handler)
-    except Exception as e:
-        logger.warning(f"CloudWatch não disponível: {e}")
+    with _setup_lock:
+        if getattr(logger, '_cyberguard_configured', False):
+            return logger
+        
+        # Handler para console
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(level)
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        console_handler.setFormatter(formatter)
+        logger.addHandler(console_handler)
+        
+        # Handler para CloudWatch
+        try:
+            logger.addHandler(_get_cloudwatch_handler(formatter))
+        except Exception as e:
+            logger.warning(f"CloudWatch não disponível: {e}")
+        
+        logger._cyberguard_configured = True
     
     return logger
 
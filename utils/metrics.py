@@ -0,0 +1,290 @@
+"""
+Instrumentação de latência das operações dos gerenciadores
+
+Cada chamada instrumentada registra, em memória e por operação: contagem,
+histograma de latência, erros (exceções e ``logger.error`` emitidos em
+``modules.*`` durante a chamada, já que os gerenciadores tratam exceções e
+retornam valores vazios), itens retornados e capacidade DynamoDB consumida.
+Os dados podem ser exportados em texto Prometheus ou CloudWatch Embedded
+Metric Format (EMF).
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from config import METRICS
+
+_active: contextvars.ContextVar[Tuple['_Measurement', ...]] = contextvars.ContextVar(
+    'cyberguard_active_operations', default=()
+)
+
+
+class _Measurement:
+    """Estado de uma chamada em andamento"""
+    
+    __slots__ = ('operation', 'items', 'error', 'read_units', 'write_units')
+    
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.items: Optional[int] = None
+        self.error = False
+        self.read_units = 0.0
+        self.write_units = 0.0
+
+
+class _OperationStats:
+    """Agregados de uma operação (histograma com limites fixos)"""
+    
+    __slots__ = ('calls', 'errors', 'total_seconds', 'max_seconds', 'buckets',
+                 'items', 'read_units', 'write_units')
+    
+    def __init__(self, bucket_count: int):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (bucket_count + 1)  # último = +Inf
+        self.items = 0
+        self.read_units = 0.0
+        self.write_units = 0.0
+
+
+class MetricsRegistry:
+    """Registro em processo das métricas por operação"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = METRICS['latency_buckets'],
+                 namespace: str = METRICS['namespace']):
+        self.bucket_bounds = tuple(buckets)
+        self.namespace = namespace
+        self._stats: Dict[str, _OperationStats] = {}
+        self._lock = threading.Lock()
+    
+    def _record(self, measurement: _Measurement, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats.get(measurement.operation)
+            if stats is None:
+                stats = self._stats[measurement.operation] = _OperationStats(len(self.bucket_bounds))
+            stats.calls += 1
+            stats.total_seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            stats.buckets[bisect.bisect_left(self.bucket_bounds, seconds)] += 1
+            if measurement.error:
+                stats.errors += 1
+            if measurement.items:
+                stats.items += measurement.items
+            stats.read_units += measurement.read_units
+            stats.write_units += measurement.write_units
+    
+    @contextmanager
+    def measure(self, operation: str):
+        """Context manager que mede um bloco; defina `m.items` para contar itens"""
+        measurement = _Measurement(operation)
+        token = _active.set(_active.get() + (measurement,))
+        start = time.perf_counter()
+        try:
+            yield measurement
+        except BaseException:
+            measurement.error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _active.reset(token)
+            self._record(measurement, elapsed)
+    
+    def instrument(self, operation: Optional[str] = None) -> Callable:
+        """Decorator que mede a função; listas retornadas contam como itens"""
+        def decorator(func):
+            name = operation or func.__qualname__
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(name) as measurement:
+                    result = func(*args, **kwargs)
+                    if isinstance(result, list):
+                        measurement.items = len(result)
+                    return result
+            
+            wrapper.__instrumented__ = True
+            return wrapper
+        return decorator
+    
+    def instrument_class(self, cls):
+        """Decorator de classe: instrumenta todos os métodos públicos"""
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('_'):
+                continue
+            operation = f'{cls.__name__}.{attr}'
+            if isinstance(value, staticmethod):
+                setattr(cls, attr, staticmethod(self.instrument(operation)(value.__func__)))
+            elif isinstance(value, classmethod):
+                setattr(cls, attr, classmethod(self.instrument(operation)(value.__func__)))
+            elif inspect.isfunction(value) and not getattr(value, '__instrumented__', False):
+                setattr(cls, attr, self.instrument(operation)(value))
+        return cls
+    
+    # Consulta e exportação
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+    
+    def _quantile(self, stats: _OperationStats, q: float) -> float:
+        """Estimativa de quantil por interpolação linear no histograma"""
+        if not stats.calls:
+            return 0.0
+        target = q * stats.calls
+        cumulative = 0
+        lower = 0.0
+        for i, count in enumerate(stats.buckets):
+            upper = self.bucket_bounds[i] if i < len(self.bucket_bounds) else stats.max_seconds
+            if count and cumulative + count >= target:
+                fraction = (target - cumulative) / count
+                return min(lower + (upper - lower) * fraction, stats.max_seconds)
+            cumulative += count
+            lower = upper
+        return stats.max_seconds
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Resumo por operação (latências em milissegundos)"""
+        with self._lock:
+            items = list(self._stats.items())
+            return {
+                op: {
+                    'calls': s.calls,
+                    'errors': s.errors,
+                    'error_rate': s.errors / s.calls if s.calls else 0.0,
+                    'avg_ms': s.total_seconds / s.calls * 1000 if s.calls else 0.0,
+                    'p50_ms': self._quantile(s, 0.50) * 1000,
+                    'p95_ms': self._quantile(s, 0.95) * 1000,
+                    'p99_ms': self._quantile(s, 0.99) * 1000,
+                    'max_ms': s.max_seconds * 1000,
+                    'items': s.items,
+                    'read_units': s.read_units,
+                    'write_units': s.write_units
+                }
+                for op, s in sorted(items)
+            }
+    
+    def to_prometheus(self) -> str:
+        """Exporta no formato texto do Prometheus"""
+        prefix = self.namespace.lower()
+        lines = []
+        
+        def header(name, kind, text):
+            lines.append(f'# HELP {prefix}_{name} {text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+        
+        with self._lock:
+            stats = sorted(self._stats.items())
+            
+            header('operation_duration_seconds', 'histogram', 'Latência das operações')
+            for op, s in stats:
+                cumulative = 0
+                for bound, count in zip(self.bucket_bounds + (float('inf'),), s.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_operation_duration_seconds_bucket'
+                                 f'{{operation="{op}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_operation_duration_seconds_sum{{operation="{op}"}} {s.total_seconds}')
+                lines.append(f'{prefix}_operation_duration_seconds_count{{operation="{op}"}} {s.calls}')
+            
+            counters = [
+                ('operation_errors_total', 'Chamadas com erro', 'errors'),
+                ('operation_items_total', 'Itens retornados', 'items'),
+                ('dynamodb_consumed_read_units_total', 'RCUs consumidas', 'read_units'),
+                ('dynamodb_consumed_write_units_total', 'WCUs consumidas', 'write_units')
+            ]
+            for name, text, attr in counters:
+                header(name, 'counter', text)
+                for op, s in stats:
+                    lines.append(f'{prefix}_{name}{{operation="{op}"}} {getattr(s, attr)}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def to_emf(self, timestamp_ms: Optional[int] = None) -> List[str]:
+        """Exporta um documento CloudWatch EMF (JSON) por operação"""
+        timestamp_ms = timestamp_ms or int(time.time() * 1000)
+        documents = []
+        for op, s in self.snapshot().items():
+            documents.append(json.dumps({
+                '_aws': {
+                    'Timestamp': timestamp_ms,
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [['Operation']],
+                        'Metrics': [
+                            {'Name': 'Calls', 'Unit': 'Count'},
+                            {'Name': 'Errors', 'Unit': 'Count'},
+                            {'Name': 'LatencyAvg', 'Unit': 'Milliseconds'},
+                            {'Name': 'LatencyP95', 'Unit': 'Milliseconds'},
+                            {'Name': 'Items', 'Unit': 'Count'},
+                            {'Name': 'ConsumedRCU', 'Unit': 'Count'},
+                            {'Name': 'ConsumedWCU', 'Unit': 'Count'}
+                        ]
+                    }]
+                },
+                'Operation': op,
+                'Calls': s['calls'],
+                'Errors': s['errors'],
+                'LatencyAvg': round(s['avg_ms'], 3),
+                'LatencyP95': round(s['p95_ms'], 3),
+                'Items': s['items'],
+                'ConsumedRCU': s['read_units'],
+                'ConsumedWCU': s['write_units']
+            }))
+        return documents
+
+
+def add_consumed_capacity(read_units: float = 0.0, write_units: float = 0.0) -> None:
+    """Soma capacidade consumida às operações em andamento (inclusivo, como a latência)"""
+    for measurement in _active.get():
+        measurement.read_units += read_units
+        measurement.write_units += write_units
+
+
+def current_operation() -> Optional[str]:
+    """Operação instrumentada mais interna em andamento"""
+    active = _active.get()
+    return active[-1].operation if active else None
+
+
+class _ErrorCounter(logging.Handler):
+    """Marca como erro a operação em andamento quando ela registra logger.error
+
+    Por ser um handler, sua presença desativaria o `logging.lastResort`
+    (saída em stderr quando não há handlers configurados); nesse caso o
+    registro é repassado a ele para manter o comportamento padrão.
+    """
+    
+    def emit(self, record: logging.LogRecord):
+        active = _active.get()
+        if active and record.levelno >= logging.ERROR:
+            active[-1].error = True
+        if not logging.getLogger().handlers and logging.lastResort is not None \
+                and record.levelno >= logging.lastResort.level:
+            logging.lastResort.handle(record)
+
+
+_metrics = MetricsRegistry()
+_error_counter = _ErrorCounter(level=logging.WARNING)
+logging.getLogger('modules').addHandler(_error_counter)
+
+
+def get_metrics() -> MetricsRegistry:
+    """Retorna o registro de métricas do processo"""
+    return _metrics
+
+
+def instrument(operation: Optional[str] = None) -> Callable:
+    return _metrics.instrument(operation)
+
+
+def instrumented(cls):
+    """Decorator de classe que instrumenta os métodos públicos no registro global"""
+    return _metrics.instrument_class(cls)
@@ -0,0 +1,583 @@
+"""
+Camada de armazenamento plugável para as tabelas da aplicação
+
+Os gerenciadores obtêm tabelas com ``get_table('progress')`` e usam a mesma
+API de ``boto3`` Table (put_item, get_item, query, scan, update_item,
+delete_item, batch_writer). O backend é escolhido por ``config.STORAGE``:
+
+- ``dynamodb``: tabelas reais (Table por thread, ver ``AWSClient.table``)
+- ``sqlite``: banco local indexado para instalações de nó único e para medir
+  desempenho sem AWS
+"""
+import base64
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from botocore.exceptions import ClientError
+
+from config import DYNAMODB_TABLES, STORAGE
+from utils.aws_client import get_aws_client
+from utils.capacity import MeteredTable
+from utils import expressions
+
+logger = logging.getLogger(__name__)
+
+# Esquema das tabelas (espelha setup_v2.py). `columns` são atributos extras
+# materializados em colunas indexadas no SQLite.
+TABLE_SCHEMAS = {
+    'questions': {
+        'hash': 'questionId', 'range': None, 'range_type': 'S',
+        'indexes': {'CategoryIndex': ('category', None)},
+        'columns': ['category']
+    },
+    'progress': {
+        'hash': 'userId', 'range': 'timestamp', 'range_type': 'N',
+        'indexes': {},
+        'columns': []
+    },
+    'certificates': {
+        'hash': 'userId', 'range': 'certificateId', 'range_type': 'S',
+        'indexes': {'CertificateIdIndex': ('certificateId', None)},
+        'columns': ['certificateId']
+    },
+    'badges': {
+        'hash': 'userId', 'range': 'badgeId', 'range_type': 'S',
+        'indexes': {},
+        'columns': []
+    },
+    'user_stats': {
+        'hash': 'userId', 'range': None, 'range_type': 'S',
+        'indexes': {},
+        'columns': []
+    }
+}
+
+
+def conditional_check_failed(error: ClientError) -> bool:
+    """Indica se o erro é falha de ConditionExpression (qualquer backend)"""
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def _client_error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+# Serialização de itens (preserva Decimal, conjuntos e binários)
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return {'$N': str(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(v, Decimal) for v in value):
+            return {'$NS': [str(v) for v in value]}
+        if all(isinstance(v, (bytes, bytearray)) for v in value):
+            return {'$BS': [base64.b64encode(v).decode('ascii') for v in value]}
+        return {'$SS': list(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {'$B': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {'$N': str(value)}
+    raise TypeError(f"Tipo não suportado: {type(value).__name__}")
+
+
+def _object_hook(obj):
+    if len(obj) == 1:
+        (tag, value), = obj.items()
+        if tag == '$N':
+            return Decimal(value)
+        if tag == '$NS':
+            return {Decimal(v) for v in value}
+        if tag == '$SS':
+            return set(value)
+        if tag == '$B':
+            return base64.b64decode(value)
+        if tag == '$BS':
+            return {base64.b64decode(v) for v in value}
+    return obj
+
+
+def _normalize_numbers(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _normalize_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize_numbers(v) for v in value]
+    return value
+
+
+def encode_item(item: Dict) -> str:
+    return json.dumps(_normalize_numbers(item), default=_json_default,
+                      ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_item(data: str) -> Dict:
+    return json.loads(data, object_hook=_object_hook)
+
+
+class StorageBackend:
+    """Interface dos backends de armazenamento"""
+    
+    name = 'base'
+    
+    def table(self, key: str):
+        """Retorna a tabela lógica `key` ('questions', 'progress', ...)"""
+        raise NotImplementedError
+
+
+class DynamoDBBackend(StorageBackend):
+    """Tabelas DynamoDB reais"""
+    
+    name = 'dynamodb'
+    
+    def table(self, key: str):
+        return MeteredTable(get_aws_client().table(DYNAMODB_TABLES[key]), key)
+
+
+class SQLiteBackend(StorageBackend):
+    """Tabelas em um banco SQLite local (WAL, uma conexão por thread)"""
+    
+    name = 'sqlite'
+    
+    def __init__(self, path: str = STORAGE['sqlite_path'],
+                 page_size: int = STORAGE['sqlite_page_size']):
+        if path == ':memory:':
+            # Memória compartilhada entre as conexões das threads
+            path = f"file:cyberguard-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.path = path
+        self.page_size = page_size
+        self._local = threading.local()
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._anchor = self.connection()  # mantém bancos em memória vivos
+        self._create_schema(self._anchor)
+    
+    def connection(self) -> sqlite3.Connection:
+        """Conexão da thread atual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                uri=self.path.startswith('file:'),
+                isolation_level=None,       # transações explícitas
+                cached_statements=256,      # cache de prepared statements
+                check_same_thread=True
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.create_function('segment', 2, _segment, deterministic=True)
+            self._local.conn = conn
+        return conn
+    
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        for key, schema in TABLE_SCHEMAS.items():
+            name = _sql_name(key)
+            sk_type = 'NUMERIC' if schema['range_type'] == 'N' else 'TEXT'
+            extra = ''.join(f', "a_{c}" TEXT' for c in schema['columns'])
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {name} ('
+                f'pk TEXT NOT NULL, sk {sk_type} NOT NULL DEFAULT \'\'{extra}, '
+                f'data TEXT NOT NULL, PRIMARY KEY (pk, sk)) WITHOUT ROWID'
+            )
+            for column in schema['columns']:
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name}_{column} '
+                    f'ON {name} ("a_{column}", pk, sk)'
+                )
+            if schema['range_type'] == 'N':
+                # Leituras por período (ex.: atividade recente, exportações)
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {name}_sk ON {name} (sk)')
+    
+    def table(self, key: str) -> 'SQLiteTable':
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.setdefault(key, SQLiteTable(self, key))
+        return table
+
+
+def _sql_name(key: str) -> str:
+    return f't_{key}'
+
+
+def _segment(pk: str, total: int) -> int:
+    return zlib.crc32(pk.encode('utf-8')) % total
+
+
+class _SQLiteBatchWriter:
+    """Equivalente ao batch_writer do boto3: grava tudo em uma transação"""
+    
+    def __init__(self, table: 'SQLiteTable', flush_amount: int = 500):
+        self.table = table
+        self.flush_amount = flush_amount
+        self._puts: List[Dict] = []
+        self._deletes: List[Dict] = []
+    
+    def put_item(self, Item: Dict) -> None:
+        self._puts.append(Item)
+        if len(self._puts) + len(self._deletes) >= self.flush_amount:
+            self.flush()
+    
+    def delete_item(self, Key: Dict) -> None:
+        self._deletes.append(Key)
+        if len(self._puts) + len(self._deletes) >= self.flush_amount:
+            self.flush()
+    
+    def flush(self) -> None:
+        if not self._puts and not self._deletes:
+            return
+        conn = self.table.backend.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self._puts:
+                conn.executemany(self.table._upsert_sql, [self.table._row(i) for i in self._puts])
+            if self._deletes:
+                conn.executemany(self.table._delete_sql, [self.table._key_params(k) for k in self._deletes])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._puts, self._deletes = [], []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+
+class SQLiteTable:
+    """Tabela SQLite com a mesma API usada pelos gerenciadores na Table do boto3"""
+    
+    def __init__(self, backend: SQLiteBackend, key: str):
+        self.backend = backend
+        self.key = key
+        self.name = self.table_name = DYNAMODB_TABLES[key]
+        self.schema = TABLE_SCHEMAS[key]
+        self._sql = _sql_name(key)
+        columns = ['pk', 'sk'] + [f'"a_{c}"' for c in self.schema['columns']] + ['data']
+        self._upsert_sql = (
+            f'INSERT OR REPLACE INTO {self._sql} ({", ".join(columns)}) '
+            f'VALUES ({", ".join("?" for _ in columns)})'
+        )
+        self._delete_sql = f'DELETE FROM {self._sql} WHERE pk = ? AND sk = ?'
+        self._get_sql = f'SELECT data FROM {self._sql} WHERE pk = ? AND sk = ?'
+    
+    # Conversões
+    def _sk(self, value):
+        if self.schema['range'] is None:
+            return ''
+        if self.schema['range_type'] == 'N':
+            return float(value)
+        return value
+    
+    def _key_params(self, key: Dict):
+        hash_key, range_key = self.schema['hash'], self.schema['range']
+        if hash_key not in key or (range_key and range_key not in key):
+            raise _client_error('ValidationException', 'Chave incompleta', 'GetItem')
+        return (key[hash_key], self._sk(key[range_key]) if range_key else '')
+    
+    def _row(self, item: Dict):
+        pk, sk = self._key_params(item)
+        extra = [item.get(c) for c in self.schema['columns']]
+        return (pk, sk, *[str(v) if v is not None else None for v in extra], encode_item(item))
+    
+    def _key_of(self, item: Dict, index: Optional[str] = None) -> Dict:
+        names = [self.schema['hash']] + ([self.schema['range']] if self.schema['range'] else [])
+        if index:
+            names += [n for n in self.schema['indexes'][index] if n]
+        return {n: item[n] for n in names if n in item}
+    
+    def _load(self, conn, key: Dict) -> Optional[Dict]:
+        row = conn.execute(self._get_sql, self._key_params(key)).fetchone()
+        return decode_item(row[0]) if row else None
+    
+    def _check(self, condition, current, names, values, operation):
+        if condition is not None and not expressions.evaluate(condition, current, names, values):
+            raise _client_error('ConditionalCheckFailedException',
+                                'The conditional request failed', operation)
+    
+    # Escrita
+    def put_item(self, Item: Dict, ConditionExpression=None,
+                 ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs) -> Dict:
+        conn = self.backend.connection()
+        if ConditionExpression is None:
+            conn.execute(self._upsert_sql, self._row(Item))
+            return {}
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = self._load(conn, Item)
+            self._check(ConditionExpression, current, ExpressionAttributeNames,
+                        ExpressionAttributeValues, 'PutItem')
+            conn.execute(self._upsert_sql, self._row(Item))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {}
+    
+    def delete_item(self, Key: Dict, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues: str = 'NONE', **kwargs) -> Dict:
+        conn = self.backend.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = self._load(conn, Key)
+            self._check(ConditionExpression, current, ExpressionAttributeNames,
+                        ExpressionAttributeValues, 'DeleteItem')
+            conn.execute(self._delete_sql, self._key_params(Key))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {'Attributes': current} if ReturnValues == 'ALL_OLD' and current else {}
+    
+    def update_item(self, Key: Dict, UpdateExpression: str, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+                    ReturnValues: str = 'NONE', **kwargs) -> Dict:
+        conn = self.backend.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = self._load(conn, Key)
+            self._check(ConditionExpression, current, ExpressionAttributeNames,
+                        ExpressionAttributeValues, 'UpdateItem')
+            base = current if current is not None else dict(Key)
+            updated = expressions.apply_update(
+                UpdateExpression, base, ExpressionAttributeNames,
+                _normalize_numbers(ExpressionAttributeValues or {})
+            )
+            conn.execute(self._upsert_sql, self._row(updated))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': updated}
+        if ReturnValues == 'ALL_OLD' and current:
+            return {'Attributes': current}
+        if ReturnValues in ('UPDATED_NEW', 'UPDATED_OLD'):
+            source = updated if ReturnValues == 'UPDATED_NEW' else (current or {})
+            changed = {k for k in set(updated) | set(current or {})
+                       if (current or {}).get(k) != updated.get(k)}
+            return {'Attributes': {k: source[k] for k in changed if k in source}}
+        return {}
+    
+    def batch_writer(self, overwrite_by_pkeys=None) -> _SQLiteBatchWriter:
+        return _SQLiteBatchWriter(self)
+    
+    # Leitura
+    def get_item(self, Key: Dict, ProjectionExpression=None,
+                 ExpressionAttributeNames=None, **kwargs) -> Dict:
+        item = self._load(self.backend.connection(), Key)
+        if item is None:
+            return {}
+        return {'Item': expressions.project(item, ProjectionExpression, ExpressionAttributeNames)}
+    
+    def batch_get(self, keys: List[Dict], ProjectionExpression=None,
+                  ExpressionAttributeNames=None) -> List[Dict]:
+        """Equivalente local do BatchGetItem (uma conexão, sem limite de 100 chaves)"""
+        conn = self.backend.connection()
+        items = []
+        for key in keys:
+            item = self._load(conn, key)
+            if item is not None:
+                items.append(expressions.project(item, ProjectionExpression, ExpressionAttributeNames))
+        return items
+    
+    def query(self, KeyConditionExpression, IndexName: Optional[str] = None,
+              FilterExpression=None, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, ScanIndexForward: bool = True,
+              Limit: Optional[int] = None, ExclusiveStartKey: Optional[Dict] = None,
+              ProjectionExpression=None, Select: Optional[str] = None, **kwargs) -> Dict:
+        builder = ConditionExpressionBuilder()
+        key_expr, names, values = expressions.normalize(
+            KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, True, builder
+        )
+        FilterExpression, names, values = expressions.normalize(FilterExpression, names, values,
+                                                                builder=builder)
+        conditions = expressions.key_conditions(key_expr, names, values)
+        
+        if IndexName:
+            if IndexName not in self.schema['indexes']:
+                raise _client_error('ValidationException', f'Índice inexistente: {IndexName}', 'Query')
+            hash_attr = self.schema['indexes'][IndexName][0]
+            where, params = [f'"a_{hash_attr}" = ?'], [str(conditions[hash_attr][1])]
+            order = ['pk', 'sk']
+        else:
+            hash_attr = self.schema['hash']
+            where, params = ['pk = ?'], [conditions[hash_attr][1]]
+            order = ['sk']
+            range_attr = self.schema['range']
+            if range_attr and range_attr in conditions:
+                clause, extra = self._range_sql(conditions[range_attr])
+                where.append(clause)
+                params.extend(extra)
+        
+        direction = 'ASC' if ScanIndexForward else 'DESC'
+        if ExclusiveStartKey:
+            start = [ExclusiveStartKey[self.schema['hash']],
+                     self._sk(ExclusiveStartKey.get(self.schema['range'], ''))
+                     if self.schema['range'] else '']
+            comparator = '>' if ScanIndexForward else '<'
+            if IndexName:
+                where.append(f'(pk, sk) {comparator} (?, ?)')
+                params.extend(start)
+            else:
+                where.append(f'sk {comparator} ?')
+                params.append(start[1])
+        
+        sql = (f'SELECT data FROM {self._sql} WHERE {" AND ".join(where)} '
+               f'ORDER BY {", ".join(f"{c} {direction}" for c in order)} LIMIT ?')
+        return self._page(sql, params, Limit, key_expr, FilterExpression, names, values,
+                          ProjectionExpression, Select, IndexName)
+    
+    def scan(self, FilterExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, Limit: Optional[int] = None,
+             ExclusiveStartKey: Optional[Dict] = None, Segment: Optional[int] = None,
+             TotalSegments: Optional[int] = None, ProjectionExpression=None,
+             Select: Optional[str] = None, IndexName: Optional[str] = None, **kwargs) -> Dict:
+        filter_expr, names, values = expressions.normalize(
+            FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues
+        )
+        where, params = ['1 = 1'], []
+        if TotalSegments:
+            where.append('segment(pk, ?) = ?')
+            params.extend([TotalSegments, Segment or 0])
+        if ExclusiveStartKey:
+            where.append('(pk, sk) > (?, ?)')
+            params.extend(self._key_params(ExclusiveStartKey))
+        sql = (f'SELECT data FROM {self._sql} WHERE {" AND ".join(where)} '
+               f'ORDER BY pk, sk LIMIT ?')
+        return self._page(sql, params, Limit, None, filter_expr, names, values,
+                          ProjectionExpression, Select, None)
+    
+    def _range_sql(self, condition):
+        op = condition[0]
+        if op == 'BETWEEN':
+            return 'sk BETWEEN ? AND ?', [self._sk(condition[1]), self._sk(condition[2])]
+        if op == 'begins_with':
+            return "substr(sk, 1, length(?)) = ?", [condition[1], condition[1]]
+        return f'sk {op} ?', [self._sk(condition[1])]
+    
+    def _page(self, sql, params, limit, key_expr, filter_expr, names, values,
+              projection, select, index) -> Dict:
+        page_size = limit or self.backend.page_size
+        rows = self.backend.connection().execute(sql, params + [page_size]).fetchall()
+        key_ast = expressions.parse_condition(key_expr, names) if key_expr else None
+        filter_ast = expressions.parse_condition(filter_expr, names) if filter_expr else None
+        
+        items = []
+        last = None
+        for (data,) in rows:
+            item = decode_item(data)
+            last = item
+            if key_ast and not expressions.matches(key_ast, item, values):
+                continue
+            if filter_ast and not expressions.matches(filter_ast, item, values):
+                continue
+            items.append(item)
+        
+        response = {'Count': len(items), 'ScannedCount': len(rows)}
+        if select != 'COUNT':
+            response['Items'] = [expressions.project(i, projection, names) for i in items]
+        if len(rows) == page_size and last is not None:
+            response['LastEvaluatedKey'] = self._key_of(last, index)
+        return response
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Retorna o backend configurado em config.STORAGE['backend']"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = STORAGE['backend']
+                if backend == 'sqlite':
+                    _storage = SQLiteBackend()
+                elif backend == 'dynamodb':
+                    _storage = DynamoDBBackend()
+                else:
+                    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+                logger.info(f"Backend de armazenamento: {_storage.name}")
+    return _storage
+
+
+def set_storage(backend: Optional[StorageBackend]) -> None:
+    """Substitui o backend ativo (testes, benchmarks, scripts)"""
+    global _storage
+    with _storage_lock:
+        _storage = backend
+
+
+def get_table(key: str):
+    """Atalho para get_storage().table(key)"""
+    return get_storage().table(key)
+
+
+def iter_pages(operation, **kwargs) -> Iterator[Dict]:
+    """Itera páginas de query/scan seguindo LastEvaluatedKey"""
+    while True:
+        response = operation(**kwargs)
+        yield response
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+BATCH_GET_LIMIT = 100  # chaves por chamada BatchGetItem
+
+
+def batch_get(table, keys: List[Dict], ProjectionExpression: Optional[str] = None,
+              ExpressionAttributeNames: Optional[Dict] = None, max_retries: int = 8,
+              backoff_base: float = 0.05) -> List[Dict]:
+    """Lê vários itens de `table` por chave, em lotes de 100 (BatchGetItem)
+    
+    Chaves repetidas são lidas uma vez e UnprocessedKeys (throttling parcial)
+    são reenviadas com backoff exponencial. A ordem do resultado não é
+    garantida, como no DynamoDB.
+    """
+    if hasattr(table, 'batch_get'):  # SQLiteTable
+        return table.batch_get(keys, ProjectionExpression, ExpressionAttributeNames)
+    
+    unique = list({json.dumps(k, sort_keys=True, default=str): k for k in keys}.values())
+    resource = get_aws_client().dynamodb
+    name = table.table_name
+    items: List[Dict] = []
+    for start in range(0, len(unique), BATCH_GET_LIMIT):
+        request = {'Keys': unique[start:start + BATCH_GET_LIMIT]}
+        if ProjectionExpression:
+            request['ProjectionExpression'] = ProjectionExpression
+        if ExpressionAttributeNames:
+            request['ExpressionAttributeNames'] = ExpressionAttributeNames
+        
+        for attempt in range(max_retries + 1):
+            response = resource.batch_get_item(RequestItems={name: request},
+                                               ReturnConsumedCapacity='TOTAL')
+            if isinstance(table, MeteredTable):
+                table.meter('batch_get_item', response)
+            items.extend(response.get('Responses', {}).get(name, []))
+            unprocessed = response.get('UnprocessedKeys', {}).get(name)
+            if not unprocessed or not unprocessed.get('Keys'):
+                break
+            if attempt == max_retries:
+                raise _client_error('ProvisionedThroughputExceededException',
+                                    f"{len(unprocessed['Keys'])} chaves não processadas", 'BatchGetItem')
+            request = unprocessed
+            time.sleep(min(backoff_base * (2 ** attempt), 2.0))
+    return items
@@ -0,0 +1,195 @@
+"""
+Verificação local de tokens JWT do Cognito (RS256)
+
+Os tokens de acesso e de identidade emitidos pelo Cognito são assinados
+com RSA/SHA-256 por chaves publicadas no JWKS do user pool. A assinatura é
+conferida aqui mesmo (PKCS#1 v1.5, só biblioteca padrão), contra o JWKS em
+cache: o Cognito só é consultado para buscar as chaves, periodicamente ou
+quando aparece um ``kid`` desconhecido (rotação de chaves).
+
+Tokens já verificados ficam num cache em memória até expirarem, então uma
+verificação repetida custa apenas um hash do token.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from config import AWS_REGION, COGNITO, TIMEOUTS
+from utils.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Prefixo DER do DigestInfo de SHA-256 (RFC 8017, seção 9.2)
+_SHA256_DIGEST_INFO = bytes.fromhex('3031300d060960864801650304020105000420')
+
+
+class TokenError(ValueError):
+    """Token inválido, expirado ou de outro pool/cliente"""
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _b64int(segment: str) -> int:
+    return int.from_bytes(_b64decode(segment), 'big')
+
+
+def rsa_sha256_verify(message: bytes, signature: bytes, n: int, e: int) -> bool:
+    """Confere uma assinatura RSASSA-PKCS1-v1_5 com SHA-256"""
+    size = (n.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    value = int.from_bytes(signature, 'big')
+    if value >= n:
+        return False
+    encoded = pow(value, e, n).to_bytes(size, 'big')
+    digest = _SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    padding = size - len(digest) - 3
+    if padding < 8:
+        return False
+    expected = b'\x00\x01' + b'\xff' * padding + b'\x00' + digest
+    return hmac.compare_digest(encoded, expected)
+
+
+def _fetch_jwks(url: str) -> Dict:
+    with urllib.request.urlopen(url, timeout=TIMEOUTS['aws_default']) as response:
+        return json.loads(response.read())
+
+
+@instrumented
+class TokenVerifier:
+    """Verifica tokens de um user pool/cliente com JWKS e claims em cache"""
+    
+    def __init__(self, user_pool_id: str, client_id: str, region: Optional[str] = None,
+                 fetch: Callable[[str], Dict] = _fetch_jwks,
+                 clock: Callable[[], float] = time.time):
+        region = region or user_pool_id.split('_')[0] or AWS_REGION
+        self.issuer = f'https://cognito-idp.{region}.amazonaws.com/{user_pool_id}'
+        self.jwks_url = f'{self.issuer}/.well-known/jwks.json'
+        self.client_id = client_id
+        self.leeway = COGNITO['leeway_seconds']
+        self._fetch = fetch
+        self._clock = clock
+        self._keys: Dict[str, Tuple[int, int]] = {}
+        self._fetched_at: Optional[float] = None
+        self._keys_lock = threading.Lock()
+        self._claims: 'OrderedDict[bytes, Dict]' = OrderedDict()
+        self._claims_lock = threading.Lock()
+    
+    def _load_keys(self) -> None:
+        jwks = self._fetch(self.jwks_url)
+        keys = {
+            key['kid']: (_b64int(key['n']), _b64int(key['e']))
+            for key in jwks.get('keys', [])
+            if key.get('kty') == 'RSA' and key.get('kid')
+        }
+        self._keys = keys
+        logger.info(f"JWKS carregado: {len(keys)} chaves")
+    
+    def _key(self, kid: str) -> Tuple[int, int]:
+        """Chave pública do `kid`, buscando o JWKS se vencido ou se o kid é novo"""
+        now = time.monotonic()
+        fetched_at = self._fetched_at
+        stale = fetched_at is None or now - fetched_at > COGNITO['jwks_refresh_seconds']
+        unknown = kid not in self._keys and (
+            fetched_at is None or now - fetched_at > COGNITO['jwks_min_interval'])
+        if stale or unknown:
+            with self._keys_lock:
+                if self._fetched_at == fetched_at:
+                    try:
+                        self._load_keys()
+                    except Exception as e:
+                        logger.warning(f"Falha ao carregar JWKS, mantendo as chaves atuais: {e}")
+                    self._fetched_at = now  # falhas também esperam o intervalo mínimo
+        key = self._keys.get(kid)
+        if key is None:
+            raise TokenError('Chave de assinatura desconhecida')
+        return key
+    
+    def _cached(self, cache_key: bytes, now: float) -> Optional[Dict]:
+        with self._claims_lock:
+            claims = self._claims.get(cache_key)
+            if claims is None:
+                return None
+            if now > claims['exp'] + self.leeway:
+                del self._claims[cache_key]
+                return None
+            self._claims.move_to_end(cache_key)
+            return claims
+    
+    def _store(self, cache_key: bytes, claims: Dict) -> None:
+        with self._claims_lock:
+            self._claims[cache_key] = claims
+            while len(self._claims) > COGNITO['claims_cache_size']:
+                self._claims.popitem(last=False)
+    
+    def verify(self, token: str, token_use: Optional[str] = None) -> Dict:
+        """Valida assinatura, exp, iss, token_use e cliente; retorna as claims
+
+        `token_use` restringe o tipo ('access' ou 'id'). Levanta
+        ``TokenError`` se o token não for aceito.
+        """
+        now = self._clock()
+        cache_key = hashlib.sha256(token.encode()).digest()
+        claims = self._cached(cache_key, now)
+        if claims is None:
+            claims = self._verify(token, now)
+            self._store(cache_key, claims)
+        if token_use is not None and claims['token_use'] != token_use:
+            raise TokenError(f"Token de tipo '{claims['token_use']}', esperado '{token_use}'")
+        return dict(claims)
+    
+    def _verify(self, token: str, now: float) -> Dict:
+        try:
+            header_segment, payload_segment, signature_segment = token.split('.')
+            header = json.loads(_b64decode(header_segment))
+            claims = json.loads(_b64decode(payload_segment))
+            signature = _b64decode(signature_segment)
+        except (ValueError, AttributeError) as e:
+            raise TokenError(f"Token malformado: {e}")
+        
+        if header.get('alg') != 'RS256':
+            raise TokenError(f"Algoritmo não suportado: {header.get('alg')}")
+        n, e = self._key(header.get('kid', ''))
+        if not rsa_sha256_verify(f'{header_segment}.{payload_segment}'.encode(), signature, n, e):
+            raise TokenError('Assinatura inválida')
+        
+        if not isinstance(claims.get('exp'), (int, float)) or now > claims['exp'] + self.leeway:
+            raise TokenError('Token expirado')
+        if claims.get('iat', 0) > now + self.leeway:
+            raise TokenError('Token emitido no futuro')
+        if claims.get('iss') != self.issuer:
+            raise TokenError('Emissor inválido')
+        token_use = claims.get('token_use')
+        if token_use == 'access':
+            audience = claims.get('client_id')
+        elif token_use == 'id':
+            audience = claims.get('aud')
+        else:
+            raise TokenError(f"token_use inválido: {token_use}")
+        if audience != self.client_id:
+            raise TokenError('Token emitido para outro cliente')
+        return claims
+
+
+_verifiers: Dict[Tuple[str, str], TokenVerifier] = {}
+_verifiers_lock = threading.Lock()
+
+
+def get_token_verifier(user_pool_id: str, client_id: str) -> TokenVerifier:
+    """Verificador do processo para o pool/cliente (JWKS e claims compartilhados)"""
+    key = (user_pool_id, client_id)
+    verifier = _verifiers.get(key)
+    if verifier is None:
+        with _verifiers_lock:
+            verifier = _verifiers.get(key)
+            if verifier is None:
+                verifier = _verifiers[key] = TokenVerifier(user_pool_id, client_id)
+    return verifier